@@ -5,13 +5,26 @@ from jose import jwt
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import threading
+import time
 
 import bcrypt
 
+# Work factor for new hashes; existing hashes at another cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
 # Try to use bcrypt directly if passlib has issues
 try:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
     USE_PASSLIB = True
 except Exception as e:
     print(f"⚠️ Passlib bcrypt issue detected: {e}")
@@ -29,7 +42,7 @@ def get_password_hash(password: str) -> str:
             print(f"⚠️ Passlib hash failed, using bcrypt directly: {e}")
     
     # Fallback to direct bcrypt usage
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
@@ -48,6 +61,136 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         # If that fails, try the original passlib method as last resort
         return pwd_context.verify(plain_password, hashed_password)
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a stored hash was made with a different work factor"""
+    if USE_PASSLIB:
+        try:
+            return pwd_context.needs_update(hashed_password)
+        except Exception:
+            pass
+    
+    # Fallback: bcrypt hashes look like $2b$<rounds>$<salt+hash>
+    try:
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password and return a replacement hash when the cost changed"""
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if password_needs_rehash(hashed_password):
+        return True, get_password_hash(plain_password)
+    return True, None
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when too many password hashing jobs are already queued"""
+
+
+class PasswordHashingPool:
+    """
+    Bounded thread pool for bcrypt work.
+    
+    Concurrency is capped by the worker count; callers beyond
+    max_pending are rejected instead of queueing without limit.
+    """
+    
+    def __init__(self, max_workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        
+        self.pending = 0
+        self.active = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.queue_wait_ms = deque(maxlen=1000)
+        self.run_ms = deque(maxlen=1000)
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="password-hash"
+            )
+        return self._executor
+    
+    async def run(self, func, *args):
+        """Run a hashing function on the pool, tracking queue depth and latency"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHashingBusy("Password hashing queue is full")
+            self.pending += 1
+        
+        submitted = time.perf_counter()
+        
+        def timed():
+            started = time.perf_counter()
+            with self._lock:
+                self.active += 1
+                self.max_queue_depth = max(self.max_queue_depth, self.pending - self.active)
+                self.queue_wait_ms.append((started - submitted) * 1000)
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.run_ms.append((time.perf_counter() - started) * 1000)
+        
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, timed)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth, concurrency and latency metrics"""
+        with self._lock:
+            waits = sorted(self.queue_wait_ms)
+            runs = sorted(self.run_ms)
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "bcrypt_rounds": BCRYPT_ROUNDS,
+                "active": self.active,
+                "queue_depth": self.pending - self.active,
+                "max_queue_depth": self.max_queue_depth,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "p95_queue_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else 0.0,
+                "p95_hash_ms": round(runs[min(len(runs) - 1, int(len(runs) * 0.95))], 2) if runs else 0.0,
+            }
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hashing_pool = PasswordHashingPool()
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await password_hashing_pool.run(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop"""
+    return await password_hashing_pool.run(verify_password, plain_password, hashed_password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password off the event loop, returning a new hash if the cost changed"""
+    valid, new_hash = await password_hashing_pool.run(verify_and_update_password, plain_password, hashed_password)
+    if new_hash:
+        password_hashing_pool.rehashed += 1
+    return valid, new_hash
+
 def create_access_token(data: dict, secret_key: str, algorithm: str, expires_delta: timedelta = timedelta(minutes=30)):
     """Create JWT access token with expiration"""
     to_encode = data.copy()
@@ -66,13 +209,12 @@ def verify_token(token: str) -> Optional[Dict[str, Any]]:
         Token payload if valid, None if invalid
     """
     try:
-        from app.core.settings import get_settings
-        settings = get_settings()
+        from app.config import settings
         
         payload = jwt.decode(
             token, 
             settings.SECRET_KEY, 
-            algorithms=[settings.ALGORITHM]
+            algorithms=[settings.JWT_ALGORITHM]
         )
         
         # Check expiration
@@ -111,15 +253,14 @@ async def get_current_user(token: str = Depends(security)) -> Dict[str, Any]:
             token_str = str(token)
         
         # Get settings for JWT configuration
-        from app.core.settings import get_settings
-        settings = get_settings()
+        from app.config import settings
         
         # Decode and verify JWT token
         try:
             payload = jwt.decode(
                 token_str, 
                 settings.SECRET_KEY, 
-                algorithms=[settings.ALGORITHM]
+                algorithms=[settings.JWT_ALGORITHM]
             )
             
             # Check if token has expired
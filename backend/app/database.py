@@ -1,6 +1,14 @@
 import os
-from sqlalchemy import create_engine
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 # Get DATABASE_URL from environment with fallback to SQLite for development
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./localstorm.db')
@@ -9,8 +17,182 @@ DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./localstorm.db')
 if DATABASE_URL.startswith('postgres://'):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# Connection pool configuration (ignored for SQLite, which uses its own pooling)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Map a sync database URL onto its async driver (asyncpg / aiosqlite)"""
+    if database_url.startswith('postgresql+asyncpg://') or database_url.startswith('sqlite+aiosqlite://'):
+        return database_url
+    if database_url.startswith('postgresql://'):
+        return database_url.replace('postgresql://', 'postgresql+asyncpg://', 1)
+    if database_url.startswith('postgresql+psycopg2://'):
+        return database_url.replace('postgresql+psycopg2://', 'postgresql+asyncpg://', 1)
+    if database_url.startswith('sqlite://'):
+        return database_url.replace('sqlite://', 'sqlite+aiosqlite://', 1)
+    return database_url
+
+
+class PoolMetrics:
+    """Checkout wait and utilization counters for a connection pool"""
+
+    def __init__(self, name: str, window: int = 1000):
+        self.name = name
+        self.checkouts = 0
+        self.checkins = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.checkout_timeouts = 0
+        self.checkout_errors = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.recent_waits_ms = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_wait(self, wait_ms: float, timed_out: bool = False, failed: bool = False):
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+            elif failed:
+                self.checkout_errors += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.recent_waits_ms.append(wait_ms)
+
+    def on_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def on_invalidate(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def on_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def on_checkin(self):
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self, pool: Any = None) -> Dict[str, Any]:
+        """Current counters plus live pool state when available"""
+        with self._lock:
+            waits = sorted(self.recent_waits_ms)
+            stats = {
+                'name': self.name,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'checked_out': self.checked_out,
+                'peak_checked_out': self.peak_checked_out,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'checkout_timeouts': self.checkout_timeouts,
+                'checkout_errors': self.checkout_errors,
+                'avg_checkout_wait_ms': round(self.total_wait_ms / len(waits), 3) if waits else 0.0,
+                'p95_checkout_wait_ms': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                'max_checkout_wait_ms': round(self.max_wait_ms, 3),
+            }
+
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(0, pool._max_overflow)
+            stats.update({
+                'pool_size': pool.size(),
+                'max_overflow': pool._max_overflow,
+                'overflow': pool.overflow(),
+                'idle': pool.checkedin(),
+                'in_use': pool.checkedout(),
+                'utilization': round(pool.checkedout() / capacity, 3) if capacity > 0 else 0.0,
+            })
+
+        return stats
+
+
+class _TimedCheckoutMixin:
+    """Times how long callers wait for a connection from a queue pool"""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = failed = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        except Exception:
+            # Connect failures and the like; not a wait for a free slot
+            failed = True
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_wait((time.perf_counter() - start) * 1000, timed_out, failed)
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.metrics = self.metrics
+        return new_pool
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    """QueuePool that records checkout wait times"""
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait times"""
+
+
+def _attach_pool_metrics(pool: Any, metrics: PoolMetrics):
+    """Wire pool events into a metrics object"""
+    if isinstance(pool, _TimedCheckoutMixin):
+        pool.metrics = metrics
+
+    @event.listens_for(pool, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.on_connect()
+
+    @event.listens_for(pool, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.on_checkout()
+
+    @event.listens_for(pool, 'checkin')
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.on_checkin()
+
+    @event.listens_for(pool, 'invalidate')
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.on_invalidate()
+
+
+def _engine_options(database_url: str, poolclass: Any) -> Dict[str, Any]:
+    """Pool options for server databases; SQLite keeps SQLAlchemy's defaults"""
+    if database_url.startswith('sqlite'):
+        return {}
+    return {
+        'poolclass': poolclass,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+
+
 # Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, InstrumentedQueuePool))
+sync_pool_metrics = PoolMetrics('sync')
+_attach_pool_metrics(engine.pool, sync_pool_metrics)
 
 # Create a configured "Session" class
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
@@ -18,6 +200,55 @@ SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 # Base class for declarative models
 Base = declarative_base()
 
+# Async engine is created on first use so the async driver is only required
+# by deployments that actually adopt the async path
+ASYNC_DATABASE_URL = get_async_database_url(DATABASE_URL)
+async_pool_metrics = PoolMetrics('async')
+_async_engine = None
+_async_session_factory = None
+
+
+def get_async_engine():
+    """Get or create the shared AsyncEngine"""
+    global _async_engine, _async_session_factory
+
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            **_engine_options(ASYNC_DATABASE_URL, InstrumentedAsyncQueuePool)
+        )
+        _attach_pool_metrics(_async_engine.sync_engine.pool, async_pool_metrics)
+        _async_session_factory = async_sessionmaker(
+            bind=_async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """Create a new AsyncSession bound to the shared async engine"""
+    get_async_engine()
+    return _async_session_factory()
+
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """Pool checkout-wait and utilization metrics for the sync and async engines"""
+    return {
+        'sync': sync_pool_metrics.snapshot(engine.pool),
+        'async': async_pool_metrics.snapshot(_async_engine.sync_engine.pool) if _async_engine is not None else None,
+    }
+
+
+async def dispose_async_engine():
+    """Close pooled async connections (call on shutdown)"""
+    global _async_engine, _async_session_factory
+
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
+
+
 def get_db():
     """
     Dependency that provides a database session.
@@ -28,3 +259,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Async dependency that provides an AsyncSession.
+    Routes can switch from get_db one at a time.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,9 +1,10 @@
-import aiosmtplib
 import os
 from email.message import EmailMessage
 from typing import Optional
 from jinja2 import Template
 
+from app.services.smtp_pool import get_smtp_pool
+
 class EmailService:
     def __init__(self):
         # Email configuration from environment variables
@@ -43,15 +44,14 @@ class EmailService:
                 print("="*50)
                 return True
             
-            # Send via SMTP
-            await aiosmtplib.send(
-                message,
-                hostname=self.smtp_host,
-                port=self.smtp_port,
-                start_tls=True,
-                username=self.smtp_username,
-                password=self.smtp_password,
+            # Send over the SMTP connection pool shared with the alert notifier
+            pool = get_smtp_pool(
+                self.smtp_host,
+                self.smtp_port,
+                self.smtp_username,
+                self.smtp_password
             )
+            await pool.send(message)
             return True
             
         except Exception as e:
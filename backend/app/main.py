@@ -7,6 +7,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.middleware.input_sanitization import InputSanitizationMiddleware
 from app.middleware.content_moderation import ContentModerationMiddleware
 from app.middleware.monitoring import MonitoringMiddleware, set_monitoring_middleware_instance
+from app.database import dispose_async_engine
+from app.auth import password_hashing_pool
+from app.services.ai_personalization_service import close_personalization_service
+from app.services.alert_service import close_alert_system
+from app.services.audit_writer import audit_event_writer
+from app.services.health_service import close_health_service
+from app.services.health_snapshot import start_health_sampler, stop_health_sampler
+from app.services.smtp_pool import close_smtp_pools
 import os
 
 from app.routes import auth_v2, cape_ai, audit, monitoring, error_tracking, dashboard
@@ -15,6 +23,7 @@ from app.routes.alerts import router as alerts_router
 from app.routes.ai_performance import router as ai_performance_router
 from app.routes.ai_context import router as ai_context_router
 from app.routes.ai_personalization import router as ai_personalization_router
+from app.routes.voice import router as voice_router
 
 # Optional routes with graceful fallbacks
 try:
@@ -55,6 +64,23 @@ app = FastAPI(
     version="3.0.0"
 )
 
+@app.on_event("startup")
+async def startup_event():
+    """Start background samplers on the worker's event loop"""
+    start_health_sampler()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled resources on worker shutdown"""
+    await audit_event_writer.stop()
+    await close_personalization_service()
+    await stop_health_sampler()
+    await close_alert_system()
+    await close_health_service()
+    await close_smtp_pools()
+    await dispose_async_engine()
+    password_hashing_pool.shutdown()
+
 # Include routers
 app.include_router(auth_v2.router, prefix="/api/auth", tags=["auth"])
 app.include_router(cape_ai.router, prefix="/api/cape_ai", tags=["cape-ai"])
@@ -67,6 +93,8 @@ app.include_router(alerts_router, prefix="/api/alerts", tags=["alerts"])
 app.include_router(ai_performance_router, prefix="/api/ai_performance", tags=["ai-performance"])
 app.include_router(ai_context_router, prefix="/api/ai_context", tags=["ai-context"])
 app.include_router(ai_personalization_router, prefix="/api/ai_personalization", tags=["ai-personalization"])
+# The voice router carries its own /api/voice prefix
+app.include_router(voice_router)
 
 if USAGE_ANALYTICS_AVAILABLE:
     app.include_router(usage_analytics_router, prefix="/api/v1/analytics", tags=["usage-analytics"])
@@ -77,6 +105,8 @@ if PREFERENCE_MANAGEMENT_AVAILABLE:
     print("✅ Preference Management routes enabled (Task 2.2.6)")
 
 # Initialize monitoring middleware (REQUIRED)
+# The instance Starlette builds for the stack replaces this one as the global
+# instance on first request; this keeps monitoring endpoints answering before then
 monitoring_middleware = MonitoringMiddleware(app)
 set_monitoring_middleware_instance(monitoring_middleware)
 
@@ -105,6 +135,12 @@ try:
 except Exception as e:
     print(f"❌ Failed to add InputSanitizationMiddleware: {e}")
 
+try:
+    app.add_middleware(MonitoringMiddleware)
+    print("✅ MonitoringMiddleware added successfully")
+except Exception as e:
+    print(f"❌ Failed to add MonitoringMiddleware: {e}")
+
 # Add OPTIONAL middleware only if available
 if AUDIT_LOGGING_AVAILABLE:
     try:
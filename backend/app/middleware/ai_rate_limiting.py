@@ -1,38 +1,36 @@
 """AI Rate Limiting Middleware"""
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from collections import defaultdict
-import time
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+import math
+from typing import Optional
 
-class AIRateLimitingMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, ai_requests_per_minute: int = 20):
-        super().__init__(app)
+from app.middleware.rate_limiter import RateLimiter
+
+class AIRateLimitingMiddleware:
+    def __init__(self, app: ASGIApp, ai_requests_per_minute: int = 20, limiter: Optional[RateLimiter] = None):
+        self.app = app
         self.ai_requests_per_minute = ai_requests_per_minute
-        self.ai_request_counts = defaultdict(list)
+        self.limiter = limiter or RateLimiter("ai", ai_requests_per_minute, 60)
+
+    @property
+    def ai_request_counts(self):
+        """Remaining AI tokens per client tracked in this process"""
+        return self.limiter.snapshot()
 
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Check if this is an AI-related endpoint
-        if "/ai/" in str(request.url) or "/chat/" in str(request.url):
-            client_ip = request.client.host
-            current_time = time.time()
-            
-            # Clean old requests (older than 1 minute)
-            self.ai_request_counts[client_ip] = [
-                req_time for req_time in self.ai_request_counts[client_ip]
-                if current_time - req_time < 60
-            ]
+        if scope["type"] == "http" and ("/ai/" in scope["path"] or "/chat/" in scope["path"]):
+            client_ip = scope["client"][0] if scope.get("client") else "unknown"
             
             # Check if AI rate limit exceeded
-            if len(self.ai_request_counts[client_ip]) >= self.ai_requests_per_minute:
-                from starlette.responses import JSONResponse
-                return JSONResponse(
+            result = await self.limiter.hit(client_ip)
+            if not result.allowed:
+                response = JSONResponse(
                     status_code=429,
-                    content={"detail": "AI rate limit exceeded. Please wait before making more AI requests."}
+                    content={"detail": "AI rate limit exceeded. Please wait before making more AI requests."},
+                    headers={"Retry-After": str(math.ceil(result.retry_after))}
                 )
-            
-            # Record current AI request
-            self.ai_request_counts[client_ip].append(current_time)
+                await response(scope, receive, send)
+                return
         
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
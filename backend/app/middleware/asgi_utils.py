@@ -0,0 +1,97 @@
+"""
+Helpers shared by the pure-ASGI middlewares
+
+Working on the raw scope/receive/send avoids the per-request task and
+stream plumbing of BaseHTTPMiddleware and leaves streaming responses
+untouched.
+"""
+
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import Message, Receive, Scope, Send
+
+# Scope key under which the buffered request body is shared between layers
+CACHED_BODY_KEY = "capeai.cached_body"
+
+
+def get_header(scope: Scope, name: bytes) -> Optional[str]:
+    """First value of a (lower-case) request header, without building a Headers object"""
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def get_client_ip(scope: Scope, proxy_headers: Tuple[bytes, ...] = (b"x-forwarded-for",)) -> str:
+    """Client IP, preferring the first matching proxy header"""
+    for name in proxy_headers:
+        value = get_header(scope, name)
+        if value:
+            return value.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def read_body(scope: Scope, receive: Receive) -> Tuple[bytes, Receive]:
+    """
+    Buffer the request body once and return a receive callable that replays it.
+
+    The body is cached on the scope, so a second middleware inspecting the
+    same request reuses it instead of buffering again; the receive it was
+    handed is then already the outer layer's replay and is passed through.
+    """
+    body = scope.get(CACHED_BODY_KEY)
+    if body is not None:
+        return body, receive
+
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    body = b"".join(chunks)
+    scope[CACHED_BODY_KEY] = body
+
+    replayed = False
+
+    async def replay() -> Message:
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, replay
+
+
+class HeaderSend:
+    """
+    send wrapper that sets headers on the response start message.
+
+    `headers` may be a callable taking the start message, for values only
+    known once the response begins. `response_started` tells error
+    handlers whether they can still send a response of their own.
+    """
+
+    def __init__(self, send: Send, headers: Union[Dict[str, str], Callable[[Message], Dict[str, str]]]):
+        self.send = send
+        self.headers = headers
+        self.response_started = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.response_started = True
+            headers = self.headers(message) if callable(self.headers) else self.headers
+            response_headers = MutableHeaders(scope=message)
+            for name, value in headers.items():
+                response_headers[name] = value
+        await self.send(message)
+
+
+def send_with_headers(send: Send, headers: Union[Dict[str, str], Callable[[Message], Dict[str, str]]]) -> HeaderSend:
+    """Wrap send so the given headers are set on the response start message"""
+    return HeaderSend(send, headers)
@@ -7,22 +7,30 @@ import re
 import json
 import logging
 from typing import Dict, Any, List, Optional
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from urllib.parse import parse_qsl
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.middleware.asgi_utils import get_header, read_body, send_with_headers
 
 logger = logging.getLogger(__name__)
 
-class ContentModerationMiddleware(BaseHTTPMiddleware):
+class ContentModerationMiddleware:
     """
     Enterprise content moderation middleware for AI safety and compliance
     Filters inappropriate content, hate speech, and harmful instructions
     """
     
-    def __init__(self, app, strict_mode: bool = False):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, strict_mode: bool = False):
+        self.app = app
         self.strict_mode = strict_mode
         
+        # Content moderation headers added to every response
+        self.moderation_headers = {
+            "X-Content-Moderated": "true",
+            "X-Moderation-Policy": "strict" if strict_mode else "standard"
+        }
+        
         # Basic inappropriate patterns (simplified for deployment)
         self.inappropriate_patterns = [
             r'\b(hate|violence|harm|kill|murder)\b',
@@ -36,80 +44,69 @@ class ContentModerationMiddleware(BaseHTTPMiddleware):
         
         logger.info("✅ ContentModerationMiddleware initialized successfully")
     
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process request with content moderation"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
         try:
+            violation = None
+            
             # Check query parameters for inappropriate content
-            if request.query_params:
-                for key, value in request.query_params.items():
+            query_string = scope.get("query_string", b"")
+            if query_string:
+                for key, value in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True):
                     if self._contains_inappropriate_content(str(value)):
                         logger.warning(f"Inappropriate content detected in query param: {key}")
-                        return JSONResponse(
-                            status_code=400,
-                            content={
-                                "error": "Content moderation violation",
-                                "details": "Request contains inappropriate content",
-                                "field": key
-                            }
-                        )
+                        violation = {
+                            "error": "Content moderation violation",
+                            "details": "Request contains inappropriate content",
+                            "field": key
+                        }
+                        break
             
             # Check request body for POST/PUT/PATCH requests
-            if request.method in ['POST', 'PUT', 'PATCH']:
+            if violation is None and scope["method"] in ('POST', 'PUT', 'PATCH'):
                 try:
-                    content_type = request.headers.get('content-type', '').lower()
+                    content_type = (get_header(scope, b"content-type") or "").lower()
                     
                     if 'application/json' in content_type:
-                        body = await request.body()
+                        body, receive = await read_body(scope, receive)
                         if body:
                             try:
                                 json_data = json.loads(body.decode('utf-8'))
                                 if self._check_json_content(json_data):
                                     logger.warning("Inappropriate content detected in JSON body")
-                                    return JSONResponse(
-                                        status_code=400,
-                                        content={
-                                            "error": "Content moderation violation",
-                                            "details": "Request body contains inappropriate content"
-                                        }
-                                    )
+                                    violation = {
+                                        "error": "Content moderation violation",
+                                        "details": "Request body contains inappropriate content"
+                                    }
                             except json.JSONDecodeError:
                                 # If JSON parsing fails, check as string
                                 body_str = body.decode('utf-8', errors='ignore')
                                 if self._contains_inappropriate_content(body_str):
                                     logger.warning("Inappropriate content detected in request body")
-                                    return JSONResponse(
-                                        status_code=400,
-                                        content={
-                                            "error": "Content moderation violation",
-                                            "details": "Request body contains inappropriate content"
-                                        }
-                                    )
+                                    violation = {
+                                        "error": "Content moderation violation",
+                                        "details": "Request body contains inappropriate content"
+                                    }
                 except Exception as e:
                     logger.warning(f"Body moderation check error: {e}")
                     # Continue processing if body check fails
                     pass
             
-            # Process the request
-            response = await call_next(request)
-            
-            # Add content moderation headers
-            response.headers["X-Content-Moderated"] = "true"
-            response.headers["X-Moderation-Policy"] = "strict" if self.strict_mode else "standard"
-            
-            return response
+            if violation is not None:
+                response = JSONResponse(status_code=400, content=violation)
+                await response(scope, receive, send)
+                return
             
         except Exception as e:
             logger.error(f"Content moderation middleware error: {e}")
             # Continue with original request if moderation fails
-            try:
-                return await call_next(request)
-            except Exception as e2:
-                logger.error(f"Fallback request processing error: {e2}")
-                return JSONResponse(
-                    status_code=500,
-                    content={"error": "Internal server error"}
-                )
+        
+        # Process the request, adding content moderation headers
+        await self.app(scope, receive, send_with_headers(send, self.moderation_headers))
     
     def _contains_inappropriate_content(self, text: str) -> bool:
         """Check if text contains inappropriate content"""
@@ -2,54 +2,46 @@
 DDoS Protection Middleware for CapeAI Enterprise Platform
 """
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from collections import defaultdict
-import time
-from typing import Dict, Tuple
+from fastapi import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+import math
+from typing import Dict, Optional
 
-class DDoSProtectionMiddleware(BaseHTTPMiddleware):
+from app.middleware.asgi_utils import get_client_ip
+from app.middleware.rate_limiter import RateLimiter, RateLimitResult
+
+class DDoSProtectionMiddleware:
     """Enterprise DDoS protection middleware"""
     
-    def __init__(self, app, max_requests: int = 100, window: int = 60):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, max_requests: int = 100, window: int = 60, limiter: Optional[RateLimiter] = None):
+        self.app = app
         self.max_requests = max_requests
         self.window = window
-        self.request_counts: Dict[str, list] = defaultdict(list)
+        self.limiter = limiter or RateLimiter("ddos", max_requests, window)
+    
+    @property
+    def request_counts(self) -> Dict[str, int]:
+        """Remaining tokens per client tracked in this process"""
+        return self.limiter.snapshot()
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Process request with DDoS protection"""
-        client_ip = self._get_client_ip(request)
-        current_time = time.time()
-        
-        # Clean old requests
-        self._clean_old_requests(client_ip, current_time)
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
         # Check if client is rate limited
-        if len(self.request_counts[client_ip]) >= self.max_requests:
-            return Response(
-                content="Rate limit exceeded. Please try again later.",
-                status_code=429
-            )
-        
-        # Record this request
-        self.request_counts[client_ip].append(current_time)
+        result = await self.limiter.hit(get_client_ip(scope))
+        if not result.allowed:
+            await self._rate_limited_response(result)(scope, receive, send)
+            return
         
         # Process request
-        response = await call_next(request)
-        return response
-    
-    def _get_client_ip(self, request: Request) -> str:
-        """Extract client IP address"""
-        forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            return forwarded.split(",")[0].strip()
-        return request.client.host if request.client else "unknown"
+        await self.app(scope, receive, send)
     
-    def _clean_old_requests(self, client_ip: str, current_time: float):
-        """Remove requests outside the time window"""
-        cutoff_time = current_time - self.window
-        self.request_counts[client_ip] = [
-            req_time for req_time in self.request_counts[client_ip]
-            if req_time > cutoff_time
-        ]
+    def _rate_limited_response(self, result: RateLimitResult) -> Response:
+        return Response(
+            content="Rate limit exceeded. Please try again later.",
+            status_code=429,
+            headers={"Retry-After": str(math.ceil(result.retry_after))}
+        )
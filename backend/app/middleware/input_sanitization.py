@@ -8,21 +8,23 @@ import html
 import json
 import logging
 from typing import Dict, Any, List, Optional, Union
-from fastapi import Request, Response, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from urllib.parse import parse_qsl
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 import bleach
 
+from app.middleware.asgi_utils import get_client_ip, get_header, read_body, send_with_headers
+
 logger = logging.getLogger(__name__)
 
-class InputSanitizationMiddleware(BaseHTTPMiddleware):
+class InputSanitizationMiddleware:
     """
     Enterprise input sanitization middleware for security protection
     Handles XSS prevention, SQL injection protection, and input validation
     """
     
-    def __init__(self, app, max_content_length: int = 10 * 1024 * 1024):  # 10MB default
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, max_content_length: int = 10 * 1024 * 1024):  # 10MB default
+        self.app = app
         self.max_content_length = max_content_length
         
         # Rate limiting tracking (simple in-memory for now)
@@ -75,6 +77,36 @@ class InputSanitizationMiddleware(BaseHTTPMiddleware):
             'img': ['src', 'alt', 'width', 'height'],
         }
         
+        # Security headers added to every response
+        self.security_headers = {
+            "X-Content-Type-Options": "nosniff",
+            "X-Frame-Options": "DENY",
+            "X-XSS-Protection": "1; mode=block",
+            "Content-Security-Policy": (
+                "default-src 'self'; "
+                "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://cdn.jsdelivr.net; "
+                "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com https://cdn.jsdelivr.net; "
+                "font-src 'self' https://fonts.gstatic.com https://cdn.jsdelivr.net; "
+                "img-src 'self' data: https: blob: https://lightning-s3.s3.amazonaws.com https://lightning-s3.s3.us-east-1.amazonaws.com; "
+                "connect-src 'self' "
+                "https://www.cape-control.com https://cape-control.com https://capecraft.herokuapp.com "
+                "https://api.openai.com https://api.anthropic.com https://generativelanguage.googleapis.com "
+                "wss: https:; "
+                "manifest-src 'self'; "
+                "worker-src 'self' blob:; "
+                "child-src 'self' blob:; "
+                "object-src 'none'; "
+                "base-uri 'self'; "
+                "form-action 'self'; "
+                "frame-ancestors 'none'"
+            ),
+            # Additional production security headers
+            "Strict-Transport-Security": "max-age=31536000; includeSubDomains; preload",
+            "Referrer-Policy": "strict-origin-when-cross-origin",
+            "Permissions-Policy": "geolocation=(), microphone=(), camera=(), payment=(), usb=(), magnetometer=(), gyroscope=()",
+            "X-Permitted-Cross-Domain-Policies": "none",
+        }
+        
         logger.info("✅ InputSanitizationMiddleware initialized with performance monitoring")
     
     def get_security_stats(self) -> Dict[str, Any]:
@@ -87,44 +119,56 @@ class InputSanitizationMiddleware(BaseHTTPMiddleware):
             "tracked_ips_count": len(self._request_counts)
         }
     
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process request with comprehensive input sanitization"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        send_with_security_headers = send_with_headers(send, self.security_headers)
         
         try:
             # Increment request counter for monitoring
             self._request_counter += 1
             
             # Get client IP for tracking
-            client_ip = self._get_client_ip(request)
+            client_ip = self._get_client_ip(scope)
             
             # Check if IP is blocked
             if client_ip in self._blocked_ips:
                 logger.warning(f"Blocked request from IP: {client_ip}")
                 self._threats_blocked += 1
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=403,
                     content={"error": "Access denied", "details": "IP temporarily blocked"}
                 )
+                await response(scope, receive, send)
+                return
             
             # Check content length
-            if hasattr(request, 'headers') and 'content-length' in request.headers:
-                content_length = int(request.headers.get('content-length', 0))
+            content_length_header = get_header(scope, b"content-length")
+            if content_length_header:
+                content_length = int(content_length_header)
                 if content_length > self.max_content_length:
                     logger.warning(f"Request content too large: {content_length} bytes")
-                    return JSONResponse(
+                    response = JSONResponse(
                         status_code=413,
                         content={"error": "Request entity too large", "max_size": self.max_content_length}
                     )
+                    await response(scope, receive, send)
+                    return
             
             # Sanitize query parameters
-            if request.query_params:
+            query_string = scope.get("query_string", b"")
+            if query_string:
                 self._security_checks_performed += 1
-                sanitized_query = self._sanitize_query_params(dict(request.query_params))
+                query_params = dict(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+                sanitized_query = self._sanitize_query_params(query_params)
                 if not sanitized_query['is_safe']:
                     self._track_malicious_request(client_ip, "query_params")
                     self._threats_blocked += 1
                     logger.warning(f"Malicious query parameters detected from {client_ip}: {sanitized_query['threats']}")
-                    return JSONResponse(
+                    response = JSONResponse(
                         status_code=400,
                         content={
                             "error": "Invalid input detected",
@@ -132,16 +176,19 @@ class InputSanitizationMiddleware(BaseHTTPMiddleware):
                             "threats": sanitized_query['threats']
                         }
                     )
+                    await response(scope, receive, send)
+                    return
             
-            # Sanitize request body for POST/PUT/PATCH requests
-            if request.method in ['POST', 'PUT', 'PATCH']:
+            # Sanitize request body for POST/PUT/PATCH requests; other
+            # content types (e.g. multipart uploads) stream through unbuffered
+            if scope["method"] in ('POST', 'PUT', 'PATCH'):
                 try:
                     # Get content type
-                    content_type = request.headers.get('content-type', '').lower()
+                    content_type = (get_header(scope, b"content-type") or "").lower()
                     
                     if 'application/json' in content_type:
                         # Read and sanitize JSON body
-                        body = await request.body()
+                        body, receive = await read_body(scope, receive)
                         if body:
                             self._security_checks_performed += 1
                             sanitized_body = await self._sanitize_json_body(body)
@@ -149,7 +196,7 @@ class InputSanitizationMiddleware(BaseHTTPMiddleware):
                                 self._track_malicious_request(client_ip, "json_body")
                                 self._threats_blocked += 1
                                 logger.warning(f"Malicious JSON body detected from {client_ip}: {sanitized_body['threats']}")
-                                return JSONResponse(
+                                response = JSONResponse(
                                     status_code=400,
                                     content={
                                         "error": "Invalid input detected",
@@ -157,18 +204,21 @@ class InputSanitizationMiddleware(BaseHTTPMiddleware):
                                         "threats": sanitized_body['threats']
                                     }
                                 )
+                                await response(scope, receive, send)
+                                return
                     
                     elif 'application/x-www-form-urlencoded' in content_type:
                         # Handle form data
                         try:
                             self._security_checks_performed += 1
-                            form_data = await request.form()
-                            sanitized_form = self._sanitize_form_data(dict(form_data))
+                            body, receive = await read_body(scope, receive)
+                            form_data = dict(parse_qsl(body.decode('utf-8', errors='ignore'), keep_blank_values=True))
+                            sanitized_form = self._sanitize_form_data(form_data)
                             if not sanitized_form['is_safe']:
                                 self._track_malicious_request(client_ip, "form_data")
                                 self._threats_blocked += 1
                                 logger.warning(f"Malicious form data detected from {client_ip}: {sanitized_form['threats']}")
-                                return JSONResponse(
+                                response = JSONResponse(
                                     status_code=400,
                                     content={
                                         "error": "Invalid input detected",
@@ -176,6 +226,8 @@ class InputSanitizationMiddleware(BaseHTTPMiddleware):
                                         "threats": sanitized_form['threats']
                                     }
                                 )
+                                await response(scope, receive, send)
+                                return
                         except Exception as e:
                             logger.warning(f"Form data processing error: {e}")
                 
@@ -184,50 +236,22 @@ class InputSanitizationMiddleware(BaseHTTPMiddleware):
                     # Continue processing if sanitization fails
                     pass
             
-            # Process the request
-            response = await call_next(request)
-            
             # Periodic cleanup to prevent memory bloat (every 1000 requests)
             if self._request_counter % 1000 == 0:
                 self._cleanup_old_tracking_data()
             
-            # Add security headers
-            response.headers["X-Content-Type-Options"] = "nosniff"
-            response.headers["X-Frame-Options"] = "DENY"
-            response.headers["X-XSS-Protection"] = "1; mode=block"
-            response.headers["Content-Security-Policy"] = (
-                "default-src 'self'; "
-                "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://cdn.jsdelivr.net; "
-                "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com https://cdn.jsdelivr.net; "
-                "font-src 'self' https://fonts.gstatic.com https://cdn.jsdelivr.net; "
-                "img-src 'self' data: https: blob: https://lightning-s3.s3.amazonaws.com https://lightning-s3.s3.us-east-1.amazonaws.com; "
-                "connect-src 'self' "
-                "https://www.cape-control.com https://cape-control.com https://capecraft.herokuapp.com "
-                "https://api.openai.com https://api.anthropic.com https://generativelanguage.googleapis.com "
-                "wss: https:; "
-                "manifest-src 'self'; "
-                "worker-src 'self' blob:; "
-                "child-src 'self' blob:; "
-                "object-src 'none'; "
-                "base-uri 'self'; "
-                "form-action 'self'; "
-                "frame-ancestors 'none'"
-            )
-            
-            # Additional production security headers
-            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
-            response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-            response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=(), payment=(), usb=(), magnetometer=(), gyroscope=()"
-            response.headers["X-Permitted-Cross-Domain-Policies"] = "none"
-            
-            return response
+            # Process the request, adding security headers to the response
+            await self.app(scope, receive, send_with_security_headers)
             
         except Exception as e:
             logger.error(f"Input sanitization middleware error: {e}")
-            return JSONResponse(
+            if send_with_security_headers.response_started:
+                raise
+            response = JSONResponse(
                 status_code=500,
                 content={"error": "Internal server error", "details": "Input processing failed"}
             )
+            await response(scope, receive, send)
     
     def _sanitize_query_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Sanitize query parameters"""
@@ -372,23 +396,11 @@ class InputSanitizationMiddleware(BaseHTTPMiddleware):
         
         return text
     
-    def _get_client_ip(self, request: Request) -> str:
+    def _get_client_ip(self, scope: Scope) -> str:
         """Extract client IP from request headers (considering Cloudflare/Heroku proxies)"""
-        # Check for Cloudflare connecting IP first
-        if 'cf-connecting-ip' in request.headers:
-            return request.headers['cf-connecting-ip']
-        
-        # Check for X-Forwarded-For (Heroku/proxy)
-        if 'x-forwarded-for' in request.headers:
-            forwarded_ips = request.headers['x-forwarded-for'].split(',')
-            return forwarded_ips[0].strip()
-        
-        # Check for X-Real-IP
-        if 'x-real-ip' in request.headers:
-            return request.headers['x-real-ip']
-        
-        # Fallback to remote address
-        return getattr(request.client, 'host', 'unknown')
+        # Cloudflare connecting IP first, then X-Forwarded-For (Heroku/proxy), then X-Real-IP,
+        # falling back to the remote address
+        return get_client_ip(scope, (b"cf-connecting-ip", b"x-forwarded-for", b"x-real-ip"))
     
     def _track_malicious_request(self, client_ip: str, threat_type: str):
         """Track malicious requests and potentially block repeat offenders"""
@@ -9,21 +9,23 @@ import asyncio
 import psutil
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import URL
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 
+from app.middleware.asgi_utils import get_header, send_with_headers
+
 logger = logging.getLogger(__name__)
 
 # Global monitoring instance for external access
 _monitoring_middleware_instance: Optional['MonitoringMiddleware'] = None
 
-class MonitoringMiddleware(BaseHTTPMiddleware):
+class MonitoringMiddleware:
     """Enterprise monitoring middleware with comprehensive metrics"""
 
-    def __init__(self, app, max_requests: int = 1000):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, max_requests: int = 1000):
+        self.app = app
         self.max_requests = max_requests
         self.requests: List[Dict[str, Any]] = []
         self.metrics: Dict[str, Any] = {
@@ -46,49 +48,54 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
 
         logger.info("MonitoringMiddleware initialized")
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process request with comprehensive monitoring"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         start_time = time.time()
-        request_id = f"{int(time.time())}-{id(request)}"
+        request_id = f"{int(start_time)}-{id(scope)}"
 
         # Collect request info
         request_info = {
             "id": request_id,
-            "method": request.method,
-            "url": str(request.url),
-            "path": request.url.path,
-            "client_ip": request.client.host if request.client else "unknown",
-            "user_agent": request.headers.get("user-agent", "unknown"),
+            "method": scope["method"],
+            "url": str(URL(scope=scope)),
+            "path": scope["path"],
+            "client_ip": scope["client"][0] if scope.get("client") else "unknown",
+            "user_agent": get_header(scope, b"user-agent") or "unknown",
             "timestamp": datetime.now().isoformat(),
             "start_time": start_time
         }
 
-        try:
-            # Process request
-            response = await call_next(request)
+        def monitoring_headers(message: Message) -> Dict[str, str]:
+            request_info["status_code"] = message["status"]
+            return {
+                "X-Request-ID": request_id,
+                "X-Response-Time": f"{time.time() - start_time:.3f}s",
+                "X-Timestamp": datetime.now().isoformat()
+            }
 
-            # Calculate response time
-            end_time = time.time()
-            response_time = end_time - start_time
+        send_wrapper = send_with_headers(send, monitoring_headers)
+
+        try:
+            # Process request (response bodies stream through untouched)
+            await self.app(scope, receive, send_wrapper)
 
             # Update request info with response data
+            end_time = time.time()
+            status_code = request_info.get("status_code", 500)
             request_info.update({
-                "status_code": response.status_code,
-                "response_time": response_time,
-                "success": 200 <= response.status_code < 400,
+                "status_code": status_code,
+                "response_time": end_time - start_time,
+                "success": 200 <= status_code < 400,
                 "end_time": end_time
             })
 
-            # Add monitoring headers
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Response-Time"] = f"{response_time:.3f}s"
-            response.headers["X-Timestamp"] = datetime.now().isoformat()
-
             # Update metrics
             await self._update_metrics(request_info)
 
-            return response
-
         except Exception as e:
             # Handle errors
             end_time = time.time()
@@ -106,7 +113,10 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
 
             logger.error(f"Request {request_id} failed: {e}")
 
-            return JSONResponse(
+            if send_wrapper.response_started:
+                raise
+
+            response = JSONResponse(
                 status_code=500,
                 content={"error": "Internal server error", "request_id": request_id},
                 headers={
@@ -115,6 +125,7 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
                     "X-Error": "true"
                 }
             )
+            await response(scope, receive, send)
 
     async def _update_metrics(self, request_info: Dict[str, Any]) -> None:
         """Update comprehensive metrics"""
@@ -0,0 +1,207 @@
+"""
+Shared rate limiting engine for the limiter middlewares
+
+Token buckets give O(1) time and memory per client: each key stores only
+its remaining tokens and last refill time. Buckets live either in-process
+(LRU-bounded) or in Redis behind an atomic Lua script, so limits hold
+across gunicorn workers and dynos.
+"""
+
+import os
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory").lower()
+RATE_LIMIT_KEY_PREFIX = os.getenv("RATE_LIMIT_KEY_PREFIX", "capeai:ratelimit")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# KEYS[1] = bucket key
+# ARGV = capacity, refill rate (tokens/second), cost
+TOKEN_BUCKET_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of a single rate limit check"""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float = 0.0
+
+
+class InMemoryRateLimitBackend:
+    """
+    Per-process token buckets with LRU eviction.
+
+    A bucket that has fully refilled is indistinguishable from a missing
+    one, so idle keys are dropped from the cold end as requests arrive and
+    the table is capped at max_keys.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> [tokens, last refill time, time the bucket is full again]
+        self.buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    async def consume(self, key: str, capacity: int, refill_rate: float, cost: int = 1) -> RateLimitResult:
+        return self.consume_now(key, capacity, refill_rate, cost)
+
+    def consume_now(self, key: str, capacity: int, refill_rate: float, cost: int = 1) -> RateLimitResult:
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            tokens = float(capacity)
+        else:
+            tokens = min(float(capacity), bucket[0] + (now - bucket[1]) * refill_rate)
+            self.buckets.move_to_end(key)
+
+        if tokens >= cost:
+            tokens -= cost
+            allowed = True
+            retry_after = 0.0
+        else:
+            allowed = False
+            retry_after = (cost - tokens) / refill_rate
+
+        full_at = now + (capacity - tokens) / refill_rate
+        if bucket is None:
+            self.buckets[key] = [tokens, now, full_at]
+        else:
+            bucket[0], bucket[1], bucket[2] = tokens, now, full_at
+
+        self._evict(now)
+        return RateLimitResult(allowed, capacity, int(tokens), retry_after)
+
+    def _evict(self, now: float):
+        # Amortised O(1): look at a couple of the least recently used keys
+        for _ in range(2):
+            if not self.buckets:
+                break
+            oldest_key, oldest = next(iter(self.buckets.items()))
+            if oldest[2] <= now:
+                del self.buckets[oldest_key]
+            else:
+                break
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+
+    def snapshot(self, prefix: str = "") -> Dict[str, int]:
+        """Remaining tokens per key (for introspection)"""
+        return {
+            key: int(bucket[0]) for key, bucket in self.buckets.items()
+            if key.startswith(prefix)
+        }
+
+
+class RedisRateLimitBackend:
+    """
+    Token buckets stored in Redis and updated atomically by a Lua script.
+
+    If Redis is unreachable the backend degrades to an in-process bucket
+    and retries Redis after retry_interval seconds.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, retry_interval: float = 30.0,
+                 fallback: Optional[InMemoryRateLimitBackend] = None):
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.retry_interval = retry_interval
+        self.fallback = fallback or InMemoryRateLimitBackend()
+        self.redis_client: Optional[redis.Redis] = None
+        self._script = None
+        self._unavailable_until = 0.0
+
+    def _get_script(self):
+        if self._script is None:
+            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+            self._script = self.redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+        return self._script
+
+    async def consume(self, key: str, capacity: int, refill_rate: float, cost: int = 1) -> RateLimitResult:
+        if time.monotonic() < self._unavailable_until:
+            return self.fallback.consume_now(key, capacity, refill_rate, cost)
+
+        try:
+            allowed, tokens, retry_after = await self._get_script()(
+                keys=[key], args=[capacity, refill_rate, cost]
+            )
+        except Exception as e:
+            logger.warning(f"Redis rate limiting unavailable, using in-process buckets: {e}")
+            self._unavailable_until = time.monotonic() + self.retry_interval
+            return self.fallback.consume_now(key, capacity, refill_rate, cost)
+
+        return RateLimitResult(bool(int(allowed)), capacity, int(float(tokens)), float(retry_after))
+
+    def snapshot(self, prefix: str = "") -> Dict[str, int]:
+        return self.fallback.snapshot(prefix)
+
+
+class RateLimiter:
+    """A named limit of `limit` requests per `window` seconds on a shared backend"""
+
+    def __init__(self, name: str, limit: int, window: float = 60, backend=None):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.refill_rate = limit / window
+        self.backend = backend or get_rate_limit_backend()
+        self.key_prefix = f"{RATE_LIMIT_KEY_PREFIX}:{name}:"
+
+    async def hit(self, identifier: str, cost: int = 1) -> RateLimitResult:
+        """Consume tokens for a client and report whether the request may proceed"""
+        return await self.backend.consume(self.key_prefix + identifier, self.limit, self.refill_rate, cost)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Remaining tokens per tracked client in this process"""
+        return {
+            key[len(self.key_prefix):]: tokens
+            for key, tokens in self.backend.snapshot(self.key_prefix).items()
+        }
+
+
+_shared_backend = None
+
+def get_rate_limit_backend():
+    """Get the process-wide backend selected by RATE_LIMIT_STORAGE (memory | redis)"""
+    global _shared_backend
+    if _shared_backend is None:
+        if RATE_LIMIT_STORAGE == "redis":
+            _shared_backend = RedisRateLimitBackend()
+        else:
+            _shared_backend = InMemoryRateLimitBackend()
+    return _shared_backend
@@ -1,41 +1,42 @@
 """Rate Limiting Middleware"""
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from collections import defaultdict
-import time
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+import math
+from typing import Optional
 
-class RateLimitingMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, requests_per_minute: int = 60):
-        super().__init__(app)
+from app.middleware.rate_limiter import RateLimiter
+
+class RateLimitingMiddleware:
+    def __init__(self, app: ASGIApp, requests_per_minute: int = 60, limiter: Optional[RateLimiter] = None):
+        self.app = app
         self.requests_per_minute = requests_per_minute
-        self.request_counts = defaultdict(list)
+        self.limiter = limiter or RateLimiter("general", requests_per_minute, 60)
 
-    async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host
-        current_time = time.time()
-        
-        # Clean old requests (older than 1 minute)
-        self.request_counts[client_ip] = [
-            req_time for req_time in self.request_counts[client_ip]
-            if current_time - req_time < 60
-        ]
+    @property
+    def request_counts(self):
+        """Remaining tokens per client tracked in this process"""
+        return self.limiter.snapshot()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
         
         # Check if rate limit exceeded
-        if len(self.request_counts[client_ip]) >= self.requests_per_minute:
-            from fastapi import HTTPException
-            from starlette.responses import JSONResponse
-            return JSONResponse(
+        result = await self.limiter.hit(client_ip)
+        if not result.allowed:
+            response = JSONResponse(
                 status_code=429,
-                content={"detail": "Rate limit exceeded. Try again later."}
+                content={"detail": "Rate limit exceeded. Try again later."},
+                headers={"Retry-After": str(math.ceil(result.retry_after))}
             )
+            await response(scope, receive, send)
+            return
         
-        # Record current request
-        self.request_counts[client_ip].append(current_time)
-        
-        response: Response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
 
 # Backwards compatibility
 RateLimitMiddleware = RateLimitingMiddleware
@@ -7,7 +7,10 @@ Fixed for production Heroku deployment.
 """
 
 # Import audit log models
-from .audit_log import AuditLog, AuditEventType, AuditLogLevel
+from .audit_log import (
+    AuditLog, AuditEventType, AuditLogLevel, AuditStatsRollup, AuditUserActivitySketch,
+    AuditExportJob, AuditExportChunk
+)
 
 # Import base models with error handling
 try:
@@ -44,6 +47,10 @@ __all__ = [
     "AuditLog",
     "AuditEventType", 
     "AuditLogLevel",
+    "AuditStatsRollup",
+    "AuditUserActivitySketch",
+    "AuditExportJob",
+    "AuditExportChunk",
     "User",
     "UserProfile",
     "Conversation",
@@ -6,7 +6,7 @@ Comprehensive audit logging system for security, compliance, and monitoring.
 Tracks all important user actions, security events, and system activities.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -69,6 +69,7 @@ class AuditEventType(Enum):
     # System Events
     SYSTEM_ERROR = "system_error"
     SYSTEM_WARNING = "system_warning"
+    SYSTEM_HEALTH_CHECK = "system_health_check"
     MAINTENANCE_START = "maintenance_start"
     MAINTENANCE_END = "maintenance_end"
     
@@ -108,18 +109,28 @@ class AuditLog(Base):
     - User activity tracking
     """
     __tablename__ = "audit_logs"
-    __table_args__ = {"extend_existing": True}  # ✅ Fix for redefinition error
+    __table_args__ = (
+        # Composite indexes match the filter combinations of the audit API and
+        # continue with (created_at, id) so keyset pages are read straight off
+        # the index; risk_score trails so min_risk_score is checked in the index
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index("ix_audit_logs_user_created_at", "user_id", "created_at", "id"),
+        Index("ix_audit_logs_category_created_at", "event_category", "created_at", "id"),
+        Index("ix_audit_logs_type_created_at", "event_type", "created_at", "id"),
+        Index("ix_audit_logs_success_created_at", "success", "created_at", "id", "risk_score"),
+        {"extend_existing": True},  # ✅ Fix for redefinition error
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
     # User Information
-    user_id = Column(Integer, ForeignKey("users_v2.id", ondelete="SET NULL"), nullable=True, index=True)
+    user_id = Column(Integer, ForeignKey("users_v2.id", ondelete="SET NULL"), nullable=True)
     user_email = Column(String(255), nullable=True, index=True)
     user_role = Column(String(50), nullable=True)
     
     # Event Details
-    event_type = Column(String(50), nullable=False, index=True)
-    event_category = Column(String(50), nullable=False, index=True)  # 'security', 'auth', 'ai', 'profile', etc.
+    event_type = Column(String(50), nullable=False)
+    event_category = Column(String(50), nullable=False)  # 'security', 'auth', 'ai', 'profile', etc.
     event_level = Column(String(20), nullable=False, default=AuditLogLevel.INFO.value)
     event_description = Column(Text, nullable=True)
     
@@ -133,7 +144,7 @@ class AuditLog(Base):
     # Response Details
     status_code = Column(Integer, nullable=True, index=True)
     response_time_ms = Column(Integer, nullable=True)
-    success = Column(Boolean, nullable=False, default=True, index=True)
+    success = Column(Boolean, nullable=False, default=True)
     
     # Error Information
     error_message = Column(Text, nullable=True)
@@ -156,7 +167,7 @@ class AuditLog(Base):
     regulatory_tags = Column(JSON, nullable=True)  # GDPR, CCPA, SOX, etc.
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     event_timestamp = Column(DateTime(timezone=True), nullable=True)  # When the actual event occurred
     
     # Relationships
@@ -230,3 +241,85 @@ class AuditLog(Base):
             event_metadata=metadata,
             **kwargs
         )
+
+
+class AuditStatsRollup(Base):
+    """
+    Hourly and daily audit event counts per category
+
+    Maintained by the audit writer as events are flushed and rebuilt from
+    raw rows by reconcile_audit_rollups.py. bucket_start is naive UTC.
+    """
+    __tablename__ = "audit_stats_rollups"
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "event_category", name="uq_audit_stats_rollups_bucket"),
+        {"extend_existing": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(10), nullable=False)  # 'hour' or 'day'
+    bucket_start = Column(DateTime, nullable=False)
+    event_category = Column(String(50), nullable=False)
+    total_events = Column(Integer, nullable=False, default=0)
+    failed_events = Column(Integer, nullable=False, default=0)
+    high_risk_events = Column(Integer, nullable=False, default=0)
+
+
+class AuditUserActivitySketch(Base):
+    """
+    Top-K sketch (Space-Saving) of the most active users in one bucket
+
+    counters maps user_email to an event count; once it holds
+    AUDIT_STATS_TOPK_CAPACITY users, newcomers replace the least active one.
+    """
+    __tablename__ = "audit_user_activity_sketches"
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", name="uq_audit_user_activity_sketches_bucket"),
+        {"extend_existing": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(10), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    counters = Column(JSON, nullable=False, default=dict)
+
+
+class AuditExportJob(Base):
+    """
+    A background audit export
+
+    Kept in the database rather than in the web process so that any worker
+    can report on a job or serve its download; the output itself is stored
+    as AuditExportChunk rows. updated_at moves as the job progresses, so a
+    job whose worker died can be told apart from one still running.
+    """
+    __tablename__ = "audit_export_jobs"
+    __table_args__ = {"extend_existing": True}
+
+    job_id = Column(String(32), primary_key=True)
+    requested_by = Column(String(255), nullable=True)
+    start_date = Column(DateTime, nullable=False)
+    end_date = Column(DateTime, nullable=False)
+    export_format = Column(String(10), nullable=False)
+    compress = Column(Boolean, nullable=False, default=True)
+    status = Column(String(20), nullable=False, default="pending")  # pending | running | completed | failed
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    completed_at = Column(DateTime, nullable=True, index=True)
+    bytes_written = Column(BigInteger, nullable=False, default=0)
+    chunk_count = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+
+
+class AuditExportChunk(Base):
+    """One piece of a finished export's output, in download order"""
+    __tablename__ = "audit_export_chunks"
+    __table_args__ = (
+        UniqueConstraint("job_id", "seq", name="uq_audit_export_chunks_seq"),
+        {"extend_existing": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(32), ForeignKey("audit_export_jobs.job_id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
@@ -10,12 +10,14 @@ API endpoints for managing conversation context and memory:
 """
 
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 from datetime import datetime
+import json
 
 from app.services.conversation_context_service import get_context_service, ContextType
-from app.services.multi_provider_ai_service import MultiProviderAIService
+from app.services.multi_provider_ai_service import MultiProviderAIService, get_multi_provider_ai_service
 from app.dependencies import get_current_user
 from app.models import User
 
@@ -118,6 +120,70 @@ async def context_aware_chat(
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def context_aware_chat_stream(
+    request: ConversationRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streaming variant of /chat using Server-Sent Events
+    
+    Emits a `start` event, one `delta` event per chunk as the provider
+    generates it, then a `done` event with finish reason, token usage and
+    time-to-first-token. Failures mid-stream are reported as an `error` event.
+    """
+    context_service = await get_context_service()
+    ai_service = get_multi_provider_ai_service()
+    
+    conversation_id = request.conversation_id
+    if not conversation_id:
+        conversation_id = await context_service.get_conversation_id(
+            user_id=str(current_user.id)
+        )
+    
+    messages = [{"role": "user", "content": request.message}]
+    
+    async def generate_chat_stream():
+        yield f"data: {json.dumps({'type': 'start', 'conversation_id': conversation_id})}\n\n"
+        
+        try:
+            async for chunk in ai_service.stream_response(
+                messages=messages,
+                model=request.model,
+                temperature=request.temperature,
+                user_id=str(current_user.id),
+                conversation_id=conversation_id,
+                use_context=request.use_context
+            ):
+                if chunk.delta:
+                    data = {"type": "delta", "index": chunk.index, "content": chunk.delta}
+                else:
+                    data = {
+                        "type": "done",
+                        "conversation_id": conversation_id,
+                        "model_used": chunk.model,
+                        "provider": chunk.provider.value,
+                        "finish_reason": chunk.finish_reason,
+                        "tokens_used": chunk.usage,
+                        "time_to_first_token_ms": chunk.time_to_first_token_ms,
+                        "response_time_ms": chunk.response_time_ms
+                    }
+                yield f"data: {json.dumps(data)}\n\n"
+        
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'error': f'Chat error: {str(e)}'})}\n\n"
+    
+    return StreamingResponse(
+        generate_chat_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @router.get("/conversations/{conversation_id}", response_model=ConversationContextResponse)
 async def get_conversation_context(
     conversation_id: str,
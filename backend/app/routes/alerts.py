@@ -31,6 +31,7 @@ from app.services.alert_service import (
     AlertStatus,
     NotificationChannel
 )
+from app.services.alert_rule_engine import parse_condition
 from app.services.audit_service import get_audit_logger, AuditEventType
 
 
@@ -402,6 +403,11 @@ async def create_alert_rule(
         if rule_data.name in alert_system.alert_rules:
             raise HTTPException(status_code=400, detail="Alert rule with this name already exists")
         
+        try:
+            parse_condition(rule_data.condition, rule_data.threshold)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         # Create rule
         rule = AlertRule(
             name=rule_data.name,
@@ -464,8 +470,11 @@ async def update_alert_rule(
         
         # Update fields
         update_data = rule_updates.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(rule, field, value)
+        try:
+            parse_condition(update_data.get("condition", rule.condition), update_data.get("threshold", rule.threshold))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        alert_system.update_alert_rule(rule_name, **update_data)
         
         # Log to audit system
         audit_logger = get_audit_logger()
@@ -10,15 +10,25 @@ API endpoints for viewing and managing audit logs, providing:
 - Administrative audit management
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 
 from app.database import get_db
-from app.models.audit_log import AuditLog, AuditEventType, AuditLogLevel
+from app.models.audit_log import AuditEventType, AuditLogLevel
 from app.services.audit_service import get_audit_logger
+from app.services.audit_export_service import (
+    CONTENT_TYPES,
+    PARQUET_AVAILABLE,
+    export_filename,
+    export_job_filename,
+    export_job_to_dict,
+    get_audit_export_job_manager,
+    iter_audit_export,
+)
 from app.auth import get_current_user
 from app.models import User
 
@@ -83,10 +93,12 @@ class SecurityEventResponse(BaseModel):
 
 @router.get("/logs", response_model=List[AuditLogResponse])
 async def get_audit_logs(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     limit: int = Query(50, le=1000, description="Maximum number of logs to return"),
-    offset: int = Query(0, ge=0, description="Number of logs to skip"),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor of the previous page"),
+    offset: int = Query(0, ge=0, description="Number of logs to skip (deprecated, use cursor)"),
     event_category: Optional[str] = Query(None, description="Filter by event category"),
     event_type: Optional[str] = Query(None, description="Filter by event type"),
     user_id: Optional[str] = Query(None, description="Filter by user ID"),
@@ -96,7 +108,10 @@ async def get_audit_logs(
     min_risk_score: Optional[int] = Query(None, ge=0, le=100, description="Minimum risk score")
 ):
     """
-    Get audit logs with filtering and pagination
+    Get audit logs with filtering and cursor pagination
+    
+    Logs are returned newest first. When more logs match, the X-Next-Cursor
+    response header holds the cursor for the next page.
     
     Requires admin role for full access, users can only see their own logs
     """
@@ -106,36 +121,29 @@ async def get_audit_logs(
         # Non-admin users can only see their own logs
         user_id = current_user.id
     
-    # Build query
-    query = db.query(AuditLog)
-    
-    # Apply filters
-    if event_category:
-        query = query.filter(AuditLog.event_category == event_category)
-    
-    if event_type:
-        query = query.filter(AuditLog.event_type == event_type)
-    
-    if user_id:
-        query = query.filter(AuditLog.user_id == user_id)
-    
-    if start_date:
-        query = query.filter(AuditLog.created_at >= start_date)
-    
-    if end_date:
-        query = query.filter(AuditLog.created_at <= end_date)
-    
-    if success_only is not None:
-        query = query.filter(AuditLog.success == success_only)
-    
-    if min_risk_score is not None:
-        query = query.filter(AuditLog.risk_score >= min_risk_score)
-    
-    # Order by most recent first
-    query = query.order_by(AuditLog.created_at.desc())
+    audit_logger = get_audit_logger()
+    try:
+        logs, next_cursor = audit_logger.query_audit_logs(
+            db,
+            limit=limit,
+            cursor=cursor,
+            offset=offset,
+            event_category=event_category,
+            event_type=event_type,
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date,
+            success=success_only,
+            min_risk_score=min_risk_score
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    # Apply pagination
-    logs = query.offset(offset).limit(limit).all()
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return logs
 
@@ -150,7 +158,7 @@ async def get_audit_log(
     Get a specific audit log entry by ID
     """
     
-    log = db.query(AuditLog).filter(AuditLog.id == log_id).first()
+    log = get_audit_logger().get_audit_log(db, log_id)
     
     if not log:
         raise HTTPException(
@@ -350,77 +358,136 @@ async def get_available_event_types(
     }
 
 
+def _validate_export_request(current_user: User, start_date: datetime, end_date: datetime, format: str):
+    """Shared checks for streamed and background exports"""
+    
+    if current_user.user_role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    # Validate date range (max 1 year)
+    if (end_date - start_date).days > 365:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Export date range cannot exceed 1 year"
+        )
+    
+    if format == "parquet" and not PARQUET_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Parquet export is not available on this server"
+        )
+
+
 @router.post("/export")
 async def export_audit_logs(
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     start_date: datetime = Query(..., description="Export start date"),
     end_date: datetime = Query(..., description="Export end date"),
-    format: str = Query("json", regex="^(json|csv)$", description="Export format")
+    format: str = Query("json", regex="^(json|csv|ndjson|parquet)$", description="Export format"),
+    compress: bool = Query(False, description="Gzip the export")
 ):
     """
     Export audit logs for compliance reporting
     
+    The export is streamed as it is read from the database, so memory use
+    does not depend on the size of the date range.
+    
     Requires admin role
     """
     
+    _validate_export_request(current_user, start_date, end_date, format)
+    
+    filename = export_filename(format, start_date, end_date, compress)
+    return StreamingResponse(
+        iter_audit_export(start_date, end_date, format, compress, exported_by=current_user.email),
+        media_type="application/gzip" if compress else CONTENT_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post("/export/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_export_job(
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    start_date: datetime = Query(..., description="Export start date"),
+    end_date: datetime = Query(..., description="Export end date"),
+    format: str = Query("csv", regex="^(json|csv|ndjson|parquet)$", description="Export format"),
+    compress: bool = Query(True, description="Gzip the export")
+):
+    """
+    Run a long export in the background; poll the job and download it when completed
+    
+    Requires admin role
+    """
+    
+    _validate_export_request(current_user, start_date, end_date, format)
+    
+    job_manager = get_audit_export_job_manager()
+    job = job_manager.create_job(start_date, end_date, format, compress, requested_by=current_user.email)
+    background_tasks.add_task(job_manager.run_job, job.job_id)
+    
+    return export_job_to_dict(job)
+
+
+def _get_export_job(job_id: str, current_user: User):
     if current_user.user_role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
     
-    # Validate date range (max 1 year)
-    if (end_date - start_date).days > 365:
+    job = get_audit_export_job_manager().get_job(job_id)
+    if not job:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Export date range cannot exceed 1 year"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
         )
+    return job
+
+
+@router.get("/export/jobs/{job_id}")
+async def get_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the status of a background export
     
-    # Get logs for export
-    logs = db.query(AuditLog).filter(
-        AuditLog.created_at >= start_date,
-        AuditLog.created_at <= end_date
-    ).order_by(AuditLog.created_at).all()
-    
-    if format == "json":
-        return {
-            "export_info": {
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat(),
-                "total_records": len(logs),
-                "exported_by": current_user.email,
-                "export_timestamp": datetime.utcnow().isoformat()
-            },
-            "audit_logs": [log.to_dict() for log in logs]
-        }
+    Requires admin role
+    """
     
-    elif format == "csv":
-        # For CSV export, you would typically return a file response
-        # This is a simplified version returning CSV-like data
-        csv_data = []
-        if logs:
-            # Header
-            headers = list(logs[0].to_dict().keys())
-            csv_data.append(headers)
-            
-            # Data rows
-            for log in logs:
-                row = []
-                log_dict = log.to_dict()
-                for header in headers:
-                    value = log_dict.get(header, "")
-                    if isinstance(value, (dict, list)):
-                        value = str(value)
-                    row.append(str(value) if value is not None else "")
-                csv_data.append(row)
-        
-        return {
-            "format": "csv",
-            "headers": csv_data[0] if csv_data else [],
-            "data": csv_data[1:] if len(csv_data) > 1 else [],
-            "total_records": len(logs)
+    return export_job_to_dict(_get_export_job(job_id, current_user))
+
+
+@router.get("/export/jobs/{job_id}/download")
+async def download_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Download the output of a completed background export
+    
+    Requires admin role
+    """
+    
+    job = _get_export_job(job_id, current_user)
+    if job.status != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Export job is {job.status}"
+        )
+    
+    return StreamingResponse(
+        get_audit_export_job_manager().iter_output(job),
+        media_type="application/gzip" if job.compress else CONTENT_TYPES[job.export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{export_job_filename(job)}"',
+            "Content-Length": str(job.bytes_written)
         }
+    )
 
 
 @router.delete("/logs/{log_id}")
@@ -442,7 +509,7 @@ async def delete_audit_log(
             detail="Admin access required"
         )
     
-    log = db.query(AuditLog).filter(AuditLog.id == log_id).first()
+    log = get_audit_logger().get_audit_log(db, log_id)
     
     if not log:
         raise HTTPException(
@@ -470,7 +537,7 @@ async def delete_audit_log(
     )
     
     # Delete the log
-    db.delete(log)
+    audit_logger.delete_audit_log(db, log)
     db.commit()
     
     return {
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
+import logging
 import os
 import re
 from typing import Optional
@@ -8,9 +9,14 @@ from datetime import datetime
 
 from app import models, schemas
 from app.dependencies import get_db
-from app.auth import get_password_hash, verify_password, create_access_token
+from app.auth import (
+    get_password_hash_async, verify_and_update_password_async, create_access_token,
+    PasswordHashingBusy
+)
 from app.services.audit_service import get_audit_logger, AuditEventType, AuditLogLevel
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 from app.config import settings
@@ -141,8 +147,14 @@ async def register_v2(
                 detail="Email already registered. Please use a different email or try logging in."
             )
         
-        # Hash password with enhanced security
-        hashed_password = get_password_hash(user.password)
+        # Hash password with enhanced security (off the event loop)
+        try:
+            hashed_password = await get_password_hash_async(user.password)
+        except PasswordHashingBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy. Please try again shortly."
+            )
         
         # Create user record with production schema
         db_user = models.User(
@@ -273,8 +285,18 @@ async def login_v2(payload: schemas.LoginInput, db: Session = Depends(get_db)):
                 detail="Invalid email or password"
             )
         
-        # Verify password using production column name
-        if not verify_password(payload.password, user.password_hash):
+        # Verify password using production column name (off the event loop)
+        try:
+            password_valid, upgraded_hash = await verify_and_update_password_async(
+                payload.password, user.password_hash
+            )
+        except PasswordHashingBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy. Please try again shortly."
+            )
+        
+        if not password_valid:
             # Log failed login attempt
             audit_logger.log_authentication_event(
                 db=db,
@@ -292,6 +314,15 @@ async def login_v2(payload: schemas.LoginInput, db: Session = Depends(get_db)):
                 detail="Invalid email or password"
             )
         
+        # Transparently upgrade hashes made with an outdated work factor
+        if upgraded_hash:
+            try:
+                user.password_hash = upgraded_hash
+                db.commit()
+            except Exception:
+                db.rollback()
+                logger.warning(f"Password rehash failed for {user.email}", exc_info=True)
+        
         # Check if account is active (skip this check for production compatibility)
         # if not user.is_active:
         #     raise HTTPException(
@@ -440,8 +471,13 @@ async def register_step2(request: schemas.RegisterStep2Request, db: Session = De
         # Create new user with production schema fields
         print(f"🔐 Step2 Debug: About to hash password for '{normalized_email}'")
         try:
-            hashed_password = get_password_hash(request.password)
+            hashed_password = await get_password_hash_async(request.password)
             print(f"✅ Step2 Debug: Password hashed successfully")
+        except PasswordHashingBusy:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy. Please try again shortly."
+            )
         except Exception as hash_error:
             print(f"❌ Step2 Debug: Password hashing failed: {hash_error}")
             raise HTTPException(
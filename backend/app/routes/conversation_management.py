@@ -86,11 +86,15 @@ class SearchConversationsRequest(BaseModel):
     """Request model for searching conversations"""
     query: str = Field(..., description="Search query")
     filters: Dict[str, Any] = Field(default_factory=dict, description="Search filters")
+    limit: Optional[int] = Field(None, ge=1, le=200, description="Maximum results to return")
+    offset: int = Field(0, ge=0, description="Number of results to skip")
 
 class MessageSearchRequest(BaseModel):
     """Request model for searching messages within a conversation"""
     query: str = Field(..., description="Search query")
     filters: Dict[str, Any] = Field(default_factory=dict, description="Search filters")
+    limit: Optional[int] = Field(None, ge=1, le=200, description="Maximum results to return")
+    offset: int = Field(0, ge=0, description="Number of results to skip")
 
 class ConversationResponse(BaseModel):
     """Response model for conversation data"""
@@ -498,7 +502,9 @@ async def search_messages(
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        messages = await conversation.search_messages(request.query, request.filters)
+        messages = await conversation.search_messages(
+            request.query, request.filters, limit=request.limit, offset=request.offset
+        )
         
         return [
             MessageResponse(
@@ -750,7 +756,9 @@ async def search_conversations(
     """Search conversations for a user"""
     try:
         manager = get_conversation_manager()
-        conversations = await manager.search_conversations(user_id, request.query, request.filters)
+        conversations = await manager.search_conversations(
+            user_id, request.query, request.filters, limit=request.limit, offset=request.offset
+        )
         
         return [
             ConversationResponse(
@@ -1,8 +1,53 @@
 """Health Routes"""
+from datetime import datetime
+
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse, Response
+
+from app.services.health_snapshot import HealthSnapshot, get_health_sampler
 
 router = APIRouter()
 
-@router.get("/")
-async def health_root():
-    return {"message": "health endpoint"}
+
+def _snapshot_headers(snapshot: HealthSnapshot) -> dict:
+    return {
+        "Age": str(int(snapshot.age_seconds())),
+        "X-Health-Stale": "true" if snapshot.is_stale() else "false",
+    }
+
+
+def _starting() -> JSONResponse:
+    # The first run is still in progress. That run probes this endpoint too,
+    # so answer 200 rather than have the process report itself as down.
+    return JSONResponse({
+        "status": "starting",
+        "overall_status": "unknown",
+        "timestamp": datetime.utcnow().isoformat(),
+        "stale": True
+    })
+
+
+@router.get("")
+@router.get("/", include_in_schema=False)
+@router.get("/status")
+async def health_status():
+    """Overall status from the latest shared health snapshot"""
+    snapshot = await get_health_sampler().get_snapshot(wait=False)
+    if snapshot is None:
+        return _starting()
+    return JSONResponse(snapshot.summary(), headers=_snapshot_headers(snapshot))
+
+
+@router.get("/detailed")
+async def health_detailed():
+    """Full result of the latest comprehensive health check"""
+    snapshot = await get_health_sampler().get_snapshot(wait=False)
+    if snapshot is None:
+        return _starting()
+    return Response(content=snapshot.payload, media_type="application/json", headers=_snapshot_headers(snapshot))
+
+
+@router.get("/sampler")
+async def health_sampler_metrics():
+    """Background sampler state"""
+    return get_health_sampler().get_metrics()
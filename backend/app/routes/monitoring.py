@@ -1,8 +1,33 @@
 """Monitoring Routes"""
 from fastapi import APIRouter
 
+from app.database import get_pool_metrics
+from app.auth import password_hashing_pool
+from app.services.audit_writer import audit_event_writer
+from app.services.multi_provider_ai_service import get_multi_provider_ai_service
+
 router = APIRouter()
 
 @router.get("/")
 async def monitoring_root():
     return {"message": "monitoring endpoint"}
+
+@router.get("/database/pool")
+async def database_pool_metrics():
+    """Connection pool checkout-wait and utilization metrics"""
+    return get_pool_metrics()
+
+@router.get("/auth/password-hashing")
+async def password_hashing_metrics():
+    """Password hashing pool queue depth and latency metrics"""
+    return password_hashing_pool.get_metrics()
+
+@router.get("/audit/writer")
+async def audit_writer_metrics():
+    """Batched audit writer queue depth, throughput and dropped events"""
+    return audit_event_writer.get_metrics()
+
+@router.get("/ai/response-cache")
+async def ai_response_cache_metrics():
+    """AI response cache hit and miss rates, tokens and provider cost saved"""
+    return get_multi_provider_ai_service().get_cache_metrics()
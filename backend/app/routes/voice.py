@@ -6,13 +6,12 @@ Author: CapeAI Development Team
 Date: July 25, 2025
 """
 
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, Request, status
 from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional, Any, Union
 import logging
 import asyncio
-import io
 import base64
 import json
 from datetime import datetime
@@ -22,7 +21,8 @@ from ..services.voice_service import (
     SpeechToTextResult, TextToSpeechResult, VoiceAnalytics,
     create_voice_service, get_supported_audio_formats, get_supported_languages
 )
-from ..middleware.auth import get_current_user
+from ..services.voice_streaming import StreamTooLarge, VoiceProcessingBusy
+from ..auth import get_current_user
 from ..middleware.rate_limiting import RateLimitMiddleware
 
 logger = logging.getLogger(__name__)
@@ -327,13 +327,80 @@ async def speech_to_text_upload(
         logger.error(f"Upload speech-to-text error: {e}")
         raise HTTPException(status_code=500, detail="Audio file processing failed")
 
+@router.post("/speech-to-text/stream", response_model=SpeechToTextResponse)
+async def speech_to_text_stream(
+    request: Request,
+    audio_format: str = Query("wav", description="Audio format of the raw request body"),
+    language: str = Query("en-US", description="Language code"),
+    provider: Optional[str] = Query(None, description="Preferred provider"),
+    session_id: Optional[str] = Query(None, description="Session ID for analytics"),
+    current_user: Dict = Depends(get_current_user),
+    service: VoiceService = Depends(get_voice_service)
+):
+    """
+    Convert a raw binary audio body to text
+    
+    The body is read chunk by chunk and WAV audio is preprocessed and
+    recognized segment by segment while the upload is still in flight.
+    Use chunked transfer encoding for audio of unknown length.
+    """
+    try:
+        try:
+            audio_format_enum = AudioFormat(audio_format.lower())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Unsupported audio format")
+        
+        provider_enum = None
+        if provider:
+            try:
+                provider_enum = VoiceProvider(provider.lower())
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Unsupported provider")
+        
+        result = await service.speech_to_text_stream(
+            chunks=request.stream(),
+            audio_format=audio_format_enum,
+            language=language,
+            provider=provider_enum,
+            session_id=session_id,
+            user_id=current_user.get('user_id')
+        )
+        
+        return SpeechToTextResponse(
+            text=result.text,
+            confidence=result.confidence,
+            provider=result.provider.value,
+            language=result.language,
+            duration=result.duration,
+            processing_time=result.processing_time,
+            alternatives=result.alternatives,
+            timestamp=result.timestamp
+        )
+        
+    except HTTPException:
+        raise
+    except StreamTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except VoiceProcessingBusy:
+        raise HTTPException(status_code=503, detail="Audio processing is busy, retry shortly")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Streaming speech-to-text error: {e}")
+        raise HTTPException(status_code=500, detail="Speech recognition failed")
+
 @router.post("/text-to-speech/stream")
 async def text_to_speech_stream(
     request: TextToSpeechRequest,
     current_user: Dict = Depends(get_current_user),
     service: VoiceService = Depends(get_voice_service)
 ):
-    """Convert text to speech and stream audio response"""
+    """
+    Convert text to speech and stream audio response
+    
+    Text is synthesized sentence by sentence and audio is sent as each
+    segment is ready, so time to first audio depends on the first sentence.
+    """
     try:
         # Validate audio format
         try:
@@ -341,15 +408,21 @@ async def text_to_speech_stream(
         except ValueError:
             raise HTTPException(status_code=400, detail="Unsupported audio format")
         
-        # Perform text-to-speech
-        result = await service.text_to_speech(
+        if len(request.text.strip()) == 0:
+            raise HTTPException(status_code=400, detail="Text cannot be empty")
+        
+        voice_profile = service.resolve_voice_profile(request.voice_profile, current_user.get('user_id'))
+        audio = service.text_to_speech_stream(
             text=request.text,
-            voice_profile=request.voice_profile,
+            voice_profile=voice_profile,
             audio_format=audio_format,
             session_id=request.session_id,
             user_id=current_user.get('user_id')
         )
         
+        # Synthesize the first segment before answering so failures still map to a 500
+        first_chunk = await audio.__anext__()
+        
         # Determine content type
         content_type_map = {
             AudioFormat.WAV: "audio/wav",
@@ -360,18 +433,21 @@ async def text_to_speech_stream(
         content_type = content_type_map.get(audio_format, "audio/wav")
         
         # Create streaming response
-        def generate_audio():
-            yield result.audio_data
+        async def generate_audio():
+            yield first_chunk
+            try:
+                async for chunk in audio:
+                    yield chunk
+            except Exception as e:
+                logger.error(f"Streaming TTS failed mid-stream: {e}")
+                raise
         
         return StreamingResponse(
-            io.BytesIO(result.audio_data),
+            generate_audio(),
             media_type=content_type,
             headers={
                 "Content-Disposition": f"attachment; filename=speech.{audio_format.value}",
-                "Content-Length": str(len(result.audio_data)),
-                "X-Processing-Time": str(result.processing_time),
-                "X-Audio-Duration": str(result.audio_duration),
-                "X-Provider": result.provider.value
+                "X-Provider": voice_profile.provider.value
             }
         )
         
@@ -570,7 +646,7 @@ async def voice_echo_test(
         raise HTTPException(status_code=500, detail="Voice echo test failed")
 
 # WebSocket endpoint for real-time voice interaction
-from fastapi import WebSocket
+from fastapi import WebSocket, WebSocketDisconnect
 import websockets
 
 @router.websocket("/ws/realtime")
@@ -614,3 +690,89 @@ async def voice_websocket(
     except Exception as e:
         logger.error(f"Voice WebSocket error: {e}")
         await websocket.close()
+
+async def _authenticate_websocket(websocket: WebSocket) -> Optional[Dict]:
+    """
+    User behind a WebSocket handshake, or None
+    
+    Takes a Bearer Authorization header, or a ?token= query parameter for
+    browsers, which cannot set headers on WebSocket requests.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    else:
+        token = websocket.query_params.get("token")
+    if not token:
+        return None
+    try:
+        return await get_current_user(token)
+    except HTTPException:
+        return None
+
+@router.websocket("/ws/speech-to-text")
+async def speech_to_text_websocket(
+    websocket: WebSocket,
+    service: VoiceService = Depends(get_voice_service)
+):
+    """
+    Streaming speech-to-text over a WebSocket
+    
+    Query parameters: token (or a Bearer Authorization header),
+    audio_format (default wav), language, provider. Send binary audio
+    frames, then the text frame "end". Partial transcripts are pushed as
+    {"type": "partial", ...} while audio is still arriving, followed by a
+    single {"type": "final", ...}. Unauthenticated handshakes are refused
+    before the connection is accepted.
+    """
+    current_user = await _authenticate_websocket(websocket)
+    if current_user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    params = websocket.query_params
+    
+    try:
+        audio_format = AudioFormat(params.get("audio_format", "wav").lower())
+        provider = VoiceProvider(params["provider"].lower()) if params.get("provider") else None
+    except ValueError:
+        await websocket.send_json({"type": "error", "message": "Unsupported audio format or provider"})
+        await websocket.close()
+        return
+    
+    async def frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                yield message["bytes"]
+            elif message.get("text") == "end":
+                return
+    
+    try:
+        result = await service.speech_to_text_stream(
+            chunks=frames(),
+            audio_format=audio_format,
+            language=params.get("language", "en-US"),
+            provider=provider,
+            session_id=params.get("session_id"),
+            user_id=current_user.get('user_id'),
+            on_partial=websocket.send_json
+        )
+        await websocket.send_json({
+            "type": "final",
+            "text": result.text,
+            "confidence": result.confidence,
+            "duration": result.duration,
+            "processing_time": result.processing_time
+        })
+        await websocket.close()
+        
+    except WebSocketDisconnect:
+        logger.info("Speech-to-text WebSocket disconnected")
+    except Exception as e:
+        logger.error(f"Speech-to-text WebSocket error: {e}")
+        await websocket.send_json({"type": "error", "message": str(e)})
+        await websocket.close()
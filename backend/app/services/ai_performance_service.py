@@ -12,6 +12,7 @@ from datetime import datetime, timedelta
 from enum import Enum
 from dataclasses import dataclass, asdict
 import json
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,7 @@ class PerformanceMetric(Enum):
     MEMORY_USAGE = "memory_usage"
     CPU_USAGE = "cpu_usage"
     MODEL_CONFIDENCE = "model_confidence"
+    TIME_TO_FIRST_TOKEN = "time_to_first_token"
 
 class AIModelType(Enum):
     """AI Model types for tracking"""
@@ -33,6 +35,15 @@ class AIModelType(Enum):
     WEATHER_PREDICTION = "weather_prediction"
     STORM_TRACKING = "storm_tracking"
 
+class AIProvider(Enum):
+    """External AI providers tracked per request"""
+    OPENAI = "openai"
+    CLAUDE = "claude"
+    GEMINI = "gemini"
+
+# Successful request latencies kept per provider/model for percentiles
+LATENCY_WINDOW = 200
+
 @dataclass
 class PerformanceRecord:
     """Performance record data structure"""
@@ -50,6 +61,8 @@ class AIPerformanceMonitor:
         self.metrics = []
         self.active_requests = {}
         self.model_stats = {}
+        self.request_latencies = {}  # (provider, model) -> recent successful latencies in ms
+        self.request_outcomes = {}  # (provider, model) -> {"success": n, "failure": n}
         self.is_monitoring = True
         self.start_time = datetime.utcnow()
         
@@ -145,6 +158,71 @@ class AIPerformanceMonitor:
             logger.error(f"Failed to record performance metric: {e}")
             return "recording_failed"
     
+    def record_ai_request(
+        self,
+        provider: AIProvider,
+        model: str,
+        endpoint: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        response_time_ms: float,
+        success: bool,
+        user_id: Optional[str] = None,
+        error_type: Optional[str] = None,
+        error_message: Optional[str] = None,
+        response_length: Optional[int] = None,
+        quality_score: Optional[float] = None
+    ) -> str:
+        """Record one request to an external AI provider"""
+        key = (provider.value, model)
+        outcomes = self.request_outcomes.setdefault(key, {"success": 0, "failure": 0})
+        outcomes["success" if success else "failure"] += 1
+        if success:
+            self.request_latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(response_time_ms)
+        
+        metadata = {
+            "provider": provider.value,
+            "model": model,
+            "endpoint": endpoint,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "user_id": user_id,
+            "response_length": response_length,
+            "quality_score": quality_score
+        }
+        if not success:
+            metadata.update({"error_type": error_type, "error_message": error_message})
+            self.record_metric(AIModelType.CAPE_AI, PerformanceMetric.ERROR_RATE, 1.0, metadata)
+        return self.record_metric(AIModelType.CAPE_AI, PerformanceMetric.RESPONSE_TIME, response_time_ms, metadata)
+    
+    def get_latency_percentile(
+        self,
+        provider: AIProvider,
+        model: str,
+        percentile: float = 95,
+        min_samples: int = 1
+    ) -> Optional[float]:
+        """Latency percentile in ms over recent successful requests, None without enough samples"""
+        samples = self.request_latencies.get((provider.value, model))
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, int(round(percentile / 100 * len(ordered))) - 1))
+        return ordered[index]
+    
+    def get_provider_latency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """p50/p95/p99 latency and outcome counts per provider/model"""
+        stats = {}
+        for (provider, model), outcomes in self.request_outcomes.items():
+            provider_enum = AIProvider(provider)
+            stats[f"{provider}/{model}"] = {
+                **outcomes,
+                "p50_ms": self.get_latency_percentile(provider_enum, model, 50),
+                "p95_ms": self.get_latency_percentile(provider_enum, model, 95),
+                "p99_ms": self.get_latency_percentile(provider_enum, model, 99)
+            }
+        return stats
+    
     def start_request_timing(self, model_type: AIModelType, request_id: str) -> None:
         """Start timing a request"""
         self.active_requests[request_id] = {
@@ -216,6 +294,7 @@ class AIPerformanceMonitor:
             "total_metrics": len(self.metrics),
             "active_requests": len(self.active_requests),
             "model_stats": self.model_stats,
+            "provider_latency": self.get_provider_latency_stats(),
             "is_monitoring": self.is_monitoring,
             "system_info": {
                 "cpu_percent": psutil.cpu_percent(),
@@ -294,6 +373,7 @@ __all__ = [
     "AIPerformanceMonitor",
     "PerformanceMetric",
     "AIModelType", 
+    "AIProvider",
     "PerformanceRecord",
     "record_ai_metric",
     "time_ai_request",
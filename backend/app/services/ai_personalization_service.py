@@ -22,6 +22,7 @@ import hashlib
 
 from app.services.conversation_context_service import get_context_service, ContextType
 from app.services.multi_provider_ai_service import MultiProviderAIService, ModelProvider
+from app.services.profile_write_behind import ProfileDelta, ProfileWriteBehind
 
 logger = logging.getLogger(__name__)
 
@@ -149,6 +150,13 @@ class AIPersonalizationService:
         self.personality_cache = {}  # In-memory cache for active profiles
         self.prompt_templates = self._load_prompt_templates()
         
+        # Interaction updates reach Redis in batches; the cache holds them meanwhile
+        self.profile_writer = ProfileWriteBehind(
+            client=lambda: self.context_service.redis_client if self.context_service else None,
+            current=self._cached_profile_dict,
+            refreshed=self._refresh_cached_profile
+        )
+        
     async def initialize(self):
         """Initialize the personalization service"""
         self.context_service = await get_context_service()
@@ -360,6 +368,9 @@ class AIPersonalizationService:
     
     async def _store_personality_profile(self, profile: UserPersonalityProfile):
         """Store personality profile in Redis"""
+        # The full profile already includes any buffered interaction updates
+        self.profile_writer.discard(profile.user_id)
+        
         if not self.context_service or not self.context_service.redis_client:
             return
         
@@ -390,6 +401,9 @@ class AIPersonalizationService:
                 
                 if profile_data:
                     profile_dict = json.loads(profile_data)
+                    pending = self.profile_writer.pending(user_id)
+                    if pending:
+                        pending.apply(profile_dict)
                     profile = UserPersonalityProfile.from_dict(profile_dict)
                     self.personality_cache[user_id] = profile
                     return profile
@@ -401,6 +415,18 @@ class AIPersonalizationService:
             logger.error(f"Failed to get personality profile: {e}")
             return self._get_default_profile(user_id)
     
+    def _cached_profile_dict(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Cached profile in storage form, for profiles missing from Redis at flush time"""
+        profile = self.personality_cache.get(user_id)
+        return profile.to_dict() if profile else None
+    
+    def _refresh_cached_profile(self, user_id: str, profile_dict: Dict[str, Any]):
+        """Adopt the merged profile a flush wrote, plus anything recorded since"""
+        pending = self.profile_writer.pending(user_id)
+        if pending:
+            pending.apply(profile_dict)
+        self.personality_cache[user_id] = UserPersonalityProfile.from_dict(profile_dict)
+    
     def _get_default_profile(self, user_id: str) -> UserPersonalityProfile:
         """Get default personality profile for new users"""
         return UserPersonalityProfile(
@@ -563,26 +589,15 @@ class AIPersonalizationService:
             if not profile:
                 return
             
-            # Update confidence score based on interaction success
-            if interaction_data.get('positive_feedback', False):
-                profile.confidence_score = min(profile.confidence_score + 0.05, 1.0)
-            elif interaction_data.get('negative_feedback', False):
-                profile.confidence_score = max(profile.confidence_score - 0.05, 0.1)
-            
-            # Update interaction patterns
-            if 'response_time' in interaction_data:
-                profile.interaction_patterns['avg_response_time'] = interaction_data['response_time']
-            
-            # Update topics of interest
-            if 'topic' in interaction_data and interaction_data['topic'] not in profile.topics_of_interest:
-                profile.topics_of_interest.append(interaction_data['topic'])
-            
-            profile.updated_at = datetime.now()
-            
-            # Store updated profile
-            await self._store_personality_profile(profile)
+            delta = ProfileDelta()
+            delta.record(interaction_data, datetime.now())
+            profile = UserPersonalityProfile.from_dict(delta.apply(profile.to_dict()))
             self.personality_cache[user_id] = profile
             
+            # Buffer the change for the next batched write; store directly if buffering is off
+            if not self.profile_writer.record(user_id, delta):
+                await self._store_personality_profile(profile)
+            
             logger.debug(f"Updated profile for user {user_id}")
             
         except Exception as e:
@@ -604,6 +619,12 @@ async def get_personalization_service() -> AIPersonalizationService:
     return _personalization_service
 
 
+async def close_personalization_service():
+    """Flush buffered profile updates on shutdown"""
+    if _personalization_service is not None:
+        await _personalization_service.profile_writer.stop()
+
+
 async def initialize_personalization_service():
     """Initialize the personalization service on startup"""
     await get_personalization_service()
@@ -0,0 +1,430 @@
+"""
+AI Response Cache
+=================
+
+Sits in front of provider calls in MultiProviderAIService.generate_response
+so repeated questions are not paid for twice.
+
+Exact tier: the key is a BLAKE2b digest of the model, the generation
+parameters and the canonicalized message list (roles lowercased, content
+whitespace-collapsed), after context and personalization are applied.
+
+Semantic tier (optional, AI_RESPONSE_CACHE_SEMANTIC=local|openai): the last
+user message is embedded and compared by cosine similarity with earlier
+queries that share everything else (model, parameters, preceding
+messages). A match at or above AI_RESPONSE_CACHE_SIMILARITY_THRESHOLD is
+served from cache. "local" uses hashed word and character n-gram vectors:
+it is free but lexical, so it only catches near-duplicate wording
+(spelling, punctuation, filler words) and needs a high threshold.
+"openai" calls the embeddings API and also matches paraphrases.
+
+Entries are scoped per tenant (the user unless the caller names a shared
+tenant), so one user's cached answer is never served to another by
+similarity; requests with neither are not cached. TTLs can be set per tenant with AI_RESPONSE_CACHE_TENANT_TTLS.
+Entries live in-process (LRU bounded) or in Redis (AI_RESPONSE_CACHE_STORAGE);
+with Redis, eviction beyond TTL is left to the server's maxmemory policy.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+AI_RESPONSE_CACHE_ENABLED = os.getenv("AI_RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+AI_RESPONSE_CACHE_STORAGE = os.getenv("AI_RESPONSE_CACHE_STORAGE", "memory").lower()
+AI_RESPONSE_CACHE_KEY_PREFIX = os.getenv("AI_RESPONSE_CACHE_KEY_PREFIX", "capeai:aicache")
+AI_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("AI_RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+AI_RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("AI_RESPONSE_CACHE_TTL_SECONDS", "3600"))
+AI_RESPONSE_CACHE_SEMANTIC = os.getenv("AI_RESPONSE_CACHE_SEMANTIC", "off").lower()
+AI_RESPONSE_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("AI_RESPONSE_CACHE_SIMILARITY_THRESHOLD", "0.92"))
+AI_RESPONSE_CACHE_SEMANTIC_MAX_PER_CONTEXT = int(os.getenv("AI_RESPONSE_CACHE_SEMANTIC_MAX_PER_CONTEXT", "200"))
+
+LOCAL_EMBEDDING_DIMENSIONS = 512
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+
+WORD_RE = re.compile(r"\w+")
+
+
+def parse_tenant_ttls(value: str) -> Dict[str, int]:
+    """'public=86400,beta=600' -> {'public': 86400, 'beta': 600}"""
+    ttls = {}
+    for item in value.split(","):
+        tenant, _, seconds = item.partition("=")
+        if tenant.strip() and seconds.strip():
+            ttls[tenant.strip()] = int(seconds)
+    return ttls
+
+
+AI_RESPONSE_CACHE_TENANT_TTLS = parse_tenant_ttls(os.getenv("AI_RESPONSE_CACHE_TENANT_TTLS", ""))
+
+
+def normalize_text(text: Any) -> str:
+    return " ".join(unicodedata.normalize("NFC", str(text or "")).split())
+
+
+def canonical_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Messages with only role and content, roles lowercased and whitespace collapsed"""
+    return [
+        {"role": str(message.get("role", "user")).strip().lower(), "content": normalize_text(message.get("content"))}
+        for message in messages
+    ]
+
+
+def _digest(payload: Any) -> str:
+    data = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode(), digest_size=20).hexdigest()
+
+
+def split_query(messages: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], str]:
+    """(messages before the last user message, its content)"""
+    for index in range(len(messages) - 1, -1, -1):
+        if messages[index]["role"] == "user":
+            return messages[:index] + messages[index + 1:], messages[index]["content"]
+    return messages, ""
+
+
+def local_embedding(text: str, dimensions: int = LOCAL_EMBEDDING_DIMENSIONS) -> List[float]:
+    """Normalized hashed vector of words and character trigrams"""
+    text = text.lower()
+    vector = [0.0] * dimensions
+    features = WORD_RE.findall(text)
+    compact = " ".join(features)
+    features += [compact[i:i + 3] for i in range(max(0, len(compact) - 2))]
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimensions
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else vector
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class InMemoryResponseCacheBackend:
+    """Per-process entries with TTL and LRU eviction"""
+
+    def __init__(self, max_entries: int = AI_RESPONSE_CACHE_MAX_ENTRIES,
+                 max_vectors_per_context: int = AI_RESPONSE_CACHE_SEMANTIC_MAX_PER_CONTEXT):
+        self.max_entries = max_entries
+        self.max_vectors_per_context = max_vectors_per_context
+        # key -> (expires at, entry)
+        self.entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # context key -> {entry key: vector}, least recently stored context first
+        self.vectors: "OrderedDict[str, OrderedDict[str, List[float]]]" = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self.entries.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return item[1]
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl: int):
+        self.entries[key] = (time.monotonic() + ttl, entry)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def add_vector(self, context_key: str, key: str, vector: List[float], ttl: int):
+        vectors = self.vectors.setdefault(context_key, OrderedDict())
+        self.vectors.move_to_end(context_key)
+        vectors[key] = vector
+        vectors.move_to_end(key)
+        while len(vectors) > self.max_vectors_per_context:
+            vectors.popitem(last=False)
+        # No context can hold more live vectors than there are entries
+        while len(self.vectors) > self.max_entries:
+            self.vectors.popitem(last=False)
+
+    async def get_vectors(self, context_key: str) -> List[Tuple[str, List[float]]]:
+        vectors = self.vectors.get(context_key)
+        if not vectors:
+            return []
+        # Drop vectors whose entries were evicted or expired
+        for key in [key for key in vectors if key not in self.entries]:
+            del vectors[key]
+        if not vectors:
+            del self.vectors[context_key]
+        return list(vectors.items())
+
+    async def clear(self):
+        self.entries.clear()
+        self.vectors.clear()
+
+    def size(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'entries': self.size(), 'evictions': self.evictions}
+
+
+class RedisResponseCacheBackend:
+    """
+    Entries stored in Redis and shared by every worker.
+
+    If Redis is unreachable the backend degrades to an in-process cache and
+    retries Redis after retry_interval seconds.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, retry_interval: float = 30.0,
+                 fallback: Optional[InMemoryResponseCacheBackend] = None,
+                 max_vectors_per_context: int = AI_RESPONSE_CACHE_SEMANTIC_MAX_PER_CONTEXT):
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.retry_interval = retry_interval
+        self.fallback = fallback or InMemoryResponseCacheBackend()
+        self.max_vectors_per_context = max_vectors_per_context
+        self.redis_client: Optional[redis.Redis] = None
+        self._unavailable_until = 0.0
+
+    def _client(self) -> Optional[redis.Redis]:
+        if time.monotonic() < self._unavailable_until:
+            return None
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+        return self.redis_client
+
+    def _unavailable(self, e: Exception):
+        logger.warning(f"Redis response cache unavailable, using in-process cache: {e}")
+        self._unavailable_until = time.monotonic() + self.retry_interval
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        client = self._client()
+        if client is None:
+            return await self.fallback.get(key)
+        try:
+            data = await client.get(f"{AI_RESPONSE_CACHE_KEY_PREFIX}:entry:{key}")
+        except Exception as e:
+            self._unavailable(e)
+            return await self.fallback.get(key)
+        return json.loads(data) if data else None
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl: int):
+        client = self._client()
+        if client is None:
+            return await self.fallback.set(key, entry, ttl)
+        try:
+            await client.set(f"{AI_RESPONSE_CACHE_KEY_PREFIX}:entry:{key}", json.dumps(entry), ex=ttl)
+        except Exception as e:
+            self._unavailable(e)
+            await self.fallback.set(key, entry, ttl)
+
+    async def add_vector(self, context_key: str, key: str, vector: List[float], ttl: int):
+        client = self._client()
+        if client is None:
+            return await self.fallback.add_vector(context_key, key, vector, ttl)
+        redis_key = f"{AI_RESPONSE_CACHE_KEY_PREFIX}:vectors:{context_key}"
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.hset(redis_key, key, json.dumps([round(v, 5) for v in vector]))
+                pipe.expire(redis_key, ttl)
+                pipe.hlen(redis_key)
+                _, _, size = await pipe.execute()
+            if size > self.max_vectors_per_context:
+                # Hash fields are unordered: trim arbitrary ones, their entries still expire normally
+                extra = (await client.hkeys(redis_key))[:size - self.max_vectors_per_context]
+                extra = [field for field in extra if field != key]
+                if extra:
+                    await client.hdel(redis_key, *extra)
+        except Exception as e:
+            self._unavailable(e)
+            await self.fallback.add_vector(context_key, key, vector, ttl)
+
+    async def get_vectors(self, context_key: str) -> List[Tuple[str, List[float]]]:
+        client = self._client()
+        if client is None:
+            return await self.fallback.get_vectors(context_key)
+        try:
+            stored = await client.hgetall(f"{AI_RESPONSE_CACHE_KEY_PREFIX}:vectors:{context_key}")
+        except Exception as e:
+            self._unavailable(e)
+            return await self.fallback.get_vectors(context_key)
+        return [(key, json.loads(vector)) for key, vector in stored.items()]
+
+    async def clear(self):
+        await self.fallback.clear()
+        client = self._client()
+        if client is None:
+            return
+        try:
+            async for redis_key in client.scan_iter(match=f"{AI_RESPONSE_CACHE_KEY_PREFIX}:*"):
+                await client.delete(redis_key)
+        except Exception as e:
+            self._unavailable(e)
+
+    def stats(self) -> Dict[str, Any]:
+        # Redis-side entry counts and evictions belong to the server (INFO keyspace/stats);
+        # only the in-process fallback is counted here, and labelled as such
+        return {
+            'redis_available': time.monotonic() >= self._unavailable_until,
+            'fallback_entries': self.fallback.size(),
+            'fallback_evictions': self.fallback.evictions,
+        }
+
+
+class AIResponseCache:
+    """Exact and semantic response cache with per-tenant TTLs"""
+
+    def __init__(
+        self,
+        backend=None,
+        enabled: bool = AI_RESPONSE_CACHE_ENABLED,
+        semantic: str = AI_RESPONSE_CACHE_SEMANTIC,
+        similarity_threshold: float = AI_RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+        default_ttl: int = AI_RESPONSE_CACHE_TTL_SECONDS,
+        tenant_ttls: Optional[Dict[str, int]] = None,
+        embedder: Optional[Callable[[str], Awaitable[List[float]]]] = None
+    ):
+        self.backend = backend or _create_backend()
+        self.enabled = enabled
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self.default_ttl = default_ttl
+        self.tenant_ttls = tenant_ttls if tenant_ttls is not None else AI_RESPONSE_CACHE_TENANT_TTLS
+        self.embedder = embedder
+
+        self.metrics = {
+            'exact_hits': 0,
+            'semantic_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'embedding_failures': 0,
+            'tokens_saved': 0,
+            'cost_saved_usd': 0.0,
+        }
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.semantic in ("local", "openai") or self.embedder is not None
+
+    def ttl_for(self, tenant: str) -> int:
+        return self.tenant_ttls.get(tenant, self.default_ttl)
+
+    def keys_for(
+        self,
+        tenant: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        parameters: Dict[str, Any]
+    ) -> Tuple[str, str, str]:
+        """(exact key, semantic context key, query text)"""
+        canonical = canonical_messages(messages)
+        exact_key = _digest([tenant, model, parameters, canonical])
+        context, query = split_query(canonical)
+        context_key = _digest([tenant, model, parameters, context])
+        return exact_key, context_key, query
+
+    async def _embed(self, text: str) -> Optional[List[float]]:
+        if not text:
+            return None
+        try:
+            if self.embedder is not None:
+                return await self.embedder(text)
+            return local_embedding(text)
+        except Exception as e:
+            self.metrics['embedding_failures'] += 1
+            logger.warning(f"Response cache embedding failed: {e}")
+            return None
+
+    async def lookup(
+        self,
+        tenant: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        parameters: Dict[str, Any]
+    ) -> Optional[Tuple[Dict[str, Any], str, float]]:
+        """(entry, 'exact' | 'semantic', similarity) for a cached response, else None"""
+        if not self.enabled:
+            return None
+        exact_key, context_key, query = self.keys_for(tenant, model, messages, parameters)
+        try:
+            entry = await self.backend.get(exact_key)
+            if entry is not None:
+                return self._hit(entry, 'exact', 1.0)
+
+            if self.semantic_enabled:
+                vector = await self._embed(query)
+                if vector is not None:
+                    best_key, best_score = None, 0.0
+                    for key, candidate in await self.backend.get_vectors(context_key):
+                        score = cosine(vector, candidate)
+                        if score > best_score:
+                            best_key, best_score = key, score
+                    if best_key is not None and best_score >= self.similarity_threshold:
+                        entry = await self.backend.get(best_key)
+                        if entry is not None:
+                            return self._hit(entry, 'semantic', best_score)
+        except Exception as e:
+            logger.warning(f"Response cache lookup failed: {e}")
+
+        self.metrics['misses'] += 1
+        return None
+
+    def _hit(self, entry: Dict[str, Any], kind: str, similarity: float):
+        self.metrics[f'{kind}_hits'] += 1
+        self.metrics['tokens_saved'] += entry.get('usage', {}).get('total_tokens', 0)
+        self.metrics['cost_saved_usd'] += entry.get('cost_usd', 0.0)
+        return entry, kind, similarity
+
+    async def store(
+        self,
+        tenant: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        parameters: Dict[str, Any],
+        entry: Dict[str, Any]
+    ):
+        if not self.enabled:
+            return
+        exact_key, context_key, query = self.keys_for(tenant, model, messages, parameters)
+        ttl = self.ttl_for(tenant)
+        try:
+            await self.backend.set(exact_key, entry, ttl)
+            if self.semantic_enabled:
+                vector = await self._embed(query)
+                if vector is not None:
+                    await self.backend.add_vector(context_key, exact_key, vector, ttl)
+            self.metrics['stores'] += 1
+        except Exception as e:
+            logger.warning(f"Response cache store failed: {e}")
+
+    async def clear(self):
+        await self.backend.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        hits = self.metrics['exact_hits'] + self.metrics['semantic_hits']
+        lookups = hits + self.metrics['misses']
+        return {
+            **self.metrics,
+            'cost_saved_usd': round(self.metrics['cost_saved_usd'], 6),
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'miss_rate': self.metrics['misses'] / lookups if lookups else 0.0,
+            **self.backend.stats(),
+            'semantic': self.semantic if self.semantic_enabled else 'off',
+            'storage': AI_RESPONSE_CACHE_STORAGE
+        }
+
+
+def _create_backend():
+    """Backend selected by AI_RESPONSE_CACHE_STORAGE (memory | redis)"""
+    if AI_RESPONSE_CACHE_STORAGE == "redis":
+        return RedisResponseCacheBackend()
+    return InMemoryResponseCacheBackend()
@@ -0,0 +1,324 @@
+"""
+AI Provider Routing Policy
+==========================
+
+Decides how a single generation is spread across configured models:
+
+- Every attempt has a per-model timeout (AI_TIMEOUT_SECONDS, overridable
+  per model with AI_MODEL_TIMEOUTS="gpt-4=60,claude-3-haiku=15").
+- Hedging: if the primary has not answered after its recent p95 latency
+  (from AIPerformanceMonitor), one backup request goes to the next model
+  in line. The first success wins and the other request is cancelled.
+- Failover: a 429, 5xx, timeout or connection error moves on to the next
+  model straight away. Other errors (bad request, auth) are returned to
+  the caller, since another provider would not fix them.
+- Circuit breaker per provider: after AI_CIRCUIT_FAILURE_THRESHOLD
+  consecutive retryable failures the provider is skipped for
+  AI_CIRCUIT_RESET_SECONDS, then a single probe request is let through.
+
+Backup models are the default model of each other provider, in
+AI_PROVIDER_PRIORITY order; at most AI_RETRY_ATTEMPTS models are tried.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.ai_performance_service import AIPerformanceMonitor, AIProvider
+
+logger = logging.getLogger(__name__)
+
+AI_FALLBACK_ENABLED = os.getenv("AI_FALLBACK_ENABLED", "true").lower() == "true"
+AI_RETRY_ATTEMPTS = int(os.getenv("AI_RETRY_ATTEMPTS", "3"))
+AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", "30"))
+AI_HEDGE_ENABLED = os.getenv("AI_HEDGE_ENABLED", "true").lower() == "true"
+AI_HEDGE_PERCENTILE = float(os.getenv("AI_HEDGE_PERCENTILE", "95"))
+AI_HEDGE_MIN_SAMPLES = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+AI_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("AI_HEDGE_MIN_DELAY_SECONDS", "0.5"))
+AI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("AI_CIRCUIT_FAILURE_THRESHOLD", "5"))
+AI_CIRCUIT_RESET_SECONDS = float(os.getenv("AI_CIRCUIT_RESET_SECONDS", "30"))
+
+# Provider names as written in AI_PROVIDER_PRIORITY
+PROVIDER_ALIASES = {
+    "openai": "openai",
+    "anthropic": "claude",
+    "claude": "claude",
+    "google": "gemini",
+    "gemini": "gemini",
+}
+
+RETRYABLE_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+    "ServiceUnavailable", "ResourceExhausted", "DeadlineExceeded", "TooManyRequests",
+}
+
+
+def parse_provider_priority(value: str) -> List[str]:
+    """Provider values from a JSON list or comma-separated names"""
+    try:
+        names = json.loads(value)
+    except ValueError:
+        names = value.split(",")
+    priority = []
+    for name in names:
+        provider = PROVIDER_ALIASES.get(str(name).strip().lower())
+        if provider and provider not in priority:
+            priority.append(provider)
+    return priority
+
+
+def parse_model_timeouts(value: str) -> Dict[str, float]:
+    timeouts = {}
+    for item in value.split(","):
+        model, _, seconds = item.partition("=")
+        if model.strip() and seconds.strip():
+            timeouts[model.strip()] = float(seconds)
+    return timeouts
+
+
+AI_PROVIDER_PRIORITY = parse_provider_priority(os.getenv("AI_PROVIDER_PRIORITY", '["openai", "anthropic", "google"]'))
+AI_MODEL_TIMEOUTS = parse_model_timeouts(os.getenv("AI_MODEL_TIMEOUTS", ""))
+
+
+class ProvidersUnavailable(Exception):
+    """Raised when every candidate provider is short-circuited"""
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """True for errors another provider may not have: 429, 5xx, timeouts, connection failures"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+            return True
+        status = getattr(error, "status_code", None)
+        if status is None and isinstance(getattr(error, "code", None), int):
+            status = error.code
+        if isinstance(status, int) and (status == 429 or status >= 500):
+            return True
+        if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+            return True
+        # Provider wrappers re-raise with the original error as the cause or context
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = AI_CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = AI_CIRCUIT_RESET_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.probe_in_flight or self.consecutive_failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.times_opened += 1
+            self.opened_at = self.clock()
+        self.probe_in_flight = False
+
+    def release(self):
+        """An attempt ended without a verdict (cancelled or non-retryable error)"""
+        self.probe_in_flight = False
+
+
+Candidate = Tuple[str, Any]  # (model key, AIModelConfig)
+
+
+class AIRoutingPolicy:
+    """Timeouts, hedging, failover and circuit breaking across AI models"""
+
+    def __init__(
+        self,
+        performance_monitor: AIPerformanceMonitor,
+        provider_priority: Optional[List[str]] = None,
+        fallback_enabled: bool = AI_FALLBACK_ENABLED,
+        max_attempts: int = AI_RETRY_ATTEMPTS,
+        default_timeout: float = AI_TIMEOUT_SECONDS,
+        model_timeouts: Optional[Dict[str, float]] = None,
+        hedge_enabled: bool = AI_HEDGE_ENABLED,
+        hedge_percentile: float = AI_HEDGE_PERCENTILE,
+        hedge_min_samples: int = AI_HEDGE_MIN_SAMPLES,
+        hedge_min_delay: float = AI_HEDGE_MIN_DELAY_SECONDS
+    ):
+        self.performance_monitor = performance_monitor
+        self.provider_priority = provider_priority if provider_priority is not None else AI_PROVIDER_PRIORITY
+        self.fallback_enabled = fallback_enabled
+        self.max_attempts = max(1, max_attempts)
+        self.default_timeout = default_timeout
+        self.model_timeouts = model_timeouts if model_timeouts is not None else AI_MODEL_TIMEOUTS
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+        self.metrics = {
+            'requests': 0,
+            'hedges_sent': 0,
+            'hedge_wins': 0,
+            'failovers': 0,
+            'short_circuited': 0,
+        }
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self.breakers:
+            self.breakers[provider] = CircuitBreaker()
+        return self.breakers[provider]
+
+    def timeout_for(self, model_key: str) -> float:
+        return self.model_timeouts.get(model_key, self.default_timeout)
+
+    def hedge_delay(self, model_key: str, config: Any) -> Optional[float]:
+        """Seconds to wait before hedging, None until enough latency samples exist"""
+        if not self.hedge_enabled:
+            return None
+        p95_ms = self.performance_monitor.get_latency_percentile(
+            AIProvider(config.provider.value), config.model_name,
+            self.hedge_percentile, self.hedge_min_samples
+        )
+        try:
+            delay = max(self.hedge_min_delay, float(p95_ms) / 1000)
+        except (TypeError, ValueError):
+            return None
+        return delay if delay < self.timeout_for(model_key) else None
+
+    def backup_providers(self, primary_provider: str, available: List[str]) -> List[str]:
+        """Other available providers, configured priority first"""
+        if not self.fallback_enabled:
+            return []
+        ordered = [p for p in self.provider_priority if p in available]
+        ordered += [p for p in available if p not in ordered]
+        return [p for p in ordered if p != primary_provider]
+
+    async def execute(
+        self,
+        candidates: List[Candidate],
+        call: Callable[[str, Any], Awaitable[Any]]
+    ) -> Tuple[str, Any]:
+        """
+        Run call(model_key, config) over the candidates and return
+        (model_key, result) for the first success
+        """
+        self.metrics['requests'] += 1
+        pending = list(candidates[:self.max_attempts])
+        running: Dict[asyncio.Task, Candidate] = {}
+        last_error: Optional[BaseException] = None
+        hedge_at: Optional[float] = None
+        loop = asyncio.get_event_loop()
+
+        def launch_next() -> bool:
+            nonlocal hedge_at
+            while pending:
+                model_key, config = pending.pop(0)
+                if not self.breaker(config.provider.value).allow_request():
+                    self.metrics['short_circuited'] += 1
+                    logger.info(f"Skipping {model_key}: circuit open for {config.provider.value}")
+                    continue
+                running[asyncio.ensure_future(call(model_key, config))] = (model_key, config)
+                # Only the first request is hedged
+                if len(running) == 1 and hedge_at is None and pending:
+                    delay = self.hedge_delay(model_key, config)
+                    hedge_at = loop.time() + delay if delay is not None else None
+                return True
+            return False
+
+        if not launch_next():
+            raise ProvidersUnavailable("All AI providers are temporarily unavailable")
+        hedged = False
+
+        try:
+            while running:
+                timeout = None
+                if hedge_at is not None and not hedged and pending:
+                    timeout = max(0.0, hedge_at - loop.time())
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedged = True
+                    if launch_next():
+                        self.metrics['hedges_sent'] += 1
+                        logger.info(f"Hedging slow {candidates[0][0]} request")
+                    continue
+
+                for task in done:
+                    model_key, config = running.pop(task)
+                    breaker = self.breaker(config.provider.value)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        if not is_retryable_error(e):
+                            breaker.release()
+                            if not running:
+                                raise
+                            continue
+                        breaker.record_failure()
+                        if launch_next():
+                            self.metrics['failovers'] += 1
+                            logger.warning(f"AI request to {model_key} failed ({type(e).__name__}), failing over")
+                        continue
+
+                    breaker.record_success()
+                    if hedged and model_key != candidates[0][0]:
+                        self.metrics['hedge_wins'] += 1
+                    return model_key, result
+
+            raise last_error
+        finally:
+            for task, (_, config) in running.items():
+                task.cancel()
+                self.breaker(config.provider.value).release()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            'circuits': {
+                provider: {
+                    'state': breaker.state,
+                    'consecutive_failures': breaker.consecutive_failures,
+                    'times_opened': breaker.times_opened
+                }
+                for provider, breaker in self.breakers.items()
+            }
+        }
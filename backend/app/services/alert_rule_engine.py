@@ -0,0 +1,357 @@
+"""
+Alert Rule Engine
+=================
+
+Evaluates every alert rule in one batch per tick against ring-buffered
+metric history instead of comparing each rule with a single snapshot.
+
+Conditions are compiled once from text:
+
+    error_rate > threshold                  latest sample
+    avg(cpu_percent, 5m) > 80               rolling mean over the window
+    p95(response_time_ms, 10m) >= 2000      percentile (p50, p99, ...)
+    max(memory_percent, 15m) > threshold    also min()
+    rate(disk_percent, 1h) > 0.01           change per second over the window
+    health_status != healthy for 3m         labels are encoded to numbers
+
+"threshold" is the rule's threshold. A trailing "for <duration>" sets how
+long the condition must hold continuously before the rule fires; without
+it the rule's own duration is used. Durations take s, m or h (default s).
+
+All metrics share one timestamp ring of ALERT_SERIES_CAPACITY samples and
+one value matrix (a row per metric), so the engine computes each distinct
+(aggregation, window) once over the metrics that need it. It then
+compares all the rules with vector operations.
+"""
+
+import logging
+import os
+import re
+import time
+import warnings
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ALERT_SERIES_CAPACITY = int(os.getenv("ALERT_SERIES_CAPACITY", "720"))
+
+DEFAULT_WINDOW_SECONDS = 300.0
+
+# Labels recorded by the alert system, mapped to comparable numbers
+LABEL_ENCODINGS = {
+    "health_status": {"healthy": 0.0, "warning": 1.0, "degraded": 2.0, "unhealthy": 3.0, "critical": 4.0},
+}
+BOOLEAN_LABELS = {"true": 1.0, "false": 0.0}
+
+COMPARISONS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+AGGREGATIONS = {"last", "avg", "mean", "min", "max", "rate"}
+
+DURATION = r"\d+(?:\.\d+)?[smh]?"
+CONDITION_RE = re.compile(
+    r"^\s*(?:(?P<agg>[a-z]+\d*)\(\s*(?P<metric>\w+)\s*(?:,\s*(?P<window>" + DURATION + r")\s*)?\)|(?P<bare>\w+))"
+    r"\s*(?P<op>>=|<=|==|!=|>|<)\s*(?P<rhs>[\w.\-]+)"
+    r"(?:\s+for\s+(?P<for>" + DURATION + r"))?\s*$",
+    re.IGNORECASE
+)
+
+
+def parse_duration(value: str) -> float:
+    """'90' -> 90.0, '5m' -> 300.0, '1h' -> 3600.0"""
+    value = value.strip().lower()
+    unit = value[-1] if value[-1] in "smh" else "s"
+    number = float(value.rstrip("smh"))
+    return number * {"s": 1, "m": 60, "h": 3600}[unit]
+
+
+def encode_value(metric: str, value: Any) -> float:
+    """Numeric value for the time series, NaN when it cannot be encoded"""
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        label = value.strip().lower()
+        encoded = LABEL_ENCODINGS.get(metric, {}).get(label, BOOLEAN_LABELS.get(label))
+        if encoded is not None:
+            return encoded
+        try:
+            return float(label)
+        except ValueError:
+            return float("nan")
+    return float("nan")
+
+
+@dataclass(frozen=True)
+class ParsedCondition:
+    """A condition reduced to aggregation, metric, comparison and bound"""
+    metric: str
+    aggregation: str  # last | avg | min | max | rate | percentile
+    percentile: Optional[float]
+    window: float  # seconds
+    op: str
+    value: float
+    for_seconds: Optional[float]
+
+    def matches(self, value: float) -> bool:
+        """Compare one already-aggregated value"""
+        return not np.isnan(value) and bool(COMPARISONS[self.op](value, self.value))
+
+
+def parse_condition(condition: str, threshold: float = 0.0) -> ParsedCondition:
+    """Compile condition text; raises ValueError if it is not understood"""
+    match = CONDITION_RE.match(condition or "")
+    if not match:
+        raise ValueError(f"Unsupported alert condition: {condition!r}")
+
+    metric = match.group("metric") or match.group("bare")
+    aggregation = (match.group("agg") or "last").lower()
+    percentile = None
+    if re.fullmatch(r"p\d{1,2}(?:\.\d+)?", aggregation):
+        percentile = float(aggregation[1:])
+        aggregation = "percentile"
+    elif aggregation == "mean":
+        aggregation = "avg"
+    elif aggregation not in AGGREGATIONS:
+        raise ValueError(f"Unsupported aggregation {aggregation!r} in {condition!r}")
+
+    rhs = match.group("rhs")
+    if rhs.lower() == "threshold":
+        value = float(threshold)
+    else:
+        value = encode_value(metric, rhs)
+        if np.isnan(value):
+            raise ValueError(f"Cannot compare {metric} with {rhs!r}")
+
+    window = parse_duration(match.group("window")) if match.group("window") else DEFAULT_WINDOW_SECONDS
+    for_seconds = parse_duration(match.group("for")) if match.group("for") else None
+    return ParsedCondition(metric, aggregation, percentile, window, match.group("op"), value, for_seconds)
+
+
+def nan_percentile(window: np.ndarray, q: float) -> np.ndarray:
+    """
+    Row-wise percentile ignoring NaN, with numpy's default linear
+    interpolation. np.nanpercentile loops over rows in Python, which
+    dominates a tick; sorting once pushes NaNs to the end of each row.
+    """
+    ordered = np.sort(window, axis=1)
+    counts = np.count_nonzero(~np.isnan(window), axis=1)
+    rank = np.maximum(counts - 1, 0) * (q / 100)
+    low = np.floor(rank).astype(int)
+    high = np.minimum(low + 1, np.maximum(counts - 1, 0))
+    rows = np.arange(window.shape[0])
+    below, above = ordered[rows, low], ordered[rows, high]
+    result = below + (above - below) * (rank - low)
+    result[counts == 0] = np.nan
+    return result
+
+
+class TimeSeriesStore:
+    """
+    Ring buffer of metric samples: one shared timestamp column per tick
+    and one row per metric. Metrics missing from a sample are NaN.
+    """
+
+    def __init__(self, capacity: int = ALERT_SERIES_CAPACITY):
+        self.capacity = capacity
+        self.rows: Dict[str, int] = {}
+        self.values = np.full((0, capacity), np.nan)
+        self.timestamps = np.full(capacity, np.nan)
+        self.position = 0  # total samples recorded
+
+    def row(self, metric: str) -> int:
+        """Row index for a metric, adding an empty row the first time it is seen"""
+        index = self.rows.get(metric)
+        if index is None:
+            index = len(self.rows)
+            if index == self.values.shape[0]:
+                grown = np.full((max(8, index * 2), self.capacity), np.nan)
+                grown[:index] = self.values
+                self.values = grown
+            self.rows[metric] = index
+        return index
+
+    def record(self, sample: Dict[str, Any], timestamp: Optional[float] = None):
+        column = self.position % self.capacity
+        self.timestamps[column] = timestamp if timestamp is not None else time.time()
+        self.values[:, column] = np.nan
+        for metric, value in sample.items():
+            encoded = encode_value(metric, value)
+            if not np.isnan(encoded):
+                row = self.row(metric)  # may reallocate self.values
+                self.values[row, column] = encoded
+        self.position += 1
+
+    @property
+    def latest_column(self) -> Optional[int]:
+        return (self.position - 1) % self.capacity if self.position else None
+
+    def window_columns(self, now: float, seconds: float) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            return np.flatnonzero((self.timestamps > now - seconds) & (self.timestamps <= now))
+
+
+@dataclass
+class _Group:
+    """Rules sharing an aggregation and window"""
+    aggregation: str
+    percentile: Optional[float]
+    window: float
+    metric_rows: np.ndarray  # distinct rows needed by the group
+    rule_positions: np.ndarray  # where the group's rules sit in the rule arrays
+    row_of_rule: np.ndarray  # for each rule, index into metric_rows
+
+
+class AlertRuleEngine:
+    """Compiles alert rules once and evaluates them in batch each tick"""
+
+    def __init__(self, store: Optional[TimeSeriesStore] = None):
+        self.store = store or TimeSeriesStore()
+        self.rule_names: List[str] = []
+        self.conditions: List[ParsedCondition] = []
+        self.invalid_rules: Dict[str, str] = {}
+        self._groups: List[_Group] = []
+        self._comparisons: List[Tuple[Any, np.ndarray]] = []
+        self._thresholds = np.empty(0)
+        self._for_seconds = np.empty(0)
+        self._pending_since = np.empty(0)
+        self._dirty = True
+
+        self.metrics = {"compilations": 0, "evaluations": 0, "last_evaluation_ms": 0.0}
+
+    def invalidate(self):
+        """Rules changed; recompile before the next evaluation"""
+        self._dirty = True
+
+    def record(self, sample: Dict[str, Any], timestamp: Optional[float] = None):
+        self.store.record(sample, timestamp)
+
+    def compile(self, rules: Iterable[Any]):
+        """Compile enabled rules (objects with name, condition, threshold, duration)"""
+        previous = {
+            name: (condition, pending)
+            for name, condition, pending in zip(self.rule_names, self.conditions, self._pending_since)
+        }
+        names, conditions, for_seconds = [], [], []
+        self.invalid_rules = {}
+        for rule in rules:
+            if not getattr(rule, "enabled", True):
+                continue
+            try:
+                parsed = parse_condition(rule.condition, rule.threshold)
+            except ValueError as e:
+                self.invalid_rules[rule.name] = str(e)
+                logger.warning(f"Skipping alert rule {rule.name}: {e}")
+                continue
+            names.append(rule.name)
+            conditions.append(parsed)
+            for_seconds.append(parsed.for_seconds if parsed.for_seconds is not None else float(rule.duration or 0))
+
+        self.rule_names = names
+        self.conditions = conditions
+        self._thresholds = np.array([c.value for c in conditions], dtype=float)
+        self._for_seconds = np.array(for_seconds, dtype=float)
+        # Rules whose condition did not change keep their pending state
+        self._pending_since = np.array([
+            previous[name][1] if name in previous and previous[name][0] == condition else np.nan
+            for name, condition in zip(names, conditions)
+        ], dtype=float)
+
+        rows = np.array([self.store.row(c.metric) for c in conditions], dtype=int)
+        groups: Dict[Tuple[str, Optional[float], float], List[int]] = {}
+        for position, c in enumerate(conditions):
+            window = 0.0 if c.aggregation == "last" else c.window
+            groups.setdefault((c.aggregation, c.percentile, window), []).append(position)
+        self._groups = []
+        for (aggregation, percentile, window), positions in groups.items():
+            positions = np.array(positions, dtype=int)
+            metric_rows, row_of_rule = np.unique(rows[positions], return_inverse=True)
+            self._groups.append(_Group(aggregation, percentile, window, metric_rows, positions, row_of_rule))
+
+        ops = np.array([c.op for c in conditions], dtype=object)
+        self._comparisons = [
+            (compare, np.flatnonzero(ops == op)) for op, compare in COMPARISONS.items() if (ops == op).any()
+        ]
+        self._dirty = False
+        self.metrics["compilations"] += 1
+
+    def _aggregate(self, group: _Group, now: float) -> np.ndarray:
+        store = self.store
+        if group.aggregation == "last":
+            column = store.latest_column
+            if column is None:
+                return np.full(len(group.metric_rows), np.nan)
+            return store.values[group.metric_rows, column]
+
+        columns = store.window_columns(now, group.window)
+        if group.aggregation == "rate":
+            if len(columns) < 2:
+                return np.full(len(group.metric_rows), np.nan)
+            times = store.timestamps[columns]
+            first, last = columns[np.argmin(times)], columns[np.argmax(times)]
+            elapsed = store.timestamps[last] - store.timestamps[first]
+            return (store.values[group.metric_rows, last] - store.values[group.metric_rows, first]) / elapsed
+
+        window = store.values[np.ix_(group.metric_rows, columns)]
+        if window.shape[1] == 0:
+            return np.full(len(group.metric_rows), np.nan)
+        # All-NaN rows (metric absent in the window) come out as NaN; silence the warning
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            if group.aggregation == "avg":
+                return np.nanmean(window, axis=1)
+            if group.aggregation == "min":
+                return np.nanmin(window, axis=1)
+            if group.aggregation == "max":
+                return np.nanmax(window, axis=1)
+            return nan_percentile(window, group.percentile)
+
+    def evaluate(self, rules: Optional[Iterable[Any]] = None, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        Evaluate all compiled rules at `now` and return (rule name, value)
+        for each rule that has held for its duration. Pass the rules to
+        recompile them after invalidate().
+        """
+        started = time.perf_counter()
+        if self._dirty and rules is not None:
+            self.compile(rules)
+        now = now if now is not None else time.time()
+
+        values = np.full(len(self.rule_names), np.nan)
+        for group in self._groups:
+            values[group.rule_positions] = self._aggregate(group, now)[group.row_of_rule]
+
+        met = np.zeros(len(values), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for compare, positions in self._comparisons:
+                met[positions] = compare(values[positions], self._thresholds[positions])
+        met &= ~np.isnan(values)
+
+        # for-duration: track when each condition started holding
+        self._pending_since[~met] = np.nan
+        self._pending_since[met & np.isnan(self._pending_since)] = now
+        firing = np.flatnonzero(met & (now - self._pending_since >= self._for_seconds))
+
+        self.metrics["evaluations"] += 1
+        self.metrics["last_evaluation_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return [(self.rule_names[i], float(values[i])) for i in firing]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "compiled_rules": len(self.rule_names),
+            "invalid_rules": dict(self.invalid_rules),
+            "aggregation_groups": len(self._groups),
+            "series": len(self.store.rows),
+            "samples": min(self.store.position, self.store.capacity),
+        }
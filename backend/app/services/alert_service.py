@@ -4,7 +4,7 @@ Alert Systems Service for Task 1.3.6 - Automated Notifications
 
 Comprehensive alert system providing:
 - Real-time alert generation and management
-- Multi-channel notification delivery (email, webhook, log)
+- Multi-channel notification delivery (email, webhook, log) with queued, coalesced dispatch
 - Configurable alert rules and thresholds
 - Alert escalation and grouping
 - Integration with monitoring, error tracking, and health checks
@@ -14,7 +14,6 @@ Comprehensive alert system providing:
 
 import logging
 import asyncio
-import smtplib
 import json
 import time
 import os
@@ -23,15 +22,18 @@ from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
 from collections import defaultdict, deque
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import aiohttp
+from email.message import EmailMessage
+import httpx
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.services.audit_service import get_audit_logger, AuditEventType
 from app.services.error_tracker import get_error_tracker, ErrorSeverity, ErrorCategory
 from app.services.health_service import get_health_service, HealthStatus
+from app.services.health_snapshot import get_health_sampler
+from app.services.alert_rule_engine import AlertRuleEngine, encode_value, parse_condition
+from app.services.notification_dispatcher import NotificationDispatcher
+from app.services.smtp_pool import get_smtp_pool
 
 
 class AlertSeverity(Enum):
@@ -126,7 +128,7 @@ class NotificationChannel:
     channel_type: AlertChannel
     config: Dict[str, Any]
     enabled: bool = True
-    rate_limit: int = 60  # seconds between notifications
+    rate_limit: int = 60  # seconds between notifications; repeats in between go out as one digest
 
 
 class AlertSystem:
@@ -137,13 +139,20 @@ class AlertSystem:
         self.audit_logger = get_audit_logger()
         self.error_tracker = get_error_tracker()
         self.health_service = get_health_service()
+        self.health_sampler = get_health_sampler()
         
         # Alert storage and management
         self.active_alerts: Dict[str, Alert] = {}
         self.alert_history = deque(maxlen=1000)
         self.alert_rules: Dict[str, AlertRule] = {}
+        self.rule_engine = AlertRuleEngine()
         self.notification_channels: Dict[str, NotificationChannel] = {}
         
+        # Notification delivery runs on per-channel workers, off the monitoring loop
+        self.dispatcher = NotificationDispatcher(self._deliver_notifications)
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        
         # Rate limiting and cooldowns
         self.last_alert_times: Dict[str, datetime] = {}
         self.alert_counts = defaultdict(int)
@@ -341,12 +350,22 @@ class AlertSystem:
     def add_alert_rule(self, rule: AlertRule):
         """Add a custom alert rule"""
         self.alert_rules[rule.name] = rule
+        self.rule_engine.invalidate()
         self.logger.info(f"Added alert rule: {rule.name}")
     
+    def update_alert_rule(self, rule_name: str, **changes) -> AlertRule:
+        """Update fields of an existing alert rule"""
+        rule = self.alert_rules[rule_name]
+        for field, value in changes.items():
+            setattr(rule, field, value)
+        self.rule_engine.invalidate()
+        return rule
+    
     def remove_alert_rule(self, rule_name: str):
         """Remove an alert rule"""
         if rule_name in self.alert_rules:
             del self.alert_rules[rule_name]
+            self.rule_engine.invalidate()
             self.logger.info(f"Removed alert rule: {rule_name}")
     
     def add_notification_channel(self, channel: NotificationChannel):
@@ -422,36 +441,34 @@ class AlertSystem:
         return alert_id
     
     async def _send_alert_notifications(self, alert: Alert, rule: AlertRule):
-        """Send alert notifications through configured channels"""
+        """Queue alert notifications on the configured channels"""
         
         for channel_type in rule.channels:
-            try:
-                # Find matching notification channel
-                channel = None
-                for ch in self.notification_channels.values():
-                    if ch.channel_type == channel_type and ch.enabled:
-                        channel = ch
-                        break
-                
-                if not channel:
-                    self.logger.warning(f"No enabled channel found for type: {channel_type.value}")
-                    continue
-                
-                # Check rate limit
-                rate_limit_key = f"{channel.name}_{alert.rule_name}"
-                if rate_limit_key in self.last_alert_times:
-                    time_since_last = datetime.utcnow() - self.last_alert_times[rate_limit_key]
-                    if time_since_last.total_seconds() < channel.rate_limit:
-                        self.logger.debug(f"Channel {channel.name} rate limited, skipping")
-                        continue
-                
-                # Send notification
-                success = await self._send_notification(alert, channel)
-                if success:
-                    self.last_alert_times[rate_limit_key] = datetime.utcnow()
-                    
-            except Exception as e:
-                self.logger.error(f"Failed to send alert via {channel_type.value}: {str(e)}")
+            channel = self._find_channel(channel_type)
+            if not channel:
+                self.logger.warning(f"No enabled channel found for type: {channel_type.value}")
+                continue
+            
+            # Repeats within the channel's rate limit are coalesced into a digest
+            self.dispatcher.submit(channel.name, alert.rule_name, alert, window=channel.rate_limit)
+    
+    def _find_channel(self, channel_type: AlertChannel) -> Optional[NotificationChannel]:
+        """First enabled notification channel of a type"""
+        for channel in self.notification_channels.values():
+            if channel.channel_type == channel_type and channel.enabled:
+                return channel
+        return None
+    
+    async def _deliver_notifications(self, channel_name: str, alerts: List[Alert]) -> bool:
+        """Dispatcher callback: send one alert, or a digest of coalesced alerts"""
+        channel = self.notification_channels.get(channel_name)
+        if not channel or not channel.enabled:
+            self.logger.warning(f"Notification channel {channel_name} no longer available, dropping {len(alerts)} alert(s)")
+            return True
+        
+        if len(alerts) == 1:
+            return await self._send_notification(alerts[0], channel)
+        return await self._send_digest_notification(alerts, channel)
     
     async def _send_notification(self, alert: Alert, channel: NotificationChannel) -> bool:
         """Send notification through specific channel"""
@@ -471,6 +488,38 @@ class AlertSystem:
             self.logger.error(f"Failed to send notification via {channel.name}: {str(e)}")
             return False
     
+    async def _send_digest_notification(self, alerts: List[Alert], channel: NotificationChannel) -> bool:
+        """Send several alerts of one rule as a single notification"""
+        
+        try:
+            if channel.channel_type == AlertChannel.LOG:
+                return all(self._send_log_notification(alert) for alert in alerts)
+            elif channel.channel_type == AlertChannel.EMAIL:
+                severity = max(alerts, key=lambda a: self._severity_rank(a.severity)).severity
+                subject = f"[LocalStorm Alert] {severity.value.upper()}: {len(alerts)} x {alerts[0].rule_name}"
+                body = f"LocalStorm Alert Digest\n\n{len(alerts)} alerts for rule {alerts[0].rule_name}\n\n"
+                body += "\n\n".join(self._format_alert_email(alert) for alert in alerts)
+                return await self._send_email(channel, subject, body)
+            elif channel.channel_type == AlertChannel.WEBHOOK:
+                payload = {
+                    "digest": True,
+                    "rule_name": alerts[0].rule_name,
+                    "count": len(alerts),
+                    "alerts": [self._webhook_payload(alert) for alert in alerts]
+                }
+                return await self._post_webhook(channel, payload, f"digest of {len(alerts)} {alerts[0].rule_name} alerts")
+            else:
+                self.logger.warning(f"Unsupported notification channel: {channel.channel_type.value}")
+                return False
+                
+        except Exception as e:
+            self.logger.error(f"Failed to send digest via {channel.name}: {str(e)}")
+            return False
+    
+    @staticmethod
+    def _severity_rank(severity: AlertSeverity) -> int:
+        return list(AlertSeverity).index(severity)
+    
     def _send_log_notification(self, alert: Alert) -> bool:
         """Send alert notification to logs"""
         try:
@@ -490,25 +539,9 @@ class AlertSystem:
             self.logger.error(f"Failed to send log notification: {str(e)}")
             return False
     
-    async def _send_email_notification(self, alert: Alert, channel: NotificationChannel) -> bool:
-        """Send alert notification via email"""
-        try:
-            config = channel.config
-            
-            if not config.get("smtp_username") or not config.get("to_emails"):
-                self.logger.warning("Email configuration incomplete, skipping email notification")
-                return False
-            
-            # Create email message
-            msg = MIMEMultipart()
-            msg['From'] = config['from_email']
-            msg['To'] = ', '.join(config['to_emails'])
-            msg['Subject'] = f"[LocalStorm Alert] {alert.severity.value.upper()}: {alert.title}"
-            
-            # Email body
-            body = f"""
-LocalStorm Alert Notification
-
+    def _format_alert_email(self, alert: Alert) -> str:
+        """Plain-text email section describing one alert"""
+        return f"""
 Alert ID: {alert.id}
 Severity: {alert.severity.value.upper()}
 Type: {alert.alert_type.value}
@@ -520,31 +553,73 @@ Description: {alert.description}
 Tags: {', '.join(alert.tags)}
 
 Source Data:
-{json.dumps(alert.source_data, indent=2)}
-
---
-LocalStorm Alert System
-            """.strip()
+{json.dumps(alert.source_data, indent=2, default=str)}
+        """.strip()
+    
+    async def _send_email_notification(self, alert: Alert, channel: NotificationChannel) -> bool:
+        """Send alert notification via email"""
+        subject = f"[LocalStorm Alert] {alert.severity.value.upper()}: {alert.title}"
+        body = f"LocalStorm Alert Notification\n\n{self._format_alert_email(alert)}"
+        return await self._send_email(channel, subject, body)
+    
+    async def _send_email(self, channel: NotificationChannel, subject: str, body: str) -> bool:
+        """Send a plain-text email over the shared SMTP connection pool"""
+        try:
+            config = channel.config
             
-            msg.attach(MIMEText(body, 'plain'))
+            if not config.get("smtp_username") or not config.get("to_emails"):
+                self.logger.warning("Email configuration incomplete, skipping email notification")
+                return False
             
-            # Send email
-            server = smtplib.SMTP(config['smtp_server'], config['smtp_port'])
-            server.starttls()
-            server.login(config['smtp_username'], config['smtp_password'])
-            text = msg.as_string()
-            server.sendmail(config['from_email'], config['to_emails'], text)
-            server.quit()
+            msg = EmailMessage()
+            msg['From'] = config['from_email']
+            msg['To'] = ', '.join(config['to_emails'])
+            msg['Subject'] = subject
+            msg.set_content(f"{body}\n\n--\nLocalStorm Alert System")
             
-            self.logger.info(f"Sent email notification for alert {alert.id}")
+            pool = get_smtp_pool(
+                config['smtp_server'],
+                config['smtp_port'],
+                config['smtp_username'],
+                config['smtp_password']
+            )
+            await pool.send(msg, sender=config['from_email'], recipients=config['to_emails'])
+            
+            self.logger.info(f"Sent email notification: {subject}")
             return True
             
         except Exception as e:
             self.logger.error(f"Failed to send email notification: {str(e)}")
             return False
     
+    def _webhook_payload(self, alert: Alert) -> Dict[str, Any]:
+        return {
+            "alert_id": alert.id,
+            "rule_name": alert.rule_name,
+            "severity": alert.severity.value,
+            "alert_type": alert.alert_type.value,
+            "title": alert.title,
+            "description": alert.description,
+            "timestamp": alert.timestamp.isoformat(),
+            "status": alert.status.value,
+            "tags": alert.tags,
+            "source_data": alert.source_data
+        }
+    
     async def _send_webhook_notification(self, alert: Alert, channel: NotificationChannel) -> bool:
         """Send alert notification via webhook"""
+        return await self._post_webhook(channel, self._webhook_payload(alert), f"alert {alert.id}")
+    
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Shared pooled client, recreated if closed or used from a different event loop"""
+        loop = asyncio.get_running_loop()
+        if self._http_client is None or self._http_client.is_closed or self._http_client_loop is not loop:
+            self._http_client = httpx.AsyncClient()
+            self._http_client_loop = loop
+        return self._http_client
+    
+    async def _post_webhook(self, channel: NotificationChannel, payload: Dict[str, Any], description: str) -> bool:
+        """POST a payload to the channel's webhook over the pooled HTTP client"""
         try:
             config = channel.config
             
@@ -552,39 +627,31 @@ LocalStorm Alert System
                 self.logger.warning("Webhook URL not configured, skipping webhook notification")
                 return False
             
-            # Prepare webhook payload
-            payload = {
-                "alert_id": alert.id,
-                "rule_name": alert.rule_name,
-                "severity": alert.severity.value,
-                "alert_type": alert.alert_type.value,
-                "title": alert.title,
-                "description": alert.description,
-                "timestamp": alert.timestamp.isoformat(),
-                "status": alert.status.value,
-                "tags": alert.tags,
-                "source_data": alert.source_data
-            }
-            
-            # Send webhook
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    config['url'],
-                    json=payload,
-                    headers=config.get('headers', {}),
-                    timeout=aiohttp.ClientTimeout(total=config.get('timeout', 30))
-                ) as response:
-                    if response.status == 200:
-                        self.logger.info(f"Sent webhook notification for alert {alert.id}")
-                        return True
-                    else:
-                        self.logger.error(f"Webhook returned status {response.status}")
-                        return False
+            response = await self._get_http_client().post(
+                config['url'],
+                content=json.dumps(payload, default=str),
+                headers=config.get('headers', {}),
+                timeout=config.get('timeout', 30)
+            )
+            if response.status_code == 200:
+                self.logger.info(f"Sent webhook notification for {description}")
+                return True
+            else:
+                self.logger.error(f"Webhook returned status {response.status_code}")
+                return False
                         
         except Exception as e:
             self.logger.error(f"Failed to send webhook notification: {str(e)}")
             return False
     
+    async def close(self):
+        """Deliver queued notifications and release pooled connections"""
+        await self.dispatcher.stop()
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._http_client_loop = None
+    
     async def acknowledge_alert(self, alert_id: str, acknowledged_by: str) -> bool:
         """Acknowledge an alert"""
         if alert_id not in self.active_alerts:
@@ -639,8 +706,12 @@ LocalStorm Alert System
         """Check all alert rule conditions"""
         
         try:
-            # Get current system state
-            health_result = await self.health_service.run_comprehensive_health_check()
+            # Get current system state from the shared snapshot, waiting only if it is stale
+            snapshot = await self.health_sampler.get_snapshot()
+            if snapshot is None:
+                # The sampler has not completed its first run yet
+                return
+            health_result = snapshot.data
             error_stats = self.error_tracker.get_error_statistics()
             
             # Extract metrics for condition checking
@@ -666,63 +737,49 @@ LocalStorm Alert System
                 "timestamp": datetime.utcnow()
             }
             
-            # Check each alert rule
-            for rule_name, rule in self.alert_rules.items():
-                if not rule.enabled:
+            # Append to the metric history and evaluate every rule in one batch
+            now = time.time()
+            self.rule_engine.record(current_data, now)
+            firing = self.rule_engine.evaluate(self.alert_rules.values(), now)
+            
+            for rule_name, value in firing:
+                rule = self.alert_rules.get(rule_name)
+                if rule is None:
                     continue
                 
                 try:
-                    condition_met = self._evaluate_condition(rule, current_data)
+                    # Generate alert
+                    title = self._generate_alert_title(rule, current_data)
+                    description = self._generate_alert_description(rule, current_data)
+                    
+                    await self.create_alert(
+                        rule_name=rule_name,
+                        title=title,
+                        description=description,
+                        source_data={**current_data, "rule_value": value}
+                    )
                     
-                    if condition_met:
-                        # Generate alert
-                        title = self._generate_alert_title(rule, current_data)
-                        description = self._generate_alert_description(rule, current_data)
-                        
-                        await self.create_alert(
-                            rule_name=rule_name,
-                            title=title,
-                            description=description,
-                            source_data=current_data
-                        )
-                        
                 except Exception as e:
-                    self.logger.error(f"Error evaluating rule {rule_name}: {str(e)}")
+                    self.logger.error(f"Error raising alert for rule {rule_name}: {str(e)}")
                     
         except Exception as e:
             self.logger.error(f"Error checking alert conditions: {str(e)}")
     
     def _evaluate_condition(self, rule: AlertRule, data: Dict[str, Any]) -> bool:
-        """Evaluate if alert condition is met"""
+        """
+        Evaluate a rule against a single data point, ignoring windows and
+        durations (the batch engine applies those over the metric history)
+        """
         
         try:
-            condition = rule.condition
-            threshold = rule.threshold
-            
-            # Simple condition evaluation (can be extended)
-            if "error_rate > threshold" in condition:
-                return data.get("error_rate", 0) > threshold
-            elif "health_status != healthy" in condition:
-                return data.get("health_status") != "healthy"
-            elif "health_status == critical" in condition:
-                return data.get("health_status") == "critical"
-            elif "cpu_percent > threshold" in condition:
-                return data.get("cpu_percent", 0) > threshold
-            elif "memory_percent > threshold" in condition:
-                return data.get("memory_percent", 0) > threshold
-            elif "disk_percent > threshold" in condition:
-                return data.get("disk_percent", 0) > threshold
-            elif "database_connected == false" in condition:
-                return not data.get("database_connected", True)
-            elif "security_events > threshold" in condition:
-                return data.get("security_events", 0) > threshold
-            else:
-                self.logger.warning(f"Unknown condition: {condition}")
-                return False
-                
-        except Exception as e:
-            self.logger.error(f"Error evaluating condition: {str(e)}")
+            condition = parse_condition(rule.condition, rule.threshold)
+        except ValueError:
+            self.logger.warning(f"Unknown condition: {rule.condition}")
             return False
+        
+        if condition.aggregation == "rate":
+            return False  # needs history
+        return condition.matches(encode_value(condition.metric, data.get(condition.metric)))
     
     def _generate_alert_title(self, rule: AlertRule, data: Dict[str, Any]) -> str:
         """Generate alert title based on rule and data"""
@@ -799,28 +856,24 @@ LocalStorm Alert System
         # Send to all available channels for escalated alerts
         escalation_channels = [AlertChannel.LOG, AlertChannel.EMAIL, AlertChannel.WEBHOOK]
         
+        escalated_alert = Alert(
+            id=f"{alert.id}_escalated",
+            rule_name=alert.rule_name,
+            alert_type=alert.alert_type,
+            severity=AlertSeverity.CRITICAL,  # Escalate severity
+            title=escalation_title,
+            description=escalation_description,
+            timestamp=datetime.utcnow(),
+            source_data=alert.source_data,
+            tags=alert.tags + ["escalated"]
+        )
+        
         for channel_type in escalation_channels:
-            channel = None
-            for ch in self.notification_channels.values():
-                if ch.channel_type == channel_type and ch.enabled:
-                    channel = ch
-                    break
-            
+            channel = self._find_channel(channel_type)
             if channel:
-                # Create temporary escalated alert for notification
-                escalated_alert = Alert(
-                    id=f"{alert.id}_escalated",
-                    rule_name=alert.rule_name,
-                    alert_type=alert.alert_type,
-                    severity=AlertSeverity.CRITICAL,  # Escalate severity
-                    title=escalation_title,
-                    description=escalation_description,
-                    timestamp=datetime.utcnow(),
-                    source_data=alert.source_data,
-                    tags=alert.tags + ["escalated"]
+                self.dispatcher.submit(
+                    channel.name, f"{alert.rule_name}:escalated", escalated_alert, window=channel.rate_limit
                 )
-                
-                await self._send_notification(escalated_alert, channel)
     
     def get_active_alerts(self, 
                          severity: Optional[AlertSeverity] = None,
@@ -869,7 +922,9 @@ LocalStorm Alert System
             "type_counts": dict(type_counts),
             "status_counts": dict(status_counts),
             "recent_alerts_24h": len(recent_alerts),
-            "alert_history_size": len(self.alert_history)
+            "alert_history_size": len(self.alert_history),
+            "rule_engine": self.rule_engine.get_metrics(),
+            "notifications": self.dispatcher.get_metrics()
         }
 
 
@@ -882,3 +937,9 @@ def get_alert_system() -> AlertSystem:
     if _alert_system_instance is None:
         _alert_system_instance = AlertSystem()
     return _alert_system_instance
+
+
+async def close_alert_system():
+    """Flush queued notifications and close the global alert system's connections"""
+    if _alert_system_instance is not None:
+        await _alert_system_instance.close()
@@ -0,0 +1,545 @@
+"""
+Audit Log Export Service
+========================
+
+Streams audit logs out of the database in constant memory for compliance
+exports. Rows are read through a server-side cursor in batches and encoded
+incrementally as JSON, CSV, NDJSON or Parquet, optionally gzip-compressed,
+so memory stays bounded regardless of the date range.
+
+Long exports can run as background jobs. Job state and output are stored
+in the database, so any web worker can report on a job and serve its
+download once finished.
+"""
+
+import csv
+import io
+import json
+import os
+import logging
+import tempfile
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.audit_log import AuditExportChunk, AuditExportJob, AuditLog
+from app.services.audit_partitions import get_audit_partition_manager
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+AUDIT_EXPORT_BATCH_SIZE = int(os.getenv("AUDIT_EXPORT_BATCH_SIZE", "2000"))
+AUDIT_EXPORT_RETENTION_HOURS = int(os.getenv("AUDIT_EXPORT_RETENTION_HOURS", "24"))
+AUDIT_EXPORT_CHUNK_BYTES = int(os.getenv("AUDIT_EXPORT_CHUNK_BYTES", str(1024 * 1024)))
+AUDIT_EXPORT_STALE_MINUTES = int(os.getenv("AUDIT_EXPORT_STALE_MINUTES", "30"))
+
+EXPORT_FORMATS = ("json", "csv", "ndjson", "parquet")
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Export field name -> AuditLog column, in the order of AuditLog.to_dict()
+EXPORT_FIELDS = {
+    "id": AuditLog.id,
+    "user_id": AuditLog.user_id,
+    "user_email": AuditLog.user_email,
+    "user_role": AuditLog.user_role,
+    "event_type": AuditLog.event_type,
+    "event_category": AuditLog.event_category,
+    "event_level": AuditLog.event_level,
+    "event_description": AuditLog.event_description,
+    "ip_address": AuditLog.ip_address,
+    "user_agent": AuditLog.user_agent,
+    "endpoint": AuditLog.endpoint,
+    "http_method": AuditLog.http_method,
+    "status_code": AuditLog.status_code,
+    "response_time_ms": AuditLog.response_time_ms,
+    "success": AuditLog.success,
+    "error_message": AuditLog.error_message,
+    "metadata": AuditLog.event_metadata,
+    "risk_score": AuditLog.risk_score,
+    "created_at": AuditLog.created_at,
+    "event_timestamp": AuditLog.event_timestamp,
+}
+
+
+def _serialize_row(row) -> Dict[str, Any]:
+    """Same shape as AuditLog.to_dict(), built from a plain result row"""
+    record = dict(zip(EXPORT_FIELDS, row))
+    for key in ("created_at", "event_timestamp"):
+        if record[key] is not None:
+            record[key] = record[key].isoformat()
+    return record
+
+
+def iter_audit_log_batches(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime,
+    batch_size: int = AUDIT_EXPORT_BATCH_SIZE
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield audit logs in the date range as batches of dicts, oldest first
+
+    Uses a server-side cursor (stream_results/yield_per) so only one batch
+    is held in memory at a time; columns are selected directly instead of
+    materializing ORM objects.
+    """
+    source = get_audit_partition_manager().audit_log_source(db, start_date, end_date)
+    stmt = (
+        select(*(source.c[column.name] for column in EXPORT_FIELDS.values()))
+        .where(source.c.created_at >= start_date, source.c.created_at <= end_date)
+        .order_by(source.c.created_at, source.c.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    result = db.execute(stmt)
+    try:
+        for partition in result.partitions():
+            yield [_serialize_row(row) for row in partition]
+    finally:
+        result.close()
+
+
+def count_audit_logs(db: Session, start_date: datetime, end_date: datetime) -> int:
+    """Number of audit logs in the export range"""
+    source = get_audit_partition_manager().audit_log_source(db, start_date, end_date)
+    return db.execute(
+        select(func.count()).select_from(source)
+        .where(source.c.created_at >= start_date, source.c.created_at <= end_date)
+    ).scalar()
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return "" if value is None else value
+
+
+def _encode_csv(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in batches:
+        writer.writerows([_csv_value(record[name]) for name in EXPORT_FIELDS] for record in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _encode_ndjson(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(json.dumps(record, default=str) + "\n" for record in batch).encode()
+
+
+def _encode_json(batches: Iterable[List[Dict[str, Any]]], export_info: Dict[str, Any]) -> Iterator[bytes]:
+    """The {"export_info": ..., "audit_logs": [...]} document, written incrementally"""
+    yield f'{{"export_info": {json.dumps(export_info)}, "audit_logs": ['.encode()
+    first = True
+    for batch in batches:
+        if not batch:
+            continue
+        encoded = ", ".join(json.dumps(record, default=str) for record in batch)
+        yield (encoded if first else ", " + encoded).encode()
+        first = False
+    yield b"]}"
+
+
+class _ChunkSink:
+    """Minimal writable file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.string()),
+        ("user_email", pa.string()),
+        ("user_role", pa.string()),
+        ("event_type", pa.string()),
+        ("event_category", pa.string()),
+        ("event_level", pa.string()),
+        ("event_description", pa.string()),
+        ("ip_address", pa.string()),
+        ("user_agent", pa.string()),
+        ("endpoint", pa.string()),
+        ("http_method", pa.string()),
+        ("status_code", pa.int32()),
+        ("response_time_ms", pa.int32()),
+        ("success", pa.bool_()),
+        ("error_message", pa.string()),
+        ("metadata", pa.string()),
+        ("risk_score", pa.int32()),
+        ("created_at", pa.string()),
+        ("event_timestamp", pa.string()),
+    ])
+
+
+def _encode_parquet(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """One Parquet row group per batch, flushed as soon as it is written"""
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for batch in batches:
+            columns = {name: [record[name] for record in batch] for name in EXPORT_FIELDS}
+            columns["user_id"] = [None if v is None else str(v) for v in columns["user_id"]]
+            columns["metadata"] = [None if v is None else json.dumps(v, default=str) for v in columns["metadata"]]
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_filename(export_format: str, start_date: datetime, end_date: datetime, compress: bool) -> str:
+    name = f"audit_logs_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{export_format}"
+    return name + ".gz" if compress else name
+
+
+def iter_audit_export(
+    start_date: datetime,
+    end_date: datetime,
+    export_format: str = "csv",
+    compress: bool = False,
+    exported_by: Optional[str] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+    batch_size: int = AUDIT_EXPORT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """
+    Encoded export as a stream of byte chunks
+
+    Opens its own session so the stream can outlive the request scope
+    (StreamingResponse bodies and background jobs).
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    if export_format == "parquet" and not PARQUET_AVAILABLE:
+        raise ValueError("Parquet export requires pyarrow")
+
+    db = session_factory()
+    try:
+        batches = iter_audit_log_batches(db, start_date, end_date, batch_size)
+
+        if export_format == "json":
+            export_info = {
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "total_records": count_audit_logs(db, start_date, end_date),
+                "exported_by": exported_by,
+                "export_timestamp": datetime.utcnow().isoformat()
+            }
+            chunks = _encode_json(batches, export_info)
+        elif export_format == "csv":
+            chunks = _encode_csv(batches)
+        elif export_format == "ndjson":
+            chunks = _encode_ndjson(batches)
+        else:
+            chunks = _encode_parquet(batches)
+
+        if compress:
+            chunks = gzip_chunks(chunks)
+
+        for chunk in chunks:
+            if chunk:
+                yield chunk
+    finally:
+        db.close()
+
+
+def export_job_filename(job: AuditExportJob) -> str:
+    return export_filename(job.export_format, job.start_date, job.end_date, job.compress)
+
+
+def export_job_to_dict(job: AuditExportJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "format": job.export_format,
+        "compressed": job.compress,
+        "start_date": job.start_date.isoformat(),
+        "end_date": job.end_date.isoformat(),
+        "requested_by": job.requested_by,
+        "created_at": job.created_at.isoformat(),
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "bytes_written": job.bytes_written,
+        "filename": export_job_filename(job),
+        "error": job.error,
+    }
+
+
+class ExportJobAbandoned(Exception):
+    """The job stopped being ours: cleanup_expired failed it while it was still running"""
+
+
+class AuditExportJobManager:
+    """
+    Tracks background exports and their output in the database
+
+    Any web worker can create, poll or download a job, whichever one ran
+    it. The export is spooled to a local temporary file while the audit
+    rows are being read and then stored as AUDIT_EXPORT_CHUNK_BYTES chunks,
+    so neither the run nor the download holds the whole file in memory.
+    Finished jobs expire after retention_hours; jobs that stop making
+    progress for AUDIT_EXPORT_STALE_MINUTES (their worker was restarted)
+    are marked failed. A running job refreshes updated_at as it goes, and
+    only moves itself out of "running", so a job that was failed as stale
+    stays failed even if its worker turns out to be alive.
+    """
+
+    def __init__(self, retention_hours: int = AUDIT_EXPORT_RETENTION_HOURS,
+                 session_factory: Callable[[], Session] = SessionLocal,
+                 chunk_bytes: int = AUDIT_EXPORT_CHUNK_BYTES,
+                 stale_minutes: int = AUDIT_EXPORT_STALE_MINUTES):
+        self.retention = timedelta(hours=retention_hours)
+        self.session_factory = session_factory
+        self.chunk_bytes = chunk_bytes
+        self.stale_after = timedelta(minutes=stale_minutes)
+        # Refresh updated_at well inside the stale window while a job runs
+        self.heartbeat_seconds = self.stale_after.total_seconds() / 4
+
+    def create_job(self, start_date: datetime, end_date: datetime, export_format: str,
+                   compress: bool = True, requested_by: Optional[str] = None) -> AuditExportJob:
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        if export_format == "parquet" and not PARQUET_AVAILABLE:
+            raise ValueError("Parquet export requires pyarrow")
+
+        self.cleanup_expired()
+        now = datetime.utcnow()
+        job = AuditExportJob(
+            job_id=uuid.uuid4().hex,
+            requested_by=requested_by,
+            start_date=start_date,
+            end_date=end_date,
+            export_format=export_format,
+            compress=compress,
+            status="pending",
+            created_at=now,
+            updated_at=now,
+            bytes_written=0,
+            chunk_count=0
+        )
+        db = self.session_factory()
+        try:
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+        finally:
+            db.close()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[AuditExportJob]:
+        db = self.session_factory()
+        try:
+            job = db.get(AuditExportJob, job_id)
+            if job is not None:
+                db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def _update_job(self, job_id: str, from_status: Optional[str] = None, **values) -> bool:
+        """Update a job, only while it is in from_status if given; False if no job matched"""
+        query = update(AuditExportJob).where(AuditExportJob.job_id == job_id)
+        if from_status is not None:
+            query = query.where(AuditExportJob.status == from_status)
+        db = self.session_factory()
+        try:
+            result = db.execute(query.values(updated_at=datetime.utcnow(), **values))
+            db.commit()
+            return result.rowcount > 0
+        finally:
+            db.close()
+
+    def _heartbeat(self, job_id: str):
+        """Show the job is still making progress; raises if it was failed as stale meanwhile"""
+        if not self._update_job(job_id, from_status="running"):
+            raise ExportJobAbandoned(job_id)
+
+    def run_job(self, job_id: str):
+        """Run the export and store its output; meant for BackgroundTasks / a worker thread"""
+        job = self.get_job(job_id)
+        if job is None:
+            logger.error(f"Audit export job {job_id} not found")
+            return
+
+        try:
+            if not self._update_job(job_id, from_status="pending", status="running"):
+                raise ExportJobAbandoned(job_id)
+            with tempfile.TemporaryFile() as spool:
+                bytes_written = 0
+                last_heartbeat = time.monotonic()
+                for chunk in iter_audit_export(
+                    job.start_date, job.end_date, job.export_format, job.compress,
+                    exported_by=job.requested_by, session_factory=self.session_factory
+                ):
+                    spool.write(chunk)
+                    bytes_written += len(chunk)
+                    if time.monotonic() - last_heartbeat >= self.heartbeat_seconds:
+                        self._heartbeat(job_id)
+                        last_heartbeat = time.monotonic()
+                self._heartbeat(job_id)
+
+                spool.seek(0)
+                chunk_count = self._store_output(job_id, spool)
+
+            if not self._update_job(
+                job_id, from_status="running", status="completed", chunk_count=chunk_count,
+                bytes_written=bytes_written, completed_at=datetime.utcnow()
+            ):
+                raise ExportJobAbandoned(job_id)
+        except ExportJobAbandoned:
+            # Already marked failed by cleanup_expired; leave that status alone
+            logger.warning(f"Audit export job {job_id} was abandoned as stale; discarding its output")
+            self._discard_output(job_id)
+        except Exception as e:
+            logger.error(f"Audit export job {job_id} failed: {e}")
+            if self._discard_output(job_id):
+                try:
+                    self._update_job(
+                        job_id, from_status="running", status="failed",
+                        error=str(e), completed_at=datetime.utcnow()
+                    )
+                except Exception as update_error:
+                    logger.error(f"Could not record failure of audit export job {job_id}: {update_error}")
+
+    def _store_output(self, job_id: str, spool) -> int:
+        """Copy the spooled export into chunk rows, one commit per chunk"""
+        db = self.session_factory()
+        try:
+            seq = 0
+            while True:
+                data = spool.read(self.chunk_bytes)
+                if not data:
+                    return seq
+                db.add(AuditExportChunk(job_id=job_id, seq=seq, data=data))
+                result = db.execute(
+                    update(AuditExportJob)
+                    .where(AuditExportJob.job_id == job_id, AuditExportJob.status == "running")
+                    .values(updated_at=datetime.utcnow())
+                )
+                if result.rowcount == 0:
+                    db.rollback()
+                    raise ExportJobAbandoned(job_id)
+                db.commit()
+                seq += 1
+        finally:
+            db.close()
+
+    def _discard_output(self, job_id: str) -> bool:
+        try:
+            self._delete_output(job_id)
+            return True
+        except Exception as e:
+            logger.error(f"Could not delete output of audit export job {job_id}: {e}")
+            return False
+
+    def _delete_output(self, job_id: str):
+        db = self.session_factory()
+        try:
+            db.execute(delete(AuditExportChunk).where(AuditExportChunk.job_id == job_id))
+            db.commit()
+        finally:
+            db.close()
+
+    def iter_output(self, job: AuditExportJob) -> Iterator[bytes]:
+        """Stream a completed job's output one stored chunk at a time"""
+        db = self.session_factory()
+        try:
+            for seq in range(job.chunk_count):
+                data = db.execute(
+                    select(AuditExportChunk.data)
+                    .where(AuditExportChunk.job_id == job.job_id, AuditExportChunk.seq == seq)
+                ).scalar_one()
+                yield data
+        finally:
+            db.close()
+
+    def cleanup_expired(self):
+        """Fail jobs that stopped making progress; delete finished jobs past the retention period"""
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(AuditExportJob)
+                .where(
+                    AuditExportJob.status.in_(("pending", "running")),
+                    AuditExportJob.updated_at < now - self.stale_after
+                )
+                .values(status="failed", error="Export was interrupted", completed_at=now, updated_at=now)
+            )
+
+            expired = select(AuditExportJob.job_id).where(
+                AuditExportJob.completed_at.is_not(None),
+                AuditExportJob.completed_at < now - self.retention
+            )
+            db.execute(delete(AuditExportChunk).where(AuditExportChunk.job_id.in_(expired)))
+            db.execute(delete(AuditExportJob).where(
+                AuditExportJob.completed_at.is_not(None),
+                AuditExportJob.completed_at < now - self.retention
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+
+# Global export job manager instance
+audit_export_job_manager = AuditExportJobManager()
+
+
+def get_audit_export_job_manager() -> AuditExportJobManager:
+    """Get the global audit export job manager"""
+    return audit_export_job_manager
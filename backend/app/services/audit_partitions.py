@@ -0,0 +1,378 @@
+"""
+Audit Log Partitioning and Retention
+====================================
+
+audit_logs is range-partitioned by month on created_at in Postgres
+(see migrations/versions/partition_audit_logs.py). Retention is enforced by
+detaching and dropping whole monthly partitions rather than by DELETE, and
+the maintenance job pre-creates partitions for the coming months. Only the
+few rows that land in the default partition (timestamps outside every
+monthly range) are moved or deleted row by row.
+
+SQLite has no declarative partitioning, so completed months are rolled out
+of the hot audit_logs table into per-month tables with the same naming and
+dropped the same way. Every read goes through audit_log_source() (or
+audit_log_entity() for ORM queries), which only touches the tables
+overlapping the requested window.
+
+Rows whose retention_policy outlives the default period are copied into
+audit_logs_retained before their partition is dropped, and reads keep
+returning them from there.
+"""
+
+import os
+import re
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import column, delete, select, table, text, union_all
+from sqlalchemy.orm import Session, aliased
+
+from app.models.audit_log import AuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "365"))
+AUDIT_PARTITION_MONTHS_AHEAD = int(os.getenv("AUDIT_PARTITION_MONTHS_AHEAD", "3"))
+
+AUDIT_TABLE = AuditLog.__tablename__
+RETAINED_TABLE = "audit_logs_retained"
+DEFAULT_PARTITION = f"{AUDIT_TABLE}_default"
+PARTITION_NAME_RE = re.compile(r"^audit_logs_y(\d{4})m(\d{2})$")
+
+# retention_policy -> days to keep (None never expires); unset or unknown
+# policies follow AUDIT_RETENTION_DAYS
+RETENTION_POLICY_DAYS: Dict[str, Optional[int]] = {
+    "short": 90,
+    "standard": AUDIT_RETENTION_DAYS,
+    "extended": 7 * 365,
+    "legal_hold": None,
+}
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    years, month = divmod(value.month - 1 + months, 12)
+    return datetime(value.year + years, month + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{AUDIT_TABLE}_y{month:%Y}m{month:%m}"
+
+
+@dataclass
+class AuditPartition:
+    """One month of audit logs: [start, end)"""
+    name: str
+    start: datetime
+    end: datetime
+
+    @classmethod
+    def from_name(cls, name: str) -> Optional["AuditPartition"]:
+        match = PARTITION_NAME_RE.match(name)
+        if not match:
+            return None
+        start = datetime(int(match.group(1)), int(match.group(2)), 1)
+        return cls(name, start, add_months(start, 1))
+
+
+class AuditPartitionManager:
+    """Creates, lists and expires monthly audit log partitions"""
+
+    def __init__(self, retention_days: int = AUDIT_RETENTION_DAYS,
+                 months_ahead: int = AUDIT_PARTITION_MONTHS_AHEAD,
+                 retention_policy_days: Optional[Dict[str, Optional[int]]] = None):
+        self.retention_days = retention_days
+        self.months_ahead = months_ahead
+        self.retention_policy_days = {
+            **RETENTION_POLICY_DAYS,
+            "standard": retention_days,
+            **(retention_policy_days or {}),
+        }
+
+    @staticmethod
+    def _dialect(db: Session) -> str:
+        return db.get_bind().dialect.name
+
+    def is_partitioned(self, db: Session) -> bool:
+        """Whether audit_logs is a partitioned table (Postgres) or uses rolling tables (SQLite)"""
+        dialect = self._dialect(db)
+        if dialect == "postgresql":
+            return db.execute(text(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :name"
+            ), {"name": AUDIT_TABLE}).first() is not None
+        return dialect == "sqlite"
+
+    def list_partitions(self, db: Session) -> List[AuditPartition]:
+        """Monthly partitions (or rolled tables), oldest first"""
+        dialect = self._dialect(db)
+        if dialect == "postgresql":
+            names = db.execute(text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :name"
+            ), {"name": AUDIT_TABLE}).scalars().all()
+        elif dialect == "sqlite":
+            names = db.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :pattern"
+            ), {"pattern": f"{AUDIT_TABLE}_y%"}).scalars().all()
+        else:
+            names = []
+
+        partitions = [p for p in (AuditPartition.from_name(name) for name in names) if p]
+        return sorted(partitions, key=lambda p: p.start)
+
+    def _has_default_partition(self, db: Session) -> bool:
+        return db.execute(text(
+            "SELECT 1 FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :parent AND c.relname = :name"
+        ), {"parent": AUDIT_TABLE, "name": DEFAULT_PARTITION}).first() is not None
+
+    def create_future_partitions(self, db: Session, now: Optional[datetime] = None) -> List[str]:
+        """
+        Make sure partitions exist from the current month to months_ahead months out
+
+        Postgres refuses a new partition while the default partition holds
+        rows for its range, so the default is detached for the duration,
+        its rows for each new month are moved into that month's partition,
+        and it is attached again. The parent is locked until commit, so
+        concurrent inserts wait rather than fail.
+        """
+        if self._dialect(db) != "postgresql" or not self.is_partitioned(db):
+            # Rolled SQLite tables are created when a month is rolled
+            return []
+
+        existing = {p.name for p in self.list_partitions(db)}
+        current = month_start(now or datetime.utcnow())
+        missing = [
+            start for start in (add_months(current, offset) for offset in range(self.months_ahead + 1))
+            if partition_name(start) not in existing
+        ]
+        if not missing:
+            return []
+
+        has_default = self._has_default_partition(db)
+        if has_default:
+            db.execute(text(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+
+        created = []
+        for start in missing:
+            name = partition_name(start)
+            window = {"start": start, "end": add_months(start, 1)}
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {AUDIT_TABLE} "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{window['end']:%Y-%m-%d}')"
+            ))
+            if has_default:
+                db.execute(text(
+                    f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} "
+                    f"WHERE created_at >= :start AND created_at < :end"
+                ), window)
+                db.execute(text(
+                    f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end"
+                ), window)
+            created.append(name)
+
+        if has_default:
+            db.execute(text(f"ALTER TABLE {AUDIT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        db.commit()
+        return created
+
+    def roll_completed_months(self, db: Session, now: Optional[datetime] = None) -> List[str]:
+        """SQLite: move finished months out of the hot table into per-month tables"""
+        if self._dialect(db) != "sqlite":
+            return []
+
+        current = month_start(now or datetime.utcnow())
+        months = db.execute(text(
+            f"SELECT DISTINCT strftime('%Y-%m', created_at) FROM {AUDIT_TABLE} WHERE created_at < :current"
+        ), {"current": current}).scalars().all()
+
+        rolled = []
+        for value in sorted(months):
+            start = datetime.strptime(value, "%Y-%m")
+            end = add_months(start, 1)
+            name = partition_name(start)
+            db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} AS SELECT * FROM {AUDIT_TABLE} WHERE 0"))
+            db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{name}_created_at ON {name} (created_at)"))
+            window = {"start": start, "end": end}
+            db.execute(text(
+                f"INSERT INTO {name} SELECT * FROM {AUDIT_TABLE} WHERE created_at >= :start AND created_at < :end"
+            ), window)
+            db.execute(text(
+                f"DELETE FROM {AUDIT_TABLE} WHERE created_at >= :start AND created_at < :end"
+            ), window)
+            rolled.append(name)
+        db.commit()
+        return rolled
+
+    def _retained_policies(self) -> List[str]:
+        return [
+            policy for policy, days in self.retention_policy_days.items()
+            if days is None or days > self.retention_days
+        ]
+
+    def _ensure_retained_table(self, db: Session):
+        if self._dialect(db) == "postgresql":
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {RETAINED_TABLE} (LIKE {AUDIT_TABLE} INCLUDING DEFAULTS)"
+            ))
+        else:
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {RETAINED_TABLE} AS SELECT * FROM {AUDIT_TABLE} WHERE 0"
+            ))
+
+    def _has_retained_table(self, db: Session) -> bool:
+        dialect = self._dialect(db)
+        if dialect == "postgresql":
+            query = "SELECT to_regclass(:name) IS NOT NULL"
+        elif dialect == "sqlite":
+            query = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = :name"
+        else:
+            return False
+        return bool(db.execute(text(query), {"name": RETAINED_TABLE}).scalar())
+
+    def _retain_rows(self, db: Session, source: str, condition: str = "TRUE", params: Optional[Dict[str, Any]] = None):
+        """Copy rows with a longer retention_policy from source into audit_logs_retained"""
+        retained_policies = self._retained_policies()
+        if not retained_policies:
+            return
+        placeholders = ", ".join(f":policy_{i}" for i in range(len(retained_policies)))
+        db.execute(
+            text(f"INSERT INTO {RETAINED_TABLE} SELECT * FROM {source} "
+                 f"WHERE retention_policy IN ({placeholders}) AND {condition}"),
+            {**{f"policy_{i}": policy for i, policy in enumerate(retained_policies)}, **(params or {})}
+        )
+
+    def drop_expired_partitions(self, db: Session, now: Optional[datetime] = None) -> List[str]:
+        """
+        Drop partitions whose whole month is past the retention period
+
+        Rows with a longer retention_policy are first copied to
+        audit_logs_retained; the partition itself is detached and dropped.
+        Expired rows that landed in the Postgres default partition are
+        deleted from it the same way.
+        """
+        if not self.is_partitioned(db):
+            logger.warning("audit_logs is not partitioned; skipping retention")
+            return []
+
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+        expired = [p for p in self.list_partitions(db) if p.end <= cutoff]
+        postgres = self._dialect(db) == "postgresql"
+        purge_default = postgres and self._has_default_partition(db)
+        if not expired and not purge_default:
+            return []
+
+        self._ensure_retained_table(db)
+
+        dropped = []
+        for partition in expired:
+            self._retain_rows(db, partition.name)
+            if postgres:
+                db.execute(text(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {partition.name}"))
+            db.execute(text(f"DROP TABLE {partition.name}"))
+            dropped.append(partition.name)
+            logger.info(f"Dropped expired audit partition {partition.name}")
+
+        if purge_default:
+            # Same month granularity as the partitions above
+            window = {"cutoff": month_start(cutoff)}
+            self._retain_rows(db, DEFAULT_PARTITION, "created_at < :cutoff", window)
+            result = db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff"), window)
+            if result.rowcount:
+                logger.info(f"Deleted {result.rowcount} expired rows from {DEFAULT_PARTITION}")
+
+        db.commit()
+        return dropped
+
+    def purge_retained(self, db: Session, now: Optional[datetime] = None) -> int:
+        """Expire rows in audit_logs_retained once their own policy has run out"""
+        if not self._has_retained_table(db):
+            return 0
+
+        now = now or datetime.utcnow()
+        purged = 0
+        for policy, days in self.retention_policy_days.items():
+            if days is None:
+                continue
+            result = db.execute(
+                text(f"DELETE FROM {RETAINED_TABLE} WHERE retention_policy = :policy AND created_at < :cutoff"),
+                {"policy": policy, "cutoff": now - timedelta(days=days)}
+            )
+            purged += result.rowcount or 0
+        db.commit()
+        return purged
+
+    def run_maintenance(self, db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Pre-create future partitions, roll finished months (SQLite) and drop expired ones"""
+        return {
+            "created": self.create_future_partitions(db, now),
+            "rolled": self.roll_completed_months(db, now),
+            "dropped": self.drop_expired_partitions(db, now),
+            "retained_rows_purged": self.purge_retained(db, now),
+        }
+
+    def audit_log_source(self, db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """
+        Selectable with the audit_logs columns covering start..end (either open)
+
+        Postgres prunes partitions itself from the created_at predicate.
+        On SQLite the hot table is unioned with only the rolled month tables
+        that overlap the window. Rows kept in audit_logs_retained after
+        their partition was dropped are unioned in on both.
+        """
+        others = []
+        if self._dialect(db) == "sqlite":
+            others = [
+                p.name for p in self.list_partitions(db)
+                if (start is None or p.end > start) and (end is None or p.start <= end)
+            ]
+        if self._has_retained_table(db):
+            others.append(RETAINED_TABLE)
+        if not others:
+            return AuditLog.__table__
+
+        columns = [c for c in AuditLog.__table__.columns]
+        selects = [select(*columns)]
+        for name in others:
+            other = table(name, *[column(c.name, c.type) for c in columns])
+            selects.append(select(*other.columns))
+        return union_all(*selects).subquery(AUDIT_TABLE)
+
+    def audit_log_entity(self, db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """AuditLog for ORM queries, mapped onto audit_log_source() when other tables are involved"""
+        source = self.audit_log_source(db, start, end)
+        if source is AuditLog.__table__:
+            return AuditLog
+        return aliased(AuditLog, source)
+
+    def delete_audit_log(self, db: Session, log: AuditLog):
+        """Delete one audit log from whichever table holds it; the caller commits"""
+        hot = AuditLog.__table__
+        db.execute(delete(hot).where(hot.c.id == log.id, hot.c.created_at == log.created_at))
+        if self._dialect(db) == "sqlite":
+            for partition in self.list_partitions(db):
+                if partition.start <= log.created_at < partition.end:
+                    rolled = table(partition.name, column("id"))
+                    db.execute(delete(rolled).where(rolled.c.id == log.id))
+        if self._has_retained_table(db):
+            retained = table(RETAINED_TABLE, column("id"), column("created_at"))
+            db.execute(delete(retained).where(retained.c.id == log.id, retained.c.created_at == log.created_at))
+        db.expunge(log)
+
+
+# Global partition manager instance
+audit_partition_manager = AuditPartitionManager()
+
+
+def get_audit_partition_manager() -> AuditPartitionManager:
+    """Get the global audit partition manager"""
+    return audit_partition_manager
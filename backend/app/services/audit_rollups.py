@@ -0,0 +1,321 @@
+"""
+Audit Statistics Rollups
+========================
+
+Hourly and daily per-category counters (total, failed, high-risk) plus a
+Space-Saving top-K sketch of the most active users per bucket. The audit
+writer folds every flushed batch into them, so the statistics endpoint sums
+at most ~24 hourly and `days` daily buckets instead of scanning audit_logs.
+
+A window [now - days, now) is covered by hourly buckets up to the first
+day boundary and daily buckets after it, so its start is rounded down to
+the hour.
+
+Rollups are derived data: a failed update is logged and counted but never
+fails the audit write, and rebuild() recomputes any range from raw rows
+(see reconcile_audit_rollups.py).
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.models.audit_log import AuditStatsRollup, AuditUserActivitySketch
+from app.services.audit_partitions import get_audit_partition_manager
+
+logger = logging.getLogger(__name__)
+
+AUDIT_STATS_TOPK_CAPACITY = int(os.getenv("AUDIT_STATS_TOPK_CAPACITY", "100"))
+AUDIT_ROLLUP_HOURLY_RETENTION_DAYS = int(os.getenv("AUDIT_ROLLUP_HOURLY_RETENTION_DAYS", "92"))
+
+HIGH_RISK_SCORE = 70
+GRANULARITIES = ("hour", "day")
+
+BucketKey = Tuple[str, datetime]
+
+
+def _utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    """Start of the hour or day containing value, as naive UTC"""
+    value = _utc_naive(value)
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def merge_sketch(counters: Dict[str, int], deltas: Dict[str, int], capacity: int) -> Dict[str, int]:
+    """
+    Space-Saving update: known users are incremented; once the sketch is
+    full, a newcomer takes over the least active slot and inherits its count.
+    Counts are therefore upper bounds, exact while fewer than capacity users
+    were seen.
+    """
+    merged = dict(counters)
+    for email, count in sorted(deltas.items(), key=lambda item: -item[1]):
+        if email in merged:
+            merged[email] += count
+        elif len(merged) < capacity:
+            merged[email] = count
+        else:
+            evicted = min(merged, key=merged.get)
+            merged[email] = merged.pop(evicted) + count
+    return merged
+
+
+class RollupDeltas:
+    """Counter increments for a set of audit rows, keyed by bucket"""
+
+    def __init__(self):
+        self.stats: Dict[Tuple[str, datetime, str], List[int]] = {}
+        self.users: Dict[BucketKey, Dict[str, int]] = {}
+
+    def add(self, created_at: datetime, event_category: str, success: Optional[bool],
+            risk_score: Optional[int], user_email: Optional[str]):
+        failed = 1 if success is False else 0
+        high_risk = 1 if risk_score is not None and risk_score >= HIGH_RISK_SCORE else 0
+        for granularity in GRANULARITIES:
+            start = bucket_start(created_at, granularity)
+            counts = self.stats.setdefault((granularity, start, event_category), [0, 0, 0])
+            counts[0] += 1
+            counts[1] += failed
+            counts[2] += high_risk
+            if user_email:
+                users = self.users.setdefault((granularity, start), {})
+                users[user_email] = users.get(user_email, 0) + 1
+
+    def __bool__(self):
+        return bool(self.stats)
+
+
+class AuditStatsRollups:
+    """Maintains and queries the audit statistics rollup tables"""
+
+    def __init__(self, topk_capacity: int = AUDIT_STATS_TOPK_CAPACITY,
+                 hourly_retention_days: int = AUDIT_ROLLUP_HOURLY_RETENTION_DAYS):
+        self.topk_capacity = topk_capacity
+        self.hourly_retention_days = hourly_retention_days
+        self.applied_rows = 0
+        self.failures = 0
+
+    @staticmethod
+    def deltas_for(rows: Iterable[Dict[str, Any]]) -> RollupDeltas:
+        deltas = RollupDeltas()
+        for row in rows:
+            deltas.add(
+                row.get("created_at") or datetime.utcnow(),
+                row["event_category"],
+                row.get("success", True),
+                row.get("risk_score"),
+                row.get("user_email"),
+            )
+        return deltas
+
+    def record(self, bind: Any, rows: List[Dict[str, Any]]) -> bool:
+        """
+        Fold already-written audit rows into the rollups in their own
+        transaction. Failures are logged and left for reconciliation.
+        """
+        deltas = self.deltas_for(rows)
+        if not deltas:
+            return True
+        try:
+            if isinstance(bind, Engine):
+                with bind.begin() as conn:
+                    self.apply(conn, deltas)
+            else:
+                self.apply(bind, deltas)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Failed to update audit rollups for {len(rows)} events: {e}")
+            return False
+        self.applied_rows += len(rows)
+        return True
+
+    def apply(self, conn: Connection, deltas: RollupDeltas):
+        """Add the deltas to the rollup rows, creating buckets as needed"""
+        upsert_insert = self._upsert_insert(conn)
+        table = AuditStatsRollup.__table__
+
+        for (granularity, start, category), (total, failed, high_risk) in deltas.stats.items():
+            values = {
+                "granularity": granularity, "bucket_start": start, "event_category": category,
+                "total_events": total, "failed_events": failed, "high_risk_events": high_risk,
+            }
+            if upsert_insert is not None:
+                statement = upsert_insert(table).values(**values)
+                conn.execute(statement.on_conflict_do_update(
+                    index_elements=["granularity", "bucket_start", "event_category"],
+                    set_={
+                        "total_events": table.c.total_events + statement.excluded.total_events,
+                        "failed_events": table.c.failed_events + statement.excluded.failed_events,
+                        "high_risk_events": table.c.high_risk_events + statement.excluded.high_risk_events,
+                    }
+                ))
+                continue
+
+            updated = conn.execute(update(table).where(and_(
+                table.c.granularity == granularity,
+                table.c.bucket_start == start,
+                table.c.event_category == category,
+            )).values(
+                total_events=table.c.total_events + total,
+                failed_events=table.c.failed_events + failed,
+                high_risk_events=table.c.high_risk_events + high_risk,
+            ))
+            if not updated.rowcount:
+                conn.execute(insert(table).values(**values))
+
+        for (granularity, start), users in deltas.users.items():
+            self._merge_user_sketch(conn, upsert_insert, granularity, start, users)
+
+    def _merge_user_sketch(self, conn: Connection, upsert_insert, granularity: str,
+                           start: datetime, users: Dict[str, int]):
+        table = AuditUserActivitySketch.__table__
+        if upsert_insert is not None:
+            conn.execute(upsert_insert(table).values(
+                granularity=granularity, bucket_start=start, counters={}
+            ).on_conflict_do_nothing(index_elements=["granularity", "bucket_start"]))
+
+        bucket = and_(table.c.granularity == granularity, table.c.bucket_start == start)
+        current = conn.execute(select(table.c.counters).where(bucket).with_for_update()).first()
+        if current is None:
+            conn.execute(insert(table).values(
+                granularity=granularity, bucket_start=start,
+                counters=merge_sketch({}, users, self.topk_capacity)
+            ))
+            return
+        conn.execute(update(table).where(bucket).values(
+            counters=merge_sketch(current.counters or {}, users, self.topk_capacity)
+        ))
+
+    @staticmethod
+    def _upsert_insert(conn: Connection):
+        """Dialect insert() supporting ON CONFLICT, or None for the update-then-insert fallback"""
+        return {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(conn.dialect.name)
+
+    @staticmethod
+    def _window(start: datetime):
+        """Rollup rows covering [start, now): hourly up to the first day boundary, daily after"""
+        first_hour = bucket_start(start, "hour")
+        first_day = bucket_start(start, "day")
+        if first_day < first_hour:
+            first_day += timedelta(days=1)
+
+        def covering(table):
+            return or_(
+                and_(table.c.granularity == "hour",
+                     table.c.bucket_start >= first_hour,
+                     table.c.bucket_start < first_day),
+                and_(table.c.granularity == "day",
+                     table.c.bucket_start >= first_day),
+            )
+        return covering
+
+    def get_statistics(self, db: Session, days: int = 7, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Audit statistics for the last `days` days, read from the rollups"""
+        covering = self._window((now or datetime.utcnow()) - timedelta(days=days))
+
+        stats = AuditStatsRollup.__table__
+        category_stats = db.execute(
+            select(
+                stats.c.event_category,
+                func.sum(stats.c.total_events).label("total"),
+                func.sum(stats.c.failed_events).label("failed"),
+                func.sum(stats.c.high_risk_events).label("high_risk"),
+            ).where(covering(stats)).group_by(stats.c.event_category)
+        ).all()
+
+        sketches = AuditUserActivitySketch.__table__
+        user_counts: Dict[str, int] = {}
+        for counters in db.execute(select(sketches.c.counters).where(covering(sketches))).scalars():
+            for email, count in (counters or {}).items():
+                user_counts[email] = user_counts.get(email, 0) + count
+        top_users = sorted(user_counts.items(), key=lambda item: (-item[1], item[0]))[:10]
+
+        total_events = sum(row.total for row in category_stats)
+        failed_events = sum(row.failed for row in category_stats)
+        return {
+            "period_days": days,
+            "total_events": total_events,
+            "failed_events": failed_events,
+            "high_risk_events": sum(row.high_risk for row in category_stats),
+            "success_rate": round((total_events - failed_events) / max(total_events, 1) * 100, 2),
+            "events_by_category": {row.event_category: row.total for row in category_stats},
+            "top_users": [{"email": email, "event_count": count} for email, count in top_users]
+        }
+
+    def rebuild(self, db: Session, start: datetime, batch_size: int = 10000) -> int:
+        """
+        Recompute every bucket from the day containing start onwards from raw
+        audit rows, replacing whatever the writer had accumulated. Returns the
+        number of rows read.
+
+        Events flushed while the rebuild runs may be counted twice; run it in
+        a quiet period or re-run it to converge.
+        """
+        first_day = bucket_start(start, "day")
+        source = get_audit_partition_manager().audit_log_source(db, first_day)
+
+        deltas = RollupDeltas()
+        rows = 0
+        result = db.execute(
+            select(source.c.created_at, source.c.event_category, source.c.success,
+                   source.c.risk_score, source.c.user_email)
+            .where(source.c.created_at >= first_day)
+            .execution_options(yield_per=batch_size)
+        )
+        for row in result:
+            deltas.add(row.created_at, row.event_category, row.success, row.risk_score, row.user_email)
+            rows += 1
+
+        for table in (AuditStatsRollup.__table__, AuditUserActivitySketch.__table__):
+            db.execute(delete(table).where(table.c.bucket_start >= first_day))
+
+        # Sketches are rebuilt from exact counts, keeping the top capacity users
+        for key, users in deltas.users.items():
+            top = sorted(users.items(), key=lambda item: -item[1])[:self.topk_capacity]
+            deltas.users[key] = dict(top)
+
+        self.apply(db.connection(), deltas)
+        db.commit()
+        logger.info(f"Rebuilt audit rollups since {first_day:%Y-%m-%d} from {rows} events")
+        return rows
+
+    def prune(self, db: Session, now: Optional[datetime] = None) -> int:
+        """Drop hourly buckets older than any statistics window needs"""
+        cutoff = bucket_start((now or datetime.utcnow()) - timedelta(days=self.hourly_retention_days), "day")
+        pruned = 0
+        for table in (AuditStatsRollup.__table__, AuditUserActivitySketch.__table__):
+            result = db.execute(delete(table).where(and_(
+                table.c.granularity == "hour", table.c.bucket_start < cutoff
+            )))
+            pruned += result.rowcount or 0
+        db.commit()
+        return pruned
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "applied_rows": self.applied_rows,
+            "failures": self.failures,
+            "topk_capacity": self.topk_capacity,
+        }
+
+
+# Global rollup instance
+audit_stats_rollups = AuditStatsRollups()
+
+
+def get_audit_stats_rollups() -> AuditStatsRollups:
+    """Get the global audit statistics rollups"""
+    return audit_stats_rollups
@@ -11,11 +11,12 @@ Comprehensive audit logging service that provides:
 """
 
 import json
+import base64
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, or_, func
+from sqlalchemy import desc, and_, or_, func, tuple_, case, select
 from fastapi import Request
 import hashlib
 import re
@@ -23,6 +24,25 @@ from user_agents import parse
 
 from app.models.audit_log import AuditLog, AuditEventType, AuditLogLevel
 from app.database import get_db
+from app.services.audit_writer import audit_log_row, get_audit_event_writer
+from app.services.audit_partitions import get_audit_partition_manager
+from app.services.audit_rollups import HIGH_RISK_SCORE, get_audit_stats_rollups
+
+
+def encode_audit_cursor(created_at: datetime, log_id: int) -> str:
+    """Opaque pagination cursor for the (created_at, id) position of a log entry"""
+    raw = f"{created_at.isoformat()}|{log_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_audit_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_audit_cursor; raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, log_id = base64.urlsafe_b64decode(padded.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(log_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid audit log cursor: {cursor}") from e
 
 
 class AuditLogger:
@@ -33,6 +53,8 @@ class AuditLogger:
     def __init__(self):
         self.logger = logging.getLogger("capecontrol.audit")
         self.setup_logging()
+        self.writer = get_audit_event_writer()
+        self.rollups = get_audit_stats_rollups()
         
         # Risk assessment patterns
         self.suspicious_patterns = [
@@ -122,9 +144,17 @@ class AuditLogger:
                 **kwargs
             )
             
-            # Save to database
-            db.add(audit_log)
-            db.commit()
+            # Hand the row to the batched writer; the request path only enqueues.
+            # Critical events that do not fit the buffer, and callers without an
+            # event loop, are written synchronously as before.
+            row = audit_log_row(audit_log)
+            row["created_at"] = datetime.now(timezone.utc)
+            critical = event_level in (AuditLogLevel.ERROR, AuditLogLevel.CRITICAL) or event_category == "security"
+            if not self.writer.submit(db.get_bind(), row, critical=critical):
+                audit_log.created_at = row["created_at"]
+                db.add(audit_log)
+                db.commit()
+                self.rollups.record(db.get_bind(), [row])
             
             # Log to application logs as well
             log_message = f"AUDIT: {event_type.value} - User: {user_email or 'Anonymous'} - " \
@@ -270,6 +300,70 @@ class AuditLogger:
             data_sensitivity=data_sensitivity
         )
     
+    def query_audit_logs(self,
+                         db: Session,
+                         limit: int = 50,
+                         cursor: Optional[str] = None,
+                         offset: int = 0,
+                         event_category: Optional[str] = None,
+                         event_type: Optional[str] = None,
+                         user_id: Optional[str] = None,
+                         start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None,
+                         success: Optional[bool] = None,
+                         min_risk_score: Optional[int] = None) -> Tuple[List[AuditLog], Optional[str]]:
+        """
+        Get a page of audit logs, newest first, and the cursor for the next page
+        
+        Pages are ordered by (created_at, id) and continued with a keyset
+        predicate on that pair, so deep pages cost the same as the first one
+        instead of walking and discarding `offset` rows. `offset` is only
+        honoured when no cursor is given, for older clients.
+        """
+        source = get_audit_partition_manager().audit_log_entity(db, start_date, end_date)
+        query = db.query(source)
+        
+        if event_category:
+            query = query.filter(source.event_category == event_category)
+        
+        if event_type:
+            query = query.filter(source.event_type == event_type)
+        
+        if user_id:
+            query = query.filter(source.user_id == user_id)
+        
+        if start_date:
+            query = query.filter(source.created_at >= start_date)
+        
+        if end_date:
+            query = query.filter(source.created_at <= end_date)
+        
+        if success is not None:
+            query = query.filter(source.success == success)
+        
+        if min_risk_score is not None:
+            query = query.filter(source.risk_score >= min_risk_score)
+        
+        query = query.order_by(desc(source.created_at), desc(source.id))
+        
+        if cursor:
+            cursor_created_at, cursor_id = decode_audit_cursor(cursor)
+            query = query.filter(
+                tuple_(source.created_at, source.id) < tuple_(cursor_created_at, cursor_id)
+            )
+        elif offset:
+            query = query.offset(offset)
+        
+        # Fetch one extra row to know whether another page exists
+        logs = query.limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(logs) > limit:
+            logs = logs[:limit]
+            next_cursor = encode_audit_cursor(logs[-1].created_at, logs[-1].id)
+        
+        return logs, next_cursor
+    
     def get_user_activity(self,
                          db: Session,
                          user_id: str,
@@ -279,18 +373,19 @@ class AuditLogger:
         Get user activity logs for a specific time period
         """
         cutoff_date = datetime.utcnow() - timedelta(days=days)
+        source = get_audit_partition_manager().audit_log_entity(db, cutoff_date)
         
-        query = db.query(AuditLog).filter(
+        query = db.query(source).filter(
             and_(
-                AuditLog.user_id == user_id,
-                AuditLog.created_at >= cutoff_date
+                source.user_id == user_id,
+                source.created_at >= cutoff_date
             )
         )
         
         if event_categories:
-            query = query.filter(AuditLog.event_category.in_(event_categories))
+            query = query.filter(source.event_category.in_(event_categories))
         
-        return query.order_by(desc(AuditLog.created_at)).limit(1000).all()
+        return query.order_by(desc(source.created_at)).limit(1000).all()
     
     def get_security_events(self,
                            db: Session,
@@ -300,18 +395,19 @@ class AuditLogger:
         Get recent security events for monitoring
         """
         cutoff_date = datetime.utcnow() - timedelta(hours=hours)
+        source = get_audit_partition_manager().audit_log_entity(db, cutoff_date)
         
-        query = db.query(AuditLog).filter(
+        query = db.query(source).filter(
             and_(
-                AuditLog.event_category == "security",
-                AuditLog.created_at >= cutoff_date
+                source.event_category == "security",
+                source.created_at >= cutoff_date
             )
         )
         
         if severity_level:
-            query = query.filter(AuditLog.event_level == severity_level.value)
+            query = query.filter(source.event_level == severity_level.value)
         
-        return query.order_by(desc(AuditLog.created_at)).all()
+        return query.order_by(desc(source.created_at)).all()
     
     def get_failed_authentication_attempts(self,
                                          db: Session,
@@ -321,65 +417,83 @@ class AuditLogger:
         Get failed authentication attempts for brute force detection
         """
         cutoff_date = datetime.utcnow() - timedelta(hours=hours)
+        source = get_audit_partition_manager().audit_log_entity(db, cutoff_date)
         
         filters = [
-            AuditLog.event_category == "authentication",
-            AuditLog.success == False,
-            AuditLog.created_at >= cutoff_date
+            source.event_category == "authentication",
+            source.success == False,
+            source.created_at >= cutoff_date
         ]
         
         if ip_address:
-            filters.append(AuditLog.ip_address == ip_address)
+            filters.append(source.ip_address == ip_address)
         
-        return db.query(AuditLog).filter(and_(*filters)).all()
+        return db.query(source).filter(and_(*filters)).all()
+    
+    def get_audit_log(self, db: Session, log_id: int) -> Optional[AuditLog]:
+        """
+        Get one audit log by ID, wherever retention has moved it
+        """
+        source = get_audit_partition_manager().audit_log_entity(db)
+        return db.query(source).filter(source.id == log_id).first()
+    
+    def delete_audit_log(self, db: Session, log: AuditLog):
+        """
+        Delete one audit log from the table that holds it; the caller commits
+        """
+        get_audit_partition_manager().delete_audit_log(db, log)
     
     def get_audit_statistics(self, db: Session, days: int = 7) -> Dict[str, Any]:
         """
         Get audit statistics for dashboard and monitoring
-        """
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
         
-        # Total events
-        total_events = db.query(func.count(AuditLog.id)).filter(
-            AuditLog.created_at >= cutoff_date
-        ).scalar()
-        
-        # Events by category
-        category_stats = db.query(
-            AuditLog.event_category,
-            func.count(AuditLog.id).label('count')
-        ).filter(
-            AuditLog.created_at >= cutoff_date
-        ).group_by(AuditLog.event_category).all()
-        
-        # Failed events
-        failed_events = db.query(func.count(AuditLog.id)).filter(
-            and_(
-                AuditLog.created_at >= cutoff_date,
-                AuditLog.success == False
-            )
-        ).scalar()
+        Answered from the hourly/daily rollups, so the cost depends on the
+        number of buckets rather than the number of events. Top users come
+        from a top-K sketch and are exact while a bucket has fewer than
+        AUDIT_STATS_TOPK_CAPACITY users.
+        """
+        return self.rollups.get_statistics(db, days=days)
+    
+    def scan_audit_statistics(self, db: Session, days: int = 7) -> Dict[str, Any]:
+        """
+        Compute audit statistics from raw rows
         
-        # High-risk events
-        high_risk_events = db.query(func.count(AuditLog.id)).filter(
-            and_(
-                AuditLog.created_at >= cutoff_date,
-                AuditLog.risk_score >= 70
-            )
-        ).scalar()
+        Totals, failures and high-risk counts come from one pass over the
+        window, grouped by category; only partitions overlapping the window
+        are read. Used to verify the rollups.
+        """
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        source = get_audit_partition_manager().audit_log_source(db, cutoff_date)
+        
+        category_stats = db.execute(
+            select(
+                source.c.event_category,
+                func.count().label('total'),
+                func.sum(case((source.c.success == False, 1), else_=0)).label('failed'),
+                func.sum(case((source.c.risk_score >= HIGH_RISK_SCORE, 1), else_=0)).label('high_risk')
+            ).where(
+                source.c.created_at >= cutoff_date
+            ).group_by(source.c.event_category)
+        ).all()
+        
+        total_events = sum(row.total for row in category_stats)
+        failed_events = sum(row.failed or 0 for row in category_stats)
+        high_risk_events = sum(row.high_risk or 0 for row in category_stats)
         
         # Top users by activity
-        top_users = db.query(
-            AuditLog.user_email,
-            func.count(AuditLog.id).label('event_count')
-        ).filter(
-            and_(
-                AuditLog.created_at >= cutoff_date,
-                AuditLog.user_email.isnot(None)
-            )
-        ).group_by(AuditLog.user_email).order_by(
-            desc('event_count')
-        ).limit(10).all()
+        top_users = db.execute(
+            select(
+                source.c.user_email,
+                func.count().label('event_count')
+            ).where(
+                and_(
+                    source.c.created_at >= cutoff_date,
+                    source.c.user_email.isnot(None)
+                )
+            ).group_by(source.c.user_email).order_by(
+                desc('event_count'), source.c.user_email
+            ).limit(10)
+        ).all()
         
         return {
             "period_days": days,
@@ -387,7 +501,7 @@ class AuditLogger:
             "failed_events": failed_events,
             "high_risk_events": high_risk_events,
             "success_rate": round((total_events - failed_events) / max(total_events, 1) * 100, 2),
-            "events_by_category": {cat: count for cat, count in category_stats},
+            "events_by_category": {row.event_category: row.total for row in category_stats},
             "top_users": [{"email": email, "event_count": count} for email, count in top_users]
         }
     
@@ -0,0 +1,280 @@
+"""
+Batched audit event writer
+==========================
+
+Takes audit rows off the request path: callers only append to a bounded
+in-process buffer and a background task bulk-inserts them every
+AUDIT_WRITER_FLUSH_INTERVAL_MS or once AUDIT_WRITER_BATCH_SIZE rows are
+waiting. Postgres gets a single COPY per batch, other databases a
+multi-row INSERT. Each written batch is then folded into the statistics
+rollups (see audit_rollups.py).
+
+When the buffer is full, routine events are dropped and counted while
+critical ones are handed back to the caller to write synchronously, so
+bursts cannot grow memory without bound nor silently lose security events.
+The buffer is drained on shutdown.
+"""
+
+import asyncio
+import io
+import json
+import os
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app.models.audit_log import AuditLog
+from app.services.audit_rollups import get_audit_stats_rollups
+
+logger = logging.getLogger(__name__)
+
+AUDIT_ASYNC_WRITES = os.getenv("AUDIT_ASYNC_WRITES", "true").lower() in ("1", "true", "yes")
+AUDIT_WRITER_BATCH_SIZE = int(os.getenv("AUDIT_WRITER_BATCH_SIZE", "500"))
+AUDIT_WRITER_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_WRITER_FLUSH_INTERVAL_MS", "200"))
+AUDIT_WRITER_MAX_BUFFER = int(os.getenv("AUDIT_WRITER_MAX_BUFFER", "10000"))
+
+
+def audit_log_row(audit_log: AuditLog) -> Dict[str, Any]:
+    """Column values of an unsaved AuditLog, ready for a bulk insert"""
+    return {
+        column.name: getattr(audit_log, column.name)
+        for column in AuditLog.__table__.columns
+        if column.name != "id"
+    }
+
+
+def _copy_value(value: Any) -> str:
+    """A field in COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=str)
+    elif isinstance(value, bool):
+        value = "t" if value else "f"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class AuditEventWriter:
+    """
+    Bounded buffer of audit rows with a background bulk-insert flusher.
+
+    Rows are grouped by the engine of the session that produced them, so
+    callers keep writing to whatever database their session points at.
+    """
+
+    def __init__(self,
+                 batch_size: int = AUDIT_WRITER_BATCH_SIZE,
+                 flush_interval_ms: int = AUDIT_WRITER_FLUSH_INTERVAL_MS,
+                 max_buffer: int = AUDIT_WRITER_MAX_BUFFER,
+                 enabled: bool = AUDIT_ASYNC_WRITES):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_buffer = max_buffer
+        self.enabled = enabled
+        self.rollups = get_audit_stats_rollups()
+
+        self._buffer: "deque[Tuple[Engine, Dict[str, Any]]]" = deque()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.sync_writes = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.max_queue_depth = 0
+        self.flush_ms = deque(maxlen=1000)
+
+    def submit(self, bind: Any, row: Dict[str, Any], critical: bool = False) -> bool:
+        """
+        Buffer a row for the background flusher.
+
+        Returns False when the caller should write the event itself: async
+        writes are disabled, no event loop is available, the session is not
+        bound to an Engine, or the buffer is full and the event is critical.
+        Routine events that do not fit are dropped and counted.
+        """
+        if not self.enabled or not isinstance(bind, Engine) or not self._ensure_started():
+            self.sync_writes += 1
+            return False
+
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                if critical:
+                    self.sync_writes += 1
+                    return False
+                self.dropped += 1
+                return True
+            self._buffer.append((bind, row))
+            self.enqueued += 1
+            depth = len(self._buffer)
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+        if depth >= self.batch_size:
+            self._wake()
+        return True
+
+    def _ensure_started(self) -> bool:
+        """Start the flusher on the running loop; worker threads reuse an existing one"""
+        if self._task is not None and not self._task.done() and not self._loop.is_closed():
+            return True
+        if self._closing:
+            return False
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+        return True
+
+    def _wake(self):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if self._closing and not self._buffer:
+                break
+
+    async def flush(self):
+        """Write everything currently buffered, batch_size rows per statement"""
+        async with self._flush_lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                with self._lock:
+                    if not self._buffer:
+                        return
+                    taken = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+
+                by_engine: Dict[Engine, List[Dict[str, Any]]] = {}
+                for bind, row in taken:
+                    by_engine.setdefault(bind, []).append(row)
+
+                failed = False
+                for bind, rows in by_engine.items():
+                    if failed:
+                        self._requeue(bind, rows)
+                        continue
+                    started = time.perf_counter()
+                    try:
+                        await loop.run_in_executor(None, self._write_batch, bind, rows)
+                    except Exception as e:
+                        logger.error(f"Failed to flush {len(rows)} audit events: {e}")
+                        self.failed_flushes += 1
+                        self._requeue(bind, rows)
+                        failed = True
+                        continue
+                    self.written += len(rows)
+                    self.flushes += 1
+                    self.flush_ms.append((time.perf_counter() - started) * 1000)
+
+                # Retry on the next tick rather than spinning on a failing database
+                if failed:
+                    return
+
+    def _requeue(self, bind: Engine, rows: List[Dict[str, Any]]):
+        """Put a failed batch back at the front; whatever no longer fits is dropped"""
+        with self._lock:
+            room = max(0, self.max_buffer - len(self._buffer))
+            kept = rows[:room]
+            self._buffer.extendleft((bind, row) for row in reversed(kept))
+            self.dropped += len(rows) - len(kept)
+
+    def _write_batch(self, bind: Engine, rows: List[Dict[str, Any]]):
+        with bind.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                self._copy_rows(conn, rows)
+            else:
+                conn.execute(insert(AuditLog.__table__), rows)
+        self.rollups.record(bind, rows)
+
+    def _copy_rows(self, conn, rows: List[Dict[str, Any]]):
+        """COPY ... FROM STDIN (text format) within the connection's transaction"""
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_value(row[column]) for column in columns))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {AuditLog.__tablename__} ({', '.join(columns)}) FROM STDIN",
+                buffer
+            )
+        finally:
+            cursor.close()
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop accepting events and drain the buffer"""
+        self._closing = True
+        if self._task is not None and not self._task.done() and self._loop is asyncio.get_running_loop():
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Audit writer did not drain within {timeout}s; {len(self._buffer)} events lost")
+                self._task.cancel()
+        self._closing = False
+
+    def get_metrics(self) -> Dict[str, Any]:
+        flush_ms = sorted(self.flush_ms)
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None and not self._task.done(),
+            "batch_size": self.batch_size,
+            "flush_interval_ms": int(self.flush_interval * 1000),
+            "max_buffer": self.max_buffer,
+            "queue_depth": len(self._buffer),
+            "max_queue_depth": self.max_queue_depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sync_writes": self.sync_writes,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "rollup_failures": self.rollups.failures,
+            "p95_flush_ms": round(flush_ms[int(len(flush_ms) * 0.95)], 2) if flush_ms else None,
+        }
+
+
+# Global audit writer instance
+audit_event_writer = AuditEventWriter()
+
+
+def get_audit_event_writer() -> AuditEventWriter:
+    """Get the global audit event writer"""
+    return audit_event_writer
@@ -26,6 +26,63 @@ from app.config import settings
 logger = logging.getLogger(__name__)
 
 
+# Loads the newest message IDs, conversation metadata (hash or legacy JSON
+# string) and, when the caller already knows the owner, their preferences.
+# Every key it touches is passed in KEYS; message bodies live under keys
+# derived from the IDs, so they are fetched by the caller afterwards.
+# KEYS[1] = conversation message list, KEYS[2] = conversation metadata,
+# KEYS[3] = owner's preferences (optional)
+# ARGV[1] = max messages
+CONTEXT_LOAD_SCRIPT = """
+local ids = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+local metadata = false
+local metadata_type = redis.call('TYPE', KEYS[2])['ok']
+if metadata_type == 'hash' then
+    local fields = redis.call('HGETALL', KEYS[2])
+    local decoded = {}
+    for i = 1, #fields, 2 do
+        decoded[fields[i]] = fields[i + 1]
+    end
+    metadata = cjson.encode(decoded)
+elseif metadata_type == 'string' then
+    metadata = redis.call('GET', KEYS[2])
+end
+local preferences = false
+if KEYS[3] then
+    preferences = redis.call('GET', KEYS[3])
+end
+return {ids, metadata, preferences}
+"""
+
+
+# Appends a message, trims the conversation list and updates the metadata
+# hash atomically. Legacy JSON-string metadata is converted to a hash.
+# KEYS[1] = message, KEYS[2] = conversation message list, KEYS[3] = metadata
+# ARGV: message ID, message JSON, TTL, max messages, timestamp, user ID, tokens
+MESSAGE_APPEND_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('LPUSH', KEYS[2], ARGV[1])
+redis.call('LTRIM', KEYS[2], 0, tonumber(ARGV[4]) - 1)
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if redis.call('TYPE', KEYS[3])['ok'] == 'string' then
+    local ok, legacy = pcall(cjson.decode, redis.call('GET', KEYS[3]))
+    redis.call('DEL', KEYS[3])
+    if ok and type(legacy) == 'table' then
+        for field, value in pairs(legacy) do
+            if type(value) == 'string' or type(value) == 'number' then
+                redis.call('HSET', KEYS[3], field, value)
+            end
+        end
+    end
+end
+redis.call('HSETNX', KEYS[3], 'created_at', ARGV[5])
+redis.call('HSET', KEYS[3], 'updated_at', ARGV[5], 'user_id', ARGV[6])
+local total_tokens = redis.call('HINCRBY', KEYS[3], 'total_tokens', tonumber(ARGV[7]))
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+return total_tokens
+"""
+
+
 class ContextType(str, Enum):
     """Types of context information"""
     USER_MESSAGE = "user_message"
@@ -139,6 +196,8 @@ class ConversationContextService:
         self.conversation_ttl = 86400 * 30  # 30 days
         self.context_cache_ttl = 3600  # 1 hour
         self.max_context_messages = 50  # Maximum messages to keep in active context
+        self._context_load_script = None
+        self._message_append_script = None
         
     async def initialize(self):
         """Initialize Redis connection"""
@@ -206,22 +265,7 @@ class ConversationContextService:
         # Store message
         if self.redis_client:
             try:
-                # Store individual message
-                message_key = f"message:{message_id}"
-                await self.redis_client.setex(
-                    message_key,
-                    self.conversation_ttl,
-                    json.dumps(message.to_dict(), default=str)
-                )
-                
-                # Add to conversation message list
-                conversation_key = f"conversation:{conversation_id}:messages"
-                await self.redis_client.lpush(conversation_key, message_id)
-                await self.redis_client.expire(conversation_key, self.conversation_ttl)
-                
-                # Update conversation metadata
-                await self._update_conversation_metadata(conversation_id, user_id, tokens_used)
-                
+                await self._store_message(message, tokens_used)
                 logger.debug(f"Added message {message_id} to conversation {conversation_id}")
                 
             except Exception as e:
@@ -229,6 +273,46 @@ class ConversationContextService:
         
         return message
     
+    async def _store_message(
+        self,
+        message: ConversationMessage,
+        tokens_used: Optional[Dict[str, int]] = None
+    ):
+        """Append a message and update conversation metadata in one atomic round-trip"""
+        
+        message_key = f"message:{message.message_id}"
+        conversation_key = f"conversation:{message.conversation_id}:messages"
+        metadata_key = f"conversation:{message.conversation_id}:metadata"
+        message_data = json.dumps(message.to_dict(), default=str)
+        new_tokens = (tokens_used or {}).get('total_tokens', 0) or 0
+        now = datetime.now().isoformat()
+        
+        try:
+            if self._message_append_script is None:
+                self._message_append_script = self.redis_client.register_script(MESSAGE_APPEND_SCRIPT)
+            
+            await self._message_append_script(
+                keys=[message_key, conversation_key, metadata_key],
+                args=[
+                    message.message_id, message_data, self.conversation_ttl,
+                    self.max_context_messages, now, message.user_id, new_tokens
+                ]
+            )
+            
+        except redis.ResponseError as e:
+            # Scripting disabled or unsupported - same writes as a MULTI/EXEC block
+            logger.warning(f"Message append script unavailable, using transactional fallback: {e}")
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.setex(message_key, self.conversation_ttl, message_data)
+                pipe.lpush(conversation_key, message.message_id)
+                pipe.ltrim(conversation_key, 0, self.max_context_messages - 1)
+                pipe.expire(conversation_key, self.conversation_ttl)
+                pipe.hsetnx(metadata_key, 'created_at', now)
+                pipe.hset(metadata_key, mapping={'updated_at': now, 'user_id': message.user_id})
+                pipe.hincrby(metadata_key, 'total_tokens', new_tokens)
+                pipe.expire(metadata_key, self.conversation_ttl)
+                await pipe.execute()
+    
     async def get_conversation_context(
         self,
         conversation_id: str,
@@ -241,19 +325,16 @@ class ConversationContextService:
             return None
         
         try:
-            # Get message IDs from conversation
-            conversation_key = f"conversation:{conversation_id}:messages"
-            message_ids = await self.redis_client.lrange(conversation_key, 0, max_messages or self.max_context_messages)
+            message_ids, raw_messages, metadata_data, preferences_user_id, preferences_data = (
+                await self._load_context_payload(conversation_id, max_messages or self.max_context_messages)
+            )
             
             if not message_ids:
                 return None
             
-            # Retrieve messages
+            # Decode messages (LRANGE returns newest first)
             messages = []
-            for message_id in reversed(message_ids):  # Reverse to get chronological order
-                message_key = f"message:{message_id}"
-                message_data = await self.redis_client.get(message_key)
-                
+            for message_data in reversed(raw_messages):
                 if message_data:
                     message_dict = json.loads(message_data)
                     message = ConversationMessage.from_dict(message_dict)
@@ -262,14 +343,15 @@ class ConversationContextService:
             if not messages:
                 return None
             
-            # Get conversation metadata
-            metadata_key = f"conversation:{conversation_id}:metadata"
-            metadata_data = await self.redis_client.get(metadata_key)
-            conversation_metadata = json.loads(metadata_data) if metadata_data else {}
+            conversation_metadata = self._decode_conversation_metadata(metadata_data)
             
-            # Get user preferences
+            # Preferences were loaded alongside the messages when the owner was
+            # known from metadata; otherwise fall back to a separate lookup
             user_id = messages[0].user_id if messages else ""
-            user_preferences = await self.get_user_preferences(user_id)
+            if preferences_user_id == user_id:
+                user_preferences = self._decode_user_preferences(preferences_data)
+            else:
+                user_preferences = await self.get_user_preferences(user_id)
             
             # Create context object
             context = ConversationContext(
@@ -291,6 +373,92 @@ class ConversationContextService:
             logger.error(f"Failed to retrieve conversation context: {e}")
             return None
     
+    async def _load_context_payload(
+        self,
+        conversation_id: str,
+        max_messages: int,
+        user_id: str = ""
+    ) -> Tuple[List[str], List[Optional[str]], Optional[str], str, Optional[str]]:
+        """Fetch message IDs, message payloads, metadata and preferences in two round-trips"""
+        
+        conversation_key = f"conversation:{conversation_id}:messages"
+        metadata_key = f"conversation:{conversation_id}:metadata"
+        keys = [conversation_key, metadata_key]
+        if user_id:
+            keys.append(f"user:{user_id}:preferences")
+        
+        try:
+            if self._context_load_script is None:
+                self._context_load_script = self.redis_client.register_script(CONTEXT_LOAD_SCRIPT)
+            
+            message_ids, metadata_data, preferences_data = await self._context_load_script(
+                keys=keys, args=[max_messages]
+            )
+            
+        except redis.ResponseError as e:
+            # Scripting disabled or unsupported (e.g. some managed Redis tiers)
+            logger.warning(f"Context load script unavailable, using pipelined fallback: {e}")
+            return await self._load_context_pipelined(conversation_key, metadata_key, max_messages, user_id)
+        
+        return await self._load_messages_and_preferences(
+            message_ids, metadata_data, user_id, preferences_data if user_id else None
+        )
+    
+    async def _load_context_pipelined(
+        self,
+        conversation_key: str,
+        metadata_key: str,
+        max_messages: int,
+        user_id: str = ""
+    ) -> Tuple[List[str], List[Optional[str]], Optional[str], str, Optional[str]]:
+        """Same reads for servers without Lua scripting"""
+        
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.lrange(conversation_key, 0, max_messages - 1)
+            pipe.hgetall(metadata_key)
+            message_ids, metadata_fields = await pipe.execute(raise_on_error=False)
+        
+        if isinstance(metadata_fields, Exception):
+            # Legacy JSON-string metadata written before the hash layout
+            metadata_data = await self.redis_client.get(metadata_key)
+        else:
+            metadata_data = json.dumps(metadata_fields) if metadata_fields else None
+        
+        return await self._load_messages_and_preferences(message_ids, metadata_data, user_id)
+    
+    async def _load_messages_and_preferences(
+        self,
+        message_ids: List[str],
+        metadata_data: Optional[str],
+        user_id: str,
+        preferences_data: Optional[str] = None
+    ) -> Tuple[List[str], List[Optional[str]], Optional[str], str, Optional[str]]:
+        """
+        Second round-trip: message bodies, plus the owner's preferences when
+        the owner was only known after reading the metadata
+        """
+        
+        fetch_preferences = False
+        if not user_id:
+            user_id = self._decode_conversation_metadata(metadata_data).get('user_id') or ""
+            fetch_preferences = bool(user_id)
+        
+        if not message_ids and not fetch_preferences:
+            return message_ids, [], metadata_data, user_id, preferences_data
+        
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            if message_ids:
+                pipe.mget([f"message:{message_id}" for message_id in message_ids])
+            if fetch_preferences:
+                pipe.get(f"user:{user_id}:preferences")
+            results = await pipe.execute()
+        
+        raw_messages = results.pop(0) if message_ids else []
+        if fetch_preferences:
+            preferences_data = results.pop(0)
+        
+        return message_ids, raw_messages, metadata_data, user_id, preferences_data
+    
     async def get_user_preferences(self, user_id: str) -> Dict[str, Any]:
         """Get user preferences for context-aware responses"""
         
@@ -301,24 +469,29 @@ class ConversationContextService:
             preferences_key = f"user:{user_id}:preferences"
             preferences_data = await self.redis_client.get(preferences_key)
             
-            if preferences_data:
-                return json.loads(preferences_data)
-            
-            # Return default preferences
-            return {
-                'preferred_ai_provider': None,
-                'preferred_ai_model': None,
-                'communication_style': 'professional',
-                'detail_level': 'moderate',
-                'language': 'en',
-                'topics_of_interest': [],
-                'response_length_preference': 'moderate'
-            }
+            return self._decode_user_preferences(preferences_data)
             
         except Exception as e:
             logger.error(f"Failed to retrieve user preferences: {e}")
             return {}
     
+    def _decode_user_preferences(self, preferences_data: Optional[str]) -> Dict[str, Any]:
+        """Decode stored preferences, falling back to defaults"""
+        
+        if preferences_data:
+            return json.loads(preferences_data)
+        
+        # Return default preferences
+        return {
+            'preferred_ai_provider': None,
+            'preferred_ai_model': None,
+            'communication_style': 'professional',
+            'detail_level': 'moderate',
+            'language': 'en',
+            'topics_of_interest': [],
+            'response_length_preference': 'moderate'
+        }
+    
     async def update_user_preferences(
         self,
         user_id: str,
@@ -378,47 +551,28 @@ class ConversationContextService:
         
         return ai_context, context_metadata
     
-    async def _update_conversation_metadata(
-        self,
-        conversation_id: str,
-        user_id: str,
-        tokens_used: Optional[Dict[str, int]] = None
-    ):
-        """Update conversation metadata"""
+    def _decode_conversation_metadata(self, metadata_data: Optional[str]) -> Dict[str, Any]:
+        """Decode conversation metadata, normalizing hash-stored counters"""
         
-        if not self.redis_client:
-            return
+        if not metadata_data:
+            return {}
         
         try:
-            metadata_key = f"conversation:{conversation_id}:metadata"
-            
-            # Get existing metadata
-            existing_data = await self.redis_client.get(metadata_key)
-            metadata = json.loads(existing_data) if existing_data else {}
-            
-            # Update metadata
-            now = datetime.now().isoformat()
-            if 'created_at' not in metadata:
-                metadata['created_at'] = now
-            
-            metadata['updated_at'] = now
-            metadata['user_id'] = user_id
-            
-            # Update token counts
-            if tokens_used:
-                current_tokens = metadata.get('total_tokens', 0)
-                new_tokens = tokens_used.get('total_tokens', 0)
-                metadata['total_tokens'] = current_tokens + new_tokens
-            
-            # Store updated metadata
-            await self.redis_client.setex(
-                metadata_key,
-                self.conversation_ttl,
-                json.dumps(metadata)
-            )
-            
-        except Exception as e:
-            logger.error(f"Failed to update conversation metadata: {e}")
+            metadata = json.loads(metadata_data)
+        except ValueError:
+            return {}
+        
+        if not isinstance(metadata, dict):
+            return {}
+        
+        # Hash fields come back as strings
+        if 'total_tokens' in metadata:
+            try:
+                metadata['total_tokens'] = int(metadata['total_tokens'])
+            except (TypeError, ValueError):
+                metadata['total_tokens'] = 0
+        
+        return metadata
     
     async def cleanup_old_conversations(self, days_old: int = 30):
         """Clean up old conversations (maintenance task)"""
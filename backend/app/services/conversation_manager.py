@@ -16,12 +16,16 @@ from dataclasses import dataclass, asdict, field
 from enum import Enum
 from datetime import datetime, timedelta
 import hashlib
+import heapq
+import math
 import re
 
 # Vector similarity imports
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.utils import murmurhash3_32
 
 logger = logging.getLogger(__name__)
 
@@ -201,12 +205,412 @@ class ConversationAnalytics:
             'generated_at': self.generated_at.isoformat()
         }
 
+class ConversationVectorIndex:
+    """
+    Incremental vector store used for semantic auto-threading.
+    
+    Messages are embedded once with feature hashing, so nothing is refitted as
+    the conversation grows. Vectors are kept as sparse {feature: weight} rows;
+    each thread keeps the running sum of its members' rows and its squared
+    norm, so a new message is scored against every thread centroid with one
+    sparse dot product per thread.
+    
+    The index also maintains raw term counts for the whole conversation,
+    which ConversationManager uses for cross-conversation similarity.
+    """
+    
+    def __init__(self, n_features: int = 2 ** 18):
+        self.n_features = n_features
+        self.analyzer = HashingVectorizer(stop_words='english').build_analyzer()
+        self.message_vectors: Dict[str, Dict[int, float]] = {}
+        self.message_norms: Dict[str, float] = {}
+        self.message_threads: Dict[str, str] = {}
+        self.thread_sums: Dict[str, Dict[int, float]] = {}
+        self.thread_sq_norms: Dict[str, float] = {}
+        
+        # Conversation-wide raw term counts, bumped on every content change
+        self.term_counts: Dict[int, float] = {}
+        self.version = 0
+    
+    def count_terms(self, content: str) -> Dict[int, float]:
+        """Hash content into sparse raw term counts"""
+        counts: Dict[int, float] = {}
+        for token in self.analyzer(content):
+            feature = murmurhash3_32(token, positive=True) % self.n_features
+            counts[feature] = counts.get(feature, 0.0) + 1.0
+        return counts
+    
+    def add_message(self, message_id: str, content: str) -> Dict[int, float]:
+        """Embed a message and cache its L2-normalized vector"""
+        counts = self.count_terms(content)
+        norm = sum(value * value for value in counts.values()) ** 0.5
+        vector = {feature: value / norm for feature, value in counts.items()} if norm else {}
+        
+        self.message_vectors[message_id] = vector
+        self.message_norms[message_id] = norm
+        self._add_term_counts(vector, norm)
+        return vector
+    
+    def update_message(self, message_id: str, content: str):
+        """Re-embed an edited message, keeping its thread centroid in sync"""
+        thread_id = self.message_threads.get(message_id)
+        self.remove_message(message_id)
+        self.add_message(message_id, content)
+        if thread_id:
+            self.assign(message_id, thread_id)
+    
+    def remove_message(self, message_id: str):
+        """Drop a message vector and its contribution to its thread"""
+        thread_id = self.message_threads.pop(message_id, None)
+        vector = self.message_vectors.pop(message_id, None)
+        norm = self.message_norms.pop(message_id, 0.0)
+        if thread_id:
+            self._accumulate(thread_id, vector, -1.0)
+        if vector:
+            self._add_term_counts(vector, -norm)
+    
+    def assign(self, message_id: str, thread_id: str):
+        """Assign a message to a thread, moving it out of any previous thread"""
+        vector = self.message_vectors.get(message_id)
+        if vector is None:
+            return
+        
+        previous_thread_id = self.message_threads.get(message_id)
+        if previous_thread_id == thread_id:
+            return
+        if previous_thread_id:
+            self._accumulate(previous_thread_id, vector, -1.0)
+        
+        self.message_threads[message_id] = thread_id
+        self._accumulate(thread_id, vector, 1.0)
+    
+    def merge_threads(self, source_thread_id: str, target_thread_id: str):
+        """Fold one thread's members and centroid into another"""
+        for message_id, thread_id in self.message_threads.items():
+            if thread_id == source_thread_id:
+                self.message_threads[message_id] = target_thread_id
+        
+        source = self.thread_sums.pop(source_thread_id, None)
+        self.thread_sq_norms.pop(source_thread_id, None)
+        if source:
+            self._accumulate(target_thread_id, source, 1.0)
+    
+    def remove_thread(self, thread_id: str):
+        """Forget a thread centroid"""
+        self.thread_sums.pop(thread_id, None)
+        self.thread_sq_norms.pop(thread_id, None)
+        for message_id in [m for m, t in self.message_threads.items() if t == thread_id]:
+            del self.message_threads[message_id]
+    
+    def most_similar_thread(self, message_id: str) -> Tuple[Optional[str], float]:
+        """Return the thread whose centroid is closest to the message, with its cosine score"""
+        vector = self.message_vectors.get(message_id)
+        if not vector:
+            return None, 0.0
+        
+        best_thread_id, best_score = None, 0.0
+        for thread_id, centroid in self.thread_sums.items():
+            sq_norm = self.thread_sq_norms.get(thread_id, 0.0)
+            if sq_norm <= 0.0:
+                continue
+            dot = sum(weight * centroid.get(feature, 0.0) for feature, weight in vector.items())
+            score = dot / sq_norm ** 0.5
+            if score > best_score:
+                best_thread_id, best_score = thread_id, score
+        
+        return best_thread_id, best_score
+    
+    def _add_term_counts(self, vector: Dict[int, float], scale: float):
+        """Fold a message's raw counts (vector * norm) into the conversation totals"""
+        for feature, weight in vector.items():
+            updated = self.term_counts.get(feature, 0.0) + weight * scale
+            if updated < 0.5:  # counts are whole numbers; anything below is float residue
+                self.term_counts.pop(feature, None)
+            else:
+                self.term_counts[feature] = updated
+        self.version += 1
+    
+    def _accumulate(self, thread_id: str, vector: Optional[Dict[int, float]], sign: float):
+        """Add (or subtract) a vector into a thread sum, updating its squared norm"""
+        if not vector:
+            return
+        
+        centroid = self.thread_sums.setdefault(thread_id, {})
+        sq_norm = self.thread_sq_norms.get(thread_id, 0.0)
+        for feature, weight in vector.items():
+            previous = centroid.get(feature, 0.0)
+            updated = previous + sign * weight
+            sq_norm += updated * updated - previous * previous
+            if abs(updated) < 1e-12:
+                centroid.pop(feature, None)
+            else:
+                centroid[feature] = updated
+        self.thread_sq_norms[thread_id] = max(0.0, sq_norm)
+
+
+class UserCorpusIndex:
+    """
+    Per-user TF-IDF matrix over conversation contents for similarity search.
+    
+    Rows are cached per conversation as (features, counts) arrays and only
+    re-read when the conversation's vector index version changes, so the
+    matrix is rebuilt from cached arrays rather than refitted. A lookup is a
+    single sparse matrix-vector product plus vectorized tag and type terms.
+    """
+    
+    def __init__(self, n_features: int = 2 ** 18):
+        self.n_features = n_features
+        self.rows: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.versions: Dict[str, int] = {}
+        self.conversation_ids: List[str] = []
+        self.row_positions: Dict[str, int] = {}
+        self._matrix: Optional[sparse.csr_matrix] = None
+    
+    def sync(self, conversations: List['EnhancedConversation']):
+        """Refresh rows for conversations whose content changed since the last build"""
+        dirty = False
+        live_ids = set()
+        
+        for conversation in conversations:
+            conv_id = conversation.conversation_id
+            live_ids.add(conv_id)
+            version = conversation.vector_index.version
+            if self.versions.get(conv_id) == version:
+                continue
+            
+            counts = conversation.vector_index.term_counts
+            features = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+            self.rows[conv_id] = (features, values)
+            self.versions[conv_id] = version
+            dirty = True
+        
+        for conv_id in [c for c in self.rows if c not in live_ids]:
+            del self.rows[conv_id]
+            del self.versions[conv_id]
+            dirty = True
+        
+        if dirty or self._matrix is None:
+            self._rebuild()
+    
+    def content_similarities(self, conversation_id: str) -> np.ndarray:
+        """Cosine similarity of one conversation's TF-IDF row against every row"""
+        position = self.row_positions.get(conversation_id)
+        if position is None or self._matrix is None:
+            return np.zeros(len(self.conversation_ids))
+        
+        return (self._matrix @ self._matrix[position].T).toarray().ravel()
+    
+    def _rebuild(self):
+        self.conversation_ids = list(self.rows.keys())
+        self.row_positions = {conv_id: i for i, conv_id in enumerate(self.conversation_ids)}
+        
+        if not self.conversation_ids:
+            self._matrix = None
+            return
+        
+        lengths = [len(self.rows[conv_id][0]) for conv_id in self.conversation_ids]
+        indptr = np.concatenate(([0], np.cumsum(lengths)))
+        features = np.concatenate([self.rows[conv_id][0] for conv_id in self.conversation_ids])
+        values = np.concatenate([self.rows[conv_id][1] for conv_id in self.conversation_ids])
+        counts = sparse.csr_matrix(
+            (values, features, indptr),
+            shape=(len(self.conversation_ids), self.n_features)
+        )
+        
+        # Smoothed IDF over this user's conversations, then L2-normalize rows
+        document_frequency = np.bincount(features, minlength=self.n_features)
+        idf = np.log((1 + len(self.conversation_ids)) / (1 + document_frequency)) + 1.0
+        weighted = counts.multiply(idf).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        self._matrix = sparse.diags(1.0 / norms) @ weighted
+
+
+class MessageSearchIndex:
+    """
+    Token-level inverted index over conversation messages.
+    
+    Postings map term -> conversation_id -> message_id -> token positions, so a
+    query only touches messages containing its rarest term. Supports implicit
+    AND across terms, quoted phrase queries and BM25 ranking. The indexed
+    message objects are kept so role, thread and date filters read current
+    values without rescanning conversations.
+    """
+    
+    TOKEN_PATTERN = re.compile(r"\w+")
+    PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, Dict[str, List[int]]]] = {}
+        self.document_frequency: Dict[str, int] = {}
+        self.documents: Dict[Tuple[str, str], ConversationMessage] = {}
+        self.document_terms: Dict[Tuple[str, str], List[str]] = {}
+        self.document_lengths: Dict[Tuple[str, str], int] = {}
+        self.conversation_messages: Dict[str, set] = {}
+        self.total_length = 0
+    
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        """Lower-case word tokens"""
+        return cls.TOKEN_PATTERN.findall(text.lower())
+    
+    def add_message(self, message: ConversationMessage):
+        """Index a message's content"""
+        key = (message.conversation_id, message.message_id)
+        if key in self.documents:
+            self.remove_message(*key)
+        
+        tokens = self.tokenize(message.content)
+        positions: Dict[str, List[int]] = {}
+        for position, token in enumerate(tokens):
+            positions.setdefault(token, []).append(position)
+        
+        for term, term_positions in positions.items():
+            self.postings.setdefault(term, {}).setdefault(message.conversation_id, {})[message.message_id] = term_positions
+            self.document_frequency[term] = self.document_frequency.get(term, 0) + 1
+        
+        self.documents[key] = message
+        self.document_terms[key] = list(positions.keys())
+        self.document_lengths[key] = len(tokens)
+        self.conversation_messages.setdefault(message.conversation_id, set()).add(message.message_id)
+        self.total_length += len(tokens)
+    
+    def update_message(self, message: ConversationMessage):
+        """Re-index a message after its content changed"""
+        self.add_message(message)
+    
+    def remove_message(self, conversation_id: str, message_id: str):
+        """Remove a message from the index"""
+        key = (conversation_id, message_id)
+        if key not in self.documents:
+            return
+        
+        for term in self.document_terms.pop(key):
+            conversations = self.postings[term]
+            messages = conversations[conversation_id]
+            del messages[message_id]
+            if not messages:
+                del conversations[conversation_id]
+            if not conversations:
+                del self.postings[term]
+            self.document_frequency[term] -= 1
+            if not self.document_frequency[term]:
+                del self.document_frequency[term]
+        
+        del self.documents[key]
+        self.total_length -= self.document_lengths.pop(key)
+        message_ids = self.conversation_messages.get(conversation_id)
+        if message_ids is not None:
+            message_ids.discard(message_id)
+            if not message_ids:
+                del self.conversation_messages[conversation_id]
+    
+    def remove_conversation(self, conversation_id: str):
+        """Remove every message of a conversation from the index"""
+        for message_id in list(self.conversation_messages.get(conversation_id, ())):
+            self.remove_message(conversation_id, message_id)
+    
+    def parse_query(self, query: str) -> Tuple[List[str], List[List[str]]]:
+        """Split a query into required terms and quoted phrases"""
+        phrases = [self.tokenize(phrase) for phrase in self.PHRASE_PATTERN.findall(query)]
+        phrases = [phrase for phrase in phrases if phrase]
+        
+        terms = self.tokenize(self.PHRASE_PATTERN.sub(" ", query))
+        for phrase in phrases:
+            terms.extend(phrase)
+        
+        return list(dict.fromkeys(terms)), phrases
+    
+    def search(
+        self,
+        query: str,
+        conversation_ids: Optional[List[str]] = None,
+        filters: Dict[str, Any] = None
+    ) -> List[Tuple[float, ConversationMessage]]:
+        """Return (BM25 score, message) pairs matching every query term, best first"""
+        terms, phrases = self.parse_query(query)
+        if not terms or any(term not in self.postings for term in terms):
+            return []
+        
+        filters = filters or {}
+        start_date = datetime.fromisoformat(filters['start_date']) if filters.get('start_date') else None
+        end_date = datetime.fromisoformat(filters['end_date']) if filters.get('end_date') else None
+        
+        # Drive the intersection from the rarest term
+        terms.sort(key=lambda term: self.document_frequency[term])
+        rarest = self.postings[terms[0]]
+        if conversation_ids is None:
+            scoped = rarest.items()
+        else:
+            scoped = [(conv_id, rarest[conv_id]) for conv_id in conversation_ids if conv_id in rarest]
+        
+        document_count = len(self.documents)
+        average_length = self.total_length / document_count if document_count else 0.0
+        idf = {
+            term: math.log(1 + (document_count - df + 0.5) / (df + 0.5))
+            for term, df in ((term, self.document_frequency[term]) for term in terms)
+        }
+        
+        results = []
+        for conv_id, messages in scoped:
+            other_postings = [self.postings[term].get(conv_id) for term in terms[1:]]
+            if any(postings is None for postings in other_postings):
+                continue
+            
+            for message_id in messages:
+                term_positions = [messages[message_id]]
+                for postings in other_postings:
+                    positions = postings.get(message_id)
+                    if positions is None:
+                        break
+                    term_positions.append(positions)
+                else:
+                    message = self.documents[(conv_id, message_id)]
+                    
+                    # Apply filters
+                    if filters.get('role') and message.role.value != filters['role']:
+                        continue
+                    if filters.get('thread_id') and message.thread_id != filters['thread_id']:
+                        continue
+                    if start_date and message.timestamp < start_date:
+                        continue
+                    if end_date and message.timestamp > end_date:
+                        continue
+                    
+                    positions_by_term = dict(zip(terms, term_positions))
+                    if phrases and not all(self._matches_phrase(phrase, positions_by_term) for phrase in phrases):
+                        continue
+                    
+                    length_norm = self.k1 * (1 - self.b + self.b * self.document_lengths[(conv_id, message_id)] / (average_length or 1.0))
+                    score = 0.0
+                    for term, positions in positions_by_term.items():
+                        tf = len(positions)
+                        score += idf[term] * tf * (self.k1 + 1) / (tf + length_norm)
+                    results.append((score, message))
+        
+        results.sort(key=lambda result: (result[0], result[1].timestamp), reverse=True)
+        return results
+    
+    @staticmethod
+    def _matches_phrase(phrase: List[str], positions_by_term: Dict[str, List[int]]) -> bool:
+        """Check that phrase tokens occur at consecutive positions"""
+        following = [set(positions_by_term[token]) for token in phrase[1:]]
+        for start in positions_by_term[phrase[0]]:
+            if all(start + offset + 1 in positions for offset, positions in enumerate(following)):
+                return True
+        return False
+
+
 class EnhancedConversation:
     """
     Enhanced conversation with advanced management capabilities
     """
     
-    def __init__(self, conversation_id: str = None, user_id: str = None, conversation_data: Dict[str, Any] = None):
+    def __init__(self, conversation_id: str = None, user_id: str = None, conversation_data: Dict[str, Any] = None,
+                 search_index: Optional[MessageSearchIndex] = None):
         """Initialize enhanced conversation"""
         self.conversation_id = conversation_id or str(uuid.uuid4())
         self.user_id = user_id
@@ -224,6 +628,8 @@ class EnhancedConversation:
         self.messages: List[ConversationMessage] = []
         self.threads: Dict[str, ConversationThread] = {}
         self.message_index: Dict[str, ConversationMessage] = {}
+        self.vector_index = ConversationVectorIndex()
+        self.search_index = search_index or MessageSearchIndex()
         
         # Organization and metadata
         self.tags = data.get('tags', [])
@@ -265,6 +671,8 @@ class EnhancedConversation:
         # Add to messages list and index
         self.messages.append(message)
         self.message_index[message.message_id] = message
+        self.vector_index.add_message(message.message_id, content)
+        self.search_index.add_message(message)
         
         # Auto-threading if enabled
         if self.auto_threading:
@@ -301,6 +709,8 @@ class EnhancedConversation:
         message.content = new_content
         message.tokens = self._estimate_tokens(new_content)
         message.edited = True
+        self.vector_index.update_message(message_id, new_content)
+        self.search_index.update_message(message)
         
         self.updated_at = datetime.utcnow()
         return True
@@ -317,6 +727,8 @@ class EnhancedConversation:
         
         # Remove from index
         del self.message_index[message_id]
+        self.vector_index.remove_message(message_id)
+        self.search_index.remove_message(self.conversation_id, message_id)
         
         # Update thread if message was threaded
         if message.thread_id and message.thread_id in self.threads:
@@ -324,6 +736,7 @@ class EnhancedConversation:
             thread.message_count -= 1
             if thread.message_count == 0:
                 del self.threads[message.thread_id]
+                self.vector_index.remove_thread(message.thread_id)
         
         self.updated_at = datetime.utcnow()
         self.performance_metrics['total_messages'] -= 1
@@ -344,6 +757,7 @@ class EnhancedConversation:
             for message_id in message_ids:
                 if message_id in self.message_index:
                     self.message_index[message_id].thread_id = thread.thread_id
+                    self.vector_index.assign(message_id, thread.thread_id)
                     thread.message_count += 1
         
         self.threads[thread.thread_id] = thread
@@ -370,6 +784,8 @@ class EnhancedConversation:
         target_thread.topic_keywords.extend(source_thread.topic_keywords)
         target_thread.updated_at = datetime.utcnow()
         
+        self.vector_index.merge_threads(source_thread_id, target_thread_id)
+        
         # Remove source thread
         del self.threads[source_thread_id]
         self.performance_metrics['thread_count'] -= 1
@@ -383,34 +799,13 @@ class EnhancedConversation:
         
         return [msg for msg in self.messages if msg.thread_id == thread_id]
     
-    async def search_messages(self, query: str, filters: Dict[str, Any] = None) -> List[ConversationMessage]:
-        """Search messages within the conversation"""
-        results = []
-        query_lower = query.lower()
-        filters = filters or {}
+    async def search_messages(self, query: str, filters: Dict[str, Any] = None,
+                              limit: Optional[int] = None, offset: int = 0) -> List[ConversationMessage]:
+        """Search messages within the conversation, ranked by BM25 relevance"""
+        results = self.search_index.search(query, [self.conversation_id], filters)
         
-        for message in self.messages:
-            # Text search
-            if query_lower in message.content.lower():
-                # Apply filters
-                if filters.get('role') and message.role.value != filters['role']:
-                    continue
-                if filters.get('thread_id') and message.thread_id != filters['thread_id']:
-                    continue
-                if filters.get('start_date'):
-                    start_date = datetime.fromisoformat(filters['start_date'])
-                    if message.timestamp < start_date:
-                        continue
-                if filters.get('end_date'):
-                    end_date = datetime.fromisoformat(filters['end_date'])
-                    if message.timestamp > end_date:
-                        continue
-                
-                results.append(message)
-        
-        # Sort by relevance (simple approach - by timestamp)
-        results.sort(key=lambda x: x.timestamp, reverse=True)
-        return results
+        end = offset + limit if limit is not None else None
+        return [message for _, message in results[offset:end]]
     
     async def generate_summary(self, summary_type: str = "detailed") -> ConversationSummary:
         """Generate a conversation summary"""
@@ -531,6 +926,7 @@ class EnhancedConversation:
         for thread in self.threads.values():
             if any(keyword in thread.topic_keywords for keyword in keywords):
                 message.thread_id = thread.thread_id
+                self.vector_index.assign(message.message_id, thread.thread_id)
                 thread.message_count += 1
                 thread.updated_at = datetime.utcnow()
                 return
@@ -542,31 +938,17 @@ class EnhancedConversation:
             thread.topic_keywords = keywords
     
     async def _thread_by_semantics(self, message: ConversationMessage):
-        """Thread message based on semantic similarity"""
-        if not self.messages or len(self.messages) < 2:
+        """Thread message based on semantic similarity to existing thread centroids"""
+        if not self.threads:
             return
         
-        # Get recent messages for comparison
-        recent_messages = self.messages[-10:]  # Last 10 messages
-        
-        # Calculate semantic similarity (simplified using TF-IDF)
         try:
-            vectorizer = TfidfVectorizer(max_features=100, stop_words='english')
-            texts = [msg.content for msg in recent_messages] + [message.content]
+            thread_id, similarity = self.vector_index.most_similar_thread(message.message_id)
             
-            if len(texts) >= 2:
-                tfidf_matrix = vectorizer.fit_transform(texts)
-                similarity_scores = cosine_similarity(tfidf_matrix[-1:], tfidf_matrix[:-1])
-                
-                # Find most similar message
-                max_similarity_idx = similarity_scores.argmax()
-                max_similarity = similarity_scores.max()
-                
-                if max_similarity > 0.3:  # Threshold for similarity
-                    similar_message = recent_messages[max_similarity_idx]
-                    if similar_message.thread_id:
-                        message.thread_id = similar_message.thread_id
-                        self.threads[similar_message.thread_id].message_count += 1
+            if thread_id in self.threads and similarity > 0.3:  # Threshold for similarity
+                message.thread_id = thread_id
+                self.vector_index.assign(message.message_id, thread_id)
+                self.threads[thread_id].message_count += 1
         except Exception as e:
             logger.warning(f"Semantic threading failed: {e}")
     
@@ -736,6 +1118,8 @@ class ConversationManager:
         self.conversation_index = {}
         self.tag_index = {}
         self.participant_index = {}
+        self.user_corpora: Dict[str, UserCorpusIndex] = {}
+        self.search_index = MessageSearchIndex()
         
         # Performance tracking
         self.performance_metrics = {
@@ -755,7 +1139,8 @@ class ConversationManager:
         try:
             conversation = EnhancedConversation(
                 user_id=user_id,
-                conversation_data=conversation_data
+                conversation_data=conversation_data,
+                search_index=self.search_index
             )
             
             # Store conversation
@@ -838,6 +1223,7 @@ class ConversationManager:
         
         # Remove from other indexes
         await self._remove_from_indexes(conversation)
+        conversation.search_index.remove_conversation(conversation_id)
         
         # Remove conversation
         del self.conversations[conversation_id]
@@ -864,28 +1250,36 @@ class ConversationManager:
         
         return message
     
-    async def search_conversations(self, user_id: str, query: str, filters: Dict[str, Any] = None) -> List[EnhancedConversation]:
+    async def search_conversations(self, user_id: str, query: str, filters: Dict[str, Any] = None,
+                                   limit: Optional[int] = None, offset: int = 0) -> List[EnhancedConversation]:
         """Search conversations for a user"""
         user_conversations = await self.get_user_conversations(user_id, filters)
-        results = []
         query_lower = query.lower()
         
-        for conversation in user_conversations:
+        # Message hits come from the inverted index; keep each conversation's best score
+        conversation_ids = [conv.conversation_id for conv in user_conversations]
+        best_scores: Dict[str, float] = {}
+        for score, message in self.search_index.search(query, conversation_ids):
+            if score > best_scores.get(message.conversation_id, float('-inf')):
+                best_scores[message.conversation_id] = score
+        
+        ranked = []
+        for position, conversation in enumerate(user_conversations):
             # Search in title, description, and tags
-            if (query_lower in conversation.title.lower() or
-                query_lower in conversation.description.lower() or
-                any(query_lower in tag.lower() for tag in conversation.tags)):
-                results.append(conversation)
-                continue
+            metadata_match = (query_lower in conversation.title.lower() or
+                              query_lower in conversation.description.lower() or
+                              any(query_lower in tag.lower() for tag in conversation.tags))
+            message_score = best_scores.get(conversation.conversation_id)
             
-            # Search in message content
-            for message in conversation.messages:
-                if query_lower in message.content.lower():
-                    results.append(conversation)
-                    break
+            if metadata_match or message_score is not None:
+                # Metadata hits first, then message relevance, then recency
+                ranked.append(((metadata_match, message_score or 0.0, -position), conversation))
+        
+        ranked.sort(key=lambda item: item[0], reverse=True)
         
         self.performance_metrics['searches_performed'] += 1
-        return results
+        end = offset + limit if limit is not None else None
+        return [conversation for _, conversation in ranked[offset:end]]
     
     async def get_conversation_analytics(self, conversation_id: str) -> Optional[ConversationAnalytics]:
         """Get analytics for a specific conversation"""
@@ -913,19 +1307,41 @@ class ConversationManager:
         if not source_conversation:
             return []
         
-        # Get user's conversations
+        # Get user's conversations (most recently updated first, which breaks ties)
         user_conversations = await self.get_user_conversations(source_conversation.user_id)
-        user_conversations = [c for c in user_conversations if c.conversation_id != conversation_id]
+        candidates = [c for c in user_conversations if c.conversation_id != conversation_id]
+        if not candidates:
+            return []
+        
+        # Content similarity: one sparse matrix-vector product over the user's corpus
+        corpus = self.user_corpora.setdefault(source_conversation.user_id, UserCorpusIndex())
+        corpus.sync(user_conversations)
+        content_scores = corpus.content_similarities(conversation_id)
+        positions = np.array([corpus.row_positions[c.conversation_id] for c in candidates])
+        content_similarity = content_scores[positions] if content_scores.size else np.zeros(len(candidates))
+        
+        # Tag similarity (Jaccard) as a vectorized intersection/union over a tag vocabulary
+        source_tags = set(source_conversation.tags)
+        candidate_tag_sets = [set(c.tags) for c in candidates]
+        tag_counts = np.array([len(tags) for tags in candidate_tag_sets], dtype=np.float64)
+        common_counts = np.array([len(tags & source_tags) for tags in candidate_tag_sets], dtype=np.float64)
+        union_counts = tag_counts + len(source_tags) - common_counts
+        tag_similarity = np.divide(
+            common_counts, union_counts,
+            out=np.zeros_like(common_counts), where=union_counts > 0
+        )
+        
+        # Type similarity
+        type_match = np.array(
+            [c.conversation_type == source_conversation.conversation_type for c in candidates],
+            dtype=np.float64
+        )
         
-        # Calculate similarity scores
-        similarities = []
-        for conv in user_conversations:
-            similarity_score = await self._calculate_conversation_similarity(source_conversation, conv)
-            similarities.append((similarity_score, conv))
+        scores = np.minimum(1.0, tag_similarity * 0.3 + type_match * 0.2 + content_similarity * 0.5)
         
-        # Sort by similarity and return top results
-        similarities.sort(key=lambda x: x[0], reverse=True)
-        return [conv for _, conv in similarities[:limit]]
+        # Top-k with a heap; nlargest is stable so recency order breaks ties
+        top_positions = heapq.nlargest(limit, range(len(candidates)), key=lambda i: scores[i])
+        return [candidates[i] for i in top_positions]
     
     async def export_conversations(self, user_id: str, conversation_ids: List[str] = None, format: str = "json") -> Union[str, Dict[str, Any]]:
         """Export conversations for a user"""
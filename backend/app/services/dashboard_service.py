@@ -18,7 +18,8 @@ from dataclasses import dataclass, asdict
 from collections import defaultdict
 import json
 
-from app.middleware.monitoring import metrics_collector, health_check_detailed
+from app.middleware.monitoring import metrics_collector
+from app.services.health_snapshot import get_health_sampler
 from app.services.error_tracker import get_error_tracker
 from app.services.audit_service import get_audit_logger
 
@@ -129,7 +130,7 @@ class DashboardService:
         
         # Get current system metrics
         stats = metrics_collector.get_statistics()
-        health_data = await health_check_detailed()
+        health_data = await self._get_health_overview()
         
         # Get recent errors
         recent_errors = self.error_tracker.get_error_statistics(hours=1)
@@ -275,8 +276,23 @@ class DashboardService:
         return datetime.utcnow() < cache_time
     
     async def _get_health_overview(self) -> Dict[str, Any]:
-        """Get system health overview"""
-        return await health_check_detailed()
+        """Get system health overview from the shared health snapshot"""
+        snapshot = await get_health_sampler().get_snapshot(wait=False)
+        if snapshot is None:
+            return {"status": "unknown", "issues": ["Health sampler has not completed a run yet"], "system": {}}
+        
+        metrics = snapshot.data.get("system_metrics", {})
+        return {
+            "status": snapshot.overall_status,
+            "issues": [alert["message"] for alert in snapshot.data.get("alerts", ())],
+            "system": {
+                "cpu_percent": metrics.get("cpu", {}).get("percent", 0),
+                "memory_percent": metrics.get("memory", {}).get("percent", 0),
+                "disk_usage": metrics.get("disk", {}).get("percent", 0)
+            },
+            "checked_at": snapshot.data.get("timestamp"),
+            "stale": snapshot.is_stale()
+        }
     
     async def _get_performance_overview(self, hours: int) -> Dict[str, Any]:
         """Get performance metrics overview"""
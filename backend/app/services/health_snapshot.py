@@ -0,0 +1,361 @@
+"""
+Shared Health Snapshot
+======================
+
+One background sampler runs HealthService.run_comprehensive_health_check
+every HEALTH_SNAPSHOT_INTERVAL_SECONDS and publishes the result as an
+immutable HealthSnapshot. The alert evaluator, dashboards and /api/health
+read the latest snapshot instead of starting their own runs.
+
+The sampler is started once per worker from the app's startup event and
+lives on that event loop. A snapshot older than
+HEALTH_SNAPSHOT_MAX_AGE_SECONDS is stale. Readers that pass wait=False
+always get the current snapshot straight away, even a stale one (flagged
+as such), and a refresh is started behind them. Readers that need fresh
+data await a refresh. Concurrent refreshes share one run. Reads from any
+other event loop (a test client, a script) never start sampling there;
+they get whatever snapshot there is.
+
+With HEALTH_SNAPSHOT_STORAGE=redis, workers take turns holding a sampler
+lease in Redis. The holder runs the checks and writes the snapshot to a
+shared key; the other workers read that key instead of sampling. If the
+holder stops publishing, its lease expires and another worker takes over.
+If Redis is unreachable, each worker samples for itself until Redis
+comes back.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+import redis.asyncio as redis
+
+from app.services.health_service import HealthService, get_health_service
+
+logger = logging.getLogger(__name__)
+
+HEALTH_SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("HEALTH_SNAPSHOT_INTERVAL_SECONDS", "30"))
+HEALTH_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("HEALTH_SNAPSHOT_MAX_AGE_SECONDS", "90"))
+HEALTH_SNAPSHOT_STORAGE = os.getenv("HEALTH_SNAPSHOT_STORAGE", "memory").lower()
+HEALTH_SNAPSHOT_KEY_PREFIX = os.getenv("HEALTH_SNAPSHOT_KEY_PREFIX", "capeai:health")
+
+# Take the lease if free, extend it if we already hold it
+CLAIM_LEASE_SCRIPT = """
+local holder = redis.call('GET', KEYS[1])
+if not holder then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+if holder == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _freeze(value: Any) -> Any:
+    """Read-only view of decoded JSON: dicts become mapping proxies, lists tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@dataclass(frozen=True)
+class HealthSnapshot:
+    """Immutable result of one comprehensive health check run"""
+    data: Mapping[str, Any]
+    payload: bytes  # data encoded as JSON once, served as-is
+    taken_at: float  # wall clock, so ages compare across workers
+    max_age: float
+    source: str = "local"
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any], max_age: float, taken_at: Optional[float] = None) -> "HealthSnapshot":
+        payload = json.dumps(result, default=_json_default).encode()
+        return cls.from_payload(payload, max_age, taken_at if taken_at is not None else time.time())
+
+    @classmethod
+    def from_payload(cls, payload: bytes, max_age: float, taken_at: float, source: str = "local") -> "HealthSnapshot":
+        return cls(_freeze(json.loads(payload)), payload, taken_at, max_age, source)
+
+    @property
+    def overall_status(self) -> str:
+        return self.data.get("overall_status", "unknown")
+
+    def age_seconds(self, now: Optional[float] = None) -> float:
+        return max(0.0, (now if now is not None else time.time()) - self.taken_at)
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        return self.age_seconds(now) > self.max_age
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Mutable copy of the full result"""
+        return json.loads(self.payload)
+
+    def summary(self) -> Dict[str, Any]:
+        """Small status document for /api/health"""
+        return {
+            "status": self.overall_status,
+            "overall_status": self.overall_status,
+            "timestamp": self.data.get("timestamp"),
+            "check_duration_ms": self.data.get("check_duration_ms"),
+            "age_seconds": round(self.age_seconds(), 1),
+            "stale": self.is_stale(),
+            "timed_out": list(self.data.get("timed_out", ())),
+            "alerts": len(self.data.get("alerts", ())),
+        }
+
+
+class InMemorySnapshotStore:
+    """Single-process storage: every worker runs its own sampler"""
+
+    async def claim_sampler(self, worker_id: str, lease_seconds: float) -> bool:
+        return True
+
+    async def publish(self, snapshot: HealthSnapshot):
+        pass
+
+    async def fetch(self) -> Optional[HealthSnapshot]:
+        return None
+
+
+class RedisSnapshotStore:
+    """
+    Sampler lease and latest snapshot shared through Redis.
+
+    If Redis is unreachable every worker samples for itself and Redis is
+    retried after retry_interval seconds.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, retry_interval: float = 30.0,
+                 max_age: float = HEALTH_SNAPSHOT_MAX_AGE_SECONDS):
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.retry_interval = retry_interval
+        self.max_age = max_age
+        self.redis_client: Optional[redis.Redis] = None
+        self._claim_script = None
+        self._unavailable_until = 0.0
+
+    def _client(self) -> Optional[redis.Redis]:
+        if time.monotonic() < self._unavailable_until:
+            return None
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+            self._claim_script = self.redis_client.register_script(CLAIM_LEASE_SCRIPT)
+        return self.redis_client
+
+    def _unavailable(self, e: Exception):
+        logger.warning(f"Redis health snapshot unavailable, sampling in-process: {e}")
+        self._unavailable_until = time.monotonic() + self.retry_interval
+
+    async def claim_sampler(self, worker_id: str, lease_seconds: float) -> bool:
+        if self._client() is None:
+            return True
+        try:
+            claimed = await self._claim_script(
+                keys=[f"{HEALTH_SNAPSHOT_KEY_PREFIX}:sampler"],
+                args=[worker_id, int(lease_seconds * 1000)]
+            )
+        except Exception as e:
+            self._unavailable(e)
+            return True
+        return bool(int(claimed))
+
+    async def publish(self, snapshot: HealthSnapshot):
+        client = self._client()
+        if client is None:
+            return
+        key = f"{HEALTH_SNAPSHOT_KEY_PREFIX}:snapshot"
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping={"taken_at": repr(snapshot.taken_at), "payload": snapshot.payload.decode()})
+                pipe.expire(key, max(1, int(self.max_age)))
+                await pipe.execute()
+        except Exception as e:
+            self._unavailable(e)
+
+    async def fetch(self) -> Optional[HealthSnapshot]:
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            stored = await client.hgetall(f"{HEALTH_SNAPSHOT_KEY_PREFIX}:snapshot")
+        except Exception as e:
+            self._unavailable(e)
+            return None
+        if not stored:
+            return None
+        return HealthSnapshot.from_payload(
+            stored["payload"].encode(), self.max_age, float(stored["taken_at"]), source="redis"
+        )
+
+
+class HealthSampler:
+    """Background producer of the shared HealthSnapshot"""
+
+    def __init__(self, health_service: Optional[HealthService] = None, store=None,
+                 interval: float = HEALTH_SNAPSHOT_INTERVAL_SECONDS,
+                 max_age: float = HEALTH_SNAPSHOT_MAX_AGE_SECONDS):
+        self.health_service = health_service or get_health_service()
+        self.store = store or InMemorySnapshotStore()
+        self.interval = interval
+        self.max_age = max_age
+        # Long enough to survive one slow run, short enough to hand over quickly
+        self.lease_seconds = interval * 2
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._snapshot: Optional[HealthSnapshot] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._refreshing: Optional[asyncio.Future] = None
+
+        self.metrics = {
+            "samples": 0,
+            "shared_reads": 0,
+            "stale_reads": 0,
+            "failures": 0,
+        }
+
+    @property
+    def snapshot(self) -> Optional[HealthSnapshot]:
+        """Latest snapshot without waiting, None before the first run completes"""
+        return self._snapshot
+
+    async def get_snapshot(self, wait: bool = True) -> Optional[HealthSnapshot]:
+        """
+        Latest snapshot, None before the first run completes.
+
+        A fresh snapshot is returned immediately. Otherwise a refresh is
+        started; with wait=True the caller gets its result, with wait=False
+        the caller gets the current (stale or missing) snapshot at once.
+        Off the sampler's own loop nothing is started or awaited.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and not snapshot.is_stale():
+            return snapshot
+
+        self.metrics["stale_reads"] += 1
+        if not self._running_here():
+            return snapshot
+        refresh = self._start_refresh()
+        if not wait:
+            return snapshot
+        return await asyncio.shield(refresh)
+
+    async def refresh(self) -> HealthSnapshot:
+        """Take a new snapshot now, joining a refresh that is already running"""
+        return await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self) -> asyncio.Future:
+        refreshing = self._refreshing
+        if refreshing is None or refreshing.done() or refreshing.get_loop() is not asyncio.get_running_loop():
+            self._refreshing = asyncio.ensure_future(self._refresh())
+            self._refreshing.add_done_callback(self._refresh_done)
+        return self._refreshing
+
+    def _refresh_done(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            self.metrics["failures"] += 1
+            logger.error(f"Health snapshot refresh failed: {future.exception()}")
+
+    async def _refresh(self) -> HealthSnapshot:
+        if await self.store.claim_sampler(self.worker_id, self.lease_seconds):
+            snapshot = await self._sample()
+            await self.store.publish(snapshot)
+        else:
+            snapshot = await self.store.fetch()
+            if snapshot is None or snapshot.is_stale():
+                # The lease holder has stopped publishing; do not serve stale data meanwhile
+                snapshot = await self._sample()
+            else:
+                self.metrics["shared_reads"] += 1
+        self._snapshot = snapshot
+        return snapshot
+
+    async def _sample(self) -> HealthSnapshot:
+        result = await self.health_service.run_comprehensive_health_check()
+        self.metrics["samples"] += 1
+        return HealthSnapshot.from_result(result, self.max_age)
+
+    def _running_here(self) -> bool:
+        return self._task is not None and not self._task.done() and self._loop is asyncio.get_running_loop()
+
+    def start(self):
+        """Start the background sampler on the running event loop"""
+        if self._running_here():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                pass  # counted and logged by _refresh_done
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        """Stop the background sampler"""
+        if self._task is not None and not self._task.done() and self._loop is asyncio.get_running_loop():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            **self.metrics,
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "max_age_seconds": self.max_age,
+            "storage": type(self.store).__name__,
+            "snapshot_age_seconds": round(snapshot.age_seconds(), 1) if snapshot else None,
+            "snapshot_source": snapshot.source if snapshot else None,
+        }
+
+
+# Global health sampler instance
+_health_sampler_instance = None
+
+def get_health_sampler() -> HealthSampler:
+    """Get the global health sampler, storage selected by HEALTH_SNAPSHOT_STORAGE (memory | redis)"""
+    global _health_sampler_instance
+    if _health_sampler_instance is None:
+        store = RedisSnapshotStore() if HEALTH_SNAPSHOT_STORAGE == "redis" else InMemorySnapshotStore()
+        _health_sampler_instance = HealthSampler(store=store)
+    return _health_sampler_instance
+
+
+def start_health_sampler():
+    """Start the global sampler on the worker's event loop; call from app startup"""
+    get_health_sampler().start()
+
+
+async def stop_health_sampler():
+    """Stop the global sampler if it was started"""
+    if _health_sampler_instance is not None:
+        await _health_sampler_instance.stop()
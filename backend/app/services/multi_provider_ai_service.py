@@ -12,9 +12,9 @@ Enhanced AI service supporting multiple providers:
 import os
 import asyncio
 import logging
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, AsyncIterator
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime
 
 # Provider-specific imports
@@ -31,7 +31,9 @@ except ImportError:
 from pydantic import BaseModel
 
 from app.config import settings
-from app.services.ai_performance_service import get_ai_performance_monitor, AIModelType
+from app.services.ai_performance_service import get_ai_performance_monitor, AIModelType, AIProvider, PerformanceMetric
+from app.services.ai_response_cache import AI_RESPONSE_CACHE_SEMANTIC, OPENAI_EMBEDDING_MODEL, AIResponseCache
+from app.services.ai_routing_policy import AIRoutingPolicy
 from app.services.conversation_context_service import get_context_service, ContextType
 # Task 2.1.4: AI Personalization integration (imported lazily to avoid circular import)
 
@@ -70,12 +72,38 @@ class AIProviderResponse:
     metadata: Dict[str, Any] = None
 
 
+@dataclass
+class AIStreamChunk:
+    """Normalized streaming delta from any provider"""
+    delta: str
+    provider: ModelProvider
+    model: str
+    index: int = 0
+    finish_reason: Optional[str] = None
+    usage: Optional[Dict[str, int]] = None
+    time_to_first_token_ms: Optional[int] = None
+    response_time_ms: Optional[int] = None
+
+
+@dataclass
+class PreparedGeneration:
+    """Messages, model and parameters resolved for a single generation"""
+    messages: List[Dict[str, str]]
+    model: str
+    config: AIModelConfig
+    temperature: float
+    max_tokens: int
+    context_service: Any
+    personalization_service: Any = None
+
+
 class MultiProviderAIService:
     """Enhanced AI service with multi-provider support"""
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.performance_monitor = get_ai_performance_monitor()
+        self.routing_policy = AIRoutingPolicy(self.performance_monitor)
         
         # Initialize provider clients
         self.clients = {}
@@ -83,6 +111,11 @@ class MultiProviderAIService:
         
         self._initialize_providers()
         self._setup_model_configurations()
+        
+        embedder = None
+        if AI_RESPONSE_CACHE_SEMANTIC == "openai" and ModelProvider.OPENAI in self.clients:
+            embedder = self._openai_embedding
+        self.response_cache = AIResponseCache(embedder=embedder)
     
     def _initialize_providers(self):
         """Initialize all available AI provider clients"""
@@ -275,6 +308,8 @@ class MultiProviderAIService:
         conversation_id: Optional[str] = None,
         use_context: bool = True,
         use_personalization: bool = True,
+        use_cache: bool = True,
+        cache_tenant: Optional[str] = None,
         **kwargs
     ) -> AIProviderResponse:
         """
@@ -289,7 +324,254 @@ class MultiProviderAIService:
         - User personality profile integration
         - Personalized prompt adaptation
         - Dynamic parameter adjustment
+        
+        Requests are routed through the routing policy: per-model timeouts,
+        a hedged backup request once the primary passes its p95 latency, and
+        failover to another provider on rate limits and server errors.
+        
+        Responses are cached per tenant (the user unless cache_tenant names
+        a shared one) on the final messages, model and parameters; requests
+        with neither bypass the cache, and use_cache=False forces a provider
+        call.
+        """
+        
+        prepared = await self._prepare_generation(
+            messages, model, temperature, max_tokens,
+            user_id, conversation_id, use_context, use_personalization
+        )
+        
+        tenant = cache_tenant or user_id
+        # Anonymous callers would otherwise all share one tenant's entries
+        use_cache = use_cache and bool(tenant)
+        cache_parameters = {'temperature': prepared.temperature, 'max_tokens': prepared.max_tokens, **kwargs}
+        if use_cache:
+            lookup_start = asyncio.get_event_loop().time()
+            cached = await self.response_cache.lookup(tenant, prepared.model, prepared.messages, cache_parameters)
+            if cached is not None:
+                entry, kind, similarity = cached
+                response = AIProviderResponse(
+                    content=entry['content'],
+                    provider=ModelProvider(entry['provider']),
+                    model=entry['model'],
+                    usage=entry['usage'],
+                    response_time_ms=int((asyncio.get_event_loop().time() - lookup_start) * 1000),
+                    finish_reason=entry['finish_reason'],
+                    metadata={**(entry.get('metadata') or {}), 'cache': kind, 'cache_similarity': round(similarity, 4)}
+                )
+                self.logger.info(f"Serving {prepared.model} response from cache ({kind})")
+                await self._finish_generation(
+                    prepared, response, user_id, conversation_id, use_context, use_personalization,
+                    record_metrics=False
+                )
+                return response
+        
+        async def attempt(model_key: str, config: AIModelConfig) -> AIProviderResponse:
+            start_time = asyncio.get_event_loop().time()
+            try:
+                response = await asyncio.wait_for(
+                    self._generate_provider_response(
+                        prepared.messages, config, prepared.temperature,
+                        min(prepared.max_tokens, config.max_tokens), **kwargs
+                    ),
+                    timeout=self.routing_policy.timeout_for(model_key)
+                )
+            except asyncio.CancelledError:
+                # Lost a hedge race, not a provider failure
+                raise
+            except Exception as e:
+                self._record_failed_generation(config, user_id, start_time, e)
+                self.logger.error(f"AI generation failed for model {model_key}: {type(e).__name__}: {str(e)}")
+                raise
+            
+            end_time = asyncio.get_event_loop().time()
+            response.response_time_ms = int((end_time - start_time) * 1000)
+            return response
+        
+        candidates = self._routing_candidates(prepared.model, prepared.config)
+        model_key, response = await self.routing_policy.execute(candidates, attempt)
+        
+        if model_key != prepared.model:
+            self.logger.info(f"Request for {prepared.model} served by {model_key}")
+            prepared = replace(prepared, model=model_key, config=self.model_configs[model_key])
+        response.metadata = {**(response.metadata or {}), 'routed_from': candidates[0][0]}
+        
+        if use_cache and response.content:
+            await self.response_cache.store(tenant, candidates[0][0], prepared.messages, cache_parameters, {
+                'content': response.content,
+                'provider': response.provider.value,
+                'model': response.model,
+                'usage': response.usage,
+                'finish_reason': response.finish_reason,
+                'metadata': response.metadata,
+                'cost_usd': self._estimate_cost(prepared.config, response.usage)
+            })
+        
+        await self._finish_generation(
+            prepared, response, user_id, conversation_id, use_context, use_personalization
+        )
+        
+        return response
+    
+    def _estimate_cost(self, config: AIModelConfig, usage: Dict[str, int]) -> float:
+        """Provider cost of a response in USD from the model's per-1k token prices"""
+        return (
+            usage.get('prompt_tokens', 0) / 1000 * config.cost_per_1k_prompt
+            + usage.get('completion_tokens', 0) / 1000 * config.cost_per_1k_completion
+        )
+    
+    async def _openai_embedding(self, text: str) -> List[float]:
+        """Embedding for the semantic response cache tier"""
+        result = await self.clients[ModelProvider.OPENAI].embeddings.create(
+            model=OPENAI_EMBEDDING_MODEL, input=text
+        )
+        return result.data[0].embedding
+    
+    def _routing_candidates(self, model: str, config: AIModelConfig) -> List[tuple]:
+        """Requested model followed by the default model of each backup provider"""
+        candidates = [(model, config)]
+        available = [provider.value for provider in self.clients]
+        for provider in self.routing_policy.backup_providers(config.provider.value, available):
+            backup = self.get_default_model(ModelProvider(provider))
+            if backup in self.model_configs:
+                candidates.append((backup, self.model_configs[backup]))
+        return candidates
+    
+    async def _generate_provider_response(
+        self,
+        messages: List[Dict[str, str]],
+        config: AIModelConfig,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> AIProviderResponse:
+        """Send one request to the provider of the given model"""
+        if config.provider == ModelProvider.OPENAI:
+            return await self._generate_openai_response(messages, config, temperature, max_tokens, **kwargs)
+        elif config.provider == ModelProvider.CLAUDE:
+            return await self._generate_claude_response(messages, config, temperature, max_tokens, **kwargs)
+        elif config.provider == ModelProvider.GEMINI:
+            return await self._generate_gemini_response(messages, config, temperature, max_tokens, **kwargs)
+        raise ValueError(f"Provider '{config.provider.value}' not implemented")
+    
+    async def stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        user_id: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        use_context: bool = True,
+        use_personalization: bool = True,
+        **kwargs
+    ) -> AsyncIterator[AIStreamChunk]:
         """
+        Stream an AI response as normalized delta chunks
+        
+        Context, personalization and model selection work as in
+        generate_response. The last chunk carries finish_reason, usage and
+        timings; context storage, personalization updates and request
+        metrics run after it, once the stream has finished.
+        """
+        
+        prepared = await self._prepare_generation(
+            messages, model, temperature, max_tokens,
+            user_id, conversation_id, use_context, use_personalization
+        )
+        config = prepared.config
+        
+        loop = asyncio.get_event_loop()
+        start_time = loop.time()
+        time_to_first_token_ms = None
+        parts = []
+        index = 0
+        finish_reason = "stop"
+        usage = None
+        
+        try:
+            if config.provider == ModelProvider.OPENAI:
+                provider_stream = self._stream_openai_response(
+                    prepared.messages, config, prepared.temperature, prepared.max_tokens, **kwargs
+                )
+            elif config.provider == ModelProvider.CLAUDE:
+                provider_stream = self._stream_claude_response(
+                    prepared.messages, config, prepared.temperature, prepared.max_tokens, **kwargs
+                )
+            elif config.provider == ModelProvider.GEMINI:
+                provider_stream = self._stream_gemini_response(
+                    prepared.messages, config, prepared.temperature, prepared.max_tokens, **kwargs
+                )
+            else:
+                raise ValueError(f"Provider '{config.provider.value}' not implemented")
+            
+            async for chunk in provider_stream:
+                if chunk.finish_reason:
+                    finish_reason = chunk.finish_reason
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.delta:
+                    continue
+                
+                if time_to_first_token_ms is None:
+                    time_to_first_token_ms = int((loop.time() - start_time) * 1000)
+                    self._record_time_to_first_token(config, time_to_first_token_ms, user_id)
+                
+                parts.append(chunk.delta)
+                chunk.index = index
+                index += 1
+                yield chunk
+        
+        except Exception as e:
+            self._record_failed_generation(config, user_id, start_time, e)
+            self.logger.error(f"AI streaming failed for model {prepared.model}: {str(e)}")
+            raise
+        
+        content = "".join(parts)
+        response = AIProviderResponse(
+            content=content,
+            provider=config.provider,
+            model=config.model_name,
+            usage=usage or self._estimate_usage(prepared.messages, content),
+            response_time_ms=int((loop.time() - start_time) * 1000),
+            finish_reason=finish_reason,
+            metadata={
+                'streamed': True,
+                'chunks': index,
+                'time_to_first_token_ms': time_to_first_token_ms
+            }
+        )
+        
+        yield AIStreamChunk(
+            delta="",
+            provider=config.provider,
+            model=config.model_name,
+            index=index,
+            finish_reason=finish_reason,
+            usage=response.usage,
+            time_to_first_token_ms=time_to_first_token_ms,
+            response_time_ms=response.response_time_ms
+        )
+        
+        # Post-stream bookkeeping must not break a stream the client already received
+        try:
+            await self._finish_generation(
+                prepared, response, user_id, conversation_id, use_context, use_personalization
+            )
+        except Exception as e:
+            self.logger.warning(f"Post-stream processing failed for model {prepared.model}: {e}")
+    
+    async def _prepare_generation(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        user_id: Optional[str],
+        conversation_id: Optional[str],
+        use_context: bool,
+        use_personalization: bool
+    ) -> PreparedGeneration:
+        """Apply context and personalization, resolve the model and store the user message"""
         
         # Initialize services
         context_service = await get_context_service()
@@ -467,91 +749,108 @@ class MultiProviderAIService:
             except Exception as e:
                 logger.warning(f"Failed to store user message in context: {e}")
         
-        # Route to appropriate provider
-        start_time = asyncio.get_event_loop().time()
+        return PreparedGeneration(
+            messages=enhanced_messages,
+            model=model,
+            config=config,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            context_service=context_service,
+            personalization_service=personalization_service
+        )
+    
+    async def _finish_generation(
+        self,
+        prepared: PreparedGeneration,
+        response: AIProviderResponse,
+        user_id: Optional[str],
+        conversation_id: Optional[str],
+        use_context: bool,
+        use_personalization: bool,
+        record_metrics: bool = True
+    ) -> None:
+        """
+        Store the AI response, update personalization and record request
+        metrics (skipped for cached responses, which made no provider request)
+        """
+        
+        context_service = prepared.context_service
+        personalization_service = prepared.personalization_service
+        config = prepared.config
         
-        try:
-            if config.provider == ModelProvider.OPENAI:
-                response = await self._generate_openai_response(
-                    enhanced_messages, config, temperature, max_tokens, **kwargs
-                )
-            elif config.provider == ModelProvider.CLAUDE:
-                response = await self._generate_claude_response(
-                    enhanced_messages, config, temperature, max_tokens, **kwargs
+        # Store AI response in context if enabled
+        if use_context and user_id and conversation_id:
+            try:
+                await context_service.add_message(
+                    user_id=user_id,
+                    conversation_id=conversation_id,
+                    message_type=ContextType.AI_RESPONSE,
+                    content=response.content,
+                    metadata={
+                        'context_messages_used': len(prepared.messages),
+                        'personalization_applied': use_personalization and personalization_service is not None,
+                        'model_selected_by_personalization': prepared.model if personalization_service else None
+                    },
+                    ai_provider=response.provider.value,
+                    ai_model=response.model,
+                    tokens_used=response.usage,
+                    response_time_ms=response.response_time_ms
                 )
-            elif config.provider == ModelProvider.GEMINI:
-                response = await self._generate_gemini_response(
-                    enhanced_messages, config, temperature, max_tokens, **kwargs
+            except Exception as e:
+                logger.warning(f"Failed to store AI response in context: {e}")
+        
+        # Update personalization profile based on successful interaction
+        if personalization_service and user_id:
+            try:
+                interaction_data = {
+                    'response_time': response.response_time_ms,
+                    'model_used': response.model,
+                    'provider_used': response.provider.value,
+                    'tokens_used': response.usage.get('total_tokens', 0),
+                    'positive_feedback': True,  # Assume positive for successful generation
+                    'topic': 'general'  # Could be enhanced with topic detection
+                }
+                
+                await personalization_service.update_profile_from_interaction(
+                    user_id=user_id,
+                    interaction_data=interaction_data
                 )
-            else:
-                raise ValueError(f"Provider '{config.provider.value}' not implemented")
-            
-            end_time = asyncio.get_event_loop().time()
-            response.response_time_ms = int((end_time - start_time) * 1000)
-            
-            # Store AI response in context if enabled
-            if use_context and user_id and conversation_id:
-                try:
-                    await context_service.add_message(
-                        user_id=user_id,
-                        conversation_id=conversation_id,
-                        message_type=ContextType.AI_RESPONSE,
-                        content=response.content,
-                        metadata={
-                            'context_messages_used': len(enhanced_messages),
-                            'personalization_applied': use_personalization and personalization_service is not None,
-                            'model_selected_by_personalization': model if personalization_service else None
-                        },
-                        ai_provider=response.provider.value,
-                        ai_model=response.model,
-                        tokens_used=response.usage,
-                        response_time_ms=response.response_time_ms
-                    )
-                except Exception as e:
-                    logger.warning(f"Failed to store AI response in context: {e}")
-            
-            # Update personalization profile based on successful interaction
-            if personalization_service and user_id:
-                try:
-                    interaction_data = {
-                        'response_time': response.response_time_ms,
-                        'model_used': response.model,
-                        'provider_used': response.provider.value,
-                        'tokens_used': response.usage.get('total_tokens', 0),
-                        'positive_feedback': True,  # Assume positive for successful generation
-                        'topic': 'general'  # Could be enhanced with topic detection
-                    }
-                    
-                    await personalization_service.update_profile_from_interaction(
-                        user_id=user_id,
-                        interaction_data=interaction_data
-                    )
-                except Exception as e:
-                    logger.warning(f"Failed to update personalization profile: {e}")
-            
-            # Record performance metrics
-            self.performance_monitor.record_ai_request(
-                provider=AIModelType(config.provider.value),
-                model=config.model_name,
-                endpoint=f"/{config.provider.value}/chat",
-                prompt_tokens=response.usage.get('prompt_tokens', 0),
-                completion_tokens=response.usage.get('completion_tokens', 0),
-                response_time_ms=response.response_time_ms,
-                success=True,
-                user_id=user_id,
-                response_length=len(response.content),
-                quality_score=None  # Could add quality assessment later
-            )
-            
-            return response
-            
-        except Exception as e:
-            end_time = asyncio.get_event_loop().time()
-            response_time_ms = int((end_time - start_time) * 1000)
-            
-            # Record failed request
+            except Exception as e:
+                logger.warning(f"Failed to update personalization profile: {e}")
+        
+        if not record_metrics:
+            return
+        
+        # Record performance metrics
+        self.performance_monitor.record_ai_request(
+            provider=AIProvider(config.provider.value),
+            model=config.model_name,
+            endpoint=f"/{config.provider.value}/chat",
+            prompt_tokens=response.usage.get('prompt_tokens', 0),
+            completion_tokens=response.usage.get('completion_tokens', 0),
+            response_time_ms=response.response_time_ms,
+            success=True,
+            user_id=user_id,
+            response_length=len(response.content),
+            quality_score=None  # Could add quality assessment later
+        )
+    
+    def _record_failed_generation(
+        self,
+        config: AIModelConfig,
+        user_id: Optional[str],
+        start_time: float,
+        error: Exception
+    ) -> None:
+        """Record a failed provider request"""
+        
+        end_time = asyncio.get_event_loop().time()
+        response_time_ms = int((end_time - start_time) * 1000)
+        
+        # Never let metrics bookkeeping mask the provider error
+        try:
             self.performance_monitor.record_ai_request(
-                provider=AIModelType(config.provider.value),
+                provider=AIProvider(config.provider.value),
                 model=config.model_name,
                 endpoint=f"/{config.provider.value}/chat",
                 prompt_tokens=0,
@@ -559,12 +858,37 @@ class MultiProviderAIService:
                 response_time_ms=response_time_ms,
                 success=False,
                 user_id=user_id,
-                error_type=type(e).__name__,
-                error_message=str(e)
+                error_type=type(error).__name__,
+                error_message=str(error)
             )
-            
-            self.logger.error(f"AI generation failed for model {model}: {str(e)}")
-            raise
+        except Exception as e:
+            logger.warning(f"Failed to record failed AI request: {e}")
+    
+    def _record_time_to_first_token(self, config: AIModelConfig, ttft_ms: int, user_id: Optional[str]) -> None:
+        """Record time-to-first-token for a streamed response as its own metric"""
+        try:
+            self.performance_monitor.record_metric(
+                AIModelType.CAPE_AI,
+                PerformanceMetric.TIME_TO_FIRST_TOKEN,
+                ttft_ms,
+                {
+                    'provider': config.provider.value,
+                    'model': config.model_name,
+                    'user_id': user_id
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record time to first token: {e}")
+    
+    def _estimate_usage(self, messages: List[Dict[str, str]], content: str) -> Dict[str, int]:
+        """Approximate token usage when a provider stream does not report it"""
+        prompt_tokens = sum(len(str(msg.get('content', '')).split()) for msg in messages)
+        completion_tokens = len(content.split())
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens
+        }
     
     async def _generate_openai_response(
         self,
@@ -615,25 +939,7 @@ class MultiProviderAIService:
         """Generate response using Claude (Anthropic) API"""
         
         client = self.clients[ModelProvider.CLAUDE]
-        
-        # Convert OpenAI-style messages to Claude format
-        claude_messages = self._convert_messages_to_claude_format(messages)
-        
-        # Extract system message if present
-        system_message = None
-        if claude_messages and claude_messages[0].get('role') == 'system':
-            system_message = claude_messages.pop(0)['content']
-        
-        # Create Claude request
-        request_params = {
-            'model': config.model_name,
-            'messages': claude_messages,
-            'temperature': temperature,
-            'max_tokens': max_tokens
-        }
-        
-        if system_message:
-            request_params['system'] = system_message
+        request_params = self._build_claude_request(messages, config, temperature, max_tokens)
         
         response = await client.messages.create(**request_params)
         
@@ -658,6 +964,36 @@ class MultiProviderAIService:
             }
         )
     
+    def _build_claude_request(
+        self,
+        messages: List[Dict[str, str]],
+        config: AIModelConfig,
+        temperature: float,
+        max_tokens: int
+    ) -> Dict[str, Any]:
+        """Build Claude request parameters from OpenAI-style messages"""
+        
+        # Convert OpenAI-style messages to Claude format
+        claude_messages = self._convert_messages_to_claude_format(messages)
+        
+        # Extract system message if present
+        system_message = None
+        if claude_messages and claude_messages[0].get('role') == 'system':
+            system_message = claude_messages.pop(0)['content']
+        
+        # Create Claude request
+        request_params = {
+            'model': config.model_name,
+            'messages': claude_messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens
+        }
+        
+        if system_message:
+            request_params['system'] = system_message
+        
+        return request_params
+    
     def _convert_messages_to_claude_format(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
         """Convert OpenAI-style messages to Claude format"""
         
@@ -692,24 +1028,7 @@ class MultiProviderAIService:
     ) -> AIProviderResponse:
         """Generate response using Google Gemini models"""
         
-        client = self.clients[ModelProvider.GEMINI]
-        
-        # Create Gemini model instance
-        model = client.GenerativeModel(
-            model_name=config.model_name,
-            generation_config=client.types.GenerationConfig(
-                temperature=temperature,
-                max_output_tokens=max_tokens,
-                top_p=0.8,
-                top_k=40
-            ),
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-            }
-        )
+        model = self._build_gemini_model(config, temperature, max_tokens)
         
         # Convert messages to Gemini format
         gemini_messages = self._convert_to_gemini_format(messages)
@@ -780,6 +1099,154 @@ class MultiProviderAIService:
         
         return gemini_messages
     
+    def _build_gemini_model(self, config: AIModelConfig, temperature: float, max_tokens: int):
+        """Create a Gemini model instance with generation and safety settings"""
+        
+        client = self.clients[ModelProvider.GEMINI]
+        
+        return client.GenerativeModel(
+            model_name=config.model_name,
+            generation_config=client.types.GenerationConfig(
+                temperature=temperature,
+                max_output_tokens=max_tokens,
+                top_p=0.8,
+                top_k=40
+            ),
+            safety_settings={
+                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+            }
+        )
+    
+    async def _stream_openai_response(
+        self,
+        messages: List[Dict[str, str]],
+        config: AIModelConfig,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> AsyncIterator[AIStreamChunk]:
+        """Stream deltas from the OpenAI chat completions API"""
+        
+        client = self.clients[ModelProvider.OPENAI]
+        
+        stream = await client.chat.completions.create(
+            model=config.model_name,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **kwargs
+        )
+        
+        async for event in stream:
+            if not event.choices:
+                continue
+            choice = event.choices[0]
+            yield AIStreamChunk(
+                delta=(choice.delta.content if choice.delta else None) or "",
+                provider=ModelProvider.OPENAI,
+                model=config.model_name,
+                finish_reason=choice.finish_reason
+            )
+    
+    async def _stream_claude_response(
+        self,
+        messages: List[Dict[str, str]],
+        config: AIModelConfig,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> AsyncIterator[AIStreamChunk]:
+        """Stream deltas from the Claude messages API (raw server-sent events)"""
+        
+        client = self.clients[ModelProvider.CLAUDE]
+        request_params = self._build_claude_request(messages, config, temperature, max_tokens)
+        
+        stream = await client.messages.create(stream=True, **request_params)
+        
+        input_tokens = 0
+        output_tokens = 0
+        stop_reason = None
+        
+        async for event in stream:
+            event_type = getattr(event, 'type', None)
+            
+            if event_type == 'message_start':
+                input_tokens = event.message.usage.input_tokens
+            elif event_type == 'content_block_delta':
+                text = getattr(event.delta, 'text', None)
+                if text:
+                    yield AIStreamChunk(
+                        delta=text,
+                        provider=ModelProvider.CLAUDE,
+                        model=config.model_name
+                    )
+            elif event_type == 'message_delta':
+                stop_reason = event.delta.stop_reason
+                output_tokens = event.usage.output_tokens
+        
+        yield AIStreamChunk(
+            delta="",
+            provider=ModelProvider.CLAUDE,
+            model=config.model_name,
+            finish_reason=stop_reason or "end_turn",
+            usage={
+                'prompt_tokens': input_tokens,
+                'completion_tokens': output_tokens,
+                'total_tokens': input_tokens + output_tokens
+            }
+        )
+    
+    async def _stream_gemini_response(
+        self,
+        messages: List[Dict[str, str]],
+        config: AIModelConfig,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> AsyncIterator[AIStreamChunk]:
+        """Stream deltas from Google Gemini models"""
+        
+        model = self._build_gemini_model(config, temperature, max_tokens)
+        gemini_messages = self._convert_to_gemini_format(messages)
+        
+        try:
+            if len(gemini_messages) == 1:
+                response = await model.generate_content_async(gemini_messages[0], stream=True)
+            else:
+                chat = model.start_chat(history=gemini_messages[:-1])
+                response = await chat.send_message_async(gemini_messages[-1], stream=True)
+            
+            finish_reason = "stop"
+            async for part in response:
+                if part.candidates:
+                    finish_reason = part.candidates[0].finish_reason.name
+                try:
+                    text = part.text
+                except ValueError:
+                    # Blocked or empty parts carry no text
+                    text = ""
+                if text:
+                    yield AIStreamChunk(
+                        delta=text,
+                        provider=ModelProvider.GEMINI,
+                        model=config.model_name
+                    )
+            
+            yield AIStreamChunk(
+                delta="",
+                provider=ModelProvider.GEMINI,
+                model=config.model_name,
+                finish_reason=finish_reason
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Gemini API error: {str(e)}")
+            raise Exception(f"Gemini streaming failed: {str(e)}")
+    
     async def get_provider_status(self) -> Dict[str, Dict[str, Any]]:
         """Get status of all AI providers"""
         
@@ -801,9 +1268,20 @@ class MultiProviderAIService:
                 provider_status['models'] = provider_models
                 provider_status['default_model'] = self.get_default_model(provider)
             
+            if provider.value in self.routing_policy.breakers:
+                provider_status['circuit_state'] = self.routing_policy.breakers[provider.value].state
+            
             status[provider.value] = provider_status
         
         return status
+    
+    def get_routing_metrics(self) -> Dict[str, Any]:
+        """Hedging, failover and circuit breaker counters"""
+        return self.routing_policy.get_metrics()
+    
+    def get_cache_metrics(self) -> Dict[str, Any]:
+        """Response cache hits, misses and provider cost saved"""
+        return self.response_cache.get_metrics()
 
 
 # Global service instance
@@ -825,5 +1303,6 @@ __all__ = [
     'ModelProvider', 
     'AIModelConfig',
     'AIProviderResponse',
+    'AIStreamChunk',
     'get_multi_provider_ai_service'
 ]
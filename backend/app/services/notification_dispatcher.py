@@ -0,0 +1,257 @@
+"""
+Alert notification dispatcher
+=============================
+
+Takes notification delivery off the alert monitoring loop. Callers
+submit (channel, key, item) and return immediately; each channel has its
+own bounded queue served by ALERT_DISPATCH_WORKERS workers, so a slow
+SMTP server cannot hold up webhooks or logs.
+
+Coalescing: the first notification for a key (normally the rule name)
+is sent right away and opens a window on that channel. Repeats within
+the window are held back and delivered together as one digest when the
+window closes, so an alert storm costs two deliveries per rule and
+channel rather than one per alert.
+
+Failed deliveries are retried with exponential backoff, starting at
+ALERT_DISPATCH_RETRY_BASE_SECONDS, up to ALERT_DISPATCH_MAX_RETRIES times.
+When a channel queue is full the notification is dropped and counted.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ALERT_DISPATCH_WORKERS = int(os.getenv("ALERT_DISPATCH_WORKERS", "2"))
+ALERT_DISPATCH_QUEUE_SIZE = int(os.getenv("ALERT_DISPATCH_QUEUE_SIZE", "1000"))
+ALERT_DISPATCH_MAX_RETRIES = int(os.getenv("ALERT_DISPATCH_MAX_RETRIES", "3"))
+ALERT_DISPATCH_RETRY_BASE_SECONDS = float(os.getenv("ALERT_DISPATCH_RETRY_BASE_SECONDS", "2"))
+
+# deliver(channel, items) -> True once the channel accepted them
+Deliver = Callable[[str, List[Any]], Awaitable[bool]]
+
+
+@dataclass
+class NotificationBatch:
+    """One delivery: a single notification, or a digest of coalesced ones"""
+    channel: str
+    key: str
+    items: List[Any]
+    attempts: int = 0
+
+    @property
+    def is_digest(self) -> bool:
+        return len(self.items) > 1
+
+
+@dataclass
+class _ChannelState:
+    queue: asyncio.Queue
+    workers: List[asyncio.Task] = field(default_factory=list)
+    in_flight: int = 0
+    max_queue_depth: int = 0
+    delivered: int = 0
+    failed: int = 0
+
+
+class NotificationDispatcher:
+    """Per-channel delivery queues with coalescing and retry"""
+
+    def __init__(self,
+                 deliver: Deliver,
+                 workers: int = ALERT_DISPATCH_WORKERS,
+                 queue_size: int = ALERT_DISPATCH_QUEUE_SIZE,
+                 max_retries: int = ALERT_DISPATCH_MAX_RETRIES,
+                 retry_base_seconds: float = ALERT_DISPATCH_RETRY_BASE_SECONDS):
+        self.deliver = deliver
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._channels: Dict[str, _ChannelState] = {}
+        self._windows: Dict[Tuple[str, str], List[Any]] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+        self._retries: Dict[int, Tuple[asyncio.TimerHandle, NotificationBatch]] = {}
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.digests = 0
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def _bind_loop(self):
+        """Queues and workers belong to the running loop; start over on a new one"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._channels = {}
+            self._windows = {}
+            self._timers = {}
+            self._retries = {}
+
+    def _channel(self, name: str) -> _ChannelState:
+        state = self._channels.get(name)
+        if state is None:
+            state = self._channels[name] = _ChannelState(queue=asyncio.Queue(maxsize=self.queue_size))
+            state.workers = [
+                self._loop.create_task(self._work(name, state)) for _ in range(self.workers)
+            ]
+        return state
+
+    def submit(self, channel: str, key: str, item: Any, window: float = 0) -> bool:
+        """
+        Queue a notification for delivery on a channel.
+
+        With a window, repeats of the same key on the channel are held and
+        sent as one digest when the window closes. Returns False only when
+        the channel queue is full and the notification was dropped.
+        """
+        self._bind_loop()
+        self.submitted += 1
+
+        window_key = (channel, key)
+        if window > 0:
+            held = self._windows.get(window_key)
+            if held is not None:
+                held.append(item)
+                self.coalesced += 1
+                return True
+            self._windows[window_key] = []
+            self._timers[window_key] = self._loop.call_later(window, self._close_window, window_key)
+
+        return self._enqueue(NotificationBatch(channel=channel, key=key, items=[item]))
+
+    def _close_window(self, window_key: Tuple[str, str]):
+        self._timers.pop(window_key, None)
+        held = self._windows.pop(window_key, None)
+        if held:
+            self.digests += 1
+            self._enqueue(NotificationBatch(channel=window_key[0], key=window_key[1], items=held))
+
+    def _enqueue(self, batch: NotificationBatch) -> bool:
+        state = self._channel(batch.channel)
+        try:
+            state.queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            self.dropped += len(batch.items)
+            logger.warning(f"Notification queue for {batch.channel} is full; dropped {len(batch.items)} notification(s)")
+            return False
+        state.max_queue_depth = max(state.max_queue_depth, state.queue.qsize())
+        return True
+
+    async def _work(self, name: str, state: _ChannelState):
+        while True:
+            batch = await state.queue.get()
+            try:
+                await self._deliver(batch, state)
+            finally:
+                state.queue.task_done()
+
+    async def _deliver(self, batch: NotificationBatch, state: _ChannelState):
+        state.in_flight += 1
+        try:
+            ok = await self.deliver(batch.channel, batch.items)
+        except Exception as e:
+            logger.error(f"Notification delivery via {batch.channel} raised: {e}")
+            ok = False
+        finally:
+            state.in_flight -= 1
+
+        if ok:
+            state.delivered += len(batch.items)
+            self.delivered += len(batch.items)
+            return
+
+        if batch.attempts >= self.max_retries:
+            state.failed += len(batch.items)
+            self.failed += len(batch.items)
+            logger.error(
+                f"Giving up on {len(batch.items)} notification(s) via {batch.channel} "
+                f"after {batch.attempts + 1} attempts"
+            )
+            return
+
+        delay = self.retry_base_seconds * (2 ** batch.attempts)
+        batch.attempts += 1
+        self.retried += 1
+        handle = self._loop.call_later(delay, self._retry, id(batch))
+        self._retries[id(batch)] = (handle, batch)
+
+    def _retry(self, batch_id: int):
+        _, batch = self._retries.pop(batch_id)
+        self._enqueue(batch)
+
+    async def drain(self, timeout: Optional[float] = None):
+        """
+        Deliver everything now: close open windows, bring pending retries
+        forward and wait until every queue is empty.
+        """
+        if self._loop is not asyncio.get_running_loop():
+            return
+
+        async def settle():
+            while self._windows or self._retries or any(s.queue.qsize() or s.in_flight for s in self._channels.values()):
+                for window_key in list(self._timers):
+                    self._timers[window_key].cancel()
+                    self._close_window(window_key)
+                for batch_id, (handle, _) in list(self._retries.items()):
+                    handle.cancel()
+                    self._retry(batch_id)
+                await asyncio.gather(*(state.queue.join() for state in self._channels.values()))
+
+        await asyncio.wait_for(settle(), timeout=timeout)
+
+    async def stop(self, timeout: float = 10.0):
+        """Deliver what is pending, then stop the workers"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        try:
+            await self.drain(timeout=timeout)
+        except asyncio.TimeoutError:
+            pending = sum(state.queue.qsize() for state in self._channels.values())
+            logger.error(f"Notification dispatcher did not drain within {timeout}s; {pending} deliveries lost")
+
+        for handle in self._timers.values():
+            handle.cancel()
+        for handle, _ in self._retries.values():
+            handle.cancel()
+        workers = [task for state in self._channels.values() for task in state.workers]
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._loop = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "running": any(not task.done() for state in self._channels.values() for task in state.workers),
+            "workers_per_channel": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": sum(state.queue.qsize() for state in self._channels.values()),
+            "open_windows": len(self._windows),
+            "pending_retries": len(self._retries),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "digests": self.digests,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "channels": {
+                name: {
+                    "queue_depth": state.queue.qsize(),
+                    "max_queue_depth": state.max_queue_depth,
+                    "in_flight": state.in_flight,
+                    "delivered": state.delivered,
+                    "failed": state.failed,
+                }
+                for name, state in self._channels.items()
+            },
+        }
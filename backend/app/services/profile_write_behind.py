@@ -0,0 +1,312 @@
+"""
+Write-behind buffer for personality profile updates
+===================================================
+
+Every successful AI completion nudges the user's personality profile
+(confidence, last response time, topics). Writing the full profile JSON
+back to Redis each time costs a round-trip on the request path for a
+0.05 confidence tweak, so updates are recorded here as per-user deltas
+instead and flushed in batches every PERSONALIZATION_FLUSH_INTERVAL_SECONDS,
+sooner once PERSONALIZATION_MAX_PENDING_USERS users are waiting, and on
+shutdown.
+
+Deltas are additive (confidence), set-like (topics) or last-writer
+(response time, updated_at), so they can be folded into whatever is
+stored when the flush runs. Each batch is applied under WATCH/MULTI: if
+another worker rewrites one of the profiles in between, the batch is
+re-read and merged again rather than overwriting that worker's changes.
+Deltas from a failed flush are put back, up to PERSONALIZATION_MAX_PENDING_USERS
+users; updates for users beyond that are dropped and counted.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+PERSONALIZATION_WRITE_BEHIND = os.getenv("PERSONALIZATION_WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+PERSONALIZATION_FLUSH_INTERVAL_SECONDS = float(os.getenv("PERSONALIZATION_FLUSH_INTERVAL_SECONDS", "5"))
+PERSONALIZATION_FLUSH_BATCH_SIZE = int(os.getenv("PERSONALIZATION_FLUSH_BATCH_SIZE", "200"))
+PERSONALIZATION_MAX_PENDING_USERS = int(os.getenv("PERSONALIZATION_MAX_PENDING_USERS", "5000"))
+
+CONFIDENCE_STEP = 0.05
+CONFIDENCE_MIN = 0.1
+CONFIDENCE_MAX = 1.0
+MAX_MERGE_ATTEMPTS = 3
+
+
+@dataclass
+class ProfileDelta:
+    """Changes to one user's profile that have not been written yet"""
+    confidence: float = 0.0
+    response_time: Optional[float] = None
+    topics: List[str] = field(default_factory=list)
+    updated_at: Optional[datetime] = None
+    interactions: int = 0
+
+    def record(self, interaction_data: Dict[str, Any], now: datetime):
+        """Fold one interaction in, as update_profile_from_interaction would apply it"""
+        if interaction_data.get('positive_feedback', False):
+            self.confidence += CONFIDENCE_STEP
+        elif interaction_data.get('negative_feedback', False):
+            self.confidence -= CONFIDENCE_STEP
+        if 'response_time' in interaction_data:
+            self.response_time = interaction_data['response_time']
+        topic = interaction_data.get('topic')
+        if topic and topic not in self.topics:
+            self.topics.append(topic)
+        self.updated_at = now
+        self.interactions += 1
+
+    def combine(self, newer: 'ProfileDelta') -> 'ProfileDelta':
+        """This delta followed by a newer one"""
+        return ProfileDelta(
+            confidence=self.confidence + newer.confidence,
+            response_time=newer.response_time if newer.response_time is not None else self.response_time,
+            topics=self.topics + [topic for topic in newer.topics if topic not in self.topics],
+            updated_at=newer.updated_at or self.updated_at,
+            interactions=self.interactions + newer.interactions
+        )
+
+    def apply(self, profile: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply to a profile in its to_dict() form, in place"""
+        if self.confidence > 0:
+            profile['confidence_score'] = min(profile['confidence_score'] + self.confidence, CONFIDENCE_MAX)
+        elif self.confidence < 0:
+            profile['confidence_score'] = max(profile['confidence_score'] + self.confidence, CONFIDENCE_MIN)
+        if self.response_time is not None:
+            profile['interaction_patterns']['avg_response_time'] = self.response_time
+        for topic in self.topics:
+            if topic not in profile['topics_of_interest']:
+                profile['topics_of_interest'].append(topic)
+        if self.updated_at is not None:
+            updated_at = self.updated_at.isoformat()
+            if updated_at > profile.get('updated_at', ''):
+                profile['updated_at'] = updated_at
+        return profile
+
+
+class ProfileWriteBehind:
+    """
+    Pending profile deltas, flushed to Redis by a background task.
+
+    `client` returns the Redis client to write to (None when Redis is
+    unavailable, in which case deltas only ever live in the caller's
+    cache). `current` returns the caller's view of a profile as a dict,
+    used when a profile is missing from Redis. `refreshed` is told about
+    each merged profile so the caller can pick up other workers' changes.
+    """
+
+    def __init__(self,
+                 client: Callable[[], Optional[redis.Redis]],
+                 current: Callable[[str], Optional[Dict[str, Any]]],
+                 refreshed: Callable[[str, Dict[str, Any]], None],
+                 key_prefix: str = "personality:",
+                 ttl_seconds: int = 86400 * 90,
+                 flush_interval: float = PERSONALIZATION_FLUSH_INTERVAL_SECONDS,
+                 batch_size: int = PERSONALIZATION_FLUSH_BATCH_SIZE,
+                 max_pending: int = PERSONALIZATION_MAX_PENDING_USERS,
+                 enabled: bool = PERSONALIZATION_WRITE_BEHIND):
+        self.client = client
+        self.current = current
+        self.refreshed = refreshed
+        self.key_prefix = key_prefix
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.enabled = enabled
+
+        self._pending: Dict[str, ProfileDelta] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+
+        self.recorded = 0
+        self.written = 0
+        self.flushes = 0
+        self.conflicts = 0
+        self.failed_flushes = 0
+        self.discarded = 0
+        self.dropped = 0
+
+    def record(self, user_id: str, delta: ProfileDelta) -> bool:
+        """
+        Buffer a delta for the next flush.
+
+        Returns False when the caller should write the profile itself:
+        write-behind is disabled or no event loop is running.
+        """
+        if not self.enabled or not self._ensure_started():
+            return False
+
+        pending = self._pending.get(user_id)
+        self._pending[user_id] = pending.combine(delta) if pending else delta
+        self.recorded += delta.interactions
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+        return True
+
+    def pending(self, user_id: str) -> Optional[ProfileDelta]:
+        """Unwritten changes for a user, so reads from Redis can include them"""
+        return self._pending.get(user_id)
+
+    def discard(self, user_id: str):
+        """Forget pending changes already contained in a full profile write"""
+        if self._pending.pop(user_id, None) is not None:
+            self.discarded += 1
+
+    def _ensure_started(self) -> bool:
+        if self._task is not None and not self._task.done() and self._loop is asyncio.get_running_loop():
+            return True
+        if self._closing:
+            return False
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if self._closing and not self._pending:
+                break
+
+    async def flush(self):
+        """Write every pending delta, batch_size profiles per transaction"""
+        async with self._flush_lock:
+            taken, self._pending = self._pending, {}
+            if not taken:
+                return
+
+            client = self.client()
+            if client is None:
+                # Nothing to persist to; the caller's cache already holds the changes
+                return
+
+            user_ids = list(taken)
+            for start in range(0, len(user_ids), self.batch_size):
+                batch = {user_id: taken[user_id] for user_id in user_ids[start:start + self.batch_size]}
+                try:
+                    merged = await self._write_batch(client, batch)
+                except Exception as e:
+                    logger.error(f"Failed to flush {len(batch)} personality profile updates: {e}")
+                    self.failed_flushes += 1
+                    self._requeue({user_id: taken[user_id] for user_id in user_ids[start:]})
+                    return
+
+                self.flushes += 1
+                self.written += len(merged)
+                for user_id, profile in merged.items():
+                    self.refreshed(user_id, profile)
+
+    async def _write_batch(self, client: redis.Redis, batch: Dict[str, ProfileDelta]) -> Dict[str, Dict[str, Any]]:
+        """Merge deltas into the stored profiles; re-read and retry if another writer got there first"""
+        keys = [f"{self.key_prefix}{user_id}" for user_id in batch]
+
+        for attempt in range(MAX_MERGE_ATTEMPTS):
+            # Newer deltas already contained in a profile taken from the caller's view
+            absorbed: Dict[str, ProfileDelta] = {}
+            try:
+                async with client.pipeline(transaction=True) as pipe:
+                    await pipe.watch(*keys)
+                    stored = await pipe.mget(keys)
+
+                    merged = {}
+                    for (user_id, delta), raw in zip(batch.items(), stored):
+                        if raw is not None:
+                            merged[user_id] = delta.apply(json.loads(raw))
+                        else:
+                            # Missing or expired: the caller's view already includes the delta,
+                            # and anything recorded since flush() took the batch; take those out
+                            # of the buffer so the next flush does not apply them again
+                            profile = self.current(user_id)
+                            if profile is not None:
+                                merged[user_id] = profile
+                                newer = self._pending.pop(user_id, None)
+                                if newer is not None:
+                                    absorbed[user_id] = newer
+
+                    pipe.multi()
+                    for user_id, profile in merged.items():
+                        pipe.setex(f"{self.key_prefix}{user_id}", self.ttl_seconds, json.dumps(profile, default=str))
+                    await pipe.execute()
+                    return merged
+            except redis.WatchError:
+                self.conflicts += 1
+                self._requeue(absorbed)
+            except Exception:
+                self._requeue(absorbed)
+                raise
+
+        raise RuntimeError(f"profiles kept changing during {MAX_MERGE_ATTEMPTS} merge attempts")
+
+    def _requeue(self, deltas: Dict[str, ProfileDelta]):
+        """
+        Put unwritten deltas back ahead of anything recorded since.
+
+        Users with nothing pending are only re-added while fewer than
+        max_pending are buffered, so a Redis outage cannot grow the buffer
+        without bound; the rest are dropped (the caller's cache keeps them
+        until it expires).
+        """
+        dropped = 0
+        for user_id, delta in deltas.items():
+            newer = self._pending.get(user_id)
+            if newer:
+                self._pending[user_id] = delta.combine(newer)
+            elif len(self._pending) < self.max_pending:
+                self._pending[user_id] = delta
+            else:
+                dropped += 1
+        if dropped:
+            self.dropped += dropped
+            logger.warning(f"Personality profile buffer full; dropped updates for {dropped} users")
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop buffering and flush what is pending"""
+        self._closing = True
+        if self._task is not None and not self._task.done() and self._loop is asyncio.get_running_loop():
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Profile writer did not drain within {timeout}s; {len(self._pending)} profile updates lost")
+                self._task.cancel()
+        self._closing = False
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None and not self._task.done(),
+            "flush_interval_seconds": self.flush_interval,
+            "pending_users": len(self._pending),
+            "pending_interactions": sum(delta.interactions for delta in self._pending.values()),
+            "recorded": self.recorded,
+            "written": self.written,
+            "flushes": self.flushes,
+            "conflicts": self.conflicts,
+            "failed_flushes": self.failed_flushes,
+            "discarded": self.discarded,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,174 @@
+"""
+Pooled SMTP transport
+=====================
+
+Keeps authenticated SMTP connections open between messages instead of
+paying a TCP + STARTTLS + AUTH handshake for every email. One pool is
+kept per (host, port, username, start_tls), so the alert notifier and
+the transactional email service share connections whenever they point
+at the same server.
+
+Idle connections older than SMTP_POOL_IDLE_SECONDS are closed on the
+next checkout; a connection the server dropped while idle is replaced
+and the message retried once.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from email.message import Message
+from typing import Deque, Dict, Optional, Sequence, Tuple
+
+import aiosmtplib
+
+logger = logging.getLogger(__name__)
+
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_POOL_IDLE_SECONDS = float(os.getenv("SMTP_POOL_IDLE_SECONDS", "60"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+
+
+class SMTPConnectionPool:
+    """Up to max_size persistent connections to one SMTP server"""
+
+    def __init__(self,
+                 hostname: str,
+                 port: int,
+                 username: Optional[str] = None,
+                 password: Optional[str] = None,
+                 start_tls: bool = True,
+                 max_size: int = SMTP_POOL_SIZE,
+                 idle_seconds: float = SMTP_POOL_IDLE_SECONDS,
+                 timeout: float = SMTP_TIMEOUT_SECONDS):
+        self.hostname = hostname
+        self.port = port
+        self.username = username or None
+        self.password = password or None
+        self.start_tls = start_tls
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.timeout = timeout
+
+        self._idle: Deque[Tuple[aiosmtplib.SMTP, float]] = deque()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.reconnects = 0
+        self.messages_sent = 0
+        self.send_failures = 0
+
+    def _bind_loop(self):
+        """Connections belong to the loop that opened them; start over on a new one"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            while self._idle:
+                self._idle.pop()[0].close()
+            self._slots = asyncio.Semaphore(self.max_size)
+            self._loop = loop
+
+    def _new_client(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            start_tls=self.start_tls,
+            timeout=self.timeout
+        )
+
+    async def _checkout(self) -> aiosmtplib.SMTP:
+        now = time.monotonic()
+        while self._idle:
+            client, released_at = self._idle.pop()
+            if client.is_connected and now - released_at < self.idle_seconds:
+                self.connections_reused += 1
+                return client
+            await self._discard(client)
+
+        client = self._new_client()
+        await client.connect()
+        self.connections_opened += 1
+        return client
+
+    async def _discard(self, client: aiosmtplib.SMTP):
+        """Say goodbye politely if the connection still works, otherwise just drop it"""
+        try:
+            if client.is_connected:
+                await asyncio.wait_for(client.quit(), timeout=1.0)
+        except Exception:
+            pass
+        finally:
+            client.close()
+
+    async def send(self,
+                   message: Message,
+                   sender: Optional[str] = None,
+                   recipients: Optional[Sequence[str]] = None):
+        """Send a message over a pooled connection; raises on failure"""
+        self._bind_loop()
+        async with self._slots:
+            for attempt in range(2):
+                client = await self._checkout()
+                try:
+                    await client.send_message(message, sender=sender, recipients=recipients)
+                except aiosmtplib.SMTPServerDisconnected:
+                    client.close()
+                    if attempt:
+                        self.send_failures += 1
+                        raise
+                    # Dropped while idle; retry once on a fresh connection
+                    self.reconnects += 1
+                    continue
+                except Exception:
+                    self.send_failures += 1
+                    client.close()
+                    raise
+
+                self._idle.append((client, time.monotonic()))
+                self.messages_sent += 1
+                return
+
+    async def close(self):
+        """Close every idle connection"""
+        while self._idle:
+            await self._discard(self._idle.pop()[0])
+        self._loop = None
+
+    def get_metrics(self) -> Dict[str, object]:
+        return {
+            "server": f"{self.hostname}:{self.port}",
+            "max_size": self.max_size,
+            "idle_connections": len(self._idle),
+            "connections_opened": self.connections_opened,
+            "connections_reused": self.connections_reused,
+            "reconnects": self.reconnects,
+            "messages_sent": self.messages_sent,
+            "send_failures": self.send_failures,
+        }
+
+
+# Global pools, one per server and account
+_smtp_pools: Dict[Tuple[str, int, str, bool], SMTPConnectionPool] = {}
+
+
+def get_smtp_pool(hostname: str,
+                  port: int,
+                  username: Optional[str] = None,
+                  password: Optional[str] = None,
+                  start_tls: bool = True) -> SMTPConnectionPool:
+    """Get the shared pool for an SMTP server and account"""
+    key = (hostname, int(port), username or "", start_tls)
+    pool = _smtp_pools.get(key)
+    if pool is None:
+        pool = _smtp_pools[key] = SMTPConnectionPool(hostname, int(port), username, password, start_tls)
+    return pool
+
+
+async def close_smtp_pools():
+    """Close the connections held by every shared pool"""
+    for pool in list(_smtp_pools.values()):
+        await pool.close()
@@ -0,0 +1,337 @@
+"""
+Voice Result Cache
+==================
+
+Two-tier cache for speech recognition and synthesis results.
+
+The memory tier is an LRU bounded by the encoded size of its entries in
+bytes, so a few long recordings cannot crowd out many short phrases and
+the hottest entries always stay. Entries evicted from memory, and entries
+written by other workers, are found in the disk tier: one file per key
+under VOICE_CACHE_DIR, read through mmap. Both byte budgets apply to each
+cache separately. Keys are BLAKE2b digests of the
+request content, so every worker on the host computes the same file name
+for the same request and shares the entry.
+
+Files are written to a temporary name and renamed into place, so readers
+never see a partial entry. The disk tier is trimmed back to its byte budget
+by removing the least recently used files (by mtime, refreshed on every
+hit), in a background thread once enough has been written since the last
+trim.
+
+Async callers use get_async()/put_async(): memory hits are answered
+inline and disk reads and writes run in a worker thread, so file IO never
+blocks the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+VOICE_CACHE_MEMORY_BYTES = int(os.getenv("VOICE_CACHE_MEMORY_MB", "64")) * 1024 * 1024
+VOICE_CACHE_DISK_BYTES = int(os.getenv("VOICE_CACHE_DISK_MB", "512")) * 1024 * 1024
+VOICE_CACHE_DIR = os.getenv("VOICE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "localstorm-voice-cache"))
+
+ENTRY_MAGIC = b"LSVC"
+ENTRY_HEADER = struct.Struct("<4sI")
+
+# Encoders turn a cached value into (metadata, payload) and back
+Encoder = Callable[[Any], Tuple[Dict[str, Any], bytes]]
+Decoder = Callable[[Dict[str, Any], bytes], Any]
+
+
+def cache_key(*parts: Any) -> str:
+    """Content-addressed key for a cache entry"""
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        data = part if isinstance(part, (bytes, bytearray, memoryview)) else str(part).encode()
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") differ
+        digest.update(struct.pack("<Q", len(data)))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def encode_entry(metadata: Dict[str, Any], payload: bytes) -> bytes:
+    meta = json.dumps(metadata, separators=(",", ":")).encode()
+    return ENTRY_HEADER.pack(ENTRY_MAGIC, len(meta)) + meta + payload
+
+
+def decode_entry(data) -> Tuple[Dict[str, Any], bytes]:
+    magic, meta_length = ENTRY_HEADER.unpack_from(data)
+    if magic != ENTRY_MAGIC:
+        raise ValueError("Not a voice cache entry")
+    meta_end = ENTRY_HEADER.size + meta_length
+    metadata = json.loads(bytes(data[ENTRY_HEADER.size:meta_end]))
+    return metadata, bytes(data[meta_end:])
+
+
+class DiskCacheTier:
+    """Content-addressed entry files shared by every worker on the host"""
+
+    def __init__(self, directory: str, max_bytes: int = VOICE_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._written_since_trim = 0
+        self._trimming = False
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.errors = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    entry = decode_entry(mapped)
+            os.utime(path)
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Truncated or foreign file: drop it and treat as a miss
+            self.errors += 1
+            logger.warning(f"Discarding unreadable voice cache entry {key}: {e}")
+            self._remove(path)
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError:
+                self._remove(tmp_path)
+                raise
+        except OSError as e:
+            self.errors += 1
+            logger.warning(f"Failed to write voice cache entry {key}: {e}")
+            return
+
+        with self._lock:
+            self._written_since_trim += len(data)
+            should_trim = self._written_since_trim > self.max_bytes // 10 and not self._trimming
+            if should_trim:
+                self._written_since_trim = 0
+                self._trimming = True
+        if should_trim:
+            threading.Thread(target=self._trim_in_background, name="voice-cache-trim", daemon=True).start()
+
+    def _trim_in_background(self):
+        try:
+            self.trim()
+        except Exception as e:
+            logger.warning(f"Voice cache trim failed: {e}")
+        finally:
+            with self._lock:
+                self._trimming = False
+
+    def trim(self):
+        """Remove least recently used entries until the tier fits its budget"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                self.evictions += 1
+            total -= size
+
+    def clear(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                self._remove(os.path.join(root, name))
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def __len__(self) -> int:
+        return sum(len(files) for _, _, files in os.walk(self.directory))
+
+
+class VoiceResultCache:
+    """
+    Byte-bounded LRU in memory in front of a shared disk tier
+
+    Values are stored as objects in memory and as encoded entries on disk;
+    encoder/decoder convert between the two. A disk hit is promoted back
+    into memory.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        encoder: Encoder,
+        decoder: Decoder,
+        max_bytes: int = VOICE_CACHE_MEMORY_BYTES,
+        disk: Optional[DiskCacheTier] = None
+    ):
+        self.name = name
+        self.encoder = encoder
+        self.decoder = decoder
+        self.max_bytes = max_bytes
+        self.disk = disk
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        return self._get_disk(key)
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        """get() without blocking the event loop on the disk tier"""
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        if self.disk is None:
+            self._count_miss()
+            return None
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+        return None
+
+    def _get_disk(self, key: str) -> Optional[Any]:
+        if self.disk is not None:
+            stored = self.disk.get(key)
+            if stored is not None:
+                try:
+                    value = self.decoder(*stored)
+                except Exception as e:
+                    logger.warning(f"Failed to decode {self.name} cache entry: {e}")
+                else:
+                    self._store(key, value, _entry_size(*stored))
+                    with self._lock:
+                        self.disk_hits += 1
+                    return value
+
+        self._count_miss()
+        return None
+
+    def _count_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key: str, value: Any):
+        data = self._put_memory(key, value)
+        if self.disk is not None:
+            self.disk.put(key, data)
+
+    async def put_async(self, key: str, value: Any):
+        """put() without blocking the event loop on the disk tier"""
+        data = self._put_memory(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, data)
+
+    def _put_memory(self, key: str, value: Any) -> bytes:
+        """Store in memory; returns the encoded entry for the disk tier"""
+        metadata, payload = self.encoder(value)
+        data = encode_entry(metadata, payload)
+        self._store(key, value, len(data))
+        return data
+
+    def _store(self, key: str, value: Any, size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            metrics = {
+                "entries": len(self._entries),
+                "memory_bytes": self._size,
+                "memory_limit_bytes": self.max_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+        if self.disk is not None:
+            metrics["disk_evictions"] = self.disk.evictions
+            metrics["disk_errors"] = self.disk.errors
+        return metrics
+
+
+def _entry_size(metadata: Dict[str, Any], payload: bytes) -> int:
+    return ENTRY_HEADER.size + len(json.dumps(metadata, separators=(",", ":"))) + len(payload)
+
+
+def create_disk_tier(name: str) -> Optional[DiskCacheTier]:
+    """Disk tier for one cache under VOICE_CACHE_DIR, or None if disabled or unusable"""
+    if not VOICE_CACHE_DIR or VOICE_CACHE_DISK_BYTES <= 0:
+        return None
+    try:
+        return DiskCacheTier(os.path.join(VOICE_CACHE_DIR, name), VOICE_CACHE_DISK_BYTES)
+    except OSError as e:
+        logger.warning(f"Voice disk cache disabled: {e}")
+        return None
@@ -10,12 +10,11 @@ import asyncio
 import json
 import logging
 import time
-from typing import Dict, List, Optional, Any, Union, Tuple
+from typing import Dict, List, Optional, Any, Union, Tuple, AsyncIterator, Awaitable, Callable
 from dataclasses import dataclass, asdict
 from enum import Enum
 import io
 import base64
-import hashlib
 from datetime import datetime, timedelta
 
 # Audio processing imports
@@ -40,6 +39,11 @@ except ImportError:
     ELEVENLABS_AVAILABLE = False
     client = None
 
+from app.services.voice_cache import VoiceResultCache, cache_key, create_disk_tier
+from app.services.voice_streaming import (
+    AudioStreamJoiner, StreamingSpeechSession, get_voice_processing_pool, split_sentences, stream_in_order
+)
+
 logger = logging.getLogger(__name__)
 
 class VoiceProvider(Enum):
@@ -138,6 +142,39 @@ class VoiceAnalytics:
         if self.language_distribution is None:
             self.language_distribution = {}
 
+def preprocess_audio(audio_data: bytes, audio_format: AudioFormat) -> bytes:
+    """Preprocess audio for optimal recognition (CPU-bound; run it on the voice processing pool)"""
+    try:
+        # Convert to wav if needed
+        if audio_format != AudioFormat.WAV:
+            audio = AudioSegment.from_file(io.BytesIO(audio_data), format=audio_format.value)
+            # Standardize format
+            audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
+            wav_io = io.BytesIO()
+            audio.export(wav_io, format="wav")
+            return wav_io.getvalue()
+        
+        # Enhance audio quality
+        audio = AudioSegment.from_wav(io.BytesIO(audio_data))
+        
+        # Normalize volume
+        audio = audio.normalize()
+        
+        # Remove silence
+        audio = audio.strip_silence()
+        
+        # Apply noise reduction if available
+        if len(audio) > 0:
+            wav_io = io.BytesIO()
+            audio.export(wav_io, format="wav")
+            return wav_io.getvalue()
+        
+        return audio_data
+        
+    except Exception as e:
+        logger.warning(f"Audio preprocessing failed: {e}")
+        return audio_data
+
 class VoiceService:
     """
     Comprehensive voice integration service providing speech-to-text and text-to-speech
@@ -149,8 +186,14 @@ class VoiceService:
         self.config = config
         self.analytics = {}  # session_id -> VoiceAnalytics
         self.voice_profiles = self._initialize_voice_profiles()
-        self.audio_cache = {}  # text_hash -> audio_data
-        self.recognition_cache = {}  # audio_hash -> text
+        self.audio_cache = VoiceResultCache(
+            'tts', self._encode_tts_result, self._decode_tts_result,
+            disk=create_disk_tier('tts')
+        )
+        self.recognition_cache = VoiceResultCache(
+            'stt', self._encode_stt_result, self._decode_stt_result,
+            disk=create_disk_tier('stt')
+        )
         
         # Initialize providers
         self._initialize_providers()
@@ -290,9 +333,9 @@ class VoiceService:
                 provider = self._select_best_stt_provider()
             
             # Check cache
-            audio_hash = hashlib.md5(audio_data).hexdigest()
-            if audio_hash in self.recognition_cache:
-                cached_result = self.recognition_cache[audio_hash]
+            audio_hash = cache_key('stt', language, audio_data)
+            cached_result = await self.recognition_cache.get_async(audio_hash)
+            if cached_result is not None:
                 logger.info(f"Using cached speech recognition result")
                 return cached_result
             
@@ -318,7 +361,7 @@ class VoiceService:
             )
             
             # Cache result
-            self.recognition_cache[audio_hash] = stt_result
+            await self.recognition_cache.put_async(audio_hash, stt_result)
             
             # Update analytics
             if session_id and user_id:
@@ -336,6 +379,65 @@ class VoiceService:
             logger.error(f"Speech-to-text failed: {e}")
             raise
     
+    async def speech_to_text_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        audio_format: AudioFormat = AudioFormat.WAV,
+        language: str = "en-US",
+        provider: Optional[VoiceProvider] = None,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        on_partial: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> SpeechToTextResult:
+        """
+        Convert streamed audio chunks to text, preprocessing and recognizing
+        segments while the stream is still arriving; on_partial receives the
+        transcript so far after each segment
+        """
+        start_time = time.time()
+        
+        if provider is None:
+            provider = self._select_best_stt_provider()
+        
+        try:
+            session = StreamingSpeechSession(
+                recognize=lambda wav: self._perform_speech_recognition(wav, provider, language),
+                audio_format=audio_format.value,
+                on_partial=on_partial
+            )
+            async for chunk in chunks:
+                await session.feed(chunk)
+            result = await session.finish()
+            
+            processing_time = time.time() - start_time
+            
+            stt_result = SpeechToTextResult(
+                text=result['text'],
+                confidence=result['confidence'],
+                provider=provider,
+                language=language,
+                duration=result['duration'],
+                processing_time=processing_time,
+                alternatives=[]
+            )
+            
+            # Update analytics
+            if session_id and user_id:
+                await self._update_stt_analytics(session_id, user_id, stt_result)
+            
+            # Update performance metrics
+            self._update_performance_metrics('speech_to_text', provider, processing_time, True)
+            
+            logger.info(f"Streaming speech-to-text completed: {result['segments']} segments, "
+                        f"{result['duration']:.1f}s of audio in {processing_time:.2f}s")
+            return stt_result
+            
+        except Exception as e:
+            processing_time = time.time() - start_time
+            self._update_performance_metrics('speech_to_text', provider, processing_time, False)
+            logger.error(f"Streaming speech-to-text failed: {e}")
+            raise
+    
     async def text_to_speech(
         self,
         text: str,
@@ -351,15 +453,12 @@ class VoiceService:
         
         try:
             # Handle voice profile
-            if isinstance(voice_profile, str):
-                voice_profile = self.voice_profiles.get(voice_profile)
-            if voice_profile is None:
-                voice_profile = self._select_best_voice_profile(user_id)
+            voice_profile = self.resolve_voice_profile(voice_profile, user_id)
             
             # Check cache
-            text_hash = hashlib.md5(f"{text}_{voice_profile.voice_id}".encode()).hexdigest()
-            if text_hash in self.audio_cache:
-                cached_audio = self.audio_cache[text_hash]
+            text_hash = cache_key('tts', text, voice_profile.voice_id, audio_format.value)
+            cached_audio = await self.audio_cache.get_async(text_hash)
+            if cached_audio is not None:
                 logger.info(f"Using cached TTS audio")
                 return cached_audio
             
@@ -383,9 +482,8 @@ class VoiceService:
                 file_size=len(audio_data)
             )
             
-            # Cache result (limit cache size)
-            if len(self.audio_cache) < 100:
-                self.audio_cache[text_hash] = tts_result
+            # Cache result (least recently used entries are evicted)
+            await self.audio_cache.put_async(text_hash, tts_result)
             
             # Update analytics
             if session_id and user_id:
@@ -404,38 +502,111 @@ class VoiceService:
             logger.error(f"Text-to-speech failed: {e}")
             raise
     
+    def _encode_stt_result(self, result: SpeechToTextResult) -> Tuple[Dict[str, Any], bytes]:
+        return {
+            'text': result.text,
+            'confidence': result.confidence,
+            'provider': result.provider.value,
+            'language': result.language,
+            'duration': result.duration,
+            'processing_time': result.processing_time,
+            'alternatives': result.alternatives
+        }, b""
+    
+    def _decode_stt_result(self, metadata: Dict[str, Any], payload: bytes) -> SpeechToTextResult:
+        return SpeechToTextResult(**{**metadata, 'provider': VoiceProvider(metadata['provider'])})
+    
+    def _encode_tts_result(self, result: TextToSpeechResult) -> Tuple[Dict[str, Any], bytes]:
+        return {
+            'audio_format': result.audio_format.value,
+            'provider': result.provider.value,
+            'voice_id': result.voice_profile.voice_id,
+            'text_length': result.text_length,
+            'audio_duration': result.audio_duration,
+            'processing_time': result.processing_time
+        }, result.audio_data
+    
+    def _decode_tts_result(self, metadata: Dict[str, Any], payload: bytes) -> TextToSpeechResult:
+        provider = VoiceProvider(metadata['provider'])
+        voice_profile = next(
+            (profile for profile in self.voice_profiles.values() if profile.voice_id == metadata['voice_id']),
+            None
+        ) or VoiceProfile(
+            provider=provider,
+            voice_id=metadata['voice_id'],
+            name=metadata['voice_id'],
+            gender=VoiceGender.NEUTRAL
+        )
+        return TextToSpeechResult(
+            audio_data=payload,
+            audio_format=AudioFormat(metadata['audio_format']),
+            provider=provider,
+            voice_profile=voice_profile,
+            text_length=metadata['text_length'],
+            audio_duration=metadata['audio_duration'],
+            processing_time=metadata['processing_time'],
+            file_size=len(payload)
+        )
+    
+    def resolve_voice_profile(
+        self,
+        voice_profile: Optional[Union[str, VoiceProfile]] = None,
+        user_id: Optional[str] = None
+    ) -> VoiceProfile:
+        """Voice profile by ID or instance, falling back to the best one for the user"""
+        if isinstance(voice_profile, str):
+            voice_profile = self.voice_profiles.get(voice_profile)
+        if voice_profile is None:
+            voice_profile = self._select_best_voice_profile(user_id)
+        return voice_profile
+    
+    async def text_to_speech_stream(
+        self,
+        text: str,
+        voice_profile: Optional[Union[str, VoiceProfile]] = None,
+        audio_format: AudioFormat = AudioFormat.MP3,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Convert text to speech sentence by sentence, yielding audio as soon
+        as each segment and all segments before it are synthesized
+        
+        Segments are synthesized concurrently through text_to_speech, so
+        repeated sentences are served from the audio cache.
+        """
+        start_time = time.time()
+        voice_profile = self.resolve_voice_profile(voice_profile, user_id)
+        joiner = AudioStreamJoiner(audio_format.value)
+        segments = split_sentences(text)
+        results: List[TextToSpeechResult] = []
+        
+        async def synthesize(segment: str) -> TextToSpeechResult:
+            return await self.text_to_speech(segment, voice_profile, audio_format)
+        
+        async for result in stream_in_order(segments, synthesize):
+            results.append(result)
+            yield joiner.join(result.audio_data)
+        
+        processing_time = time.time() - start_time
+        logger.info(f"Streaming text-to-speech completed: {len(text)} chars in "
+                    f"{len(segments)} segments in {processing_time:.2f}s")
+        
+        if session_id and user_id:
+            await self._update_tts_analytics(session_id, user_id, TextToSpeechResult(
+                audio_data=b"",
+                audio_format=audio_format,
+                provider=voice_profile.provider,
+                voice_profile=voice_profile,
+                text_length=len(text),
+                audio_duration=sum(result.audio_duration for result in results),
+                processing_time=processing_time,
+                file_size=sum(result.file_size for result in results)
+            ))
+    
     async def _preprocess_audio(self, audio_data: bytes, audio_format: AudioFormat) -> bytes:
-        """Preprocess audio for optimal recognition"""
-        try:
-            # Convert to wav if needed
-            if audio_format != AudioFormat.WAV:
-                audio = AudioSegment.from_file(io.BytesIO(audio_data), format=audio_format.value)
-                # Standardize format
-                audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
-                wav_io = io.BytesIO()
-                audio.export(wav_io, format="wav")
-                return wav_io.getvalue()
-            
-            # Enhance audio quality
-            audio = AudioSegment.from_wav(io.BytesIO(audio_data))
-            
-            # Normalize volume
-            audio = audio.normalize()
-            
-            # Remove silence
-            audio = audio.strip_silence()
-            
-            # Apply noise reduction if available
-            if len(audio) > 0:
-                wav_io = io.BytesIO()
-                audio.export(wav_io, format="wav")
-                return wav_io.getvalue()
-            
-            return audio_data
-            
-        except Exception as e:
-            logger.warning(f"Audio preprocessing failed: {e}")
-            return audio_data
+        """Preprocess audio for optimal recognition on the voice processing pool"""
+        return await get_voice_processing_pool().run(preprocess_audio, audio_data, audio_format)
     
     async def _perform_speech_recognition(
         self,
@@ -772,12 +943,19 @@ class VoiceService:
     
     async def get_performance_metrics(self) -> Dict[str, Any]:
         """Get performance metrics"""
-        return self.performance_metrics
+        return {
+            **self.performance_metrics,
+            'processing_pool': get_voice_processing_pool().get_metrics(),
+            'cache': {
+                'audio': self.audio_cache.get_metrics(),
+                'recognition': self.recognition_cache.get_metrics()
+            }
+        }
     
     async def clear_cache(self):
         """Clear audio and recognition caches"""
-        self.audio_cache.clear()
-        self.recognition_cache.clear()
+        await asyncio.to_thread(self.audio_cache.clear)
+        await asyncio.to_thread(self.recognition_cache.clear)
         logger.info("Voice service caches cleared")
     
     async def health_check(self) -> Dict[str, Any]:
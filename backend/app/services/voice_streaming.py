@@ -0,0 +1,503 @@
+"""
+Streaming Speech-to-Text Pipeline
+=================================
+
+Audio arrives as raw binary chunks (HTTP body or WebSocket frames) instead
+of base64 inside JSON. WAV/PCM input is cut into segments of about
+VOICE_STREAM_SEGMENT_SECONDS, split at the quietest frame near the
+boundary so words are not cut, and each segment is preprocessed (resample,
+normalize, strip silence) on a bounded worker pool while the rest of the
+upload is still arriving. Segments are recognized as soon as they are
+ready and partial transcripts are emitted in order.
+
+Compressed formats cannot be decoded from an arbitrary byte offset, so
+they are buffered and decoded on the pool once the stream ends.
+
+Text-to-speech goes the other way: text is split into sentences, segments
+are synthesized concurrently and their audio is written out in order as
+soon as each one (and everything before it) is ready.
+"""
+
+import asyncio
+import audioop
+import io
+import os
+import logging
+import re
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pydub import AudioSegment
+
+logger = logging.getLogger(__name__)
+
+VOICE_PROCESSING_WORKERS = int(os.getenv("VOICE_PROCESSING_WORKERS", str(min(4, os.cpu_count() or 1))))
+VOICE_PROCESSING_MAX_PENDING = int(os.getenv("VOICE_PROCESSING_MAX_PENDING", "64"))
+VOICE_STREAM_SEGMENT_SECONDS = float(os.getenv("VOICE_STREAM_SEGMENT_SECONDS", "5"))
+VOICE_STREAM_MAX_INFLIGHT = int(os.getenv("VOICE_STREAM_MAX_INFLIGHT", "4"))
+VOICE_STREAM_MAX_BYTES = int(os.getenv("VOICE_STREAM_MAX_BYTES", str(25 * 1024 * 1024)))
+VOICE_TTS_MAX_CONCURRENCY = int(os.getenv("VOICE_TTS_MAX_CONCURRENCY", "3"))
+VOICE_TTS_MAX_SEGMENT_CHARS = int(os.getenv("VOICE_TTS_MAX_SEGMENT_CHARS", "300"))
+
+TARGET_SAMPLE_RATE = 16000
+STREAMING_WAV_SIZE = 0xFFFFFFFF
+
+SENTENCE_END_RE = re.compile(r'(?:(?<=[.!?…])|(?<=[.!?…]["\')\]]))\s+|\n{2,}')
+CLAUSE_END_RE = re.compile(r'(?<=[,;:])\s+')
+SPLIT_SEARCH_SECONDS = 1.0
+SPLIT_FRAME_SECONDS = 0.02
+
+
+class VoiceProcessingBusy(Exception):
+    """Raised when the audio processing queue is full"""
+
+
+class StreamTooLarge(Exception):
+    """Raised when a stream exceeds VOICE_STREAM_MAX_BYTES"""
+
+
+class VoiceProcessingPool:
+    """
+    Bounded thread pool for CPU-bound audio work (decode, resample,
+    normalize, strip silence) so it never runs on the event loop.
+    """
+
+    def __init__(self, max_workers: int = VOICE_PROCESSING_WORKERS, max_pending: int = VOICE_PROCESSING_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cpu_seconds = 0.0
+        self.queue_wait_ms = deque(maxlen=1000)
+        self.run_ms = deque(maxlen=1000)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="voice-processing"
+            )
+        return self._executor
+
+    async def run(self, func, *args):
+        """Run an audio processing function on the pool"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise VoiceProcessingBusy("Audio processing queue is full")
+            self.pending += 1
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            cpu_started = time.thread_time()
+            with self._lock:
+                self.active += 1
+                self.queue_wait_ms.append((started - submitted) * 1000)
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.cpu_seconds += time.thread_time() - cpu_started
+                    self.run_ms.append((time.perf_counter() - started) * 1000)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, timed)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self.queue_wait_ms)
+            runs = sorted(self.run_ms)
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "active": self.active,
+                "queue_depth": self.pending - self.active,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "cpu_seconds": round(self.cpu_seconds, 3),
+                "p95_queue_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else 0.0,
+                "p95_run_ms": round(runs[min(len(runs) - 1, int(len(runs) * 0.95))], 2) if runs else 0.0,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+voice_processing_pool = VoiceProcessingPool()
+
+
+def get_voice_processing_pool() -> VoiceProcessingPool:
+    """Get the global voice processing pool"""
+    return voice_processing_pool
+
+
+@dataclass
+class PCMFormat:
+    """Layout of raw PCM samples"""
+    channels: int
+    sample_rate: int
+    sample_width: int
+
+    @property
+    def frame_size(self) -> int:
+        return self.channels * self.sample_width
+
+    @property
+    def bytes_per_second(self) -> int:
+        return self.frame_size * self.sample_rate
+
+
+def parse_wav_header(buffer: bytes):
+    """
+    (PCMFormat, offset of the sample data) once the RIFF header is complete,
+    else None. The data chunk size is ignored: streaming encoders often
+    leave it as 0 or 0xFFFFFFFF.
+    """
+    if len(buffer) < 12:
+        return None
+    if buffer[:4] != b"RIFF" or buffer[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE stream")
+
+    offset = 12
+    pcm_format = None
+    while len(buffer) >= offset + 8:
+        chunk_id = buffer[offset:offset + 4]
+        chunk_size = struct.unpack("<I", buffer[offset + 4:offset + 8])[0]
+        body = offset + 8
+        if chunk_id == b"data":
+            if pcm_format is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            return pcm_format, body
+        if len(buffer) < body + chunk_size:
+            return None
+        if chunk_id == b"fmt ":
+            audio_format, channels, sample_rate = struct.unpack("<HHI", buffer[body:body + 8])
+            sample_width = struct.unpack("<H", buffer[body + 14:body + 16])[0] // 8
+            if audio_format not in (1, 0xFFFE):
+                raise ValueError("Only PCM WAV can be streamed")
+            pcm_format = PCMFormat(channels, sample_rate, sample_width)
+        offset = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def quietest_split(pcm: bytes, pcm_format: PCMFormat, target: int) -> int:
+    """Byte offset near target (within the preceding second) at the lowest-energy frame"""
+    frame_bytes = max(pcm_format.frame_size, int(pcm_format.bytes_per_second * SPLIT_FRAME_SECONDS)
+                      // pcm_format.frame_size * pcm_format.frame_size)
+    search_start = max(0, target - int(pcm_format.bytes_per_second * SPLIT_SEARCH_SECONDS))
+    search_start -= search_start % pcm_format.frame_size
+
+    best, best_rms = target, None
+    for start in range(search_start, target - frame_bytes + 1, frame_bytes):
+        rms = audioop.rms(pcm[start:start + frame_bytes], pcm_format.sample_width)
+        # Ties go to the later frame, keeping segments close to the target length
+        if best_rms is None or rms <= best_rms:
+            best, best_rms = start + frame_bytes, rms
+    return best - best % pcm_format.frame_size
+
+
+def enhance_segment(audio: AudioSegment) -> bytes:
+    """Standardize to 16kHz mono 16-bit, normalize and strip silence; WAV bytes ('' if silent)"""
+    audio = audio.set_frame_rate(TARGET_SAMPLE_RATE).set_channels(1).set_sample_width(2)
+    audio = audio.normalize().strip_silence()
+    if len(audio) == 0:
+        return b""
+    wav_io = io.BytesIO()
+    audio.export(wav_io, format="wav")
+    return wav_io.getvalue()
+
+
+def preprocess_pcm_segment(pcm: bytes, pcm_format: PCMFormat) -> bytes:
+    """Worker-pool step for one streamed segment"""
+    return enhance_segment(AudioSegment(
+        data=pcm,
+        sample_width=pcm_format.sample_width,
+        frame_rate=pcm_format.sample_rate,
+        channels=pcm_format.channels,
+    ))
+
+
+def preprocess_audio_file(audio_data: bytes, audio_format: str):
+    """Worker-pool step for a complete clip in any format pydub can decode: (WAV bytes, seconds)"""
+    audio = AudioSegment.from_file(io.BytesIO(audio_data), format=audio_format)
+    return enhance_segment(audio), len(audio) / 1000.0
+
+
+PartialCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class StreamingSpeechSession:
+    """
+    One streamed recognition: feed() chunks as they arrive, then finish().
+
+    Each segment is preprocessed on the pool and recognized concurrently
+    with later segments; transcripts are published strictly in order
+    through on_partial. At most max_inflight segments are outstanding,
+    so a slow provider pushes back on the sender instead of growing memory.
+    """
+
+    def __init__(self,
+                 recognize: Callable[[bytes], Awaitable[Dict[str, Any]]],
+                 audio_format: str = "wav",
+                 on_partial: Optional[PartialCallback] = None,
+                 pool: Optional[VoiceProcessingPool] = None,
+                 segment_seconds: float = VOICE_STREAM_SEGMENT_SECONDS,
+                 max_inflight: int = VOICE_STREAM_MAX_INFLIGHT,
+                 max_bytes: int = VOICE_STREAM_MAX_BYTES):
+        self.recognize = recognize
+        self.audio_format = audio_format
+        self.on_partial = on_partial
+        self.pool = pool or voice_processing_pool
+        self.segment_seconds = segment_seconds
+        self.max_inflight = max_inflight
+        self.max_bytes = max_bytes
+
+        self.pcm_format: Optional[PCMFormat] = None
+        self.received_bytes = 0
+        self.audio_seconds = 0.0
+        self.segments: List[Dict[str, Any]] = []
+        self.started_at: Optional[float] = None
+
+        self._header = b""
+        self._pcm = bytearray()
+        self._encoded = bytearray()
+        self._tasks: "deque[asyncio.Task]" = deque()
+        self._last_task: Optional[asyncio.Task] = None
+        self._scheduled = 0
+
+    @property
+    def streams_pcm(self) -> bool:
+        return self.audio_format == "wav"
+
+    async def feed(self, chunk: bytes):
+        """Accept the next chunk; segments are scheduled as soon as they are complete"""
+        if not chunk:
+            return
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        self.received_bytes += len(chunk)
+        if self.received_bytes > self.max_bytes:
+            raise StreamTooLarge(f"Audio stream exceeds {self.max_bytes} bytes")
+
+        if not self.streams_pcm:
+            self._encoded.extend(chunk)
+            return
+
+        if self.pcm_format is None:
+            self._header += chunk
+            parsed = parse_wav_header(self._header)
+            if parsed is None:
+                return
+            self.pcm_format, offset = parsed
+            chunk, self._header = self._header[offset:], b""
+
+        self._pcm.extend(chunk)
+        segment_bytes = int(self.pcm_format.bytes_per_second * self.segment_seconds)
+        segment_bytes -= segment_bytes % self.pcm_format.frame_size
+        while len(self._pcm) >= segment_bytes:
+            split = quietest_split(self._pcm, self.pcm_format, segment_bytes)
+            await self._schedule(bytes(self._pcm[:split]))
+            del self._pcm[:split]
+
+    async def _schedule(self, pcm: bytes):
+        while len(self._tasks) >= self.max_inflight:
+            await self._tasks.popleft()
+
+        index = self._scheduled
+        self._scheduled += 1
+        seconds = len(pcm) / self.pcm_format.bytes_per_second
+        self.audio_seconds += seconds
+        task = asyncio.create_task(self._process(
+            index, seconds, self.pool.run(preprocess_pcm_segment, pcm, self.pcm_format), self._last_task
+        ))
+        self._tasks.append(task)
+        self._last_task = task
+
+    async def _process(self, index: int, seconds: float, preprocessing: Awaitable[bytes],
+                       previous: Optional[asyncio.Task]):
+        result = await self._recognize(await preprocessing)
+        if previous is not None:
+            await previous
+        await self._publish(index, seconds, result)
+
+    async def _recognize(self, wav: bytes) -> Dict[str, Any]:
+        return await self.recognize(wav) if wav else {"text": "", "confidence": 0.0}
+
+    async def _publish(self, index: int, seconds: float, result: Dict[str, Any]):
+        segment = {
+            "index": index,
+            "text": (result.get("text") or "").strip(),
+            "confidence": result.get("confidence", 0.0),
+            "duration": seconds,
+        }
+        self.segments.append(segment)
+        if self.on_partial is not None:
+            await self.on_partial({
+                "type": "partial",
+                "segment": index,
+                "text": segment["text"],
+                "transcript": self.transcript,
+                "audio_seconds": round(sum(s["duration"] for s in self.segments), 3),
+            })
+
+    @property
+    def transcript(self) -> str:
+        return " ".join(segment["text"] for segment in self.segments if segment["text"])
+
+    async def finish(self) -> Dict[str, Any]:
+        """Flush the tail, wait for every segment and return the combined transcript"""
+        try:
+            if self.streams_pcm:
+                if self.pcm_format is None:
+                    raise ValueError("Audio stream ended before the WAV header was complete")
+                if self._pcm:
+                    await self._schedule(bytes(self._pcm))
+                    self._pcm.clear()
+            elif self._encoded:
+                task = asyncio.create_task(self._process_encoded(bytes(self._encoded)))
+                self._encoded.clear()
+                self._tasks.append(task)
+
+            while self._tasks:
+                await self._tasks.popleft()
+        except BaseException:
+            for task in self._tasks:
+                task.cancel()
+            raise
+
+        voiced = [s for s in self.segments if s["text"]]
+        voiced_seconds = sum(s["duration"] for s in voiced)
+        confidence = (
+            sum(s["confidence"] * s["duration"] for s in voiced) / voiced_seconds
+            if voiced_seconds else 0.0
+        )
+        return {
+            "text": self.transcript,
+            "confidence": confidence,
+            "duration": self.audio_seconds,
+            "segments": len(self.segments),
+        }
+
+    async def _process_encoded(self, audio_data: bytes):
+        wav, self.audio_seconds = await self.pool.run(preprocess_audio_file, audio_data, self.audio_format)
+        await self._publish(0, self.audio_seconds, await self._recognize(wav))
+
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    """Break an over-long sentence at clause boundaries, then at spaces"""
+    pieces: List[str] = []
+    current = ""
+    for clause in CLAUSE_END_RE.split(text):
+        for word in clause.split(" ") if len(clause) > max_chars else [clause]:
+            candidate = f"{current} {word}" if current else word
+            if len(candidate) > max_chars and current:
+                pieces.append(current)
+                current = word
+            else:
+                current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_sentences(text: str, max_chars: int = VOICE_TTS_MAX_SEGMENT_CHARS) -> List[str]:
+    """
+    Sentence-level segments for synthesis. Sentences longer than max_chars
+    are broken at clauses; very short ones are merged with the following
+    sentence so each provider call carries a useful amount of speech.
+    """
+    segments: List[str] = []
+    pending = ""
+    for sentence in SENTENCE_END_RE.split(text):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        if pending:
+            sentence = f"{pending} {sentence}"
+            pending = ""
+        if len(sentence) < 12:
+            pending = sentence
+            continue
+        segments.extend(_split_long(sentence, max_chars) if len(sentence) > max_chars else [sentence])
+    if pending:
+        if segments and len(segments[-1]) + len(pending) < max_chars:
+            segments[-1] = f"{segments[-1]} {pending}"
+        else:
+            segments.append(pending)
+    return segments
+
+
+class AudioStreamJoiner:
+    """
+    Turns per-segment audio files into one continuous stream.
+
+    WAV segments each carry a RIFF header: the first header is sent with
+    streaming sizes and later headers are dropped. MP3 frames and chained
+    Ogg pages can be concatenated as they are.
+    """
+
+    def __init__(self, audio_format: str):
+        self.audio_format = audio_format
+        self.pcm_format: Optional[PCMFormat] = None
+
+    def join(self, audio: bytes) -> bytes:
+        if self.audio_format != "wav" or not audio:
+            return audio
+
+        parsed = parse_wav_header(audio)
+        if parsed is None:
+            raise ValueError("Incomplete WAV segment")
+        pcm_format, offset = parsed
+        if self.pcm_format is None:
+            self.pcm_format = pcm_format
+            header = bytearray(audio[:offset])
+            header[4:8] = struct.pack("<I", STREAMING_WAV_SIZE)
+            header[offset - 4:offset] = struct.pack("<I", STREAMING_WAV_SIZE)
+            return bytes(header) + audio[offset:]
+        if pcm_format != self.pcm_format:
+            raise ValueError("WAV segments have different sample formats")
+        return audio[offset:]
+
+
+async def stream_in_order(segments: List[str],
+                          synthesize: Callable[[str], Awaitable[Any]],
+                          max_concurrency: int = VOICE_TTS_MAX_CONCURRENCY):
+    """
+    Synthesize segments concurrently and yield their audio in input order.
+
+    Earlier segments are started first, so the first one is never queued
+    behind later work; at most max_concurrency syntheses run at once.
+    Pending work is cancelled if the consumer stops early.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def bounded(segment: str) -> Any:
+        async with semaphore:
+            return await synthesize(segment)
+
+    tasks = [asyncio.create_task(bounded(segment)) for segment in segments]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,77 @@
+"""
+Audit Log Partition Maintenance
+===============================
+
+Pre-creates monthly audit_logs partitions, rolls finished months out of the
+hot table on SQLite and drops partitions past AUDIT_RETENTION_DAYS.
+
+Usage:
+    python backend/maintain_audit_partitions.py [--dry-run] [--months-ahead N] [--retention-days N]
+    heroku run python backend/maintain_audit_partitions.py -a your-app-name
+
+Schedule it daily (e.g. Heroku Scheduler) so partitions always exist ahead
+of the data being written.
+"""
+
+import os
+import sys
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.services.audit_partitions import (
+    AUDIT_PARTITION_MONTHS_AHEAD,
+    AUDIT_RETENTION_DAYS,
+    AuditPartitionManager,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain monthly audit log partitions")
+    parser.add_argument("--months-ahead", type=int, default=AUDIT_PARTITION_MONTHS_AHEAD,
+                        help="Months of partitions to keep ready ahead of now")
+    parser.add_argument("--retention-days", type=int, default=AUDIT_RETENTION_DAYS,
+                        help="Drop partitions whose whole month is older than this")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List partitions and what would expire without changing anything")
+    args = parser.parse_args(argv)
+
+    manager = AuditPartitionManager(retention_days=args.retention_days, months_ahead=args.months_ahead)
+    db = SessionLocal()
+    try:
+        if not manager.is_partitioned(db):
+            logger.error("audit_logs is not partitioned; run the partition_audit_logs migration first")
+            return False
+
+        partitions = manager.list_partitions(db)
+        logger.info(f"Existing partitions: {[p.name for p in partitions]}")
+
+        if args.dry_run:
+            cutoff = datetime.utcnow() - timedelta(days=args.retention_days)
+            logger.info(f"Would drop: {[p.name for p in partitions if p.end <= cutoff]}")
+            return True
+
+        result = manager.run_maintenance(db)
+        logger.info(f"Created partitions: {result['created']}")
+        logger.info(f"Rolled months: {result['rolled']}")
+        logger.info(f"Dropped partitions: {result['dropped']}")
+        logger.info(f"Purged retained rows: {result['retained_rows_purged']}")
+        return True
+    except Exception as e:
+        logger.error(f"Audit partition maintenance failed: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
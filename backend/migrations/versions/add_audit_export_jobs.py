@@ -0,0 +1,66 @@
+"""
+Database Migration: Audit Export Jobs
+=====================================
+
+Background audit exports used to be tracked in the web process and written
+to local disk, so with more than one web worker a status poll or download
+could land on a worker that had never heard of the job. Job state and
+output now live in the database.
+
+Revision ID: add_audit_export_jobs
+Revises: add_audit_stats_rollups
+Create Date: 2025-09-02 09:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'add_audit_export_jobs'
+down_revision = 'add_audit_stats_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    Create the export job and output chunk tables
+    """
+
+    op.create_table(
+        'audit_export_jobs',
+        sa.Column('job_id', sa.String(length=32), primary_key=True),
+        sa.Column('requested_by', sa.String(length=255), nullable=True),
+        sa.Column('start_date', sa.DateTime(), nullable=False),
+        sa.Column('end_date', sa.DateTime(), nullable=False),
+        sa.Column('export_format', sa.String(length=10), nullable=False),
+        sa.Column('compress', sa.Boolean(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('bytes_written', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('chunk_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+    )
+    op.create_index('ix_audit_export_jobs_completed_at', 'audit_export_jobs', ['completed_at'])
+
+    op.create_table(
+        'audit_export_chunks',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('job_id', sa.String(length=32),
+                  sa.ForeignKey('audit_export_jobs.job_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.UniqueConstraint('job_id', 'seq', name='uq_audit_export_chunks_seq'),
+    )
+
+
+def downgrade():
+    """
+    Drop the export job tables
+    """
+
+    op.drop_table('audit_export_chunks')
+    op.drop_index('ix_audit_export_jobs_completed_at', table_name='audit_export_jobs')
+    op.drop_table('audit_export_jobs')
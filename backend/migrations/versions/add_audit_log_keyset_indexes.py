@@ -0,0 +1,74 @@
+"""
+Database Migration: Composite Indexes for Audit Log Queries
+===========================================================
+
+Keyset pagination on (created_at, id) and composite indexes matching the
+filter combinations of GET /api/audit/logs. Single-column indexes that are
+now a prefix of a composite index are dropped to keep inserts cheap.
+
+Indexes are built CONCURRENTLY so the table stays writable on large installs.
+
+Revision ID: add_audit_log_keyset_indexes
+Revises: add_audit_logs_table
+Create Date: 2025-08-12 09:00:00.000000
+"""
+
+from alembic import op
+
+# revision identifiers
+revision = 'add_audit_log_keyset_indexes'
+down_revision = 'add_audit_logs_table'
+branch_labels = None
+depends_on = None
+
+
+COMPOSITE_INDEXES = [
+    ('ix_audit_logs_created_at_id', ['created_at', 'id']),
+    ('ix_audit_logs_user_created_at', ['user_id', 'created_at', 'id']),
+    ('ix_audit_logs_category_created_at', ['event_category', 'created_at', 'id']),
+    ('ix_audit_logs_type_created_at', ['event_type', 'created_at', 'id']),
+    ('ix_audit_logs_success_created_at', ['success', 'created_at', 'id', 'risk_score']),
+]
+
+# Covered by the composite indexes above: the explicit and the column
+# (index=True) indexes created by add_audit_logs_table
+SUPERSEDED_INDEXES = [
+    ('idx_audit_logs_user_time', ['user_id', 'created_at']),
+    ('idx_audit_logs_event_time', ['event_type', 'created_at']),
+    ('idx_audit_logs_success_risk', ['success', 'risk_score']),
+    ('ix_audit_logs_user_id', ['user_id']),
+    ('ix_audit_logs_event_type', ['event_type']),
+    ('ix_audit_logs_event_category', ['event_category']),
+    ('ix_audit_logs_success', ['success']),
+    ('ix_audit_logs_created_at', ['created_at']),
+]
+
+
+def upgrade():
+    """
+    Create composite audit log indexes and drop the ones they supersede
+    """
+
+    with op.get_context().autocommit_block():
+        for name, columns in COMPOSITE_INDEXES:
+            op.create_index(name, 'audit_logs', columns,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+        for name, _ in SUPERSEDED_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name};")
+
+    op.execute("ANALYZE audit_logs;")
+
+
+def downgrade():
+    """
+    Restore the original audit log indexes
+    """
+
+    with op.get_context().autocommit_block():
+        for name, columns in SUPERSEDED_INDEXES:
+            op.create_index(name, 'audit_logs', columns,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+        for name, _ in COMPOSITE_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name};")
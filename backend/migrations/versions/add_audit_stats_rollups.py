@@ -0,0 +1,103 @@
+"""
+Database Migration: Audit Statistics Rollups
+============================================
+
+Hourly and daily per-category audit counters and per-bucket top-user
+sketches, maintained by the audit writer and rebuilt from raw rows by
+reconcile_audit_rollups.py. The upgrade backfills them from existing
+audit_logs rows, since the statistics endpoint reads only the rollups.
+
+Revision ID: add_audit_stats_rollups
+Revises: partition_audit_logs
+Create Date: 2025-08-26 09:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'add_audit_stats_rollups'
+down_revision = 'partition_audit_logs'
+branch_labels = None
+depends_on = None
+
+# Match the application defaults (AUDIT_ROLLUP_HOURLY_RETENTION_DAYS, AUDIT_STATS_TOPK_CAPACITY)
+HOURLY_BACKFILL_DAYS = 92
+TOPK_CAPACITY = 100
+
+
+def upgrade():
+    """
+    Create the rollup tables
+    """
+
+    op.create_table(
+        'audit_stats_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('granularity', sa.String(length=10), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('event_category', sa.String(length=50), nullable=False),
+        sa.Column('total_events', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('failed_events', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('high_risk_events', sa.Integer(), nullable=False, server_default='0'),
+        sa.UniqueConstraint('granularity', 'bucket_start', 'event_category',
+                            name='uq_audit_stats_rollups_bucket'),
+    )
+
+    op.create_table(
+        'audit_user_activity_sketches',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('granularity', sa.String(length=10), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('counters', sa.JSON(), nullable=False),
+        sa.UniqueConstraint('granularity', 'bucket_start',
+                            name='uq_audit_user_activity_sketches_bucket'),
+    )
+
+    # Backfill from existing rows: daily buckets for all history, hourly ones
+    # for as long as the application keeps them. Buckets are naive UTC.
+    for granularity, since in (
+        ('day', "'-infinity'::timestamptz"),
+        ('hour', f"date_trunc('day', now() AT TIME ZONE 'UTC' - interval '{HOURLY_BACKFILL_DAYS} days') AT TIME ZONE 'UTC'"),
+    ):
+        op.execute(f"""
+            INSERT INTO audit_stats_rollups
+                (granularity, bucket_start, event_category, total_events, failed_events, high_risk_events)
+            SELECT '{granularity}',
+                   date_trunc('{granularity}', created_at AT TIME ZONE 'UTC'),
+                   event_category,
+                   count(*),
+                   count(*) FILTER (WHERE success IS FALSE),
+                   count(*) FILTER (WHERE risk_score >= 70)
+            FROM audit_logs
+            WHERE created_at >= {since}
+            GROUP BY 2, 3;
+        """)
+
+        # Exact per-user counts, keeping the most active TOPK_CAPACITY per bucket
+        op.execute(f"""
+            INSERT INTO audit_user_activity_sketches (granularity, bucket_start, counters)
+            SELECT '{granularity}', bucket, json_object_agg(user_email, events)
+            FROM (
+                SELECT bucket, user_email, events,
+                       row_number() OVER (PARTITION BY bucket ORDER BY events DESC, user_email) AS rank
+                FROM (
+                    SELECT date_trunc('{granularity}', created_at AT TIME ZONE 'UTC') AS bucket,
+                           user_email, count(*) AS events
+                    FROM audit_logs
+                    WHERE created_at >= {since} AND user_email IS NOT NULL AND user_email <> ''
+                    GROUP BY 1, 2
+                ) counts
+            ) ranked
+            WHERE rank <= {TOPK_CAPACITY}
+            GROUP BY bucket;
+        """)
+
+
+def downgrade():
+    """
+    Drop the rollup tables
+    """
+
+    op.drop_table('audit_user_activity_sketches')
+    op.drop_table('audit_stats_rollups')
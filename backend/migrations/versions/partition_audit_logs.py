@@ -0,0 +1,169 @@
+"""
+Database Migration: Monthly Range Partitioning for Audit Logs
+=============================================================
+
+Rebuilds audit_logs as a table partitioned by month on created_at so that
+retention drops whole partitions and time-windowed queries only scan the
+months they need. Existing rows are copied into monthly partitions, which
+cover every existing row; a default partition catches anything outside the
+pre-created range later on. create_future_partitions() moves rows out of
+the default partition when it creates the partition for their month.
+
+The primary key becomes (id, created_at) because Postgres requires the
+partition key in unique constraints; id keeps its sequence.
+
+Future partitions are created by maintain_audit_partitions.py.
+
+Revision ID: partition_audit_logs
+Revises: add_audit_log_keyset_indexes
+Create Date: 2025-08-19 09:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'partition_audit_logs'
+down_revision = 'add_audit_log_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+
+MONTHS_AHEAD = 3
+
+COMPOSITE_INDEXES = [
+    ('ix_audit_logs_created_at_id', ['created_at', 'id']),
+    ('ix_audit_logs_user_created_at', ['user_id', 'created_at', 'id']),
+    ('ix_audit_logs_category_created_at', ['event_category', 'created_at', 'id']),
+    ('ix_audit_logs_type_created_at', ['event_type', 'created_at', 'id']),
+    ('ix_audit_logs_success_created_at', ['success', 'created_at', 'id', 'risk_score']),
+]
+
+
+def _view_definition(name):
+    bind = op.get_bind()
+    if bind.execute(sa.text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+        return None
+    return bind.execute(sa.text("SELECT pg_get_viewdef(CAST(:name AS regclass), true)"), {"name": name}).scalar()
+
+
+def _swap_table(old_table, create_sql):
+    """Move audit_logs to old_table, create the new audit_logs and copy rows across"""
+
+    # Views and triggers reference the table; capture and recreate them afterwards
+    security_view = _view_definition('security_events_view')
+    op.execute("DROP VIEW IF EXISTS security_events_view;")
+
+    op.execute(f"ALTER TABLE audit_logs RENAME TO {old_table};")
+    # Index names are schema-wide: free the primary key name for the new table
+    op.execute(f"ALTER INDEX IF EXISTS audit_logs_pkey RENAME TO {old_table}_pkey;")
+    op.execute(create_sql)
+
+    # Foreign keys (same definitions as before)
+    op.execute(f"""
+        DO $$
+        DECLARE r record;
+        BEGIN
+            FOR r IN
+                SELECT conname, pg_get_constraintdef(oid) AS definition
+                FROM pg_constraint
+                WHERE conrelid = '{old_table}'::regclass AND contype = 'f'
+            LOOP
+                EXECUTE format('ALTER TABLE audit_logs ADD CONSTRAINT %I %s', r.conname, r.definition);
+            END LOOP;
+        END $$;
+    """)
+
+    return security_view
+
+
+def _finish_swap(old_table, security_view):
+    op.execute(f"INSERT INTO audit_logs SELECT * FROM {old_table};")
+    op.execute("ALTER SEQUENCE IF EXISTS audit_logs_id_seq OWNED BY audit_logs.id;")
+    op.execute(f"DROP TABLE {old_table};")
+
+    for name, columns in COMPOSITE_INDEXES:
+        op.create_index(name, 'audit_logs', columns)
+
+    op.execute("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_proc WHERE proname = 'audit_log_risk_score_trigger') THEN
+                CREATE TRIGGER audit_log_before_insert_trigger
+                BEFORE INSERT ON audit_logs
+                FOR EACH ROW
+                EXECUTE FUNCTION audit_log_risk_score_trigger();
+            END IF;
+        END $$;
+    """)
+
+    if security_view:
+        op.execute(f"CREATE VIEW security_events_view AS {security_view}")
+
+    op.execute("ANALYZE audit_logs;")
+
+
+def upgrade():
+    """
+    Convert audit_logs into a monthly range-partitioned table
+    """
+
+    security_view = _swap_table('audit_logs_unpartitioned', """
+        CREATE TABLE audit_logs (
+            LIKE audit_logs_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+    """)
+
+    # One partition per month from the oldest existing row to MONTHS_AHEAD months
+    # out (or the newest row, if later), so no existing row starts out in the
+    # default partition
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month_start date;
+            last_month date;
+        BEGIN
+            SELECT COALESCE(date_trunc('month', MIN(created_at)), date_trunc('month', now()))::date,
+                   GREATEST(
+                       date_trunc('month', MAX(created_at)),
+                       date_trunc('month', now() + interval '{MONTHS_AHEAD} months')
+                   )::date
+            INTO month_start, last_month FROM audit_logs_unpartitioned;
+
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+                    'audit_logs_y' || to_char(month_start, 'YYYY') || 'm' || to_char(month_start, 'MM'),
+                    month_start,
+                    (month_start + interval '1 month')::date
+                );
+                month_start := (month_start + interval '1 month')::date;
+            END LOOP;
+        END $$;
+    """)
+    op.execute("CREATE TABLE IF NOT EXISTS audit_logs_default PARTITION OF audit_logs DEFAULT;")
+
+    _finish_swap('audit_logs_unpartitioned', security_view)
+
+    # Rows whose retention_policy outlives their partition are kept here
+    op.execute("CREATE TABLE IF NOT EXISTS audit_logs_retained (LIKE audit_logs INCLUDING DEFAULTS);")
+    op.create_index('ix_audit_logs_retained_created_at', 'audit_logs_retained', ['created_at'])
+
+
+def downgrade():
+    """
+    Rebuild audit_logs as a plain table
+    """
+
+    op.drop_index('ix_audit_logs_retained_created_at', table_name='audit_logs_retained')
+    op.execute("DROP TABLE IF EXISTS audit_logs_retained;")
+
+    security_view = _swap_table('audit_logs_partitioned', """
+        CREATE TABLE audit_logs (
+            LIKE audit_logs_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+            PRIMARY KEY (id)
+        );
+    """)
+    # Dropping the partitioned parent drops every partition with it
+    _finish_swap('audit_logs_partitioned', security_view)
@@ -5,6 +5,11 @@ import pytest
 from unittest.mock import Mock, patch
 import os
 
+@pytest.fixture(autouse=True)
+def isolated_voice_cache(tmp_path, monkeypatch):
+    """Keep each test's VoiceService disk cache out of the shared directory"""
+    monkeypatch.setattr("app.services.voice_cache.VOICE_CACHE_DIR", str(tmp_path / "voice-cache"))
+
 @pytest.fixture
 def mock_ai_providers():
     """Mock all AI providers"""
@@ -0,0 +1,227 @@
+"""
+Tests for the AI response cache in front of MultiProviderAIService
+"""
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.routes import monitoring
+from app.services import multi_provider_ai_service as mpas
+from app.services.ai_response_cache import (
+    AIResponseCache,
+    InMemoryResponseCacheBackend,
+    RedisResponseCacheBackend,
+    canonical_messages,
+    parse_tenant_ttls,
+)
+from app.services.multi_provider_ai_service import ModelProvider, MultiProviderAIService
+
+
+PARAMS = {"temperature": 0.7, "max_tokens": 256}
+ENTRY = {"content": "Paris", "usage": {"total_tokens": 30}, "cost_usd": 0.002}
+
+
+def ask(question, system="You are helpful."):
+    return [{"role": "system", "content": system}, {"role": "user", "content": question}]
+
+
+class TestExactTier:
+    """Test suite for exact-match keys, TTLs and LRU eviction"""
+
+    def test_canonicalization(self):
+        assert canonical_messages([{"role": " USER ", "content": "  What  is\nthis? ", "name": "x"}]) == [
+            {"role": "user", "content": "What is this?"}
+        ]
+
+    @pytest.mark.asyncio
+    async def test_equivalent_requests_share_an_entry(self):
+        cache = AIResponseCache(backend=InMemoryResponseCacheBackend(), semantic="off")
+        await cache.store("u1", "gpt-4", ask("What is the capital of France?"), PARAMS, ENTRY)
+
+        hit = await cache.lookup("u1", "gpt-4", ask("What is the capital   of France?\n"), PARAMS)
+        assert hit == (ENTRY, "exact", 1.0)
+
+        assert await cache.lookup("u1", "gpt-4", ask("What is the capital of France?"), {**PARAMS, "temperature": 0}) is None
+        assert await cache.lookup("u1", "claude-3-haiku", ask("What is the capital of France?"), PARAMS) is None
+        assert await cache.lookup("u2", "gpt-4", ask("What is the capital of France?"), PARAMS) is None
+
+        metrics = cache.get_metrics()
+        assert metrics["exact_hits"] == 1 and metrics["misses"] == 3
+        assert metrics["tokens_saved"] == 30
+        assert metrics["cost_saved_usd"] == pytest.approx(0.002)
+
+    @pytest.mark.asyncio
+    async def test_per_tenant_ttl(self):
+        cache = AIResponseCache(
+            backend=InMemoryResponseCacheBackend(), semantic="off",
+            default_ttl=3600, tenant_ttls=parse_tenant_ttls("volatile=0, public=86400")
+        )
+        await cache.store("volatile", "gpt-4", ask("q"), PARAMS, ENTRY)
+        await cache.store("public", "gpt-4", ask("q"), PARAMS, ENTRY)
+
+        assert cache.ttl_for("public") == 86400 and cache.ttl_for("other") == 3600
+        assert await cache.lookup("volatile", "gpt-4", ask("q"), PARAMS) is None
+        assert await cache.lookup("public", "gpt-4", ask("q"), PARAMS) is not None
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        backend = InMemoryResponseCacheBackend(max_entries=2)
+        cache = AIResponseCache(backend=backend, semantic="off")
+        await cache.store("u1", "gpt-4", ask("one"), PARAMS, ENTRY)
+        await cache.store("u1", "gpt-4", ask("two"), PARAMS, ENTRY)
+        assert await cache.lookup("u1", "gpt-4", ask("one"), PARAMS) is not None
+
+        await cache.store("u1", "gpt-4", ask("three"), PARAMS, ENTRY)
+        assert await cache.lookup("u1", "gpt-4", ask("two"), PARAMS) is None
+        assert await cache.lookup("u1", "gpt-4", ask("one"), PARAMS) is not None
+        assert cache.get_metrics()["evictions"] == 1
+
+    @pytest.mark.asyncio
+    async def test_unreachable_redis_falls_back_to_memory(self):
+        backend = RedisResponseCacheBackend(redis_url="redis://127.0.0.1:1/0")
+        cache = AIResponseCache(backend=backend, semantic="off")
+        await cache.store("u1", "gpt-4", ask("q"), PARAMS, ENTRY)
+
+        assert await cache.lookup("u1", "gpt-4", ask("q"), PARAMS) is not None
+        assert backend.fallback.size() == 1
+
+        # Fallback counts are reported as such, not as the shared cache's
+        metrics = cache.get_metrics()
+        assert metrics["redis_available"] is False
+        assert metrics["fallback_entries"] == 1
+        assert "entries" not in metrics and "evictions" not in metrics
+
+
+class TestSemanticTier:
+    """Test suite for embedding-similarity lookups"""
+
+    @pytest.mark.asyncio
+    async def test_local_near_duplicates_hit(self):
+        cache = AIResponseCache(backend=InMemoryResponseCacheBackend(), semantic="local", similarity_threshold=0.92)
+        prompt = "Summarize the quarterly storm report for Cape Town in three bullet points."
+        await cache.store("u1", "gpt-4", ask(prompt), PARAMS, ENTRY)
+
+        entry, kind, similarity = await cache.lookup(
+            "u1", "gpt-4", ask("Summarise the quarterly storm report for Cape Town in three bullet points"), PARAMS
+        )
+        assert kind == "semantic" and 0.92 <= similarity < 1
+        assert entry == ENTRY
+
+        # A different place is a different question
+        assert await cache.lookup(
+            "u1", "gpt-4", ask("Summarize the quarterly storm report for Durban in three bullet points."), PARAMS
+        ) is None
+        # Similarity never crosses tenants or differing earlier messages
+        assert await cache.lookup("u2", "gpt-4", ask(prompt.lower()), PARAMS) is None
+        assert await cache.lookup("u1", "gpt-4", ask(prompt.lower(), system="Be terse."), PARAMS) is None
+
+    @pytest.mark.asyncio
+    async def test_custom_embedder_and_threshold(self):
+        vectors = {"how tall is table mountain": [1.0, 0.0], "height of table mountain": [0.96, 0.28]}
+
+        async def embed(text):
+            return vectors[text.lower().rstrip("?")]
+
+        cache = AIResponseCache(backend=InMemoryResponseCacheBackend(), embedder=embed, similarity_threshold=0.95)
+        await cache.store("u1", "gpt-4", ask("How tall is Table Mountain?"), PARAMS, ENTRY)
+        assert (await cache.lookup("u1", "gpt-4", ask("Height of Table Mountain"), PARAMS))[1] == "semantic"
+
+        cache.similarity_threshold = 0.99
+        assert await cache.lookup("u1", "gpt-4", ask("Height of Table Mountain"), PARAMS) is None
+
+
+class TestServiceCaching:
+    """Test suite for caching inside MultiProviderAIService.generate_response"""
+
+    @pytest.fixture
+    def ai_service(self, monkeypatch):
+        class ContextService:
+            async def add_message(self, **kwargs):
+                pass
+
+        async def get_context_service():
+            return ContextService()
+
+        monkeypatch.setattr(mpas, "get_context_service", get_context_service)
+        service = MultiProviderAIService()
+        service.performance_monitor = Mock()
+        service.performance_monitor.get_latency_percentile.return_value = None
+        service.response_cache = AIResponseCache(backend=InMemoryResponseCacheBackend(), semantic="off")
+        service.provider_calls = 0
+
+        async def create(**kwargs):
+            service.provider_calls += 1
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content="Paris"), finish_reason="stop")],
+                usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=500, total_tokens=1500),
+                id="c1", created=0, model="gpt-4"
+            )
+
+        service.clients = {ModelProvider.OPENAI: SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))}
+        return service
+
+    async def generate(self, service, question, user_id="u1", **kwargs):
+        return await service.generate_response(
+            [{"role": "user", "content": question}], model="gpt-4",
+            user_id=user_id, use_context=False, use_personalization=False, **kwargs
+        )
+
+    @pytest.mark.asyncio
+    async def test_repeat_question_skips_provider(self, ai_service):
+        first = await self.generate(ai_service, "Capital of France?")
+        second = await self.generate(ai_service, "Capital  of France?")
+
+        assert ai_service.provider_calls == 1
+        assert second.content == first.content == "Paris"
+        assert second.metadata["cache"] == "exact"
+        # Only the real provider request feeds latency metrics
+        assert ai_service.performance_monitor.record_ai_request.call_count == 1
+
+        metrics = ai_service.get_cache_metrics()
+        # gpt-4: 1k prompt tokens at $0.03 + 0.5k completion tokens at $0.06
+        assert metrics["cost_saved_usd"] == pytest.approx(0.06)
+        assert metrics["hit_rate"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_metrics_are_served_by_the_monitoring_router(self, ai_service, monkeypatch):
+        await self.generate(ai_service, "Capital of France?")
+        await self.generate(ai_service, "Capital of France?")
+        await self.generate(ai_service, "Capital of Spain?")
+
+        monkeypatch.setattr(monitoring, "get_multi_provider_ai_service", lambda: ai_service)
+        app = FastAPI()
+        app.include_router(monitoring.router, prefix="/api/monitoring")
+        response = TestClient(app).get("/api/monitoring/ai/response-cache")
+
+        assert response.status_code == 200
+        metrics = response.json()
+        assert metrics["hit_rate"] == pytest.approx(1 / 3)
+        assert metrics["miss_rate"] == pytest.approx(2 / 3)
+        assert metrics["cost_saved_usd"] == pytest.approx(0.06)
+        assert metrics["tokens_saved"] == 1500
+
+    @pytest.mark.asyncio
+    async def test_cache_can_be_bypassed(self, ai_service):
+        await self.generate(ai_service, "Capital of France?")
+        await self.generate(ai_service, "Capital of France?", use_cache=False)
+        assert ai_service.provider_calls == 2
+
+    @pytest.mark.asyncio
+    async def test_anonymous_requests_are_not_cached(self, ai_service):
+        await self.generate(ai_service, "Capital of France?", user_id=None)
+        await self.generate(ai_service, "Capital of France?", user_id=None)
+        assert ai_service.provider_calls == 2
+        assert ai_service.get_cache_metrics()["stores"] == 0
+
+        # A named shared tenant is still cached without a user
+        await self.generate(ai_service, "Capital of France?", user_id=None, cache_tenant="public")
+        await self.generate(ai_service, "Capital of France?", user_id=None, cache_tenant="public")
+        assert ai_service.provider_calls == 3
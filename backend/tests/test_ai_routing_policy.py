@@ -0,0 +1,262 @@
+"""
+Tests for hedged and failover routing across AI providers
+"""
+
+import pytest
+import asyncio
+from types import SimpleNamespace
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import multi_provider_ai_service as mpas
+from app.services.ai_performance_service import AIPerformanceMonitor, AIProvider
+from app.services.ai_routing_policy import (
+    AIRoutingPolicy,
+    CircuitBreaker,
+    ProvidersUnavailable,
+    is_retryable_error,
+    parse_provider_priority,
+)
+from app.services.multi_provider_ai_service import ModelProvider, MultiProviderAIService
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def model(provider, name):
+    return (name, SimpleNamespace(provider=provider, model_name=name))
+
+
+PRIMARY = model(ModelProvider.OPENAI, "gpt-4")
+BACKUP = model(ModelProvider.CLAUDE, "claude-3-sonnet")
+
+
+@pytest.fixture
+def monitor():
+    monitor = AIPerformanceMonitor.__new__(AIPerformanceMonitor)
+    monitor.metrics = []
+    monitor.model_stats = {}
+    monitor.request_latencies = {}
+    monitor.request_outcomes = {}
+    return monitor
+
+
+def seed_latency(monitor, latency_ms, count=30, provider=AIProvider.OPENAI, name="gpt-4"):
+    for _ in range(count):
+        monitor.record_ai_request(provider, name, "/chat", 10, 10, latency_ms, True)
+
+
+def scripted(behaviour, calls):
+    """call(model_key, config) that sleeps and/or raises per model"""
+    async def call(model_key, config):
+        calls.append(model_key)
+        delay, error = behaviour[model_key]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            calls.append(f"{model_key} cancelled")
+            raise
+        if error:
+            raise error
+        return f"answer from {model_key}"
+    return call
+
+
+class TestLatencyPercentiles:
+    """Test suite for per-model latency tracking in AIPerformanceMonitor"""
+
+    def test_percentiles_from_successful_requests(self, monitor):
+        for latency in range(1, 101):
+            monitor.record_ai_request(AIProvider.OPENAI, "gpt-4", "/chat", 1, 1, latency, True)
+        monitor.record_ai_request(AIProvider.OPENAI, "gpt-4", "/chat", 0, 0, 99999, False, error_type="Timeout")
+
+        assert monitor.get_latency_percentile(AIProvider.OPENAI, "gpt-4", 95) == 95
+        assert monitor.get_latency_percentile(AIProvider.OPENAI, "gpt-4", 50) == 50
+        assert monitor.get_latency_percentile(AIProvider.CLAUDE, "gpt-4", 95) is None
+        assert monitor.get_latency_percentile(AIProvider.OPENAI, "gpt-4", 95, min_samples=500) is None
+
+        stats = monitor.get_provider_latency_stats()["openai/gpt-4"]
+        assert stats["success"] == 100 and stats["failure"] == 1
+        assert stats["p99_ms"] == 99
+
+
+class TestCircuitBreaker:
+    """Test suite for the per-provider circuit breaker"""
+
+    def test_opens_after_threshold_and_probes_once(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10, clock=lambda: now[0])
+        for _ in range(3):
+            assert breaker.allow_request()
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+
+        now[0] = 11
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+
+        # A failed probe re-opens straight away
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        now[0] = 22
+        assert breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_retryable_errors(self):
+        assert is_retryable_error(StatusError(429))
+        assert is_retryable_error(StatusError(503))
+        assert is_retryable_error(asyncio.TimeoutError())
+        assert not is_retryable_error(StatusError(400))
+        assert not is_retryable_error(ValueError("bad request"))
+
+        try:
+            try:
+                raise StatusError(502)
+            except StatusError:
+                raise Exception("Gemini generation failed: HTTP 502")
+        except Exception as wrapped:
+            assert is_retryable_error(wrapped)
+
+    def test_priority_accepts_provider_aliases(self):
+        assert parse_provider_priority('["anthropic", "google", "openai"]') == ["claude", "gemini", "openai"]
+        assert parse_provider_priority("gemini,openai") == ["gemini", "openai"]
+
+
+class TestRoutingPolicy:
+    """Test suite for hedging and failover in AIRoutingPolicy"""
+
+    @pytest.mark.asyncio
+    async def test_hedge_after_p95_and_cancel_loser(self, monitor):
+        seed_latency(monitor, 50)
+        policy = AIRoutingPolicy(monitor, hedge_min_delay=0.01)
+        calls = []
+        call = scripted({"gpt-4": (5, None), "claude-3-sonnet": (0.02, None)}, calls)
+
+        start = asyncio.get_event_loop().time()
+        model_key, result = await policy.execute([PRIMARY, BACKUP], call)
+        elapsed = asyncio.get_event_loop().time() - start
+        await asyncio.sleep(0)
+
+        assert (model_key, result) == ("claude-3-sonnet", "answer from claude-3-sonnet")
+        assert elapsed < 0.5
+        assert "gpt-4 cancelled" in calls
+        assert policy.metrics["hedges_sent"] == 1 and policy.metrics["hedge_wins"] == 1
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_without_latency_history(self, monitor):
+        policy = AIRoutingPolicy(monitor, hedge_min_delay=0.01)
+        calls = []
+        call = scripted({"gpt-4": (0.1, None), "claude-3-sonnet": (0, None)}, calls)
+
+        model_key, _ = await policy.execute([PRIMARY, BACKUP], call)
+        assert model_key == "gpt-4"
+        assert calls == ["gpt-4"]
+
+    @pytest.mark.asyncio
+    async def test_failover_on_rate_limit(self, monitor):
+        policy = AIRoutingPolicy(monitor)
+        calls = []
+        call = scripted({"gpt-4": (0, StatusError(429)), "claude-3-sonnet": (0, None)}, calls)
+
+        model_key, _ = await policy.execute([PRIMARY, BACKUP], call)
+        assert model_key == "claude-3-sonnet"
+        assert policy.metrics["failovers"] == 1
+        assert policy.breaker("openai").consecutive_failures == 1
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_failed_over(self, monitor):
+        policy = AIRoutingPolicy(monitor)
+        calls = []
+        call = scripted({"gpt-4": (0, StatusError(400)), "claude-3-sonnet": (0, None)}, calls)
+
+        with pytest.raises(StatusError):
+            await policy.execute([PRIMARY, BACKUP], call)
+        assert calls == ["gpt-4"]
+        assert policy.breaker("openai").consecutive_failures == 0
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_skips_provider(self, monitor):
+        policy = AIRoutingPolicy(monitor)
+        policy.breakers["openai"] = CircuitBreaker(failure_threshold=1)
+        policy.breakers["openai"].record_failure()
+        calls = []
+        call = scripted({"gpt-4": (0, None), "claude-3-sonnet": (0, None)}, calls)
+
+        model_key, _ = await policy.execute([PRIMARY, BACKUP], call)
+        assert model_key == "claude-3-sonnet"
+        assert calls == ["claude-3-sonnet"]
+        assert policy.get_metrics()["circuits"]["openai"]["state"] == "open"
+
+        with pytest.raises(ProvidersUnavailable):
+            await policy.execute([PRIMARY], call)
+
+    @pytest.mark.asyncio
+    async def test_last_error_surfaces_when_all_fail(self, monitor):
+        policy = AIRoutingPolicy(monitor)
+        call = scripted({"gpt-4": (0, StatusError(500)), "claude-3-sonnet": (0, StatusError(503))}, [])
+
+        with pytest.raises(StatusError, match="503"):
+            await policy.execute([PRIMARY, BACKUP], call)
+
+
+class TestServiceRouting:
+    """Test suite for routing inside MultiProviderAIService.generate_response"""
+
+    @pytest.fixture
+    def ai_service(self, monitor, monkeypatch):
+        class ContextService:
+            async def add_message(self, **kwargs):
+                pass
+
+        async def get_context_service():
+            return ContextService()
+
+        monkeypatch.setattr(mpas, "get_context_service", get_context_service)
+        service = MultiProviderAIService()
+        service.performance_monitor = monitor
+        service.routing_policy = AIRoutingPolicy(monitor, provider_priority=["openai", "claude"])
+        return service
+
+    def attach(self, service, provider, create):
+        if provider == ModelProvider.OPENAI:
+            service.clients[provider] = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        else:
+            service.clients[provider] = SimpleNamespace(messages=SimpleNamespace(create=create))
+
+    @pytest.mark.asyncio
+    async def test_timeout_fails_over_to_backup_provider(self, ai_service, monitor):
+        async def slow_openai(**kwargs):
+            await asyncio.sleep(5)
+
+        async def claude(**kwargs):
+            return SimpleNamespace(
+                content=[SimpleNamespace(text="from claude")],
+                usage=SimpleNamespace(input_tokens=3, output_tokens=2),
+                stop_reason="end_turn", id="msg_1", model=kwargs["model"], stop_sequence=None
+            )
+
+        self.attach(ai_service, ModelProvider.OPENAI, slow_openai)
+        self.attach(ai_service, ModelProvider.CLAUDE, claude)
+        ai_service.routing_policy.model_timeouts = {"gpt-4": 0.05}
+
+        response = await ai_service.generate_response(
+            [{"role": "user", "content": "hi"}], model="gpt-4",
+            user_id="u1", use_context=False, use_personalization=False
+        )
+
+        assert response.content == "from claude"
+        assert response.provider == ModelProvider.CLAUDE
+        assert response.metadata["routed_from"] == "gpt-4"
+        outcomes = monitor.request_outcomes
+        assert outcomes[("openai", "gpt-4")]["failure"] == 1
+        assert outcomes[("claude", "claude-3-sonnet-20240229")]["success"] == 1
+        assert ai_service.get_routing_metrics()["failovers"] == 1
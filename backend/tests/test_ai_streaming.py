@@ -0,0 +1,283 @@
+"""
+Tests for streaming responses from MultiProviderAIService and the SSE chat endpoint
+"""
+
+import pytest
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services import multi_provider_ai_service as mpas
+from app.services.ai_performance_service import PerformanceMetric
+from app.services.conversation_context_service import ContextType
+from app.services.multi_provider_ai_service import MultiProviderAIService, ModelProvider
+
+
+class FakeContextService:
+    """Records context writes and the order they happen in"""
+
+    def __init__(self, events):
+        self.events = events
+        self.messages = []
+
+    async def generate_context_for_ai(self, conversation_id, max_context_messages=8, include_summary=True):
+        return [], {}
+
+    async def add_message(self, user_id, conversation_id, message_type, content, **kwargs):
+        self.messages.append((message_type, content))
+        self.events.append(("context", message_type))
+
+    async def get_conversation_id(self, user_id, session_id=None):
+        return f"conv_{user_id}"
+
+
+class FakeStream:
+    """Async iterator over provider events with a delay before each"""
+
+    def __init__(self, events, first_delay=0.0, delay=0.0):
+        self.events = list(events)
+        self.first_delay = first_delay
+        self.delay = delay
+        self.position = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.position >= len(self.events):
+            raise StopAsyncIteration
+        await asyncio.sleep(self.first_delay if self.position == 0 else self.delay)
+        event = self.events[self.position]
+        self.position += 1
+        return event
+
+
+def openai_events(tokens):
+    events = [
+        SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token), finish_reason=None)])
+        for token in tokens
+    ]
+    events.append(SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason="stop")]))
+    return events
+
+
+def claude_events(tokens):
+    events = [SimpleNamespace(type="message_start", message=SimpleNamespace(usage=SimpleNamespace(input_tokens=12)))]
+    events += [
+        SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="text_delta", text=token))
+        for token in tokens
+    ]
+    events.append(SimpleNamespace(
+        type="message_delta",
+        delta=SimpleNamespace(stop_reason="end_turn"),
+        usage=SimpleNamespace(output_tokens=len(tokens))
+    ))
+    events.append(SimpleNamespace(type="message_stop"))
+    return events
+
+
+@pytest.fixture
+def events():
+    return []
+
+
+@pytest.fixture
+def context_service(monkeypatch, events):
+    service = FakeContextService(events)
+
+    async def fake_get_context_service():
+        return service
+
+    monkeypatch.setattr(mpas, "get_context_service", fake_get_context_service)
+    return service
+
+
+@pytest.fixture
+def ai_service(context_service, events):
+    service = MultiProviderAIService()
+    service.performance_monitor = Mock()
+    service.performance_monitor.record_ai_request.side_effect = lambda **kw: events.append(("record_ai_request", kw["success"]))
+    service.performance_monitor.record_metric.side_effect = lambda *a, **kw: events.append(("metric", a[1]))
+    return service
+
+
+def attach_openai(service, stream_factory):
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        return stream_factory()
+    service.clients[ModelProvider.OPENAI] = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+
+
+class TestStreamResponse:
+    """Test suite for the stream_response async generator"""
+
+    @pytest.mark.asyncio
+    async def test_openai_deltas_then_post_stream_bookkeeping(self, ai_service, context_service, events):
+        attach_openai(ai_service, lambda: FakeStream(openai_events(["Hel", "lo", " world"])))
+
+        chunks = []
+        async for chunk in ai_service.stream_response(
+            messages=[{"role": "user", "content": "Say hello"}],
+            model="gpt-3.5-turbo", user_id="u1", conversation_id="c1",
+            use_personalization=False
+        ):
+            chunks.append(chunk)
+            events.append(("chunk", chunk.delta))
+
+        assert [c.delta for c in chunks] == ["Hel", "lo", " world", ""]
+        assert [c.index for c in chunks[:-1]] == [0, 1, 2]
+
+        final = chunks[-1]
+        assert final.finish_reason == "stop"
+        assert final.usage["completion_tokens"] == 2
+        assert final.time_to_first_token_ms is not None
+
+        # User message before streaming; AI response and request metrics only after the final chunk
+        final_chunk_at = events.index(("chunk", ""))
+        assert events.index(("context", ContextType.USER_MESSAGE)) < events.index(("chunk", "Hel"))
+        assert events.index(("context", ContextType.AI_RESPONSE)) > final_chunk_at
+        assert context_service.messages[-1] == (ContextType.AI_RESPONSE, "Hello world")
+
+        # Time to first token is recorded as its own metric as soon as the first delta arrives
+        assert events.index(("metric", PerformanceMetric.TIME_TO_FIRST_TOKEN)) < events.index(("chunk", "Hel"))
+
+    @pytest.mark.asyncio
+    async def test_claude_events_are_normalized(self, ai_service, events):
+        async def create(**kwargs):
+            assert kwargs["stream"] is True
+            assert kwargs["system"] == "Be brief"
+            return FakeStream(claude_events(["Hi", " there"]))
+
+        ai_service.clients[ModelProvider.CLAUDE] = SimpleNamespace(messages=SimpleNamespace(create=create))
+
+        chunks = [chunk async for chunk in ai_service.stream_response(
+            messages=[{"role": "system", "content": "Be brief"}, {"role": "user", "content": "Hello"}],
+            model="claude-3-haiku", use_context=False, use_personalization=False
+        )]
+
+        assert "".join(c.delta for c in chunks) == "Hi there"
+        assert chunks[-1].provider == ModelProvider.CLAUDE
+        assert chunks[-1].finish_reason == "end_turn"
+        assert chunks[-1].usage == {"prompt_tokens": 12, "completion_tokens": 2, "total_tokens": 14}
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(not mpas.GEMINI_AVAILABLE, reason="google-generativeai not installed")
+    async def test_gemini_parts_are_normalized(self, ai_service):
+        parts = [
+            SimpleNamespace(text=text, candidates=[SimpleNamespace(finish_reason=SimpleNamespace(name=reason))])
+            for text, reason in [("Bon", "FINISH_REASON_UNSPECIFIED"), ("jour", "STOP")]
+        ]
+
+        class FakeModel:
+            def __init__(self, **kwargs):
+                pass
+
+            async def generate_content_async(self, content, stream=False):
+                assert stream is True
+                return FakeStream(parts)
+
+        ai_service.clients[ModelProvider.GEMINI] = SimpleNamespace(
+            GenerativeModel=FakeModel,
+            types=SimpleNamespace(GenerationConfig=lambda **kw: kw)
+        )
+
+        chunks = [chunk async for chunk in ai_service.stream_response(
+            messages=[{"role": "user", "content": "Hello"}],
+            model="gemini-pro", use_context=False, use_personalization=False
+        )]
+
+        assert [c.delta for c in chunks] == ["Bon", "jour", ""]
+        assert chunks[-1].finish_reason == "STOP"
+
+    @pytest.mark.asyncio
+    async def test_provider_failure_is_recorded_and_raised(self, ai_service, events):
+        class BrokenStream(FakeStream):
+            async def __anext__(self):
+                if self.position == 1:
+                    raise ConnectionError("stream reset")
+                return await super().__anext__()
+
+        attach_openai(ai_service, lambda: BrokenStream(openai_events(["a", "b"])))
+
+        received = []
+        with pytest.raises(ConnectionError):
+            async for chunk in ai_service.stream_response(
+                messages=[{"role": "user", "content": "hi"}], model="gpt-4",
+                use_context=False, use_personalization=False
+            ):
+                received.append(chunk.delta)
+
+        assert received == ["a"]
+        # The failure is recorded and the provider error still surfaces
+        assert ("record_ai_request", False) in events
+        assert ("record_ai_request", True) not in events
+
+
+class TestChatStreamEndpoint:
+    """Test suite for the SSE chat endpoint"""
+
+    def test_sse_events(self, monkeypatch, ai_service):
+        from app.routes import ai_context
+        from app.dependencies import get_current_user
+
+        attach_openai(ai_service, lambda: FakeStream(openai_events(["One", " two"])))
+        monkeypatch.setattr(ai_context, "get_multi_provider_ai_service", lambda: ai_service)
+        monkeypatch.setattr(ai_context, "get_context_service", mpas.get_context_service)
+
+        app = FastAPI()
+        app.include_router(ai_context.router)
+        app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id="user-1")
+
+        client = TestClient(app)
+        response = client.post("/api/ai/context/chat/stream", json={"message": "count", "model": "gpt-4"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        payloads = [
+            json.loads(line[len("data: "):])
+            for line in response.text.split("\n\n") if line.startswith("data: ")
+        ]
+        assert [p["type"] for p in payloads] == ["start", "delta", "delta", "done"]
+        assert payloads[0]["conversation_id"] == "conv_user-1"
+        assert "".join(p["content"] for p in payloads if p["type"] == "delta") == "One two"
+        assert payloads[-1]["finish_reason"] == "stop"
+        assert payloads[-1]["time_to_first_token_ms"] is not None
+
+
+class TestStreamingLatency:
+    """Time to first token vs. waiting for the whole completion"""
+
+    @pytest.mark.asyncio
+    async def test_first_token_arrives_before_completion(self, ai_service):
+        tokens = [f" tok{i}" for i in range(20)]
+        attach_openai(ai_service, lambda: FakeStream(openai_events(tokens), first_delay=0.05, delay=0.01))
+
+        start = time.perf_counter()
+        first_token_at = None
+        async for chunk in ai_service.stream_response(
+            messages=[{"role": "user", "content": "go"}], model="gpt-4",
+            use_context=False, use_personalization=False
+        ):
+            if chunk.delta and first_token_at is None:
+                first_token_at = time.perf_counter() - start
+            final = chunk
+        total = time.perf_counter() - start
+
+        print(f"\nStreaming ({len(tokens)} tokens): first token {first_token_at * 1000:.0f}ms, "
+              f"full completion {total * 1000:.0f}ms "
+              f"(service TTFT {final.time_to_first_token_ms}ms, total {final.response_time_ms}ms)")
+
+        assert first_token_at < total / 3
+        assert final.time_to_first_token_ms < final.response_time_ms
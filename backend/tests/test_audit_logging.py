@@ -0,0 +1,894 @@
+"""
+Tests for the audit log query engine (keyset pagination, index-backed plans),
+streaming exports, the batched audit writer, partitioned retention and
+statistics rollups
+
+The query-plan benchmark seeds AUDIT_BENCHMARK_ROWS rows (default 200k so the
+suite stays fast); run it with AUDIT_BENCHMARK_ROWS=5000000 for the full
+regression check.
+"""
+
+import pytest
+import asyncio
+import csv
+import functools
+import gzip
+import io
+import json
+import os
+import sqlite3
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.models.audit_log import (
+    AuditEventType, AuditExportChunk, AuditExportJob, AuditLog, AuditLogLevel, AuditStatsRollup, AuditUserActivitySketch
+)
+from app.services import audit_export_service
+from app.services.audit_export_service import (
+    EXPORT_FIELDS,
+    PARQUET_AVAILABLE,
+    AuditExportJobManager,
+    export_job_filename,
+    iter_audit_export,
+)
+from app.services.audit_partitions import AuditPartitionManager, add_months, month_start, partition_name
+from app.services.audit_rollups import AuditStatsRollups, merge_sketch
+from app.services.audit_service import AuditLogger, decode_audit_cursor, encode_audit_cursor
+from app.services.audit_writer import AuditEventWriter
+
+
+BENCHMARK_ROWS = int(os.getenv("AUDIT_BENCHMARK_ROWS", "200000"))
+CATEGORIES = ["authentication", "authorization", "security", "ai_service", "profile", "admin", "data", "system"]
+BASE_TIME = datetime(2025, 1, 1)
+
+
+def seed_audit_logs(path: str, rows: int) -> None:
+    """Bulk-load rows with raw sqlite3; several rows share each timestamp"""
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO audit_logs (id, user_id, event_type, event_category, event_level, "
+        "success, risk_score, created_at) VALUES (?, ?, ?, ?, 'info', ?, ?, ?)",
+        (
+            (
+                i,
+                i % 5000,
+                f"event_{i % 40}",
+                CATEGORIES[i % len(CATEGORIES)],
+                int(i % 17 != 0),
+                (i * 37) % 101,
+                (BASE_TIME + timedelta(seconds=i // 3)).strftime("%Y-%m-%d %H:%M:%S.%f"),
+            )
+            for i in range(1, rows + 1)
+        )
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def make_session(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    AuditLog.__table__.create(engine)
+    AuditStatsRollup.__table__.create(engine)
+    AuditUserActivitySketch.__table__.create(engine)
+    AuditExportJob.__table__.create(engine)
+    AuditExportChunk.__table__.create(engine)
+    return engine, sessionmaker(bind=engine)()
+
+
+class QueryRecorder:
+    """Captures the SQL the query engine sends so its plan can be inspected"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def plan(self) -> str:
+        statement, parameters = self.statements[-1]
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+        return " | ".join(row[-1] for row in rows)
+
+
+@pytest.fixture
+def small_db(tmp_path):
+    path = str(tmp_path / "audit_small.db")
+    engine, db = make_session(path)
+    seed_audit_logs(path, 1000)
+    yield db
+    db.close()
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def benchmark_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("audit") / "audit_benchmark.db")
+    engine, db = make_session(path)
+    start = time.perf_counter()
+    seed_audit_logs(path, BENCHMARK_ROWS)
+    print(f"\nSeeded {BENCHMARK_ROWS} audit logs in {time.perf_counter() - start:.1f}s")
+    yield engine, db
+    db.close()
+    engine.dispose()
+
+
+class TestAuditCursor:
+    """Test suite for pagination cursors"""
+
+    def test_round_trip(self):
+        created_at = datetime(2025, 3, 4, 5, 6, 7, 891011)
+        assert decode_audit_cursor(encode_audit_cursor(created_at, 42)) == (created_at, 42)
+
+    @pytest.mark.parametrize("cursor", ["not-a-cursor", "%%%", encode_audit_cursor(datetime(2025, 1, 1), 1)[:-3]])
+    def test_malformed_cursor_is_rejected(self, cursor):
+        with pytest.raises(ValueError):
+            decode_audit_cursor(cursor)
+
+
+class TestKeysetPagination:
+    """Test suite for AuditLogger.query_audit_logs"""
+
+    def test_pages_cover_every_row_once_in_order(self, small_db):
+        audit_logger = AuditLogger()
+        seen = []
+        cursor = None
+        while True:
+            logs, cursor = audit_logger.query_audit_logs(small_db, limit=64, cursor=cursor)
+            seen.extend((log.created_at, log.id) for log in logs)
+            if cursor is None:
+                break
+
+        # Rows sharing a timestamp are neither skipped nor repeated across pages
+        assert len(seen) == 1000
+        assert seen == sorted(seen, reverse=True)
+
+    def test_filters_apply_across_pages(self, small_db):
+        audit_logger = AuditLogger()
+        first, cursor = audit_logger.query_audit_logs(small_db, limit=10, event_category="security", success=True)
+        second, _ = audit_logger.query_audit_logs(small_db, limit=10, event_category="security", success=True, cursor=cursor)
+
+        logs = first + second
+        assert len({log.id for log in logs}) == 20
+        assert all(log.event_category == "security" and log.success for log in logs)
+        assert first[-1].id > second[0].id
+
+    def test_offset_still_supported(self, small_db):
+        audit_logger = AuditLogger()
+        by_offset, _ = audit_logger.query_audit_logs(small_db, limit=5, offset=5)
+        first, cursor = audit_logger.query_audit_logs(small_db, limit=5)
+        by_cursor, _ = audit_logger.query_audit_logs(small_db, limit=5, cursor=cursor)
+        assert [log.id for log in by_offset] == [log.id for log in by_cursor]
+
+    def test_last_page_has_no_cursor(self, small_db):
+        logs, cursor = AuditLogger().query_audit_logs(small_db, limit=1000)
+        assert len(logs) == 1000
+        assert cursor is None
+
+
+class TestAuditQueryPlans:
+    """Query-plan regression checks and deep-page latency on a large table"""
+
+    FILTER_INDEXES = [
+        ({}, "ix_audit_logs_created_at_id"),
+        ({"user_id": "42"}, "ix_audit_logs_user_created_at"),
+        ({"event_category": "security"}, "ix_audit_logs_category_created_at"),
+        ({"event_type": "event_7"}, "ix_audit_logs_type_created_at"),
+        ({"success": False, "min_risk_score": 90}, "ix_audit_logs_success_created_at"),
+    ]
+
+    @pytest.mark.parametrize("filters,index_name", FILTER_INDEXES)
+    def test_filters_use_composite_indexes(self, benchmark_db, filters, index_name):
+        engine, db = benchmark_db
+        recorder = QueryRecorder(engine)
+        audit_logger = AuditLogger()
+
+        _, cursor = audit_logger.query_audit_logs(db, limit=50, **filters)
+        audit_logger.query_audit_logs(db, limit=50, cursor=cursor, **filters)
+        plan = recorder.plan()
+        event.remove(engine, "before_cursor_execute", recorder._record)
+
+        assert index_name in plan, plan
+        # Equality prefix + (created_at, id): rows come out of the index already ordered
+        assert "TEMP B-TREE" not in plan, plan
+
+    def test_deep_page_latency(self, benchmark_db):
+        engine, db = benchmark_db
+        audit_logger = AuditLogger()
+        depth = BENCHMARK_ROWS - 1000
+
+        # Cursor positioned at the same depth as the offset page
+        (anchor,), _ = audit_logger.query_audit_logs(db, limit=1, offset=depth - 1)
+        cursor = encode_audit_cursor(anchor.created_at, anchor.id)
+        db.expunge_all()
+
+        def timed(**kwargs):
+            best = float("inf")
+            for _ in range(3):
+                start = time.perf_counter()
+                logs, _ = audit_logger.query_audit_logs(db, limit=50, **kwargs)
+                best = min(best, time.perf_counter() - start)
+                db.expunge_all()
+            return logs, best * 1000
+
+        offset_logs, offset_ms = timed(offset=depth)
+        keyset_logs, keyset_ms = timed(cursor=cursor)
+
+        print(f"\nPage at depth {depth} of {BENCHMARK_ROWS} audit logs:")
+        print(f"  OFFSET/LIMIT: {offset_ms:8.2f}ms")
+        print(f"  Keyset:       {keyset_ms:8.2f}ms")
+
+        assert [log.id for log in offset_logs] == [log.id for log in keyset_logs]
+        assert keyset_ms * 5 < offset_ms
+
+
+@pytest.fixture
+def export_db(tmp_path):
+    path = str(tmp_path / "audit_export.db")
+    engine, db = make_session(path)
+    seed_audit_logs(path, 1000)
+    db.add(AuditLog(
+        id=1001, user_id=7, event_type="data_export", event_category="data", event_level="info",
+        success=True, created_at=BASE_TIME + timedelta(seconds=400),
+        event_metadata={"rows": 3, "tags": ["gdpr", "sox"]}, event_description='quoted "value", with comma'
+    ))
+    db.commit()
+    yield sessionmaker(bind=engine)
+    db.close()
+    engine.dispose()
+
+
+EXPORT_RANGE = (BASE_TIME, BASE_TIME + timedelta(days=1))
+
+
+def read_export(session_factory, export_format, compress=False, batch_size=64) -> bytes:
+    return b"".join(iter_audit_export(
+        *EXPORT_RANGE, export_format, compress,
+        exported_by="admin@example.com", session_factory=session_factory, batch_size=batch_size
+    ))
+
+
+class TestAuditExport:
+    """Test suite for streamed audit log exports"""
+
+    def test_csv(self, export_db):
+        rows = list(csv.DictReader(io.StringIO(read_export(export_db, "csv").decode())))
+
+        assert len(rows) == 1001
+        assert list(rows[0]) == list(EXPORT_FIELDS)
+        # Oldest first, with the (created_at, id) tie-break
+        assert [int(r["id"]) for r in rows[:4]] == [1, 2, 3, 4]
+        exported = next(r for r in rows if r["id"] == "1001")
+        assert json.loads(exported["metadata"]) == {"rows": 3, "tags": ["gdpr", "sox"]}
+        assert exported["event_description"] == 'quoted "value", with comma'
+
+    def test_ndjson(self, export_db):
+        lines = read_export(export_db, "ndjson").decode().splitlines()
+        records = [json.loads(line) for line in lines]
+
+        assert len(records) == 1001
+        assert records[0]["created_at"].startswith("2025-01-01T00:00:00")
+
+    def test_json_document(self, export_db):
+        document = json.loads(read_export(export_db, "json"))
+
+        assert document["export_info"]["total_records"] == 1001
+        assert document["export_info"]["exported_by"] == "admin@example.com"
+        assert len(document["audit_logs"]) == 1001
+
+    def test_gzip_stream(self, export_db):
+        plain = read_export(export_db, "ndjson")
+        compressed = read_export(export_db, "ndjson", compress=True)
+
+        assert gzip.decompress(compressed) == plain
+        assert len(compressed) < len(plain) / 3
+
+    @pytest.mark.skipif(not PARQUET_AVAILABLE, reason="pyarrow not installed")
+    def test_parquet(self, export_db):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(read_export(export_db, "parquet", batch_size=250)))
+        assert table.num_rows == 1001
+        assert table.column_names == list(EXPORT_FIELDS)
+
+    def test_unknown_format_is_rejected(self, export_db):
+        with pytest.raises(ValueError):
+            read_export(export_db, "xml")
+
+
+class TestAuditExportJobs:
+    """Test suite for background exports"""
+
+    def test_job_output_is_stored_in_chunks(self, export_db):
+        manager = AuditExportJobManager(session_factory=export_db, chunk_bytes=4096)
+        job = manager.create_job(*EXPORT_RANGE, "csv", compress=True, requested_by="admin@example.com")
+        assert job.status == "pending"
+
+        manager.run_job(job.job_id)
+
+        job = manager.get_job(job.job_id)
+        assert job.status == "completed"
+        assert export_job_filename(job) == "audit_logs_20250101_20250102.csv.gz"
+        output = b"".join(manager.iter_output(job))
+        assert len(output) == job.bytes_written
+        assert job.chunk_count == -(-job.bytes_written // 4096) > 1
+        assert len(list(csv.DictReader(io.StringIO(gzip.decompress(output).decode())))) == 1001
+
+    def test_other_workers_see_the_job(self, export_db):
+        # Separate managers stand in for separate web worker processes
+        creator = AuditExportJobManager(session_factory=export_db)
+        runner = AuditExportJobManager(session_factory=export_db)
+        poller = AuditExportJobManager(session_factory=export_db)
+
+        job = creator.create_job(*EXPORT_RANGE, "ndjson", compress=False)
+        runner.run_job(job.job_id)
+
+        polled = poller.get_job(job.job_id)
+        assert polled.status == "completed"
+        assert len(b"".join(poller.iter_output(polled)).splitlines()) == 1001
+
+    def test_failed_job_leaves_no_output(self, export_db, monkeypatch):
+        def broken_export(*args, **kwargs):
+            yield b"partial"
+            raise ConnectionError("database unavailable")
+
+        monkeypatch.setattr(audit_export_service, "iter_audit_export", broken_export)
+        manager = AuditExportJobManager(session_factory=export_db)
+        job = manager.create_job(*EXPORT_RANGE, "ndjson")
+        manager.run_job(job.job_id)
+
+        job = manager.get_job(job.job_id)
+        assert job.status == "failed"
+        assert "database unavailable" in job.error
+        db = export_db()
+        assert db.query(AuditExportChunk).count() == 0
+        db.close()
+
+    def test_expired_jobs_are_removed(self, export_db):
+        manager = AuditExportJobManager(retention_hours=0, session_factory=export_db)
+        job = manager.create_job(*EXPORT_RANGE, "ndjson")
+        manager.run_job(job.job_id)
+
+        manager.cleanup_expired()
+        assert manager.get_job(job.job_id) is None
+        db = export_db()
+        assert db.query(AuditExportChunk).count() == 0
+        db.close()
+
+    def test_stalled_jobs_are_failed(self, export_db):
+        manager = AuditExportJobManager(session_factory=export_db, stale_minutes=0)
+        job = manager.create_job(*EXPORT_RANGE, "ndjson")
+
+        # The worker that was meant to run it went away
+        manager.cleanup_expired()
+        job = manager.get_job(job.job_id)
+        assert job.status == "failed"
+        assert job.error == "Export was interrupted"
+
+    def test_stale_job_is_not_completed_later(self, export_db, monkeypatch):
+        manager = AuditExportJobManager(session_factory=export_db, stale_minutes=0)
+
+        def slow_export(*args, **kwargs):
+            yield b"first"
+            # Another worker's create_job runs cleanup while this one is still exporting
+            time.sleep(0.01)
+            manager.cleanup_expired()
+            yield b"second"
+
+        monkeypatch.setattr(audit_export_service, "iter_audit_export", slow_export)
+        job = manager.create_job(*EXPORT_RANGE, "ndjson")
+        manager.run_job(job.job_id)
+
+        job = manager.get_job(job.job_id)
+        assert job.status == "failed"
+        assert job.error == "Export was interrupted"
+        db = export_db()
+        assert db.query(AuditExportChunk).count() == 0
+        db.close()
+
+    def test_running_job_keeps_itself_fresh(self, export_db, monkeypatch):
+        manager = AuditExportJobManager(session_factory=export_db)
+        manager.stale_after = timedelta(seconds=0.5)
+        manager.heartbeat_seconds = 0.05
+
+        def long_export(*args, **kwargs):
+            for i in range(20):
+                time.sleep(0.05)
+                if i == 15:
+                    manager.cleanup_expired()
+                yield b"row\n"
+
+        monkeypatch.setattr(audit_export_service, "iter_audit_export", long_export)
+        job = manager.create_job(*EXPORT_RANGE, "ndjson", compress=False)
+        manager.run_job(job.job_id)
+
+        job = manager.get_job(job.job_id)
+        assert job.status == "completed" and job.error is None
+        assert b"".join(manager.iter_output(job)) == b"row\n" * 20
+
+
+class TestAuditExportRoutes:
+    """Export endpoints stream files and run background jobs"""
+
+    @pytest.fixture
+    def client(self, export_db, monkeypatch):
+        from app.routes import audit
+        from app.auth import get_current_user
+
+        monkeypatch.setattr(audit, "iter_audit_export", functools.partial(iter_audit_export, session_factory=export_db))
+        manager = AuditExportJobManager(session_factory=export_db)
+        monkeypatch.setattr(audit, "get_audit_export_job_manager", lambda: manager)
+
+        app = FastAPI()
+        app.include_router(audit.router)
+        app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+            id=1, email="admin@example.com", user_role="admin"
+        )
+        return TestClient(app)
+
+    def test_streamed_export(self, client):
+        params = {"start_date": EXPORT_RANGE[0].isoformat(), "end_date": EXPORT_RANGE[1].isoformat(),
+                  "format": "csv", "compress": "true"}
+        response = client.post("/api/audit/export", params=params)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/gzip"
+        assert 'filename="audit_logs_20250101_20250102.csv.gz"' in response.headers["content-disposition"]
+        assert len(gzip.decompress(response.content).decode().splitlines()) == 1002
+
+    def test_background_export(self, client):
+        params = {"start_date": EXPORT_RANGE[0].isoformat(), "end_date": EXPORT_RANGE[1].isoformat(),
+                  "format": "ndjson", "compress": "false"}
+        created = client.post("/api/audit/export/jobs", params=params)
+        assert created.status_code == 202
+
+        # BackgroundTasks run before TestClient returns
+        job_id = created.json()["job_id"]
+        assert client.get(f"/api/audit/export/jobs/{job_id}").json()["status"] == "completed"
+
+        download = client.get(f"/api/audit/export/jobs/{job_id}/download")
+        assert download.status_code == 200
+        assert len(download.content.decode().splitlines()) == 1001
+
+    def test_range_over_a_year_is_rejected(self, client):
+        params = {"start_date": "2023-01-01T00:00:00", "end_date": "2025-01-01T00:00:00"}
+        assert client.post("/api/audit/export", params=params).status_code == 400
+
+
+class TestAuditExportMemory:
+    """Peak memory of a streamed export vs. building the whole document"""
+
+    def _peak_mb(self, func) -> float:
+        tracemalloc.start()
+        try:
+            func()
+            return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_stays_bounded(self, benchmark_db):
+        engine, _ = benchmark_db
+        session_factory = sessionmaker(bind=engine)
+
+        def export_range(rows):
+            end = BASE_TIME + timedelta(seconds=rows // 3)
+            return lambda: sum(len(chunk) for chunk in iter_audit_export(
+                BASE_TIME, end, "csv", compress=True, session_factory=session_factory
+            ))
+
+        def previous_export(rows):
+            end = BASE_TIME + timedelta(seconds=rows // 3)
+
+            def run():
+                db = session_factory()
+                logs = db.query(AuditLog).filter(
+                    AuditLog.created_at >= BASE_TIME, AuditLog.created_at <= end
+                ).order_by(AuditLog.created_at).all()
+                document = {"audit_logs": [log.to_dict() for log in logs]}
+                db.close()
+                return len(document["audit_logs"])
+            return run
+
+        small = self._peak_mb(export_range(10000))
+        large = self._peak_mb(export_range(50000))
+        previous = self._peak_mb(previous_export(50000))
+
+        print(f"\nAudit export peak memory (tracemalloc):")
+        print(f"  Streamed, 10k rows:      {small:7.1f}MB")
+        print(f"  Streamed, 50k rows:      {large:7.1f}MB")
+        print(f"  Previous .all(), 50k:    {previous:7.1f}MB")
+
+        assert large < small * 2
+        assert large * 5 < previous
+
+
+@pytest.fixture
+def writer_db(tmp_path):
+    engine, db = make_session(str(tmp_path / "audit_writer.db"))
+    yield db
+    db.close()
+    engine.dispose()
+
+
+def count_rows(db) -> int:
+    db.expire_all()
+    return db.query(AuditLog).count()
+
+
+def log_login(audit_logger, db, i=0, **kwargs):
+    return audit_logger.log_event(
+        db=db,
+        event_type=AuditEventType.USER_LOGIN,
+        event_category="authentication",
+        user_id=str(i),
+        user_email=f"user{i}@example.com",
+        event_description="User logged in",
+        metadata={"attempt": i},
+        **kwargs
+    )
+
+
+class TestAuditEventWriter:
+    """Test suite for the batched background audit writer"""
+
+    @pytest.mark.asyncio
+    async def test_events_are_enqueued_then_bulk_inserted(self, writer_db):
+        audit_logger = AuditLogger()
+        audit_logger.writer = AuditEventWriter(batch_size=50, flush_interval_ms=50)
+
+        for i in range(120):
+            log_login(audit_logger, writer_db, i)
+
+        # Nothing has been written on the request path
+        assert count_rows(writer_db) == 0
+
+        await audit_logger.writer.stop()
+        assert count_rows(writer_db) == 120
+
+        metrics = audit_logger.writer.get_metrics()
+        assert metrics["written"] == 120
+        assert metrics["flushes"] >= 3
+        assert metrics["dropped"] == 0
+
+        stored = writer_db.query(AuditLog).filter(AuditLog.user_id == 7).one()
+        assert stored.event_metadata == {"attempt": 7}
+        assert stored.created_at is not None
+
+    @pytest.mark.asyncio
+    async def test_full_buffer_drops_routine_and_writes_critical_inline(self, writer_db):
+        audit_logger = AuditLogger()
+        audit_logger.writer = AuditEventWriter(batch_size=1000, flush_interval_ms=60000, max_buffer=10)
+
+        for i in range(15):
+            log_login(audit_logger, writer_db, i)
+        assert audit_logger.writer.get_metrics()["dropped"] == 5
+
+        log_login(audit_logger, writer_db, 99, event_level=AuditLogLevel.CRITICAL)
+        # Backpressure: the critical event was written by the caller
+        assert count_rows(writer_db) == 1
+
+        await audit_logger.writer.stop()
+        assert count_rows(writer_db) == 11
+        assert audit_logger.writer.get_metrics()["sync_writes"] == 1
+
+    def test_without_event_loop_writes_synchronously(self, writer_db):
+        audit_logger = AuditLogger()
+        audit_logger.writer = AuditEventWriter()
+
+        log_login(audit_logger, writer_db)
+        assert count_rows(writer_db) == 1
+
+    @pytest.mark.asyncio
+    async def test_default_logger_uses_shared_writer(self, writer_db):
+        audit_logger = AuditLogger()
+        assert log_login(audit_logger, writer_db) is not None
+
+        await audit_logger.writer.stop()
+        assert count_rows(writer_db) == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_events_for_retry(self, tmp_path, writer_db):
+        broken_engine = create_engine(f"sqlite:///{tmp_path / 'missing_table.db'}")
+        writer = AuditEventWriter(batch_size=10, flush_interval_ms=20)
+        row = {"event_type": "user_login", "event_category": "authentication", "event_level": "info",
+               "success": True, "created_at": datetime.utcnow()}
+
+        for _ in range(5):
+            assert writer.submit(broken_engine, dict(row))
+        assert writer.submit(writer_db.get_bind(), dict(row))
+        await asyncio.sleep(0.1)
+
+        metrics = writer.get_metrics()
+        assert metrics["failed_flushes"] >= 1
+        assert metrics["queue_depth"] == 5
+        assert count_rows(writer_db) == 1
+
+        writer._buffer.clear()
+        await writer.stop()
+        broken_engine.dispose()
+
+
+class TestAuditWriterPerformance:
+    """Request-path cost of an audit event: inline commit vs enqueue"""
+
+    EVENTS = 300
+
+    @pytest.mark.asyncio
+    async def test_enqueue_is_cheaper_than_commit(self, writer_db):
+        inline = AuditLogger()
+        inline.writer = AuditEventWriter(enabled=False)
+        start = time.perf_counter()
+        for i in range(self.EVENTS):
+            log_login(inline, writer_db, i)
+        inline_us = (time.perf_counter() - start) / self.EVENTS * 1e6
+
+        batched = AuditLogger()
+        batched.writer = AuditEventWriter(batch_size=100, flush_interval_ms=50)
+        start = time.perf_counter()
+        for i in range(self.EVENTS):
+            log_login(batched, writer_db, i)
+        enqueue_us = (time.perf_counter() - start) / self.EVENTS * 1e6
+
+        start = time.perf_counter()
+        await batched.writer.stop()
+        drain_ms = (time.perf_counter() - start) * 1000
+
+        print(f"\nAudit event cost on the request path ({self.EVENTS} events):")
+        print(f"  Inline commit: {inline_us:8.1f}us/event")
+        print(f"  Enqueue:       {enqueue_us:8.1f}us/event (drain {drain_ms:.1f}ms)")
+
+        assert count_rows(writer_db) == 2 * self.EVENTS
+        assert enqueue_us * 3 < inline_us
+
+
+def table_names(db):
+    return set(db.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+
+
+@pytest.fixture
+def monthly_db(tmp_path):
+    """Audit logs spread over the current and the previous four months"""
+    engine, db = make_session(str(tmp_path / "audit_partitions.db"))
+    current = month_start(datetime.utcnow())
+    policies = [None, "standard", "extended", "legal_hold", "short"]
+    row_id = 0
+    for months_back in range(5):
+        start = add_months(current, -months_back)
+        for i in range(20):
+            row_id += 1
+            db.add(AuditLog(
+                id=row_id, event_type="user_login", event_category=CATEGORIES[i % 3], event_level="info",
+                success=i % 4 != 0, risk_score=80 if i % 5 == 0 else 10, user_email=f"user{i % 2}@example.com",
+                retention_policy=policies[i % len(policies)],
+                created_at=start + timedelta(days=i % 5, hours=1)
+            ))
+    db.commit()
+    yield db, current
+    db.close()
+    engine.dispose()
+
+
+class TestAuditPartitions:
+    """Test suite for rolling monthly tables and partition-based retention"""
+
+    def test_month_arithmetic(self):
+        assert add_months(datetime(2025, 12, 1), 1) == datetime(2026, 1, 1)
+        assert add_months(datetime(2025, 1, 1), -1) == datetime(2024, 12, 1)
+        assert partition_name(datetime(2025, 3, 1)) == "audit_logs_y2025m03"
+
+    def test_completed_months_roll_out_of_hot_table(self, monthly_db):
+        db, current = monthly_db
+        manager = AuditPartitionManager()
+
+        rolled = manager.roll_completed_months(db)
+
+        assert rolled == [partition_name(add_months(current, -m)) for m in range(4, 0, -1)]
+        assert db.query(AuditLog).count() == 20
+        assert [p.name for p in manager.list_partitions(db)] == rolled
+        assert db.execute(text(f"SELECT COUNT(*) FROM {rolled[0]}")).scalar() == 20
+
+    def test_reads_include_rolled_months(self, monthly_db):
+        db, current = monthly_db
+        audit_logger = AuditLogger()
+        before, _ = audit_logger.query_audit_logs(db, limit=200)
+
+        AuditPartitionManager().roll_completed_months(db)
+
+        after, _ = audit_logger.query_audit_logs(db, limit=200)
+        assert [log.id for log in after] == [log.id for log in before]
+        assert len(after) == 100
+        assert len(audit_logger.get_security_events(db, hours=24 * 160)) == 30
+        exported = audit_export_service.iter_audit_log_batches(db, add_months(current, -4), add_months(current, 1))
+        assert sum(len(batch) for batch in exported) == 100
+
+        log = audit_logger.get_audit_log(db, 21)
+        assert log.created_at < current
+        audit_logger.delete_audit_log(db, log)
+        db.commit()
+        assert audit_logger.get_audit_log(db, 21) is None
+        assert db.execute(text(f"SELECT COUNT(*) FROM {partition_name(add_months(current, -1))}")).scalar() == 19
+
+    def test_statistics_read_only_overlapping_partitions(self, monthly_db):
+        db, current = monthly_db
+        audit_logger = AuditLogger()
+        days = (datetime.utcnow() - add_months(current, -1)).days + 1
+        before = audit_logger.scan_audit_statistics(db, days=days)
+
+        manager = AuditPartitionManager()
+        manager.roll_completed_months(db)
+        after = audit_logger.scan_audit_statistics(db, days=days)
+
+        assert after == before
+        assert after["total_events"] == 40
+        assert after["failed_events"] == 10
+        assert after["high_risk_events"] == 8
+
+        sql = str(manager.audit_log_source(db, add_months(current, -1)).compile())
+        assert partition_name(add_months(current, -1)) in sql
+        assert partition_name(add_months(current, -2)) not in sql
+
+    def test_statistics_use_one_aggregate_pass(self, monthly_db):
+        db, _ = monthly_db
+        recorder = QueryRecorder(db.get_bind())
+        AuditLogger().scan_audit_statistics(db, days=30)
+        event.remove(db.get_bind(), "before_cursor_execute", recorder._record)
+
+        # Grouped totals/failures/high-risk plus top users, instead of five scans
+        scans = [sql for sql, _ in recorder.statements if "FROM audit_logs" in sql]
+        assert len(scans) == 2
+
+    def test_expired_partitions_are_dropped_with_retained_rows_kept(self, monthly_db):
+        db, current = monthly_db
+        manager = AuditPartitionManager(retention_days=62, retention_policy_days={"short": 30})
+        manager.roll_completed_months(db)
+
+        dropped = manager.drop_expired_partitions(db)
+
+        # Every month ending more than 62 days ago is gone as a whole table
+        cutoff = datetime.utcnow() - timedelta(days=62)
+        expected = [partition_name(add_months(current, -m)) for m in range(4, 0, -1)
+                    if add_months(current, -m + 1) <= cutoff]
+        assert dropped == expected
+        assert not set(dropped) & table_names(db)
+
+        # 'extended' and 'legal_hold' rows outlive the default period
+        retained = db.execute(text("SELECT retention_policy, COUNT(*) FROM audit_logs_retained "
+                                   "GROUP BY retention_policy")).all()
+        assert dict(retained) == {"extended": 4 * len(dropped), "legal_hold": 4 * len(dropped)}
+
+    def test_retained_rows_are_still_read(self, monthly_db):
+        db, current = monthly_db
+        manager = AuditPartitionManager(retention_days=62, retention_policy_days={"short": 30})
+        manager.roll_completed_months(db)
+        oldest = add_months(current, -4)
+        kept = db.execute(text(
+            f"SELECT id FROM {partition_name(oldest)} WHERE retention_policy IN ('extended', 'legal_hold')"
+        )).scalars().all()
+
+        assert partition_name(oldest) in manager.drop_expired_partitions(db)
+
+        logs, _ = AuditLogger().query_audit_logs(db, end_date=add_months(oldest, 1), limit=200)
+        assert sorted(log.id for log in logs) == sorted(kept) and len(kept) == 8
+        exported = audit_export_service.iter_audit_log_batches(db, oldest, add_months(oldest, 1))
+        assert sum(len(batch) for batch in exported) == 8
+
+    def test_retained_rows_expire_with_their_own_policy(self, monthly_db):
+        db, _ = monthly_db
+        manager = AuditPartitionManager(retention_days=30, retention_policy_days={
+            "standard": 30, "extended": 60, "legal_hold": None
+        })
+        manager.roll_completed_months(db)
+        manager.drop_expired_partitions(db)
+
+        purged = manager.purge_retained(db)
+        remaining = dict(db.execute(text("SELECT retention_policy, COUNT(*) FROM audit_logs_retained "
+                                         "GROUP BY retention_policy")).all())
+        assert purged > 0
+        assert "legal_hold" in remaining
+        assert db.execute(text(
+            "SELECT COUNT(*) FROM audit_logs_retained WHERE retention_policy = 'extended' AND created_at < :cutoff"
+        ), {"cutoff": datetime.utcnow() - timedelta(days=60)}).scalar() == 0
+
+    def test_maintenance_run(self, monthly_db):
+        db, _ = monthly_db
+        result = AuditPartitionManager(retention_days=3650).run_maintenance(db)
+
+        # No native partitions on SQLite: nothing pre-created, months rolled, nothing expired
+        assert result["created"] == []
+        assert len(result["rolled"]) == 4
+        assert result["dropped"] == []
+
+
+class TestAuditStatsRollups:
+    """Test suite for rollup-backed audit statistics"""
+
+    def test_sketch_keeps_heavy_hitters(self):
+        sketch = merge_sketch({}, {"a": 5, "b": 3, "c": 1}, capacity=3)
+        assert sketch == {"a": 5, "b": 3, "c": 1}
+
+        # A newcomer takes over the least active slot and inherits its count
+        sketch = merge_sketch(sketch, {"d": 1, "a": 2}, capacity=3)
+        assert sketch == {"a": 7, "b": 3, "d": 2}
+
+    @pytest.mark.asyncio
+    async def test_writer_keeps_rollups_in_step_with_raw_rows(self, writer_db):
+        audit_logger = AuditLogger()
+        audit_logger.writer = AuditEventWriter(batch_size=50, flush_interval_ms=50)
+        audit_logger.rollups = audit_logger.writer.rollups = AuditStatsRollups()
+
+        for i in range(120):
+            log_login(audit_logger, writer_db, i % 7, success=i % 5 != 0)
+        await audit_logger.writer.stop()
+
+        from_rollups = audit_logger.get_audit_statistics(writer_db, days=1)
+        assert from_rollups == audit_logger.scan_audit_statistics(writer_db, days=1)
+        assert from_rollups["total_events"] == 120
+        assert from_rollups["failed_events"] == 24
+        assert audit_logger.rollups.get_metrics()["applied_rows"] == 120
+
+    def test_synchronous_writes_update_rollups(self, writer_db):
+        audit_logger = AuditLogger()
+        audit_logger.writer = AuditEventWriter(enabled=False)
+        audit_logger.rollups = AuditStatsRollups()
+
+        log_login(audit_logger, writer_db, 1)
+        log_login(audit_logger, writer_db, 1, success=False)
+
+        stats = audit_logger.get_audit_statistics(writer_db, days=1)
+        assert stats["total_events"] == 2
+        assert stats["failed_events"] == 1
+        assert stats["top_users"] == [{"email": "user1@example.com", "event_count": 2}]
+
+    def test_statistics_read_only_rollup_buckets(self, writer_db):
+        audit_logger = AuditLogger()
+        audit_logger.writer = AuditEventWriter(enabled=False)
+        audit_logger.rollups = AuditStatsRollups()
+        log_login(audit_logger, writer_db)
+
+        recorder = QueryRecorder(writer_db.get_bind())
+        audit_logger.get_audit_statistics(writer_db, days=90)
+        event.remove(writer_db.get_bind(), "before_cursor_execute", recorder._record)
+
+        assert len(recorder.statements) == 2
+        assert not any("FROM audit_logs " in sql or sql.endswith("FROM audit_logs") for sql, _ in recorder.statements)
+
+    def test_rebuild_matches_raw_scan(self, monthly_db):
+        db, _ = monthly_db
+        AuditPartitionManager().roll_completed_months(db)
+        rollups = AuditStatsRollups()
+        audit_logger = AuditLogger()
+        audit_logger.rollups = rollups
+
+        rows = rollups.rebuild(db, datetime.utcnow() - timedelta(days=200))
+        assert rows == 100
+
+        # Rebuilding again replaces the buckets rather than adding to them
+        rollups.rebuild(db, datetime.utcnow() - timedelta(days=200))
+        # The window reaches past the oldest row, so hour rounding of its start cannot matter
+        assert audit_logger.get_audit_statistics(db, days=200) == audit_logger.scan_audit_statistics(db, days=200)
+
+    def test_prune_drops_old_hourly_buckets(self, monthly_db):
+        db, _ = monthly_db
+        rollups = AuditStatsRollups(hourly_retention_days=45)
+        rollups.rebuild(db, datetime.utcnow() - timedelta(days=200))
+        daily_before = db.query(AuditStatsRollup).filter(AuditStatsRollup.granularity == "day").count()
+
+        assert rollups.prune(db) > 0
+        cutoff = datetime.utcnow() - timedelta(days=46)
+        assert db.query(AuditStatsRollup).filter(
+            AuditStatsRollup.granularity == "hour", AuditStatsRollup.bucket_start < cutoff
+        ).count() == 0
+        assert db.query(AuditStatsRollup).filter(AuditStatsRollup.granularity == "day").count() == daily_before
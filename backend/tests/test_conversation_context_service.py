@@ -0,0 +1,414 @@
+"""
+Tests for the Redis-backed Conversation Context Service
+Covers batched context loading, atomic message writes and round-trip budgets
+
+Author: CapeAI Development Team
+"""
+
+import pytest
+import asyncio
+import json
+import time
+import statistics
+from typing import Dict, List
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redis.exceptions import ResponseError
+
+from app.services.conversation_context_service import (
+    ConversationContextService,
+    ContextType,
+    CONTEXT_LOAD_SCRIPT,
+)
+
+
+class FakeRedis:
+    """In-memory stand-in for redis.asyncio that counts network round-trips"""
+
+    def __init__(self, latency: float = 0.0, scripting: bool = True):
+        self.strings: Dict[str, str] = {}
+        self.lists: Dict[str, List[str]] = {}
+        self.hashes: Dict[str, Dict[str, str]] = {}
+        self.latency = latency
+        self.scripting = scripting
+        self.round_trips = 0
+        self.script_keys = []
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    # Plain commands -----------------------------------------------------
+
+    def _get(self, key):
+        return self.strings.get(key)
+
+    def _mget(self, keys):
+        return [self.strings.get(key) for key in keys]
+
+    def _lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def _setex(self, key, ttl, value):
+        self.strings[key] = value
+
+    def _lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    def _ltrim(self, key, start, end):
+        self.lists[key] = self._lrange(key, start, end)
+
+    def _expire(self, key, ttl):
+        pass
+
+    def _hsetnx(self, key, field, value):
+        self.hashes.setdefault(key, {}).setdefault(field, str(value))
+
+    def _hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    def _hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = str(int(fields.get(field, 0)) + int(amount))
+        return int(fields[field])
+
+    def _hgetall(self, key):
+        if key in self.strings:
+            return ResponseError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return dict(self.hashes.get(key, {}))
+
+    def _metadata_json(self, key):
+        if key in self.hashes:
+            return json.dumps(self.hashes[key])
+        return self.strings.get(key)
+
+    async def get(self, key):
+        await self._round_trip()
+        return self._get(key)
+
+    async def mget(self, keys):
+        await self._round_trip()
+        return self._mget(keys)
+
+    async def lrange(self, key, start, end):
+        await self._round_trip()
+        return self._lrange(key, start, end)
+
+    async def setex(self, key, ttl, value):
+        await self._round_trip()
+        self._setex(key, ttl, value)
+
+    # Scripting -----------------------------------------------------------
+
+    def register_script(self, script):
+        fake = self
+
+        async def run_context_load(keys=None, args=None):
+            if not fake.scripting:
+                raise ResponseError("NOSCRIPT scripting disabled")
+            await fake._round_trip()
+            fake.script_keys.append(list(keys))
+            ids = fake._lrange(keys[0], 0, int(args[0]) - 1)
+            metadata = fake._metadata_json(keys[1])
+            preferences = fake._get(keys[2]) if len(keys) > 2 else None
+            return [ids, metadata, preferences]
+
+        async def run_message_append(keys=None, args=None):
+            if not fake.scripting:
+                raise ResponseError("NOSCRIPT scripting disabled")
+            await fake._round_trip()
+            message_key, list_key, metadata_key = keys
+            message_id, message_data, ttl, max_messages, now, user_id, tokens = args
+            fake._setex(message_key, ttl, message_data)
+            fake._lpush(list_key, message_id)
+            fake._ltrim(list_key, 0, int(max_messages) - 1)
+            if metadata_key in fake.strings:
+                legacy = json.loads(fake.strings.pop(metadata_key))
+                fake._hset(metadata_key, legacy)
+            fake._hsetnx(metadata_key, 'created_at', now)
+            fake._hset(metadata_key, {'updated_at': now, 'user_id': user_id})
+            return fake._hincrby(metadata_key, 'total_tokens', tokens)
+
+        return run_message_append if 'LPUSH' in script else run_context_load
+
+    # Pipelines -----------------------------------------------------------
+
+    def pipeline(self, transaction: bool = True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues commands and executes them in a single round-trip"""
+
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((name, args))
+            return self
+        return queue
+
+    def hset(self, key, mapping):
+        self.commands.append(("hset", (key, mapping)))
+        return self
+
+    async def execute(self, raise_on_error: bool = True):
+        await self.client._round_trip()
+        results = [getattr(self.client, f"_{name}")(*args) for name, args in self.commands]
+        self.commands = []
+        return results
+
+
+async def seed_conversation(service: ConversationContextService, conversation_id: str,
+                            message_count: int, user_id: str = "user_1"):
+    """Populate the fake store with alternating user/assistant messages"""
+    for i in range(message_count):
+        await service.add_message(
+            user_id=user_id,
+            conversation_id=conversation_id,
+            message_type=ContextType.USER_MESSAGE if i % 2 == 0 else ContextType.AI_RESPONSE,
+            content=f"message {i}",
+            tokens_used={'total_tokens': 10}
+        )
+    await service.update_user_preferences(user_id, {'communication_style': 'casual'})
+
+
+class TestBatchedContextLoading:
+    """Test suite for the batched context read path"""
+
+    @pytest.mark.asyncio
+    async def test_context_loaded_in_two_round_trips(self):
+        """Messages, metadata and preferences arrive in two round-trips"""
+        service = ConversationContextService()
+        service.redis_client = FakeRedis()
+        await seed_conversation(service, "conv_1", 20)
+
+        service.redis_client.round_trips = 0
+        context = await service.get_conversation_context("conv_1")
+
+        assert service.redis_client.round_trips == 2
+        assert context.total_messages == 20
+        assert [m.content for m in context.messages][:2] == ["message 0", "message 1"]
+        assert context.user_preferences == {'communication_style': 'casual'}
+        assert context.total_tokens == 200
+
+    @pytest.mark.asyncio
+    async def test_load_script_only_touches_declared_keys(self):
+        """The load script builds no key names, so it routes under Redis Cluster"""
+        service = ConversationContextService()
+        service.redis_client = FakeRedis()
+        await seed_conversation(service, "conv_1", 3)
+
+        await service.get_conversation_context("conv_1")
+        await service._load_context_payload("conv_1", 10, user_id="user_1")
+
+        assert "'message:'" not in CONTEXT_LOAD_SCRIPT
+        assert "'user:'" not in CONTEXT_LOAD_SCRIPT
+        assert "ARGV[2]" not in CONTEXT_LOAD_SCRIPT
+        assert service.redis_client.script_keys == [
+            ["conversation:conv_1:messages", "conversation:conv_1:metadata"],
+            ["conversation:conv_1:messages", "conversation:conv_1:metadata", "user:user_1:preferences"],
+        ]
+
+    @pytest.mark.asyncio
+    async def test_known_owner_preferences_come_from_script(self):
+        """Preferences read by the script are not fetched a second time"""
+        service = ConversationContextService()
+        service.redis_client = FakeRedis()
+        await seed_conversation(service, "conv_1", 3)
+
+        service.redis_client.round_trips = 0
+        message_ids, raw_messages, _, user_id, preferences_data = (
+            await service._load_context_payload("conv_1", 10, user_id="user_1")
+        )
+
+        assert service.redis_client.round_trips == 2
+        assert len(raw_messages) == len(message_ids) == 3
+        assert user_id == "user_1"
+        assert json.loads(preferences_data)['communication_style'] == 'casual'
+
+    @pytest.mark.asyncio
+    async def test_max_messages_is_respected(self):
+        """Only the newest max_messages are returned, in chronological order"""
+        service = ConversationContextService()
+        service.redis_client = FakeRedis()
+        await seed_conversation(service, "conv_1", 30)
+
+        context = await service.get_conversation_context("conv_1", max_messages=5)
+
+        assert [m.content for m in context.messages] == [f"message {i}" for i in range(25, 30)]
+
+    @pytest.mark.asyncio
+    async def test_pipelined_fallback_without_scripting(self):
+        """Servers without Lua still load context in two round-trips"""
+        service = ConversationContextService()
+        service.redis_client = FakeRedis(scripting=False)
+        await seed_conversation(service, "conv_1", 10)
+
+        service.redis_client.round_trips = 0
+        context = await service.get_conversation_context("conv_1")
+
+        assert service.redis_client.round_trips == 2
+        assert context.total_messages == 10
+        assert context.user_preferences == {'communication_style': 'casual'}
+
+    @pytest.mark.asyncio
+    async def test_missing_conversation_returns_none(self):
+        """Unknown conversations return None without raising"""
+        service = ConversationContextService()
+        service.redis_client = FakeRedis()
+
+        assert await service.get_conversation_context("conv_missing") is None
+        ai_context, metadata = await service.generate_context_for_ai("conv_missing")
+        assert ai_context == [] and metadata == {}
+
+    @pytest.mark.asyncio
+    async def test_generate_context_for_ai_uses_batched_path(self):
+        """AI context generation costs two round-trips"""
+        service = ConversationContextService()
+        service.redis_client = FakeRedis()
+        await seed_conversation(service, "conv_1", 30)
+
+        service.redis_client.round_trips = 0
+        ai_context, metadata = await service.generate_context_for_ai("conv_1", max_context_messages=10)
+
+        assert service.redis_client.round_trips == 2
+        assert len(ai_context) == 10
+        assert ai_context[-1] == {"role": "assistant", "content": "message 29"}
+        assert metadata['user_preferences'] == {'communication_style': 'casual'}
+
+
+class TestAtomicMessageWrites:
+    """Test suite for the single round-trip message write path"""
+
+    @pytest.mark.asyncio
+    async def test_add_message_single_round_trip(self):
+        """Appending a message costs one round-trip"""
+        service = ConversationContextService()
+        service.redis_client = FakeRedis()
+
+        await service.add_message(
+            user_id="user_1",
+            conversation_id="conv_1",
+            message_type=ContextType.USER_MESSAGE,
+            content="hello",
+            tokens_used={'total_tokens': 7}
+        )
+
+        assert service.redis_client.round_trips == 1
+        metadata = service.redis_client.hashes["conversation:conv_1:metadata"]
+        assert metadata['total_tokens'] == '7'
+        assert metadata['user_id'] == 'user_1'
+
+    @pytest.mark.asyncio
+    async def test_list_trimmed_to_max_context_messages(self):
+        """Conversation lists never grow past max_context_messages"""
+        service = ConversationContextService()
+        service.max_context_messages = 5
+        service.redis_client = FakeRedis()
+        await seed_conversation(service, "conv_1", 12)
+
+        assert len(service.redis_client.lists["conversation:conv_1:messages"]) == 5
+
+    @pytest.mark.asyncio
+    async def test_concurrent_token_totals_are_exact(self):
+        """Concurrent writers to one conversation never lose token updates"""
+        service = ConversationContextService()
+        service.redis_client = FakeRedis(latency=0.001)
+
+        await asyncio.gather(*[
+            service.add_message(
+                user_id="user_1",
+                conversation_id="conv_1",
+                message_type=ContextType.AI_RESPONSE,
+                content=f"reply {i}",
+                tokens_used={'total_tokens': 3}
+            )
+            for i in range(40)
+        ])
+
+        context = await service.get_conversation_context("conv_1")
+        assert context.total_tokens == 120
+
+    @pytest.mark.asyncio
+    async def test_legacy_json_metadata_is_migrated(self):
+        """JSON-string metadata from older writers is folded into the hash"""
+        service = ConversationContextService()
+        service.redis_client = FakeRedis()
+        service.redis_client.strings["conversation:conv_1:metadata"] = json.dumps({
+            'created_at': '2025-01-01T00:00:00', 'user_id': 'user_1', 'total_tokens': 50
+        })
+
+        await seed_conversation(service, "conv_1", 1)
+        context = await service.get_conversation_context("conv_1")
+
+        assert context.total_tokens == 60
+        assert context.created_at.year == 2025
+
+    @pytest.mark.asyncio
+    async def test_transactional_fallback_without_scripting(self):
+        """Servers without Lua get the same writes in one MULTI/EXEC"""
+        service = ConversationContextService()
+        service.redis_client = FakeRedis(scripting=False)
+
+        await seed_conversation(service, "conv_1", 3)
+        service.redis_client.round_trips = 0
+        await service.add_message(
+            user_id="user_1",
+            conversation_id="conv_1",
+            message_type=ContextType.USER_MESSAGE,
+            content="one more",
+            tokens_used={'total_tokens': 10}
+        )
+
+        assert service.redis_client.round_trips == 1
+        context = await service.get_conversation_context("conv_1")
+        assert context.total_tokens == 40
+
+
+class TestContextLoadPerformance:
+    """Performance benchmark for context-load latency vs. message count"""
+
+    @pytest.mark.asyncio
+    async def test_context_load_latency_benchmark(self):
+        """Benchmark p50/p99 context-load latency with a simulated 0.5ms RTT"""
+        latency = 0.0005
+        samples = 30
+
+        print("\nContext Load Benchmark (simulated RTT 0.5ms):")
+        print(f"{'messages':>9} {'p50 ms':>8} {'p99 ms':>8} {'legacy est ms':>14}")
+
+        for message_count in (10, 25, 50):
+            service = ConversationContextService()
+            service.redis_client = FakeRedis()
+            await seed_conversation(service, f"conv_{message_count}", message_count)
+            service.redis_client.latency = latency
+
+            times = []
+            for _ in range(samples):
+                start_time = time.perf_counter()
+                await service.get_conversation_context(f"conv_{message_count}")
+                times.append((time.perf_counter() - start_time) * 1000)
+
+            times.sort()
+            p50 = statistics.median(times)
+            p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+            # Previous implementation: LRANGE + one GET per message + metadata + preferences
+            legacy_estimate = (message_count + 3) * latency * 1000
+
+            print(f"{message_count:>9} {p50:>8.2f} {p99:>8.2f} {legacy_estimate:>14.2f}")
+
+            assert p50 < legacy_estimate
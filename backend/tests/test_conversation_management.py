@@ -29,6 +29,7 @@ from app.services.conversation_manager import (
     ConversationType,
     ConversationStatus,
     ThreadingStrategy,
+    ConversationVectorIndex,
     create_conversation_manager
 )
 
@@ -356,6 +357,257 @@ class TestEnhancedConversation:
             # Thread assignment happens in auto-threading, may be None for short content
             pass  # Just verify no errors occurred
 
+class TestConversationVectorIndex:
+    """Test suite for the incremental semantic threading index"""
+    
+    def test_message_joins_most_similar_thread(self):
+        """Test scoring a message against every thread centroid"""
+        index = ConversationVectorIndex()
+        index.add_message("m1", "python asyncio event loop coroutines")
+        index.add_message("m2", "chocolate cake baking recipe oven")
+        index.assign("m1", "thread_python")
+        index.assign("m2", "thread_baking")
+        
+        index.add_message("m3", "how do asyncio coroutines share the event loop")
+        thread_id, score = index.most_similar_thread("m3")
+        
+        assert thread_id == "thread_python"
+        assert score > 0.3
+    
+    def test_removed_message_leaves_centroid(self):
+        """Test that deleting a message removes its contribution"""
+        index = ConversationVectorIndex()
+        index.add_message("m1", "python asyncio event loop")
+        index.add_message("m2", "chocolate cake recipe")
+        index.assign("m1", "thread_a")
+        index.assign("m2", "thread_a")
+        index.remove_message("m2")
+        
+        index.add_message("m3", "chocolate cake recipe")
+        _, score = index.most_similar_thread("m3")
+        
+        assert score == pytest.approx(0.0, abs=1e-9)
+    
+    def test_merge_threads_combines_centroids(self):
+        """Test that merged threads share one centroid"""
+        index = ConversationVectorIndex()
+        index.add_message("m1", "python asyncio")
+        index.add_message("m2", "chocolate cake")
+        index.assign("m1", "thread_a")
+        index.assign("m2", "thread_b")
+        index.merge_threads("thread_b", "thread_a")
+        
+        assert set(index.thread_sums) == {"thread_a"}
+        assert index.message_threads["m2"] == "thread_a"
+    
+    @pytest.mark.asyncio
+    async def test_semantic_threading_uses_thread_centroids(self):
+        """Test semantic auto-threading against threads older than the last 10 messages"""
+        conversation = EnhancedConversation(
+            user_id="user_456",
+            conversation_data={"threading_strategy": "semantic_based"}
+        )
+        first = await conversation.add_message(MessageRole.USER, "Explain python asyncio coroutines and the event loop")
+        thread = await conversation.create_thread("Asyncio", [first.message_id])
+        
+        for i in range(15):
+            await conversation.add_message(MessageRole.USER, f"Unrelated gardening note number {i} about tomatoes")
+        
+        message = await conversation.add_message(MessageRole.USER, "Back to asyncio: how do coroutines yield to the event loop?")
+        
+        assert message.thread_id == thread.thread_id
+        assert thread.message_count == 2
+
+class TestMessageSearchIndex:
+    """Test suite for the inverted full-text message index"""
+    
+    @pytest.fixture
+    def conversation(self):
+        """Create a conversation with searchable content"""
+        return EnhancedConversation(
+            user_id="user_456",
+            conversation_data={"auto_threading": False}
+        )
+    
+    @pytest.mark.asyncio
+    async def test_and_semantics(self, conversation):
+        """Test that every query term must appear in a result"""
+        await conversation.add_message(MessageRole.USER, "python web framework")
+        await conversation.add_message(MessageRole.USER, "python data science")
+        
+        results = await conversation.search_messages("python web")
+        
+        assert [m.content for m in results] == ["python web framework"]
+    
+    @pytest.mark.asyncio
+    async def test_phrase_query(self, conversation):
+        """Test quoted phrases require adjacent tokens"""
+        await conversation.add_message(MessageRole.USER, "machine learning is fun")
+        await conversation.add_message(MessageRole.USER, "learning about machine shops")
+        
+        results = await conversation.search_messages('"machine learning"')
+        
+        assert [m.content for m in results] == ["machine learning is fun"]
+    
+    @pytest.mark.asyncio
+    async def test_bm25_ranking(self, conversation):
+        """Test that denser matches rank higher"""
+        await conversation.add_message(MessageRole.USER, "a long message that mentions redis once among many other words here")
+        await conversation.add_message(MessageRole.USER, "redis redis caching")
+        
+        results = await conversation.search_messages("redis")
+        
+        assert results[0].content == "redis redis caching"
+    
+    @pytest.mark.asyncio
+    async def test_pagination(self, conversation):
+        """Test limit and offset over ranked results"""
+        for i in range(5):
+            await conversation.add_message(MessageRole.USER, f"topic number {i}")
+        
+        all_results = await conversation.search_messages("topic")
+        page = await conversation.search_messages("topic", limit=2, offset=2)
+        
+        assert page == all_results[2:4]
+    
+    @pytest.mark.asyncio
+    async def test_edit_and_delete_update_index(self, conversation):
+        """Test that edits and deletes are reflected in search"""
+        message = await conversation.add_message(MessageRole.USER, "original wording")
+        other = await conversation.add_message(MessageRole.USER, "original text")
+        
+        await conversation.edit_message(message.message_id, "revised wording")
+        await conversation.delete_message(other.message_id)
+        
+        assert await conversation.search_messages("original") == []
+        assert len(await conversation.search_messages("revised")) == 1
+    
+    @pytest.mark.asyncio
+    async def test_thread_filter_reads_current_assignment(self, conversation):
+        """Test that thread filters see threads assigned after indexing"""
+        message = await conversation.add_message(MessageRole.USER, "deploy pipeline")
+        await conversation.add_message(MessageRole.USER, "deploy script")
+        thread = await conversation.create_thread("Deploys", [message.message_id])
+        
+        results = await conversation.search_messages("deploy", {"thread_id": thread.thread_id})
+        
+        assert [m.message_id for m in results] == [message.message_id]
+    
+    @pytest.mark.asyncio
+    async def test_manager_search_scoped_to_user(self):
+        """Test that the shared index only returns the user's conversations"""
+        manager = create_conversation_manager({})
+        mine = await manager.create_conversation("user_a", {"title": "Mine"})
+        theirs = await manager.create_conversation("user_b", {"title": "Theirs"})
+        await manager.add_message(mine.conversation_id, MessageRole.USER, "kubernetes autoscaling")
+        await manager.add_message(theirs.conversation_id, MessageRole.USER, "kubernetes autoscaling")
+        
+        results = await manager.search_conversations("user_a", "autoscaling")
+        
+        assert [c.conversation_id for c in results] == [mine.conversation_id]
+        
+        await manager.delete_conversation(theirs.conversation_id)
+        assert theirs.conversation_id not in manager.search_index.conversation_messages
+
+class TestConversationThreadingPerformance:
+    """Micro-benchmark for semantic auto-threading"""
+    
+    @pytest.mark.asyncio
+    async def test_semantic_threading_1000_messages_benchmark(self):
+        """Benchmark auto-threading a 1,000-message conversation"""
+        import time
+        
+        topics = [
+            "python asyncio coroutines event loop",
+            "react components hooks state rendering",
+            "postgres indexes query planner vacuum",
+            "kubernetes pods deployments scaling",
+        ]
+        contents = [
+            f"Message {i} discussing {topics[i % len(topics)]} in more detail"
+            for i in range(1000)
+        ]
+        
+        conversation = EnhancedConversation(
+            user_id="benchmark_user",
+            conversation_data={"threading_strategy": "hybrid"}
+        )
+        start_time = time.perf_counter()
+        for i, content in enumerate(contents):
+            await conversation.add_message(MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT, content)
+        incremental_ms = (time.perf_counter() - start_time) * 1000
+        
+        # Previous approach: refit a TfidfVectorizer over the last 10 messages per message
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        start_time = time.perf_counter()
+        for i in range(1, len(contents)):
+            texts = contents[max(0, i - 10):i] + [contents[i]]
+            TfidfVectorizer(max_features=100, stop_words='english').fit_transform(texts)
+        refit_ms = (time.perf_counter() - start_time) * 1000
+        
+        print(f"\nSemantic Threading Benchmark (1,000 messages):")
+        print(f"Incremental index: {incremental_ms:.1f}ms total, {incremental_ms / 1000:.3f}ms per message")
+        print(f"Per-message refit (fit only): {refit_ms:.1f}ms total, {refit_ms / 1000:.3f}ms per message")
+        print(f"Threads: {len(conversation.threads)}")
+        
+        assert len(conversation.messages) == 1000
+        assert incremental_ms < refit_ms
+
+class TestSimilarConversationSearchPerformance:
+    """Benchmark for vectorized similar-conversation search"""
+    
+    @pytest.mark.asyncio
+    async def test_similar_conversations_500_benchmark(self):
+        """Benchmark corpus-matrix search against per-pair TF-IDF fits"""
+        import time
+        
+        manager = create_conversation_manager({})
+        topics = [
+            "python asyncio coroutines event loop",
+            "react components hooks state rendering",
+            "postgres indexes query planner vacuum",
+            "kubernetes pods deployments scaling",
+            "sourdough bread baking hydration starter",
+        ]
+        conversations = []
+        for i in range(500):
+            conversation = await manager.create_conversation("bench_user", {
+                "title": f"Conversation {i}",
+                "tags": [f"topic{i % 5}", f"batch{i % 7}"],
+                "auto_threading": False,
+            })
+            for j in range(4):
+                await manager.add_message(
+                    conversation.conversation_id, MessageRole.USER,
+                    f"Question {j} about {topics[i % 5]} variant {i}"
+                )
+            conversations.append(conversation)
+        
+        source = conversations[0]
+        
+        start_time = time.perf_counter()
+        similar = await manager.get_similar_conversations(source.conversation_id, limit=10)
+        first_ms = (time.perf_counter() - start_time) * 1000
+        
+        start_time = time.perf_counter()
+        await manager.get_similar_conversations(source.conversation_id, limit=10)
+        warm_ms = (time.perf_counter() - start_time) * 1000
+        
+        start_time = time.perf_counter()
+        pairwise = []
+        for conv in conversations[1:]:
+            pairwise.append((await manager._calculate_conversation_similarity(source, conv), conv))
+        pairwise_ms = (time.perf_counter() - start_time) * 1000
+        
+        print(f"\nSimilar Conversation Benchmark (500 conversations):")
+        print(f"Corpus matrix (cold build): {first_ms:.1f}ms")
+        print(f"Corpus matrix (warm): {warm_ms:.1f}ms")
+        print(f"Per-pair TF-IDF fits: {pairwise_ms:.1f}ms")
+        
+        assert len(similar) == 10
+        assert all(conv.tags[0] == "topic0" for conv in similar)
+        assert warm_ms < pairwise_ms
+
 class TestConversationManager:
     """Test suite for ConversationManager class"""
     
@@ -0,0 +1,157 @@
+"""
+Tests for database engine configuration and connection pool metrics
+"""
+
+import pytest
+import threading
+import time
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from app.database import (
+    InstrumentedQueuePool,
+    PoolMetrics,
+    get_async_database_url,
+    _attach_pool_metrics,
+)
+
+
+class TestAsyncDatabaseUrl:
+    """Test suite for sync -> async driver URL mapping"""
+
+    def test_postgres_maps_to_asyncpg(self):
+        assert get_async_database_url("postgresql://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+        assert get_async_database_url("postgresql+psycopg2://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+
+    def test_sqlite_maps_to_aiosqlite(self):
+        assert get_async_database_url("sqlite:///./local.db") == "sqlite+aiosqlite:///./local.db"
+
+    def test_async_urls_unchanged(self):
+        assert get_async_database_url("postgresql+asyncpg://h/db") == "postgresql+asyncpg://h/db"
+
+
+class TestPoolMetrics:
+    """Test suite for pool checkout-wait and utilization metrics"""
+
+    @pytest.fixture
+    def instrumented_engine(self, tmp_path):
+        engine = create_engine(
+            f"sqlite:///{tmp_path}/pool.db",
+            poolclass=InstrumentedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.2,
+        )
+        metrics = PoolMetrics("test")
+        _attach_pool_metrics(engine.pool, metrics)
+        yield engine, metrics
+        engine.dispose()
+
+    def test_checkout_and_utilization(self, instrumented_engine):
+        engine, metrics = instrumented_engine
+
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            busy = metrics.snapshot(engine.pool)
+
+        idle = metrics.snapshot(engine.pool)
+
+        assert busy['in_use'] == 1
+        assert busy['utilization'] == 1.0
+        assert idle['in_use'] == 0
+        assert idle['checkouts'] == 1 and idle['checkins'] == 1
+
+    def test_checkout_wait_and_timeout_recorded(self, instrumented_engine):
+        engine, metrics = instrumented_engine
+
+        holder = engine.connect()
+        released = threading.Event()
+
+        def release_later():
+            time.sleep(0.05)
+            holder.close()
+            released.set()
+
+        threading.Thread(target=release_later).start()
+        with engine.connect():
+            pass
+        released.wait()
+
+        assert metrics.snapshot()['max_checkout_wait_ms'] >= 40
+
+        holder = engine.connect()
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        holder.close()
+
+        assert metrics.snapshot()['checkout_timeouts'] == 1
+
+    def test_concurrent_connects_are_all_counted(self, tmp_path):
+        engine = create_engine(
+            f"sqlite:///{tmp_path}/pool.db",
+            poolclass=InstrumentedQueuePool,
+            pool_size=8,
+            max_overflow=0,
+        )
+        metrics = PoolMetrics("test")
+        _attach_pool_metrics(engine.pool, metrics)
+        barrier = threading.Barrier(8)
+
+        def connect():
+            barrier.wait()
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                barrier.wait()
+
+        threads = [threading.Thread(target=connect) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+        snapshot = metrics.snapshot()
+        assert snapshot['connects'] == 8
+        assert snapshot['checkouts'] == snapshot['checkins'] == 8
+
+    def test_connect_failure_is_not_a_timeout(self, tmp_path):
+        engine = create_engine(
+            f"sqlite:///{tmp_path}/missing/pool.db",
+            poolclass=InstrumentedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+        )
+        metrics = PoolMetrics("test")
+        _attach_pool_metrics(engine.pool, metrics)
+
+        with pytest.raises(Exception):
+            engine.connect()
+        engine.dispose()
+
+        snapshot = metrics.snapshot()
+        assert snapshot['checkout_timeouts'] == 0
+        assert snapshot['checkout_errors'] == 1
+
+
+class TestAsyncSession:
+    """Test suite for the async session dependency"""
+
+    @pytest.mark.asyncio
+    async def test_get_async_db_yields_working_session(self):
+        sessions = database.get_async_db()
+        db = await sessions.__anext__()
+        try:
+            assert isinstance(db, AsyncSession)
+            result = await db.execute(text("SELECT 1"))
+            assert result.scalar() == 1
+            assert database.get_pool_metrics()['async']['checkouts'] >= 1
+        finally:
+            await sessions.aclose()
+            await database.dispose_async_engine()
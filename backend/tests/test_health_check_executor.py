@@ -0,0 +1,185 @@
+"""
+Tests for concurrent, deadline-bounded health checks in HealthService
+
+The benchmark at the end prints run duration against the number of
+registered checks; with concurrent execution it stays close to the
+slowest single check instead of growing with the count.
+"""
+
+import pytest
+import asyncio
+import time
+from unittest.mock import Mock
+
+import httpx
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import health_service as hs
+from app.services.health_service import EndpointHealthCheck, HealthCheckResult, HealthService, HealthStatus, ServiceType
+
+
+def sleeping_check(name, seconds, status=HealthStatus.HEALTHY):
+    async def check():
+        await asyncio.sleep(seconds)
+        return HealthCheckResult(
+            service_name=name,
+            service_type=ServiceType.CORE_API,
+            status=status,
+            response_time_ms=0,
+            timestamp=time.time(),
+            details={}
+        )
+    return check
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """Sessions handed out by get_db(), recording whether each was closed"""
+    opened = []
+
+    def get_db():
+        db = Mock()
+        opened.append(db)
+        try:
+            yield db
+        finally:
+            db.closed = True
+
+    monkeypatch.setattr(hs, "get_db", get_db)
+    return opened
+
+
+@pytest.fixture
+def service(sessions):
+    service = HealthService()
+    service.health_checks = {}
+    service.check_timeouts = {}
+    service.endpoint_checks = []
+    service.audit_logger = Mock()
+
+    async def metrics():
+        return {}
+
+    service._get_system_metrics_summary = metrics
+    return service
+
+
+def use_transport(service, handler):
+    service._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    service._http_client_loop = asyncio.get_running_loop()
+
+
+class TestConcurrentChecks:
+    """Test suite for the concurrent executor and its time budgets"""
+
+    @pytest.mark.asyncio
+    async def test_checks_run_concurrently(self, service):
+        for i in range(5):
+            service.register_health_check(f"check_{i}", sleeping_check(f"check_{i}", 0.2))
+
+        start = time.perf_counter()
+        result = await service.run_comprehensive_health_check()
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.6
+        assert len(result["services"]) == 5
+        assert result["overall_status"] == HealthStatus.HEALTHY
+        assert result["timed_out"] == []
+
+    @pytest.mark.asyncio
+    async def test_deadline_returns_partial_results(self, service):
+        service.deadline_seconds = 0.2
+        service.register_health_check("fast", sleeping_check("fast", 0, HealthStatus.WARNING))
+        service.register_health_check("stuck", sleeping_check("stuck", 30))
+
+        start = time.perf_counter()
+        result = await service.run_comprehensive_health_check()
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 1.0
+        assert result["services"]["fast"]["status"] == HealthStatus.WARNING
+        stuck = result["services"]["stuck"]
+        assert stuck["status"] == HealthStatus.UNHEALTHY
+        assert stuck["details"]["timed_out"] is True
+        assert result["timed_out"] == ["stuck"]
+        assert result["overall_status"] == HealthStatus.UNHEALTHY
+        assert any(alert["service"] == "stuck" for alert in result["alerts"])
+
+    @pytest.mark.asyncio
+    async def test_per_check_timeout(self, service):
+        service.register_health_check("slow", sleeping_check("slow", 1), timeout=0.05)
+        service.register_health_check("patient", sleeping_check("patient", 0.1))
+
+        result = await service.run_comprehensive_health_check()
+
+        assert result["timed_out"] == ["slow"]
+        assert result["services"]["slow"]["details"]["budget_seconds"] == 0.05
+        assert result["services"]["patient"]["status"] == HealthStatus.HEALTHY
+
+    @pytest.mark.asyncio
+    async def test_audit_session_is_closed(self, service, sessions):
+        await service.run_comprehensive_health_check()
+
+        assert len(sessions) == 1
+        assert service.audit_logger.log_system_event.call_args.kwargs["db"] is sessions[0]
+        assert sessions[0].closed is True
+
+
+class TestEndpointChecks:
+    """Test suite for endpoint probes over the pooled client"""
+
+    @pytest.mark.asyncio
+    async def test_endpoints_share_client_and_time_out_individually(self, service):
+        async def handler(request):
+            if request.url.path == "/slow":
+                await asyncio.sleep(5)
+            return httpx.Response(200, json={"status": "ok"})
+
+        use_transport(service, handler)
+        client = service._http_client
+        service.register_endpoint_check(EndpointHealthCheck(name="Up", url="http://test/up", expected_response_key="status"))
+        service.register_endpoint_check(EndpointHealthCheck(name="Slow", url="http://test/slow", timeout=0.1, critical=True))
+
+        start = time.perf_counter()
+        first = await service.run_comprehensive_health_check()
+        second = await service.run_comprehensive_health_check()
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 1.0
+        for result in (first, second):
+            assert result["endpoints"]["Up"]["status"] == HealthStatus.HEALTHY.value
+            assert result["endpoints"]["Slow"]["status"] == HealthStatus.UNHEALTHY.value
+            assert result["endpoints"]["Slow"]["timed_out"] is True
+            assert result["timed_out"] == ["Slow"]
+        assert service._http_client is client
+
+        await service.close()
+        assert client.is_closed
+
+
+class TestHealthCheckBenchmark:
+    """Check duration against the number of registered checks"""
+
+    @pytest.mark.asyncio
+    async def test_duration_does_not_scale_with_check_count(self, service):
+        check_latency = 0.05
+        durations = {}
+        for count in (1, 10, 50, 200):
+            service.health_checks = {}
+            for i in range(count):
+                service.register_health_check(f"check_{i}", sleeping_check(f"check_{i}", check_latency))
+
+            start = time.perf_counter()
+            result = await service.run_comprehensive_health_check()
+            durations[count] = time.perf_counter() - start
+            assert len(result["services"]) == count
+
+        print("\nchecks  duration_ms  sequential_ms")
+        for count, duration in durations.items():
+            print(f"{count:>6}  {duration * 1000:>11.1f}  {count * check_latency * 1000:>13.1f}")
+
+        # Sequential execution would take 10s for 200 checks
+        assert durations[200] < 1.0
@@ -0,0 +1,239 @@
+"""
+Tests for the shared, background-refreshed health snapshot
+"""
+
+import pytest
+import asyncio
+import logging
+import time
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routes.health import router as health_router
+from app.services.alert_rule_engine import AlertRuleEngine
+from app.services import alert_service
+from app.services import health_snapshot
+from app.services.health_service import HealthStatus
+from app.services.health_snapshot import HealthSampler, HealthSnapshot, RedisSnapshotStore
+
+
+class CountingHealthService:
+    """Stands in for HealthService; each run takes `delay` seconds"""
+
+    def __init__(self, delay=0.05, status=HealthStatus.HEALTHY):
+        self.delay = delay
+        self.status = status
+        self.runs = 0
+
+    async def run_comprehensive_health_check(self):
+        self.runs += 1
+        await asyncio.sleep(self.delay)
+        return {
+            "overall_status": self.status,
+            "timestamp": f"run-{self.runs}",
+            "services": {"disk_space": {"status": self.status.value}},
+            "system_metrics": {"cpu": {"percent": 12.5}, "memory": {"percent": 40}, "disk": {"percent": 55}},
+            "timed_out": [],
+            "alerts": [{"service": "disk_space", "message": "fine", "severity": self.status.value}],
+        }
+
+
+class SharedStore:
+    """What RedisSnapshotStore provides, kept in a dict shared by several samplers"""
+
+    def __init__(self):
+        self.lease_holder = None
+        self.snapshot = None
+
+    async def claim_sampler(self, worker_id, lease_seconds):
+        if self.lease_holder in (None, worker_id):
+            self.lease_holder = worker_id
+            return True
+        return False
+
+    async def publish(self, snapshot):
+        self.snapshot = snapshot
+
+    async def fetch(self):
+        return self.snapshot
+
+
+@pytest.fixture
+def service():
+    return CountingHealthService()
+
+
+@pytest.fixture
+def sampler(service):
+    return HealthSampler(health_service=service, interval=60, max_age=60)
+
+
+class TestHealthSnapshot:
+    """Test suite for the immutable snapshot"""
+
+    def test_snapshot_is_read_only_and_preencoded(self):
+        snapshot = HealthSnapshot.from_result(
+            {"overall_status": HealthStatus.WARNING, "services": {"db": {"status": "healthy"}}, "alerts": []},
+            max_age=30
+        )
+
+        assert snapshot.overall_status == "warning"
+        assert snapshot.payload == b'{"overall_status": "warning", "services": {"db": {"status": "healthy"}}, "alerts": []}'
+        with pytest.raises(TypeError):
+            snapshot.data["services"]["db"]["status"] = "critical"
+        assert snapshot.to_dict()["services"]["db"]["status"] == "healthy"
+
+    def test_staleness(self):
+        snapshot = HealthSnapshot.from_result({}, max_age=30, taken_at=1000.0)
+        assert not snapshot.is_stale(now=1030.0)
+        assert snapshot.is_stale(now=1030.5)
+        assert snapshot.age_seconds(now=1010.0) == 10.0
+
+
+class TestHealthSampler:
+    """Test suite for sampling, sharing and refresh behaviour"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_readers_share_one_run(self, sampler, service):
+        sampler.start()
+        snapshots = await asyncio.gather(*(sampler.get_snapshot() for _ in range(20)))
+
+        assert service.runs == 1
+        assert all(snapshot is snapshots[0] for snapshot in snapshots)
+        await sampler.stop()
+
+    @pytest.mark.asyncio
+    async def test_fresh_snapshot_is_served_without_running_checks(self, sampler, service):
+        sampler.start()
+        first = await sampler.get_snapshot()
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            assert await sampler.get_snapshot() is first
+        elapsed = time.perf_counter() - start
+
+        assert service.runs == 1
+        assert elapsed < 0.5
+        await sampler.stop()
+
+    @pytest.mark.asyncio
+    async def test_stale_snapshot_served_while_refreshing(self, sampler, service):
+        stale = HealthSnapshot.from_result({"overall_status": "healthy"}, max_age=60, taken_at=time.time() - 120)
+        sampler._snapshot = stale
+        sampler.start()
+
+        assert await sampler.get_snapshot(wait=False) is stale
+        fresh = await sampler.get_snapshot()
+
+        assert fresh is not stale and not fresh.is_stale()
+        assert service.runs == 1
+        assert sampler.get_metrics()["stale_reads"] >= 1
+        await sampler.stop()
+
+    @pytest.mark.asyncio
+    async def test_background_loop_keeps_snapshot_current(self, service):
+        sampler = HealthSampler(health_service=service, interval=0.05, max_age=1)
+        sampler.start()
+        await asyncio.sleep(0.3)
+        await sampler.stop()
+
+        assert service.runs >= 3
+        assert not sampler.get_metrics()["running"]
+
+    @pytest.mark.asyncio
+    async def test_reads_never_start_sampling(self, sampler, service):
+        # Not started on this loop: readers get what there is, nothing runs
+        assert await sampler.get_snapshot() is None
+        assert await sampler.get_snapshot(wait=False) is None
+        await asyncio.sleep(0.1)
+
+        assert service.runs == 0
+        assert not sampler.get_metrics()["running"]
+
+    @pytest.mark.asyncio
+    async def test_workers_share_a_single_sampler(self):
+        store = SharedStore()
+        leader_service, follower_service = CountingHealthService(), CountingHealthService()
+        leader = HealthSampler(health_service=leader_service, store=store, interval=60, max_age=60)
+        follower = HealthSampler(health_service=follower_service, store=store, interval=60, max_age=60)
+
+        published = await leader.refresh()
+        shared = await follower.refresh()
+
+        assert leader_service.runs == 1 and follower_service.runs == 0
+        assert shared is published
+        assert follower.get_metrics()["shared_reads"] == 1
+
+        # A silent lease holder does not leave the follower with stale data
+        store.snapshot = HealthSnapshot.from_result({}, max_age=60, taken_at=time.time() - 120)
+        await follower.refresh()
+        assert follower_service.runs == 1
+
+    @pytest.mark.asyncio
+    async def test_unreachable_redis_samples_locally(self, service):
+        sampler = HealthSampler(
+            health_service=service, store=RedisSnapshotStore(redis_url="redis://127.0.0.1:1/0"),
+            interval=60, max_age=60
+        )
+        snapshot = await sampler.refresh()
+
+        assert service.runs == 1
+        assert snapshot.source == "local"
+
+
+class TestSnapshotReaders:
+    """Test suite for the alert evaluator and /api/health reading the snapshot"""
+
+    @pytest.fixture
+    def global_sampler(self, sampler, monkeypatch):
+        monkeypatch.setattr(health_snapshot, "_health_sampler_instance", sampler)
+        return sampler
+
+    def test_health_routes_serve_snapshot(self, global_sampler, service):
+        app = FastAPI()
+        app.include_router(health_router, prefix="/api/health")
+        client = TestClient(app)
+
+        # Nothing sampled yet: report that the first run is under way
+        assert client.get("/api/health").json()["status"] == "starting"
+        # The request ran on the test client's own short-lived loop, which
+        # must not have started a sampler of its own
+        assert service.runs == 0 and not global_sampler.get_metrics()["running"]
+
+        global_sampler._snapshot = HealthSnapshot.from_result(
+            {"overall_status": HealthStatus.DEGRADED, "timestamp": "t0", "services": {}, "alerts": []},
+            max_age=60, taken_at=time.time() - 5
+        )
+        response = client.get("/api/health/status")
+        assert response.status_code == 200
+        assert response.json()["overall_status"] == "degraded"
+        assert response.json()["stale"] is False
+        assert response.headers["age"] == "5"
+
+        detailed = client.get("/api/health/detailed")
+        assert detailed.content == global_sampler.snapshot.payload
+
+    @pytest.mark.asyncio
+    async def test_alert_conditions_read_snapshot(self, global_sampler, service):
+        alerts = alert_service.AlertSystem.__new__(alert_service.AlertSystem)
+        alerts.logger = logging.getLogger(__name__)
+        alerts.error_tracker = type("Tracker", (), {"get_error_statistics": lambda self: {}})()
+        alerts.health_sampler = global_sampler
+        alerts.alert_rules = {}
+        alerts.rule_engine = AlertRuleEngine()
+
+        # Before the sampler starts there is nothing to evaluate yet
+        await alerts._check_alert_conditions()
+        assert service.runs == 0
+
+        global_sampler.start()
+        await alerts._check_alert_conditions()
+        await alerts._check_alert_conditions()
+
+        assert service.runs == 1
+        await global_sampler.stop()
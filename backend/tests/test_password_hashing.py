@@ -0,0 +1,169 @@
+"""
+Tests for offloaded password hashing, rehash-on-login and event-loop latency under login load
+"""
+
+import pytest
+import asyncio
+import time
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+import httpx
+from fastapi import FastAPI
+
+from app import auth
+from app.auth import (
+    PasswordHashingBusy,
+    PasswordHashingPool,
+    get_password_hash,
+    password_needs_rehash,
+    verify_and_update_password,
+    verify_password,
+)
+
+
+def _hash_with_rounds(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+class TestPasswordRehash:
+    """Test suite for work-factor upgrades on login"""
+
+    def test_current_cost_hash_is_not_rehashed(self):
+        hashed = get_password_hash("Secret123!")
+        assert not password_needs_rehash(hashed)
+        assert verify_and_update_password("Secret123!", hashed) == (True, None)
+
+    def test_outdated_cost_hash_is_upgraded(self):
+        old_rounds = 4 if auth.BCRYPT_ROUNDS != 4 else 5
+        hashed = _hash_with_rounds("Secret123!", old_rounds)
+        assert password_needs_rehash(hashed)
+
+        valid, new_hash = verify_and_update_password("Secret123!", hashed)
+        assert valid
+        assert new_hash is not None
+        assert verify_password("Secret123!", new_hash)
+        assert not password_needs_rehash(new_hash)
+
+    def test_wrong_password_is_never_rehashed(self):
+        hashed = _hash_with_rounds("Secret123!", 4)
+        assert verify_and_update_password("wrong", hashed) == (False, None)
+
+
+class TestPasswordHashingPool:
+    """Test suite for the bounded hashing pool"""
+
+    @pytest.mark.asyncio
+    async def test_runs_work_off_the_event_loop(self):
+        pool = PasswordHashingPool(max_workers=2, max_pending=8)
+        try:
+            hashed = _hash_with_rounds("Secret123!", 4)
+            results = await asyncio.gather(*[
+                pool.run(verify_password, "Secret123!", hashed) for _ in range(6)
+            ])
+            assert all(results)
+
+            metrics = pool.get_metrics()
+            assert metrics["completed"] == 6
+            assert metrics["active"] == 0
+            assert metrics["queue_depth"] == 0
+            assert metrics["max_queue_depth"] <= 5
+        finally:
+            pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_is_full(self):
+        pool = PasswordHashingPool(max_workers=1, max_pending=2)
+        try:
+            results = await asyncio.gather(
+                *[pool.run(time.sleep, 0.05) for _ in range(4)],
+                return_exceptions=True
+            )
+            rejected = [r for r in results if isinstance(r, PasswordHashingBusy)]
+            assert len(rejected) == 2
+            assert pool.get_metrics()["rejected"] == 2
+        finally:
+            pool.shutdown()
+
+
+class TestLoginLoadPerformance:
+    """Event-loop responsiveness while bcrypt verifications are in flight"""
+
+    ROUNDS = 10
+    LOGINS = 16
+    PINGS = 40
+
+    def _build_app(self, offload: bool) -> FastAPI:
+        app = FastAPI()
+        stored_hash = _hash_with_rounds("Secret123!", self.ROUNDS)
+        pool = PasswordHashingPool(max_workers=4, max_pending=64)
+        app.state.pool = pool
+
+        @app.post("/login")
+        async def login():
+            if offload:
+                valid = await pool.run(verify_password, "Secret123!", stored_hash)
+            else:
+                valid = verify_password("Secret123!", stored_hash)
+            return {"ok": valid}
+
+        @app.get("/ping")
+        async def ping():
+            return {"ok": True}
+
+        return app
+
+    async def _run_load(self, app: FastAPI):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            ping_latencies = []
+
+            async def pinger():
+                # Open-loop schedule: latency counts from when each ping was due,
+                # so time the loop spends stalled inside bcrypt is not hidden
+                interval = 0.01
+                t0 = time.perf_counter()
+                for i in range(self.PINGS):
+                    due = t0 + i * interval
+                    await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                    response = await client.get("/ping")
+                    ping_latencies.append((time.perf_counter() - due) * 1000)
+                    assert response.status_code == 200
+
+            async def logins():
+                # Let the pinger get going, then keep logins arriving while it runs
+                await asyncio.sleep(0.01)
+                start = time.perf_counter()
+                responses = await asyncio.gather(*[client.post("/login") for _ in range(self.LOGINS)])
+                return responses, time.perf_counter() - start
+
+            _, (login_responses, elapsed) = await asyncio.gather(pinger(), logins())
+
+        assert all(r.json()["ok"] for r in login_responses)
+        ping_latencies.sort()
+        p99 = ping_latencies[min(len(ping_latencies) - 1, int(len(ping_latencies) * 0.99))]
+        return self.LOGINS / elapsed, p99
+
+    @pytest.mark.asyncio
+    async def test_unrelated_endpoint_latency_during_logins(self):
+        blocking_app = self._build_app(offload=False)
+        offloaded_app = self._build_app(offload=True)
+        try:
+            blocking_rps, blocking_p99 = await self._run_load(blocking_app)
+            offloaded_rps, offloaded_p99 = await self._run_load(offloaded_app)
+        finally:
+            offloaded_app.state.pool.shutdown()
+            blocking_app.state.pool.shutdown()
+
+        print(f"\nPassword hashing load test ({self.LOGINS} logins, bcrypt rounds={self.ROUNDS}):")
+        print(f"  Inline bcrypt:    {blocking_rps:.1f} logins/s, /ping p99 {blocking_p99:.1f}ms")
+        print(f"  Offloaded bcrypt: {offloaded_rps:.1f} logins/s, /ping p99 {offloaded_p99:.1f}ms")
+
+        # Inline hashing stalls every other request behind bcrypt
+        assert offloaded_p99 < blocking_p99
+        # Throughput only holds up when bcrypt can use a core the loop is not on
+        if (os.cpu_count() or 1) >= 2:
+            assert offloaded_rps >= blocking_rps * 0.8
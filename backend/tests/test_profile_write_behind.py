@@ -0,0 +1,341 @@
+"""
+Tests for write-behind personality profile updates
+
+Interaction updates are buffered per user and merged into Redis in
+batches. The benchmark at the end prints the request-path cost of an
+update with and without the buffer against a Redis with 1 ms latency.
+"""
+
+import pytest
+import asyncio
+import json
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import redis.asyncio as redis
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ai_personalization_service import AIPersonalizationService
+from app.services.profile_write_behind import ProfileDelta
+
+
+class FakeRedis:
+    """The GET/SETEX/MGET and WATCH/MULTI subset used for profiles, with optional latency"""
+
+    def __init__(self, latency=0.0):
+        self.data = {}
+        self.versions = {}
+        self.latency = latency
+        self.writes = 0
+        self.transactions = 0
+        self.fail_next = 0
+        self.before_exec = None  # called once between WATCH and EXEC
+
+    async def _round_trip(self):
+        if self.fail_next:
+            self.fail_next -= 1
+            raise redis.ConnectionError("Connection refused")
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get(self, key):
+        await self._round_trip()
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):
+        await self._round_trip()
+        self._set(key, value)
+
+    def _set(self, key, value):
+        self.data[key] = value
+        self.versions[key] = self.versions.get(key, 0) + 1
+        self.writes += 1
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.watched = {}
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def watch(self, *keys):
+        await self.client._round_trip()
+        self.watched = {key: self.client.versions.get(key, 0) for key in keys}
+
+    async def mget(self, keys):
+        await self.client._round_trip()
+        return [self.client.data.get(key) for key in keys]
+
+    def multi(self):
+        pass
+
+    def setex(self, key, ttl, value):
+        self.commands.append((key, value))
+
+    async def execute(self):
+        if self.client.before_exec:
+            hook, self.client.before_exec = self.client.before_exec, None
+            await hook()
+        await self.client._round_trip()
+        if any(self.client.versions.get(key, 0) != version for key, version in self.watched.items()):
+            raise redis.WatchError("Watched variable changed.")
+        for key, value in self.commands:
+            self.client._set(key, value)
+        self.client.transactions += 1
+
+
+def stored_profile(user_id, confidence=0.5, topics=None):
+    return {
+        'user_id': user_id,
+        'learning_style': 'visual',
+        'communication_style': 'professional',
+        'expertise_level': 'intermediate',
+        'preferred_response_length': 'medium',
+        'topics_of_interest': topics or [],
+        'interaction_patterns': {},
+        'personality_traits': ['helpful'],
+        'preferred_providers': ['openai'],
+        'preferred_models': ['gpt-4'],
+        'response_preferences': {},
+        'learning_goals': [],
+        'created_at': '2026-01-01T00:00:00',
+        'updated_at': '2026-01-01T00:00:00',
+        'confidence_score': confidence
+    }
+
+
+def make_service(client, **writer_settings):
+    service = AIPersonalizationService()
+    service.context_service = SimpleNamespace(redis_client=client)
+    for name, value in writer_settings.items():
+        setattr(service.profile_writer, name, value)
+    return service
+
+
+def seed(client, user_id, **profile):
+    client.data[f"personality:{user_id}"] = json.dumps(stored_profile(user_id, **profile))
+
+
+def confidence_in_redis(client, user_id):
+    return json.loads(client.data[f"personality:{user_id}"])['confidence_score']
+
+
+INTERACTION = {'response_time': 420, 'positive_feedback': True, 'topic': 'general'}
+
+
+@pytest.fixture
+def client():
+    return FakeRedis()
+
+
+class TestWriteBehind:
+    """Test suite for buffering, read-your-writes and batched flushes"""
+
+    @pytest.mark.asyncio
+    async def test_updates_stay_off_redis_until_flush(self, client):
+        service = make_service(client, flush_interval=60)
+        seed(client, "u1")
+
+        for _ in range(4):
+            await service.update_profile_from_interaction("u1", INTERACTION)
+
+        assert client.writes == 0
+        profile = await service.get_personality_profile("u1")
+        assert profile.confidence_score == pytest.approx(0.7)
+        assert profile.topics_of_interest == ['general']
+        assert profile.interaction_patterns['avg_response_time'] == 420
+
+        await service.profile_writer.flush()
+        assert client.transactions == 1
+        assert confidence_in_redis(client, "u1") == pytest.approx(0.7)
+        await service.profile_writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_reads_from_redis_include_pending_deltas(self, client):
+        service = make_service(client, flush_interval=60)
+        seed(client, "u1")
+        await service.update_profile_from_interaction("u1", INTERACTION)
+
+        service.personality_cache.clear()
+        profile = await service.get_personality_profile("u1")
+
+        assert profile.confidence_score == pytest.approx(0.55)
+        assert client.writes == 0
+        await service.profile_writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_flush_batches_many_users(self, client):
+        service = make_service(client, flush_interval=60, batch_size=50)
+        for i in range(120):
+            seed(client, f"u{i}")
+        for _ in range(5):
+            for i in range(120):
+                await service.update_profile_from_interaction(f"u{i}", INTERACTION)
+
+        await service.profile_writer.flush()
+
+        # 600 interactions, 120 profile writes in 3 transactions
+        assert client.transactions == 3 and client.writes == 120
+        assert confidence_in_redis(client, "u119") == pytest.approx(0.75)
+        assert service.profile_writer.get_metrics()["pending_users"] == 0
+        await service.profile_writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_workers_merge_instead_of_overwriting(self, client):
+        worker_a = make_service(client, flush_interval=60)
+        worker_b = make_service(client, flush_interval=60)
+        seed(client, "u1")
+
+        await worker_a.update_profile_from_interaction("u1", INTERACTION)
+        await worker_b.update_profile_from_interaction("u1", {'negative_feedback': True, 'topic': 'python'})
+        await worker_b.update_profile_from_interaction("u1", {'negative_feedback': True})
+
+        # Worker B's flush lands between worker A's read and write
+        client.before_exec = worker_b.profile_writer.flush
+        await worker_a.profile_writer.flush()
+
+        stored = json.loads(client.data["personality:u1"])
+        assert stored['confidence_score'] == pytest.approx(0.5 + 0.05 - 0.1)
+        assert stored['topics_of_interest'] == ['python', 'general']
+        assert worker_a.profile_writer.get_metrics()["conflicts"] == 1
+        # Worker A's cache now reflects worker B's changes too
+        assert worker_a.personality_cache["u1"].confidence_score == pytest.approx(0.45)
+        await worker_a.profile_writer.stop()
+        await worker_b.profile_writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_full_profile_write_replaces_pending_deltas(self, client):
+        service = make_service(client, flush_interval=60)
+        seed(client, "u1")
+        await service.update_profile_from_interaction("u1", INTERACTION)
+
+        profile = await service.get_personality_profile("u1")
+        await service._store_personality_profile(profile)
+        await service.profile_writer.flush()
+
+        # Stored once by the full write, not counted again by the flush
+        assert confidence_in_redis(client, "u1") == pytest.approx(0.55)
+        await service.profile_writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_deltas(self, client):
+        service = make_service(client, flush_interval=60)
+        seed(client, "u1")
+        await service.update_profile_from_interaction("u1", INTERACTION)
+
+        client.fail_next = 1
+        await service.profile_writer.flush()
+        assert service.profile_writer.get_metrics()["failed_flushes"] == 1
+        await service.update_profile_from_interaction("u1", INTERACTION)
+
+        await service.profile_writer.flush()
+        assert confidence_in_redis(client, "u1") == pytest.approx(0.6)
+        await service.profile_writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_requeue_is_bounded(self, client):
+        service = make_service(client, flush_interval=60)
+        for i in range(4):
+            seed(client, f"u{i}")
+            await service.update_profile_from_interaction(f"u{i}", INTERACTION)
+
+        service.profile_writer.max_pending = 2
+        client.fail_next = 1
+        await service.profile_writer.flush()
+
+        metrics = service.profile_writer.get_metrics()
+        assert metrics["pending_users"] == 2 and metrics["dropped"] == 2
+        await service.profile_writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_missing_profile_counts_newer_updates_once(self, client):
+        service = make_service(client, flush_interval=60)
+        seed(client, "u1")
+        await service.update_profile_from_interaction("u1", INTERACTION)
+        del client.data["personality:u1"]
+
+        # Recorded after the flush took its batch, before it read Redis
+        client.latency = 0.01
+        await asyncio.gather(
+            service.profile_writer.flush(),
+            service.update_profile_from_interaction("u1", INTERACTION)
+        )
+        await service.profile_writer.flush()
+
+        assert confidence_in_redis(client, "u1") == pytest.approx(0.6)
+        assert service.personality_cache["u1"].confidence_score == pytest.approx(0.6)
+        await service.profile_writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_background_flush_and_shutdown(self, client):
+        service = make_service(client, flush_interval=0.05)
+        seed(client, "u1")
+        seed(client, "u2")
+
+        await service.update_profile_from_interaction("u1", INTERACTION)
+        await asyncio.sleep(0.15)
+        assert confidence_in_redis(client, "u1") == pytest.approx(0.55)
+
+        service.profile_writer.flush_interval = 60
+        await asyncio.sleep(0.1)  # let the loop pick up the longer interval
+        await service.update_profile_from_interaction("u2", INTERACTION)
+        await service.profile_writer.stop(timeout=1)
+        assert confidence_in_redis(client, "u2") == pytest.approx(0.55)
+
+    def test_delta_combine_and_clamp(self):
+        first, second = ProfileDelta(), ProfileDelta()
+        for _ in range(20):
+            first.record({'positive_feedback': True, 'topic': 'a'}, datetime(2026, 1, 1))
+        second.record({'response_time': 10, 'topic': 'b'}, datetime(2026, 1, 2))
+
+        combined = first.combine(second)
+        profile = combined.apply(stored_profile("u1", confidence=0.5))
+
+        assert profile['confidence_score'] == 1.0
+        assert profile['topics_of_interest'] == ['a', 'b']
+        assert profile['updated_at'] == '2026-01-02T00:00:00'
+        assert combined.interactions == 21
+
+
+class TestWriteBehindBenchmark:
+    """Request-path cost of a profile update with and without buffering"""
+
+    @pytest.mark.asyncio
+    async def test_update_latency(self):
+        client = FakeRedis(latency=0.001)
+        users = [f"u{i}" for i in range(20)]
+        for user_id in users:
+            seed(client, user_id)
+
+        timings = {}
+        for mode, enabled in (("direct", False), ("write-behind", True)):
+            service = make_service(client, enabled=enabled, flush_interval=60)
+            for user_id in users:
+                await service.get_personality_profile(user_id)  # warm the cache
+            client.writes = 0
+
+            start = time.perf_counter()
+            for i in range(200):
+                await service.update_profile_from_interaction(users[i % len(users)], INTERACTION)
+            timings[mode] = ((time.perf_counter() - start) / 200 * 1000, client.writes)
+            await service.profile_writer.stop()
+
+        print("\nmode          per_update_ms  redis_writes_in_request_path")
+        for mode, (ms, writes) in timings.items():
+            print(f"{mode:<12}  {ms:>13.3f}  {writes:>28}")
+
+        assert timings["write-behind"][1] == 0
+        assert timings["write-behind"][0] < timings["direct"][0] / 2
@@ -0,0 +1,211 @@
+"""
+Tests for the shared token-bucket rate limiting engine and the middlewares built on it
+"""
+
+import pytest
+import time
+from collections import defaultdict
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.rate_limiter import (
+    InMemoryRateLimitBackend,
+    RateLimiter,
+    RedisRateLimitBackend,
+)
+from app.middleware.rate_limiting import RateLimitingMiddleware
+from app.middleware.ai_rate_limiting import AIRateLimitingMiddleware
+from app.middleware.ddos_protection import DDoSProtectionMiddleware
+
+
+class FakeTokenBucketScript:
+    """Emulates TOKEN_BUCKET_SCRIPT against a store shared by several 'workers'"""
+
+    def __init__(self, store):
+        self.store = store
+        self.calls = 0
+
+    async def __call__(self, keys, args):
+        self.calls += 1
+        capacity, rate, cost = float(args[0]), float(args[1]), float(args[2])
+        now = time.time()
+        tokens, ts = self.store.get(keys[0], (capacity, now))
+        tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+        if tokens >= cost:
+            tokens -= cost
+            allowed, retry_after = 1, 0.0
+        else:
+            allowed, retry_after = 0, (cost - tokens) / rate
+        self.store[keys[0]] = (tokens, now)
+        return [allowed, str(tokens), str(retry_after)]
+
+
+class FailingScript:
+    async def __call__(self, keys, args):
+        raise ConnectionError("redis down")
+
+
+class TestInMemoryBackend:
+    """Test suite for in-process token buckets"""
+
+    @pytest.mark.asyncio
+    async def test_allows_burst_then_blocks(self):
+        limiter = RateLimiter("test", limit=5, window=60, backend=InMemoryRateLimitBackend())
+        results = [await limiter.hit("1.2.3.4") for _ in range(7)]
+
+        assert [r.allowed for r in results] == [True] * 5 + [False] * 2
+        assert results[4].remaining == 0
+        assert results[-1].retry_after == pytest.approx(12, rel=0.05)
+
+    @pytest.mark.asyncio
+    async def test_tokens_refill_over_time(self):
+        limiter = RateLimiter("test", limit=10, window=0.1, backend=InMemoryRateLimitBackend())
+        for _ in range(10):
+            assert (await limiter.hit("client")).allowed
+        assert not (await limiter.hit("client")).allowed
+
+        time.sleep(0.05)
+        assert (await limiter.hit("client")).allowed
+
+    @pytest.mark.asyncio
+    async def test_clients_and_limiters_are_isolated(self):
+        backend = InMemoryRateLimitBackend()
+        general = RateLimiter("general", limit=1, window=60, backend=backend)
+        ai = RateLimiter("ai", limit=1, window=60, backend=backend)
+
+        assert (await general.hit("a")).allowed
+        assert not (await general.hit("a")).allowed
+        assert (await general.hit("b")).allowed
+        assert (await ai.hit("a")).allowed
+        assert set(general.snapshot()) == {"a", "b"}
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_caps_tracked_keys(self):
+        backend = InMemoryRateLimitBackend(max_keys=100)
+        limiter = RateLimiter("test", limit=10, window=60, backend=backend)
+        for i in range(1000):
+            await limiter.hit(f"10.0.{i // 256}.{i % 256}")
+
+        assert len(backend.buckets) == 100
+        # Most recently seen clients survive
+        assert "10.0.3.231" in limiter.snapshot()
+
+    @pytest.mark.asyncio
+    async def test_refilled_idle_keys_are_dropped(self):
+        backend = InMemoryRateLimitBackend()
+        limiter = RateLimiter("test", limit=5, window=0.01, backend=backend)
+        for i in range(50):
+            await limiter.hit(f"client-{i}")
+        time.sleep(0.02)
+        for _ in range(30):
+            await limiter.hit("active")
+
+        assert len(backend.buckets) < 51
+
+
+class TestRedisBackend:
+    """Test suite for the shared Redis backend"""
+
+    @pytest.mark.asyncio
+    async def test_limits_hold_across_workers(self):
+        store = {}
+        workers = []
+        for _ in range(3):
+            backend = RedisRateLimitBackend()
+            backend._script = FakeTokenBucketScript(store)
+            workers.append(RateLimiter("general", limit=6, window=60, backend=backend))
+
+        allowed = 0
+        for i in range(12):
+            if (await workers[i % 3].hit("1.2.3.4")).allowed:
+                allowed += 1
+
+        # Per-process buckets would have allowed 3 x 6 requests
+        assert allowed == 6
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_local_buckets_when_redis_is_down(self):
+        backend = RedisRateLimitBackend(retry_interval=60)
+        backend._script = FailingScript()
+        limiter = RateLimiter("general", limit=2, window=60, backend=backend)
+
+        results = [(await limiter.hit("client")).allowed for _ in range(3)]
+        assert results == [True, True, False]
+        assert backend._unavailable_until > time.monotonic()
+
+
+class TestLimiterMiddlewares:
+    """The three limiter middlewares share the engine"""
+
+    def _client(self, middleware, **kwargs) -> TestClient:
+        app = FastAPI()
+
+        @app.get("/api/ai/chat")
+        async def ai_chat():
+            return {"ok": True}
+
+        @app.get("/api/status")
+        async def api_status():
+            return {"ok": True}
+
+        app.add_middleware(middleware, **kwargs)
+        return TestClient(app)
+
+    def test_general_limit(self):
+        limiter = RateLimiter("general", 3, 60, backend=InMemoryRateLimitBackend())
+        client = self._client(RateLimitingMiddleware, limiter=limiter)
+        codes = [client.get("/api/status").status_code for _ in range(4)]
+        assert codes == [200, 200, 200, 429]
+
+    def test_ai_limit_only_applies_to_ai_routes(self):
+        limiter = RateLimiter("ai", 1, 60, backend=InMemoryRateLimitBackend())
+        client = self._client(AIRateLimitingMiddleware, limiter=limiter)
+        assert client.get("/api/ai/chat").status_code == 200
+        response = client.get("/api/ai/chat")
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert client.get("/api/status").status_code == 200
+
+    def test_ddos_limit_keys_on_forwarded_ip(self):
+        limiter = RateLimiter("ddos", 2, 60, backend=InMemoryRateLimitBackend())
+        client = self._client(DDoSProtectionMiddleware, limiter=limiter)
+        headers = {"X-Forwarded-For": "203.0.113.9, 10.0.0.1"}
+        codes = [client.get("/api/status", headers=headers).status_code for _ in range(3)]
+        assert codes == [200, 200, 429]
+        assert client.get("/api/status", headers={"X-Forwarded-For": "203.0.113.10"}).status_code == 200
+
+
+class TestRateLimiterPerformance:
+    """Per-request cost must not grow with the window size"""
+
+    @pytest.mark.asyncio
+    async def test_constant_time_per_request(self):
+        requests = 20000
+        limit = 10000
+
+        # Previous approach: rebuild a timestamp list per request
+        history = defaultdict(list)
+        start = time.perf_counter()
+        for _ in range(requests):
+            now = time.time()
+            history["client"] = [t for t in history["client"] if now - t < 60]
+            if len(history["client"]) < limit:
+                history["client"].append(now)
+        list_elapsed = time.perf_counter() - start
+
+        limiter = RateLimiter("bench", limit, 60, backend=InMemoryRateLimitBackend())
+        start = time.perf_counter()
+        for _ in range(requests):
+            await limiter.hit("client")
+        bucket_elapsed = time.perf_counter() - start
+
+        print(f"\nRate limit check ({requests} requests, limit {limit}/min):")
+        print(f"  Timestamp list: {list_elapsed * 1e6 / requests:.2f}us/request")
+        print(f"  Token bucket:   {bucket_elapsed * 1e6 / requests:.2f}us/request")
+
+        assert bucket_elapsed < list_elapsed
@@ -294,21 +294,19 @@ class TestMiddlewareIntegration:
         """Test middleware request processing"""
         try:
             from app.middleware.ddos_protection import DDoSProtectionMiddleware
-            from fastapi import Request
-            from unittest.mock import AsyncMock, Mock
-            app_mock = Mock()
+            from unittest.mock import AsyncMock
+            app_mock = AsyncMock()
             middleware = DDoSProtectionMiddleware(app_mock, max_requests=5, window=60)
-            request_mock = Mock(spec=Request)
-            request_mock.client = Mock()
-            request_mock.client.host = "127.0.0.1"
-            request_mock.headers = {}
-            call_next_mock = AsyncMock()
-            response_mock = Mock()
-            response_mock.headers = {}
-            call_next_mock.return_value = response_mock
-            result = await middleware.dispatch(request_mock, call_next_mock)
-            assert result is not None
-            call_next_mock.assert_called_once()
+            scope = {
+                "type": "http",
+                "method": "GET",
+                "path": "/",
+                "headers": [],
+                "client": ("127.0.0.1", 12345),
+            }
+            receive, send = AsyncMock(), AsyncMock()
+            await middleware(scope, receive, send)
+            app_mock.assert_called_once_with(scope, receive, send)
         except (ImportError, AttributeError):
             pytest.skip("Middleware async testing not available")
 
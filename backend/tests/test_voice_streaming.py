@@ -0,0 +1,655 @@
+"""
+Tests for the streaming speech-to-text and text-to-speech pipelines
+
+The benchmark compares the buffered path (whole clip preprocessed after the
+upload) with the streaming path (segments preprocessed while it arrives),
+reporting CPU time and latency after the last byte per minute of audio.
+Set VOICE_BENCHMARK_SPEEDUP to change how much faster than real time the
+upload is replayed (default 20x).
+"""
+
+import pytest
+import asyncio
+import io
+import math
+import os
+import random
+import struct
+import threading
+import time
+import wave
+
+from fastapi import FastAPI, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.auth import create_access_token, get_current_user
+from app.config import settings
+from app.routes import voice as voice_routes
+from app.services.voice_cache import DiskCacheTier, VoiceResultCache, cache_key
+from app.services.voice_service import AudioFormat, VoiceProvider, VoiceService, preprocess_audio
+from app.services.voice_streaming import (
+    PCMFormat,
+    StreamTooLarge,
+    StreamingSpeechSession,
+    AudioStreamJoiner,
+    VoiceProcessingPool,
+    parse_wav_header,
+    quietest_split,
+    split_sentences,
+    stream_in_order,
+)
+
+
+BENCHMARK_SPEEDUP = float(os.getenv("VOICE_BENCHMARK_SPEEDUP", "20"))
+
+
+def speech_like_wav(seconds: float, sample_rate: int = 44100, channels: int = 2) -> bytes:
+    """1.2s tone bursts ("words") separated by 0.4s of silence"""
+    block = []
+    for i in range(int(1.6 * sample_rate)):
+        value = int(8000 * math.sin(2 * math.pi * 220 * i / sample_rate)) if i < 1.2 * sample_rate else 0
+        block.extend([value] * channels)
+    block_bytes = struct.pack(f"<{len(block)}h", *block)
+    frames = int(seconds * sample_rate)
+    pcm = (block_bytes * (frames // int(1.6 * sample_rate) + 1))[:frames * channels * 2]
+
+    wav_io = io.BytesIO()
+    with wave.open(wav_io, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return wav_io.getvalue()
+
+
+def wav_of(pcm: bytes, sample_rate: int = 16000) -> bytes:
+    """Mono 16-bit WAV around the given samples"""
+    wav_io = io.BytesIO()
+    with wave.open(wav_io, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm if len(pcm) % 2 == 0 else pcm + b" ")
+    return wav_io.getvalue()
+
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+async def fake_recognize(wav: bytes):
+    await asyncio.sleep(random.uniform(0, 0.02))
+    with wave.open(io.BytesIO(wav)) as audio:
+        return {"text": f"{audio.getnframes() // 1600}", "confidence": 0.9}
+
+
+class TestWavStreamParsing:
+    """Test suite for incremental WAV header parsing and segment splitting"""
+
+    def test_header_is_parsed_once_complete(self):
+        data = speech_like_wav(0.1, sample_rate=16000, channels=1)
+        assert parse_wav_header(data[:20]) is None
+        pcm_format, offset = parse_wav_header(data[:64])
+        assert pcm_format == PCMFormat(channels=1, sample_rate=16000, sample_width=2)
+        assert data[offset - 8:offset - 4] == b"data"
+
+    def test_rejects_non_wav(self):
+        with pytest.raises(ValueError):
+            parse_wav_header(b"ID3\x03" + b"\x00" * 40)
+
+    def test_split_lands_in_silence(self):
+        pcm_format = PCMFormat(channels=1, sample_rate=16000, sample_width=2)
+        data = speech_like_wav(6, sample_rate=16000, channels=1)
+        pcm = data[parse_wav_header(data)[1]:]
+
+        split = quietest_split(pcm, pcm_format, 5 * pcm_format.bytes_per_second)
+        seconds = split / pcm_format.bytes_per_second
+        # Bursts occupy [0, 1.2) of every 1.6s block: 4.4 - 4.8 is the silence before the target
+        assert 4.4 < seconds <= 4.8
+
+
+class TestStreamingSpeechSession:
+    """Test suite for chunked preprocessing and ordered partial transcripts"""
+
+    @pytest.mark.asyncio
+    async def test_partials_arrive_in_order_while_streaming(self):
+        partials = []
+
+        async def on_partial(message):
+            partials.append(message)
+
+        session = StreamingSpeechSession(
+            recognize=fake_recognize, on_partial=on_partial,
+            pool=VoiceProcessingPool(max_workers=2), segment_seconds=2
+        )
+        data = speech_like_wav(12, sample_rate=16000, channels=1)
+        chunks = chunked(data, 4096)
+        for chunk in chunks[:len(chunks) // 2]:
+            await session.feed(chunk)
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.2)
+
+        # Half the audio is in: some transcripts are already out
+        assert partials
+
+        for chunk in chunks[len(chunks) // 2:]:
+            await session.feed(chunk)
+        result = await session.finish()
+
+        assert [p["segment"] for p in partials] == list(range(len(partials)))
+        assert partials[-1]["transcript"] == result["text"]
+        assert result["segments"] == len(partials) >= 5
+        assert result["duration"] == pytest.approx(12, abs=0.01)
+
+    @pytest.mark.asyncio
+    async def test_preprocessing_runs_on_the_pool(self):
+        pool = VoiceProcessingPool(max_workers=1)
+        session = StreamingSpeechSession(recognize=fake_recognize, pool=pool, segment_seconds=1)
+        for chunk in chunked(speech_like_wav(3, sample_rate=16000, channels=1), 8192):
+            await session.feed(chunk)
+        result = await session.finish()
+
+        metrics = pool.get_metrics()
+        assert metrics["completed"] == result["segments"] >= 3
+        assert metrics["cpu_seconds"] > 0
+
+    @pytest.mark.asyncio
+    async def test_oversized_stream_is_rejected(self):
+        session = StreamingSpeechSession(recognize=fake_recognize, max_bytes=1000)
+        with pytest.raises(StreamTooLarge):
+            for chunk in chunked(speech_like_wav(1, sample_rate=16000, channels=1), 512):
+                await session.feed(chunk)
+
+
+class TestVoiceServiceStreaming:
+    """Test suite for VoiceService.speech_to_text_stream"""
+
+    @pytest.fixture
+    def voice_service(self, monkeypatch):
+        service = VoiceService({})
+
+        async def recognize(audio_data, provider, language):
+            return await fake_recognize(audio_data)
+
+        monkeypatch.setattr(service, "_perform_speech_recognition", recognize)
+        return service
+
+    @pytest.mark.asyncio
+    async def test_stream_result_and_metrics(self, voice_service):
+        async def chunks():
+            for chunk in chunked(speech_like_wav(8, sample_rate=16000, channels=1), 16384):
+                yield chunk
+
+        result = await voice_service.speech_to_text_stream(
+            chunks(), AudioFormat.WAV, provider=VoiceProvider.SYSTEM_TTS,
+            session_id="s1", user_id="u1"
+        )
+
+        assert result.text
+        assert result.duration == pytest.approx(8, abs=0.01)
+        assert voice_service.analytics["s1"].speech_to_text_requests == 1
+        metrics = await voice_service.get_performance_metrics()
+        assert metrics["successful_requests"] == 1
+        assert "processing_pool" in metrics
+
+    @pytest.mark.asyncio
+    async def test_buffered_preprocessing_no_longer_blocks_the_loop(self, voice_service):
+        data = speech_like_wav(20)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        await voice_service._preprocess_audio(data, AudioFormat.WAV)
+        task.cancel()
+        assert ticks > 2
+
+
+class TestSentenceSplitting:
+    """Test suite for splitting text into synthesis segments"""
+
+    def test_splits_on_sentence_ends_keeping_punctuation(self):
+        text = 'Hello there, how are you today? I am fine. "Quoted sentence here." Last one!'
+        assert split_sentences(text) == [
+            "Hello there, how are you today?",
+            "I am fine. \"Quoted sentence here.\" Last one!",
+        ]
+
+    def test_long_sentences_are_broken_at_clauses(self):
+        text = ", ".join(["this clause has a handful of words"] * 20) + "."
+        segments = split_sentences(text, max_chars=100)
+        assert len(segments) > 1
+        assert all(len(segment) <= 100 for segment in segments)
+        assert " ".join(segments) == text
+
+
+class TestStreamingTextToSpeech:
+    """Test suite for sentence-level streaming synthesis"""
+
+    @pytest.mark.asyncio
+    async def test_segments_are_yielded_in_order(self):
+        started = []
+
+        async def synthesize(segment):
+            started.append(segment)
+            # Later segments finish first
+            await asyncio.sleep(0.05 / len(segment))
+            return segment
+
+        segments = ["a" * n for n in range(1, 9)]
+        out = [s async for s in stream_in_order(segments, synthesize, max_concurrency=3)]
+        assert out == segments
+        assert started == segments
+
+    def test_wav_segments_join_into_one_stream(self):
+        joiner = AudioStreamJoiner("wav")
+        parts = [speech_like_wav(0.5, sample_rate=16000, channels=1) for _ in range(3)]
+        stream = b"".join(joiner.join(part) for part in parts)
+
+        pcm_format, offset = parse_wav_header(stream)
+        assert pcm_format == PCMFormat(channels=1, sample_rate=16000, sample_width=2)
+        assert len(stream) - offset == sum(len(part) - parse_wav_header(part)[1] for part in parts)
+        assert stream.count(b"RIFF") == 1
+
+    def test_mismatched_wav_segments_are_rejected(self):
+        joiner = AudioStreamJoiner("wav")
+        joiner.join(speech_like_wav(0.1, sample_rate=16000, channels=1))
+        with pytest.raises(ValueError):
+            joiner.join(speech_like_wav(0.1, sample_rate=22050, channels=1))
+
+    @pytest.fixture
+    def voice_service(self, monkeypatch):
+        service = VoiceService({})
+        service.generated = []
+
+        async def generate(text, voice_profile, audio_format):
+            service.generated.append(text)
+            # Synthesis time grows with text length
+            await asyncio.sleep(len(text) * 0.002)
+            return speech_like_wav(len(text) / 50, sample_rate=16000, channels=1)
+
+        async def duration(audio_data, audio_format):
+            return (len(audio_data) - 44) / 32000
+
+        monkeypatch.setattr(service, "_generate_speech", generate)
+        monkeypatch.setattr(service, "_calculate_audio_duration", duration)
+        return service
+
+    @pytest.mark.asyncio
+    async def test_first_audio_depends_on_first_sentence(self, voice_service):
+        text = "Short opener here. " + " ".join(
+            f"Then a considerably longer sentence number {i} follows with plenty of words in it." for i in range(10)
+        )
+        start = time.perf_counter()
+        stream = voice_service.text_to_speech_stream(
+            text, audio_format=AudioFormat.WAV, session_id="s1", user_id="u1"
+        )
+        first = await stream.__anext__()
+        first_audio = time.perf_counter() - start
+        rest = [chunk async for chunk in stream]
+        total = time.perf_counter() - start
+
+        assert first.startswith(b"RIFF")
+        assert not any(chunk.startswith(b"RIFF") for chunk in rest)
+        assert first_audio * 5 < total
+        assert voice_service.analytics["s1"].text_to_speech_requests == 1
+
+    @pytest.mark.asyncio
+    async def test_repeated_sentences_hit_the_cache(self, voice_service):
+        text = "This sentence is said twice. Something else in between. This sentence is said twice."
+        chunks = [chunk async for chunk in voice_service.text_to_speech_stream(text, audio_format=AudioFormat.WAV)]
+        assert len(chunks) == 3
+
+        again = [chunk async for chunk in voice_service.text_to_speech_stream(
+            "Something else in between.", audio_format=AudioFormat.WAV
+        )]
+        assert again[0].startswith(b"RIFF")
+        assert voice_service.generated.count("Something else in between.") == 1
+
+
+def bytes_cache(disk=None, max_bytes=1000):
+    return VoiceResultCache(
+        "test", lambda value: ({}, value), lambda metadata, payload: payload,
+        max_bytes=max_bytes, disk=disk
+    )
+
+
+class TestVoiceResultCache:
+    """Test suite for the byte-bounded LRU and its shared disk tier"""
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = bytes_cache(max_bytes=1000)
+        cache.put("hot", b"h" * 300)
+        cache.put("a", b"a" * 300)
+        cache.put("b", b"b" * 300)
+        assert cache.get("hot") is not None
+
+        cache.put("c", b"c" * 300)
+        assert "a" not in cache
+        assert cache.get("hot") == b"h" * 300
+
+        metrics = cache.get_metrics()
+        assert metrics["evictions"] == 1
+        assert metrics["memory_bytes"] <= 1000
+
+    def test_oversized_entries_are_not_kept_in_memory(self):
+        cache = bytes_cache(max_bytes=1000)
+        cache.put("small", b"s" * 100)
+        cache.put("huge", b"x" * 5000)
+        assert "huge" not in cache and "small" in cache
+
+    def test_disk_tier_is_shared_between_workers(self, tmp_path):
+        first = bytes_cache(DiskCacheTier(str(tmp_path)))
+        second = bytes_cache(DiskCacheTier(str(tmp_path)))
+        first.put(cache_key("tts", "hello"), b"audio")
+
+        assert second.get(cache_key("tts", "hello")) == b"audio"
+        assert second.get(cache_key("tts", "other")) is None
+        metrics = second.get_metrics()
+        assert metrics["disk_hits"] == 1 and metrics["misses"] == 1
+        assert metrics["hit_rate"] == 0.5
+
+    def test_corrupt_disk_entries_are_misses(self, tmp_path):
+        disk = DiskCacheTier(str(tmp_path))
+        cache = bytes_cache(disk)
+        key = cache_key("stt", b"audio")
+        cache.put(key, b"text")
+        with open(disk._path(key), "wb") as f:
+            f.write(b"garbage")
+
+        assert bytes_cache(disk).get(key) is None
+        assert disk.errors == 1
+        assert not os.path.exists(disk._path(key))
+
+    def test_disk_tier_trims_to_budget(self, tmp_path):
+        disk = DiskCacheTier(str(tmp_path), max_bytes=5000)
+        cache = bytes_cache(disk)
+        for i in range(20):
+            cache.put(f"{i:02x}key", b"x" * 1000)
+        disk.trim()
+
+        assert len(disk) <= 5
+        assert disk.evictions >= 15
+
+    def test_puts_trim_in_the_background(self, tmp_path):
+        disk = DiskCacheTier(str(tmp_path), max_bytes=5000)
+        cache = bytes_cache(disk)
+        for i in range(20):
+            cache.put(f"{i:02x}key", b"x" * 1000)
+
+        deadline = time.monotonic() + 2
+        while (len(disk) > 5 or disk._trimming) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(disk) <= 5
+
+    @pytest.mark.asyncio
+    async def test_async_access_keeps_disk_io_off_the_loop(self, tmp_path):
+        disk = DiskCacheTier(str(tmp_path))
+        io_threads = []
+        for name in ("get", "put"):
+            method = getattr(disk, name)
+
+            def recording(*args, _method=method):
+                io_threads.append(threading.current_thread())
+                return _method(*args)
+            setattr(disk, name, recording)
+
+        await bytes_cache(disk).put_async("key", b"audio")
+        assert await bytes_cache(disk).get_async("key") == b"audio"
+
+        assert len(io_threads) == 2
+        assert threading.main_thread() not in io_threads
+
+    def test_keys_do_not_collide_across_part_boundaries(self):
+        assert cache_key("ab", "c") != cache_key("a", "bc")
+
+
+class TestVoiceServiceCache:
+    """Test suite for VoiceService result caching"""
+
+    @pytest.mark.asyncio
+    async def test_tts_results_survive_a_restart(self, monkeypatch):
+        calls = []
+
+        async def generate(text, voice_profile, audio_format):
+            calls.append(text)
+            return b"ID3" + text.encode()
+
+        async def duration(audio_data, audio_format):
+            return 1.0
+
+        for _ in range(2):
+            service = VoiceService({})
+            monkeypatch.setattr(service, "_generate_speech", generate)
+            monkeypatch.setattr(service, "_calculate_audio_duration", duration)
+            result = await service.text_to_speech("Good morning", "google_neural_female")
+
+        assert calls == ["Good morning"]
+        assert result.audio_data == b"ID3Good morning"
+        assert result.voice_profile.voice_id == "en-US-Neural2-F"
+
+        metrics = await service.get_performance_metrics()
+        assert metrics["cache"]["audio"]["disk_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_recognition_results_are_cached(self, monkeypatch):
+        service = VoiceService({})
+        calls = []
+
+        async def recognize(audio_data, provider, language):
+            calls.append(language)
+            return {"text": "hello", "confidence": 0.9}
+
+        monkeypatch.setattr(service, "_perform_speech_recognition", recognize)
+        data = speech_like_wav(0.5, sample_rate=16000, channels=1)
+        await service.speech_to_text(data, AudioFormat.WAV, provider=VoiceProvider.SYSTEM_TTS)
+        result = await service.speech_to_text(data, AudioFormat.WAV, provider=VoiceProvider.SYSTEM_TTS)
+
+        assert result.text == "hello"
+        assert calls == ["en-US"]
+        assert service.recognition_cache.get_metrics()["memory_hits"] == 1
+
+        await service.clear_cache()
+        assert len(service.recognition_cache) == 0
+
+
+def route_client(service, user=None):
+    """TestClient for the voice router; user=None leaves authentication real"""
+    app = FastAPI()
+    app.include_router(voice_routes.router)
+    app.dependency_overrides[voice_routes.get_voice_service] = lambda: service
+    if user is not None:
+        app.dependency_overrides[get_current_user] = lambda: user
+    return TestClient(app)
+
+
+def access_token(user_id="u1"):
+    return create_access_token({"sub": user_id}, settings.SECRET_KEY, settings.JWT_ALGORITHM)
+
+
+class TestSpeechToTextRoutes:
+    """Test suite for the chunked upload and WebSocket speech-to-text routes"""
+
+    @pytest.fixture
+    def voice_service(self, monkeypatch):
+        service = VoiceService({})
+
+        async def recognize(audio_data, provider, language):
+            return await fake_recognize(audio_data)
+
+        monkeypatch.setattr(service, "_perform_speech_recognition", recognize)
+        return service
+
+    def test_chunked_upload(self, voice_service):
+        client = route_client(voice_service, user={"user_id": "u1"})
+        data = speech_like_wav(6, sample_rate=16000, channels=1)
+
+        response = client.post(
+            "/api/voice/speech-to-text/stream?audio_format=wav&session_id=s1",
+            content=iter(chunked(data, 8192)),
+            headers={"Content-Type": "application/octet-stream"}
+        )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["text"] and body["duration"] == pytest.approx(6, abs=0.01)
+        assert voice_service.analytics["s1"].speech_to_text_requests == 1
+
+    def test_chunked_upload_requires_authentication(self, voice_service):
+        client = route_client(voice_service)
+        data = speech_like_wav(1, sample_rate=16000, channels=1)
+
+        assert client.post("/api/voice/speech-to-text/stream", content=data).status_code == 403
+        response = client.post(
+            "/api/voice/speech-to-text/stream", content=data,
+            headers={"Authorization": "Bearer not-a-token"}
+        )
+        assert response.status_code == 401
+
+    def test_websocket_streams_partials_then_final(self, voice_service):
+        client = route_client(voice_service)
+        data = speech_like_wav(6, sample_rate=16000, channels=1)
+
+        with client.websocket_connect(f"/api/voice/ws/speech-to-text?token={access_token()}") as websocket:
+            for chunk in chunked(data, 8192):
+                websocket.send_bytes(chunk)
+            websocket.send_text("end")
+
+            messages = [websocket.receive_json()]
+            while messages[-1]["type"] == "partial":
+                messages.append(websocket.receive_json())
+
+        final = messages[-1]
+        assert final["type"] == "final"
+        assert final["duration"] == pytest.approx(6, abs=0.01)
+        assert [m["segment"] for m in messages[:-1]] == list(range(len(messages) - 1))
+        assert messages[-2]["transcript"] == final["text"]
+
+    @pytest.mark.parametrize("query, headers", [
+        ("", {}),
+        ("?token=not-a-token", {}),
+        ("", {"Authorization": "Bearer not-a-token"}),
+    ])
+    def test_websocket_rejects_unauthenticated_handshakes(self, voice_service, query, headers):
+        client = route_client(voice_service)
+        with pytest.raises(WebSocketDisconnect) as rejected:
+            with client.websocket_connect(f"/api/voice/ws/speech-to-text{query}", headers=headers) as websocket:
+                websocket.receive_json()
+        assert rejected.value.code == 1008
+
+    def test_websocket_accepts_bearer_header(self, voice_service):
+        client = route_client(voice_service)
+        headers = {"Authorization": f"Bearer {access_token()}"}
+
+        with client.websocket_connect("/api/voice/ws/speech-to-text", headers=headers) as websocket:
+            websocket.send_bytes(speech_like_wav(1, sample_rate=16000, channels=1))
+            websocket.send_text("end")
+            message = websocket.receive_json()
+            while message["type"] == "partial":
+                message = websocket.receive_json()
+        assert message["type"] == "final"
+
+
+class TestTextToSpeechStreamRoute:
+    """Test suite for the sentence-streaming text-to-speech route"""
+
+    @pytest.fixture
+    def voice_service(self, monkeypatch):
+        service = VoiceService({})
+        service.fail_on = None
+
+        async def generate(text, voice_profile, audio_format):
+            if text == service.fail_on:
+                raise RuntimeError("provider unavailable")
+            # Later sentences finish first; each segment's samples spell its text
+            await asyncio.sleep(random.uniform(0, 0.03))
+            return wav_of(text.encode())
+
+        async def duration(audio_data, audio_format):
+            return (len(audio_data) - 44) / 32000
+
+        monkeypatch.setattr(service, "_generate_speech", generate)
+        monkeypatch.setattr(service, "_calculate_audio_duration", duration)
+        return service
+
+    def test_sentences_stream_in_order(self, voice_service):
+        client = route_client(voice_service, user={"user_id": "u1"})
+        sentences = [f"Sentence number {i} has its own audio." for i in range(8)]
+
+        with client.stream("POST", "/api/voice/text-to-speech/stream", json={
+            "text": " ".join(sentences), "audio_format": "wav", "session_id": "s1"
+        }) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "audio/wav"
+            audio = b"".join(response.iter_bytes())
+
+        _, offset = parse_wav_header(audio)
+        assert audio.count(b"RIFF") == 1
+        assert audio[offset:] == b"".join(wav_of(s.encode())[44:] for s in sentences)
+        assert voice_service.analytics["s1"].text_to_speech_requests == 1
+
+    def test_empty_text_is_rejected(self, voice_service):
+        client = route_client(voice_service, user={"user_id": "u1"})
+        response = client.post("/api/voice/text-to-speech/stream", json={"text": "   ", "audio_format": "wav"})
+        assert response.status_code == 400
+
+    def test_first_segment_failure_is_an_error_response(self, voice_service):
+        client = route_client(voice_service, user={"user_id": "u1"})
+        voice_service.fail_on = "This one fails."
+
+        response = client.post("/api/voice/text-to-speech/stream", json={
+            "text": "This one fails. This one would have worked.", "audio_format": "wav"
+        })
+        assert response.status_code == 500
+        assert response.json()["detail"] == "Speech synthesis streaming failed"
+
+    def test_requires_authentication(self, voice_service):
+        client = route_client(voice_service)
+        response = client.post("/api/voice/text-to-speech/stream", json={"text": "Hello.", "audio_format": "wav"})
+        assert response.status_code == 403
+
+
+class TestStreamingBenchmark:
+    """CPU time and latency per minute of audio: buffered vs streamed preprocessing"""
+
+    @pytest.mark.asyncio
+    async def test_latency_per_minute_of_audio(self):
+        data = speech_like_wav(60)
+        chunks = chunked(data, 32 * 1024)
+        chunk_interval = 60 / len(chunks) / BENCHMARK_SPEEDUP
+
+        async def no_recognition(wav):
+            return {"text": "", "confidence": 0.0}
+
+        # Buffered: the whole clip is preprocessed once the upload has finished
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        preprocess_audio(data, AudioFormat.WAV)
+        buffered_latency = time.perf_counter() - start
+        buffered_cpu = time.process_time() - cpu_start
+
+        # Streamed: segments are preprocessed while the upload is replayed
+        session = StreamingSpeechSession(recognize=no_recognition, pool=VoiceProcessingPool(max_workers=2))
+        cpu_start = time.process_time()
+        for chunk in chunks:
+            await session.feed(chunk)
+            await asyncio.sleep(chunk_interval)
+        start = time.perf_counter()
+        await session.finish()
+        streamed_latency = time.perf_counter() - start
+        streamed_cpu = time.process_time() - cpu_start
+
+        print(f"\nSpeech-to-text preprocessing per minute of 44.1kHz stereo audio "
+              f"(upload replayed at {BENCHMARK_SPEEDUP:g}x real time):")
+        print(f"  Buffered: {buffered_cpu * 1000:7.0f}ms CPU, {buffered_latency * 1000:7.0f}ms after last byte")
+        print(f"  Streamed: {streamed_cpu * 1000:7.0f}ms CPU, {streamed_latency * 1000:7.0f}ms after last byte")
+
+        assert session.audio_seconds == pytest.approx(60, abs=0.01)
+        assert streamed_latency * 3 < buffered_latency